@@ -4,4 +4,10 @@ Module with logger names.
 
 # logger names
 MAIN_LOGGER_NAME = 'main_logger'
-CONNECTION_INFO_LOGGER_NAME = 'connection_info_logger'
\ No newline at end of file
+CONNECTION_INFO_LOGGER_NAME = 'connection_info_logger'
+
+# subsystems (see util.loggers.get_subsystem_logger)
+NET_SUBSYSTEM = 'net'
+RENDER_SUBSYSTEM = 'render'
+INPUT_SUBSYSTEM = 'input'
+STATE_SUBSYSTEM = 'state'
@@ -10,4 +10,6 @@ RESOURCES_DIR_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'res')
 DEFAULT_CONFIG_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'default_config.json'))
 LOGGERS_CONFIG_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'loggers_config.json'))
 DEFAULT_USER_CONFIG_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'default_user_config.json'))
-USER_CONFIG_DIR_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'user'))
\ No newline at end of file
+USER_CONFIG_DIR_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'user'))
+TOOLS_LOGGERS_CONFIG_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'cfg', 'tools_loggers_config.json'))
+FLIGHT_RECORDER_DIR_PATH: str = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, 'flight_recorder'))
@@ -5,6 +5,19 @@ import pygame
 
 
 ########## For externally defined data ##########
+class IBMetricsConfig(BaseModel):
+    """
+    Class that represents the configuration of the metrics exporter (see util.metrics.MetricsExporter).
+    """
+
+    model_config: ConfigDict = {'extra': 'forbid'}
+
+    enabled: bool
+    path: str
+    interval: float
+    port: int
+
+
 class IBGameConfig(BaseModel):
     """
     Class that represents the configuration of the game.
@@ -22,6 +35,10 @@ class IBGameConfig(BaseModel):
     min_window_width: int
     min_window_height: int
     debug_mode: bool
+    warm_up_viewports: bool
+    speculative_connect: bool
+    keep_connection_warm: bool
+    metrics: IBMetricsConfig
 
 
 class IBAssets(BaseModel):
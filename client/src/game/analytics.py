@@ -0,0 +1,547 @@
+"""
+This module contains the post-game analytics of the recorded network session logs (see game/session_log.py).
+The logs are streamed record by record and split into games (PAIRED or CONTINUE ... WIN/LOST/TKO),
+so only the current game is kept in memory. The statistics of all games are accumulated
+in arrays of a fixed size (heat-maps of the actions, histogram of the times to move,
+mean score trajectories), so weeks of recorded sessions are processed in bounded memory.
+"""
+
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Tuple, Union
+import numpy as np
+from game.session_log import RecordKind, iter_session_log
+from util.msg_parser import from_net_message
+from util.stats import moments_confidence_interval, proportion_confidence_interval
+from const.server_communication import *
+
+
+SESSION_LOG_EXTENSION = '.ibsl'
+"""The extension of the session logs searched in the directories."""
+
+MOVE_TIME_BINS = np.geomspace(1e-3, 1e3, 121)
+"""The edges of the histogram of the times to move in seconds (20 bins per decade)."""
+
+MAX_TRAJECTORY_TURNS = 2 * BOARD_SIDE_SIZE * BOARD_SIDE_SIZE
+"""The number of turns of the aggregated score trajectories (longer games are cut)."""
+
+OUTCOME_INCOMPLETE = 'INCOMPLETE'
+"""The outcome of a game that did not end in the session log (the player left or the log ended)."""
+
+
+@dataclass
+class GameStats:
+    """
+    This class represents the statistics of a game of a session log (from the point of view of the recording player).
+    """
+
+    session: str
+    """The path to the session log."""
+    index: int
+    """The index of the game within the session log."""
+    player: str = None
+    """The nickname of the player."""
+    opponent: str = None
+    """The nickname of the opponent."""
+    outcome: str = OUTCOME_INCOMPLETE
+    """The outcome of the game (CMD_GAME_WIN, CMD_GAME_LOSE, CMD_TKO or OUTCOME_INCOMPLETE)."""
+    is_first: bool = None
+    """Whether the player was on turn first (None if the game was resumed)."""
+    resumed: bool = False
+    """Whether the game started in the log by CONTINUE (the start of the game is in another log)."""
+    start: float = 0
+    """The time of the start of the game in seconds since the start of the recording."""
+    duration: float = 0
+    """The duration of the game in seconds."""
+    reconnects: int = 0
+    """The number of the reconnections of the player during the game."""
+    opponent_disconnects: int = 0
+    """The number of the disconnections of the opponent during the game (WAIT)."""
+    actions: List[Tuple[int, int, int]] = field(default_factory=list)
+    """The actions of the player (row, column, cell value after the action)."""
+    losses: List[Tuple[int, int]] = field(default_factory=list)
+    """The cells of the lost ships of the player."""
+    move_times: List[float] = field(default_factory=list)
+    """The times from the TURN of the player to its ACTION in seconds."""
+    scores: List[int] = field(default_factory=list)
+    """The score of the player after each turn."""
+
+
+    @property
+    def turns(self) -> int:
+        """
+        Getter for the number of turns of the game (both players).
+
+        :return: The number of turns.
+        :rtype: int
+        """
+
+        return len(self.scores)
+
+
+    @property
+    def score(self) -> int:
+        """
+        Getter for the final score of the player.
+
+        :return: The score.
+        :rtype: int
+        """
+
+        return self.scores[-1] if self.scores else 0
+
+
+    def to_row(self) -> Dict[str, Any]:
+        """
+        Returns the statistics as a flat row of the per-game table.
+
+        :return: The row.
+        :rtype: Dict[str, Any]
+        """
+
+        results = Counter(value for _, _, value in self.actions)
+        move_times = np.asarray(self.move_times)
+        return {'session': self.session, 'game': self.index, 'player': self.player, 'opponent': self.opponent,
+                'outcome': self.outcome, 'is_first': self.is_first, 'resumed': self.resumed,
+                'start_s': self.start, 'duration_s': self.duration, 'turns': self.turns,
+                'actions': len(self.actions), 'gains': results[BOARD_PLAYER_CELL],
+                'hits': results[BOARD_OPPONENT_SHIP_LOST_CELL], 'losses': len(self.losses),
+                'score': self.score, 'reconnects': self.reconnects, 'opponent_disconnects': self.opponent_disconnects,
+                'move_time_mean_s': float(move_times.mean()) if move_times.size else None,
+                'move_time_median_s': float(np.median(move_times)) if move_times.size else None,
+                'move_time_max_s': float(move_times.max()) if move_times.size else None,
+                'score_trajectory': list(self.scores)}
+
+
+@dataclass
+class SessionStats:
+    """
+    This class represents the statistics of a session log (connections, not games).
+    """
+
+    session: str
+    """The path to the session log."""
+    duration: float = 0
+    """The duration of the recording in seconds."""
+    records: int = 0
+    """The number of the records."""
+    games: int = 0
+    """The number of the games."""
+    connects: int = 0
+    """The number of the established connections."""
+    lost_connections: int = 0
+    """The number of the connections lost (not closed by the client)."""
+    invalid_frames: int = 0
+    """The number of the frames that could not be parsed."""
+    truncated: bool = False
+    """Whether the log ended in the middle of a record (e.g. the client crashed)."""
+
+
+def iter_session_paths(paths: List[str]) -> Iterator[str]:
+    """
+    Yields the session logs of the paths (directories are searched recursively for SESSION_LOG_EXTENSION).
+
+    :param paths: The paths to the session logs or to the directories.
+    :type paths: List[str]
+    :return: The paths to the session logs.
+    :rtype: Iterator[str]
+    """
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(SESSION_LOG_EXTENSION):
+                    yield os.path.join(root, name)
+
+
+_CELL_SCORES = np.zeros(256, dtype=np.int64)
+"""The score of each cell value (indexed by the cell value as uint8)."""
+_CELL_SCORES[BOARD_PLAYER_CELL & 0xFF] = SCORE_SHIP_GAINED
+_CELL_SCORES[BOARD_PLAYER_SHIP_LOST_CELL & 0xFF] = SCORE_LOST_SHIP
+_CELL_SCORES[BOARD_OPPONENT_SHIP_LOST_CELL & 0xFF] = SCORE_HIT
+
+
+def get_parts(frame: str) -> List[str]:
+    """
+    Returns the parts of the recorded frame (as util.msg_parser.from_net_message, which is used
+    only for the frames with escaped characters, the others are just split).
+
+    :param frame: The frame.
+    :type frame: str
+    :return: The parts of the frame.
+    :rtype: List[str]
+    :raises ValueError: If the frame does not start with the header.
+    """
+
+    if MSG_ESCAPE in frame:
+        return from_net_message(frame)
+    if not frame.startswith(MSG_HEADER):
+        raise ValueError(f"Invalid message header: '{frame[:len(MSG_HEADER)]}'")
+
+    body = frame[(len(MSG_HEADER) + 1):]
+    end = body.find(MSG_TERMINATOR)
+    # the unterminated last part is dropped as by from_net_message
+    return body[:end].split(MSG_DELIMITER) if end != -1 else body.split(MSG_DELIMITER)[:-1]
+
+
+def get_board(board_str: str) -> np.ndarray:
+    """
+    Parses the board from its network representation (see util.msg_parser.board_from_net).
+
+    :param board_str: The network representation of the board.
+    :type board_str: str
+    :return: The board (9, 9).
+    :rtype: np.ndarray
+    :raises ValueError: If the board is not valid.
+    """
+
+    cells = np.fromstring(board_str.replace(SEQ_DELIMITER, NUM_DELIMITER), dtype=np.int8, sep=NUM_DELIMITER)
+    return cells.reshape(BOARD_SIDE_SIZE, BOARD_SIDE_SIZE)
+
+
+def get_score(board: np.ndarray) -> int:
+    """
+    Returns the score of the player on the player-relative board (see game.rules.get_score).
+
+    :param board: The player-relative board (9, 9).
+    :type board: np.ndarray
+    :return: The score.
+    :rtype: int
+    """
+
+    return int(_CELL_SCORES[board.view(np.uint8)].sum())
+
+
+def iter_session_games(path: str) -> Iterator[Union[GameStats, SessionStats]]:
+    """
+    Streams the session log and yields the statistics of its games one by one
+    followed by the statistics of the session.
+
+    :param path: The path to the session log.
+    :type path: str
+    :return: The statistics of the games and (last) of the session.
+    :rtype: Iterator[Union[GameStats, SessionStats]]
+    :raises ValueError: If the file is not a valid session log.
+    """
+
+    session = SessionStats(path)
+    player = None
+    game: GameStats = None
+    board: np.ndarray = None
+    action = None
+    turn_start = None
+    timestamp = 0
+
+    def new_game(opponent: str, resumed: bool) -> GameStats:
+        session.games += 1
+        return GameStats(path, session.games - 1, player, opponent, resumed=resumed, start=timestamp)
+
+    records = iter_session_log(path)
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except ValueError:
+            # the header is checked before the first record, a broken tail is expected after a crash
+            if session.records == 0:
+                raise
+            session.truncated = True
+            break
+
+        session.records += 1
+        timestamp = record.timestamp
+        if record.kind == RecordKind.CONNECT:
+            session.connects += 1
+            if game is not None and session.connects > 1:
+                game.reconnects += 1
+            continue
+        elif record.kind == RecordKind.CLOSE:
+            session.lost_connections += record.payload == 'lost'
+            turn_start = None
+            continue
+        elif record.kind not in (RecordKind.FRAME_IN, RecordKind.FRAME_OUT):
+            continue
+
+        try:
+            parts = get_parts(record.payload)
+            command = parts[PART_CMD_INDEX]
+        except (ValueError, IndexError):
+            session.invalid_frames += 1
+            continue
+
+        if record.kind == RecordKind.FRAME_OUT:
+            if command == CMD_TRY_VALID and len(parts) > 1:
+                player = parts[1]
+            elif command == CMD_TURN_ACTION and game is not None and len(parts) > 1:
+                try:
+                    row, col = (int(x) for x in parts[1].split(NUM_DELIMITER))
+                except ValueError:
+                    session.invalid_frames += 1
+                    continue
+                action = (row, col) if 0 <= row < BOARD_SIDE_SIZE and 0 <= col < BOARD_SIDE_SIZE else None
+                if turn_start is not None:
+                    game.move_times.append(timestamp - turn_start)
+                    turn_start = None
+            continue
+
+        if command == CMD_LOBBY_PAIRED and len(parts) > 1:
+            if game is not None:
+                game.duration = timestamp - game.start
+                yield game
+            game = new_game(parts[1], False)
+            board = action = turn_start = None
+
+        elif command == CMD_CONTINUE and len(parts) > PART_CONTINUE_BOARD_INDEX:
+            if game is None or game.opponent != parts[PART_CONTINUE_OPPONENT_INDEX]:
+                if game is not None:
+                    game.duration = timestamp - game.start
+                    yield game
+                game = new_game(parts[PART_CONTINUE_OPPONENT_INDEX], True)
+            try:
+                board = get_board(parts[PART_CONTINUE_BOARD_INDEX])
+            except ValueError:
+                session.invalid_frames += 1
+            action = None
+            turn_start = timestamp if parts[PART_CONTINUE_PLAYER_ON_TURN_INDEX] == player else None
+
+        elif game is None:
+            continue
+
+        elif command == CMD_BOARD and len(parts) > PART_BOARD_INDEX:
+            try:
+                new_board = get_board(parts[PART_BOARD_INDEX])
+            except ValueError:
+                session.invalid_frames += 1
+                continue
+            if board is not None:
+                if action is not None:
+                    game.actions.append((action[0], action[1], int(new_board[action])))
+                    action = None
+                lost = (new_board == BOARD_PLAYER_SHIP_LOST_CELL) & (board != BOARD_PLAYER_SHIP_LOST_CELL)
+                if lost.any():
+                    game.losses.extend(zip(*(axis.tolist() for axis in lost.nonzero())))
+                game.scores.append(get_score(new_board))
+            board = new_board
+
+        elif command == CMD_PLAYER_TURN and len(parts) > 1:
+            if game.is_first is None and not game.resumed:
+                game.is_first = parts[1] == player
+            turn_start = timestamp if parts[1] == player else None
+
+        elif command == CMD_WAIT:
+            game.opponent_disconnects += 1
+            turn_start = None
+
+        elif command in (CMD_GAME_WIN, CMD_GAME_LOSE, CMD_TKO):
+            game.outcome = command
+            game.duration = timestamp - game.start
+            yield game
+            game = board = action = turn_start = None
+
+    if game is not None:
+        game.duration = timestamp - game.start
+        yield game
+    session.duration = timestamp
+    yield session
+
+
+class SessionAnalytics:
+    """
+    This class accumulates the statistics of the games and the sessions in arrays of a fixed size.
+    """
+
+
+    def __init__(self):
+        """
+        Initializes the empty statistics.
+        """
+
+        self.sessions = 0
+        """The number of the session logs."""
+        self.invalid_sessions: Dict[str, str] = {}
+        """The session logs that could not be read (path -> error)."""
+        self.truncated_sessions = 0
+        """The number of the truncated session logs."""
+        self.records = 0
+        """The number of the records."""
+        self.recorded_time = 0.0
+        """The total duration of the recordings in seconds."""
+        self.connects = 0
+        """The number of the established connections."""
+        self.lost_connections = 0
+        """The number of the lost connections."""
+        self.invalid_frames = 0
+        """The number of the frames that could not be parsed."""
+        self.games = 0
+        """The number of the games."""
+        self.outcomes = Counter()
+        """The number of the games per outcome."""
+        self.wins_first = [0, 0]
+        """The number of won and finished games in which the player was on turn first."""
+        self.reconnects = 0
+        """The number of the reconnections during the games."""
+        self.games_with_reconnect = 0
+        """The number of the games with at least one reconnection."""
+        self.opponent_disconnects = 0
+        """The number of the disconnections of the opponents."""
+        self.actions_heatmap = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=np.int64)
+        """The number of the actions per cell."""
+        self.gains_heatmap = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=np.int64)
+        """The number of the gained ships per cell."""
+        self.hits_heatmap = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=np.int64)
+        """The number of the hit ships of the opponents per cell."""
+        self.losses_heatmap = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=np.int64)
+        """The number of the lost ships per cell."""
+        self.move_time_counts = np.zeros(MOVE_TIME_BINS.size + 1, dtype=np.int64)
+        """The histogram of the times to move (the first and the last bin are out of MOVE_TIME_BINS)."""
+        self.move_time_moments = np.zeros(2)
+        """The sum and the sum of squares of the times to move."""
+        self.move_time_range = [None, None]
+        """The minimal and the maximal time to move."""
+        self.score_moments = np.zeros(2)
+        """The sum and the sum of squares of the final scores of the finished games."""
+        self.turn_moments = np.zeros(2)
+        """The sum and the sum of squares of the turns of the finished games."""
+        self.trajectories: Dict[str, np.ndarray] = {}
+        """The sums and the counts of the scores per turn of the games per outcome (2, MAX_TRAJECTORY_TURNS)."""
+
+
+    def add_game(self, game: GameStats):
+        """
+        Adds the statistics of the game.
+
+        :param game: The statistics of the game.
+        :type game: GameStats
+        """
+
+        self.games += 1
+        self.outcomes[game.outcome] += 1
+        self.reconnects += game.reconnects
+        self.games_with_reconnect += game.reconnects > 0
+        self.opponent_disconnects += game.opponent_disconnects
+
+        if game.actions:
+            actions = np.asarray(game.actions)
+            cells = actions[:, 0], actions[:, 1]
+            np.add.at(self.actions_heatmap, cells, 1)
+            np.add.at(self.gains_heatmap, cells, actions[:, 2] == BOARD_PLAYER_CELL)
+            np.add.at(self.hits_heatmap, cells, actions[:, 2] == BOARD_OPPONENT_SHIP_LOST_CELL)
+        if game.losses:
+            losses = np.asarray(game.losses)
+            np.add.at(self.losses_heatmap, (losses[:, 0], losses[:, 1]), 1)
+
+        if game.move_times:
+            move_times = np.asarray(game.move_times)
+            np.add.at(self.move_time_counts, np.searchsorted(MOVE_TIME_BINS, move_times, side='right'), 1)
+            self.move_time_moments += move_times.sum(), np.square(move_times).sum()
+            low, high = float(move_times.min()), float(move_times.max())
+            self.move_time_range = [low if self.move_time_range[0] is None else min(low, self.move_time_range[0]),
+                                    high if self.move_time_range[1] is None else max(high, self.move_time_range[1])]
+
+        if game.outcome not in (CMD_GAME_WIN, CMD_GAME_LOSE):
+            return
+
+        if game.is_first:
+            self.wins_first[0] += game.outcome == CMD_GAME_WIN
+            self.wins_first[1] += 1
+        self.score_moments += game.score, game.score ** 2
+        self.turn_moments += game.turns, game.turns ** 2
+        if not game.resumed and game.scores:
+            trajectory = self.trajectories.setdefault(game.outcome, np.zeros((2, MAX_TRAJECTORY_TURNS)))
+            scores = np.asarray(game.scores[:MAX_TRAJECTORY_TURNS])
+            trajectory[0, :scores.size] += scores
+            trajectory[1, :scores.size] += 1
+
+
+    def add_session(self, session: SessionStats):
+        """
+        Adds the statistics of the session (its games are added by add_game).
+
+        :param session: The statistics of the session.
+        :type session: SessionStats
+        """
+
+        self.sessions += 1
+        self.truncated_sessions += session.truncated
+        self.records += session.records
+        self.recorded_time += session.duration
+        self.connects += session.connects
+        self.lost_connections += session.lost_connections
+        self.invalid_frames += session.invalid_frames
+
+
+    def get_move_time_percentile(self, p: float) -> float:
+        """
+        Returns the approximate percentile of the times to move (the upper edge of its bin of the histogram).
+
+        :param p: The percentile in range <0, 100>.
+        :type p: float
+        :return: The percentile in seconds or None if there are no samples.
+        :rtype: float
+        """
+
+        total = int(self.move_time_counts.sum())
+        if total == 0:
+            return None
+
+        i = int(np.searchsorted(np.cumsum(self.move_time_counts), max(p / 100 * total, 1)))
+        # the out of range bins are bounded by the observed extremes
+        if i == 0:
+            return self.move_time_range[0]
+        if i >= MOVE_TIME_BINS.size:
+            return self.move_time_range[1]
+        return min(float(MOVE_TIME_BINS[i]), self.move_time_range[1])
+
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the aggregated statistics.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        finished = self.outcomes[CMD_GAME_WIN] + self.outcomes[CMD_GAME_LOSE]
+        move_times = int(self.move_time_counts.sum())
+        actions = self.actions_heatmap.sum()
+        hours = self.recorded_time / 3600
+        nonzero = np.flatnonzero(self.move_time_counts)
+        edges = np.concatenate(([0], MOVE_TIME_BINS, [np.inf]))
+
+        return {'sessions': self.sessions, 'truncated_sessions': self.truncated_sessions,
+                'invalid_sessions': self.invalid_sessions, 'records': self.records,
+                'invalid_frames': self.invalid_frames, 'recorded_hours': hours,
+                'games': self.games, 'outcomes': dict(self.outcomes),
+                'win_rate': proportion_confidence_interval(self.outcomes[CMD_GAME_WIN], finished),
+                'win_rate_first': proportion_confidence_interval(*self.wins_first),
+                'score': moments_confidence_interval(finished, *self.score_moments),
+                'turns': moments_confidence_interval(finished, *self.turn_moments),
+                'connections': {'connects': self.connects, 'lost': self.lost_connections,
+                                'reconnects_per_session': (self.connects - self.sessions) / self.sessions if self.sessions else None,
+                                'reconnects_per_hour': (self.connects - self.sessions) / hours if hours else None,
+                                'game_reconnects': self.reconnects,
+                                'game_reconnect_rate': proportion_confidence_interval(self.games_with_reconnect, self.games),
+                                'opponent_disconnects': self.opponent_disconnects},
+                'move_time_s': {'count': move_times,
+                                **({'mean': self.move_time_moments[0] / move_times, 'min': self.move_time_range[0],
+                                    **{f"p{p}": self.get_move_time_percentile(p) for p in (50, 90, 95, 99)},
+                                    'max': self.move_time_range[1]} if move_times else {}),
+                                'histogram': [{'low': float(edges[i]), 'high': float(edges[i + 1]) if i < MOVE_TIME_BINS.size else None,
+                                               'count': int(self.move_time_counts[i])} for i in nonzero]},
+                'heatmaps': {'actions': self.actions_heatmap.tolist(),
+                             'gains': self.gains_heatmap.tolist(),
+                             'hits': self.hits_heatmap.tolist(),
+                             'losses': self.losses_heatmap.tolist(),
+                             'hit_rate': np.round(np.divide(self.gains_heatmap + self.hits_heatmap, self.actions_heatmap,
+                                                            out=np.zeros(self.actions_heatmap.shape), where=self.actions_heatmap > 0), 4).tolist(),
+                             'actions_share': np.round(self.actions_heatmap / actions, 6).tolist() if actions else None},
+                'score_trajectories': {outcome: np.round(trajectory[0, :np.count_nonzero(trajectory[1])]
+                                                         / trajectory[1, :np.count_nonzero(trajectory[1])], 3).tolist()
+                                       for outcome, trajectory in self.trajectories.items()}}
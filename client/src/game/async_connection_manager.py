@@ -0,0 +1,417 @@
+"""
+This module contains an asyncio counterpart of the ConnectionManager. It speaks the same protocol
+(using the shared codec from util.msg_parser) but on asyncio streams, so a single process can drive
+many connections at once (load generation, tournaments, multi-session hosting).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+from util.msg_parser import ServerResponse, to_net_message, from_net_message, escape_net_message, parse_parts
+from const.server_communication import *
+from util.loggers import get_logger, get_subsystem_logger
+from const.loggers import MAIN_LOGGER_NAME, NET_SUBSYSTEM
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+net_logger = get_subsystem_logger(NET_SUBSYSTEM, MAIN_LOGGER_NAME)
+
+
+@dataclass
+class TrafficStats:
+    """
+    This class represents the traffic counters of a single connection.
+    """
+
+    frames_in: int = 0
+    """Number of complete messages received."""
+    frames_out: int = 0
+    """Number of messages sent."""
+    bytes_in: int = 0
+    """Number of bytes received."""
+    bytes_out: int = 0
+    """Number of bytes sent."""
+
+
+class AsyncConnectionManager:
+    """
+    This class is responsible for managing the connection between the client and the server
+    for the game Inverse Battleships using asyncio streams. The public API mirrors the ConnectionManager.
+    """
+
+    KEEP_ALIVE_TIMEOUT = 10
+    """The timeout for keeping the connection alive."""
+
+    CLIENT_RECONNECT_TIMEOUT = 60
+    """The timeout for reconnecting the client to the server."""
+
+    WHOLE_MSG_TIMEOUT = 5
+    """The default timeout for receiving a whole message from the server."""
+
+
+    def __init__(self, server_ip: str, server_port: int):
+        """
+        Initializes the connection manager.
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        """
+
+        self._server_ip = server_ip
+        self._server_port = server_port
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+        self._last_time_reply = None
+        self.traffic = TrafficStats()
+        """Traffic counters of the connection."""
+
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Checks if the connection manager is connected to the server.
+
+        :return: True if the connection manager is connected to the server, false otherwise.
+        :rtype: bool
+        """
+
+        return self._writer is not None and not self._writer.is_closing()
+
+
+    @property
+    def server_address(self) -> str:
+        """
+        Getter for server_address.
+
+        :return: The game server address
+        :rtype: str
+        """
+
+        return f"{self._server_ip}:{self._server_port}"
+
+
+    @property
+    def last_time_reply(self) -> float:
+        """
+        Getter for last_time_reply.
+
+        :return: The time of the last reply from the server.
+        :rtype: float
+        """
+
+        return self._last_time_reply
+
+
+    async def start(self, timeout: float = SERVER_CONNECTION_TIMEOUT):
+        """
+        Connects to the server.
+
+        :param timeout: The connection timeout in seconds.
+        :type timeout: float
+        """
+
+        if self.is_running:
+            raise ConnectionError(f"Cannot connect to the server at {self.server_address}: already connected")
+
+        try:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self._server_ip, self._server_port), timeout)
+            self._last_time_reply = time.time()
+        except Exception as e:
+            raise ConnectionError(f"Error connecting to the server at {self.server_address}: {e}")
+
+
+    async def close(self):
+        """
+        Closes the connection without notifying the server.
+        """
+
+        if self._writer is None:
+            return
+
+        writer = self._writer
+        self._writer = None
+        self._reader = None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception as e:
+            logger.debug(f"Error closing the connection to the server at {self.server_address}: {e}")
+
+
+    async def stop(self):
+        """
+        Disconnects from the server (LEAVE/BYE exchange followed by closing the connection).
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot disconnect from the server at {self.server_address}: not connected")
+
+        try:
+            await self.logout()
+        except Exception as e:
+            logger.error(f"Error disconnecting properly from the server at {self.server_address}: {e}. Forcing disconnection.")
+
+        await self.close()
+
+
+    async def _send_cmd(self, parts: List[str]):
+        """
+        Sends a command to the game server.
+
+        :param parts: The parts of the command.
+        :type parts: List[str]
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot send message to the server at {self.server_address}: not connected")
+
+        message = to_net_message(parts)
+        data = message.encode()
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except Exception as e:
+            raise ConnectionError(f"Error sending message to the server at {self.server_address}: {e}")
+
+        self.traffic.frames_out += 1
+        self.traffic.bytes_out += len(data)
+        net_logger.debug(lambda: f"Sent message to the server at {self.server_address}: '{escape_net_message(message)}'")
+
+
+    async def receive_message(self, timeout: float = WHOLE_MSG_TIMEOUT) -> ServerResponse:
+        """
+        Receives a message from the game server.
+        Waits until a whole message is received, an error occurs or the timeout expires.
+
+        :param timeout: The timeout in seconds (None for no timeout).
+        :type timeout: float
+        :return: The received message.
+        :rtype: ServerResponse
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot receive message from the server at {self.server_address}: not connected")
+
+        try:
+            data = await asyncio.wait_for(self._reader.readuntil(MSG_TERMINATOR.encode()), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout while receiving whole message from the server at {self.server_address}")
+        except asyncio.IncompleteReadError:
+            raise ConnectionError(f"Error receiving message from the server at {self.server_address}: no data received - connection was probably lost")
+        except Exception as e:
+            raise ConnectionError(f"Error receiving message from the server at {self.server_address}: {e}")
+
+        self._last_time_reply = time.time()
+        self.traffic.frames_in += 1
+        self.traffic.bytes_in += len(data)
+
+        message = data.decode()
+        net_logger.debug(lambda: f"Received complete message from the server: '{escape_net_message(message)}'")
+        try:
+            return parse_parts(from_net_message(message))
+        except ValueError as e:
+            raise ValueError(f"Validation failed while parsing message from the server at {self.server_address}: {e}")
+
+
+    async def _receive_command_response(self, expected_command: str, check_for_ping: bool = True, timeout: float = WHOLE_MSG_TIMEOUT) -> ServerResponse:
+        """
+        Receives a response from the game server and returns it if it matches the expected command.
+        Ping messages received before the expected response are answered.
+
+        :param expected_command: The expected command.
+        :type expected_command: str
+        :param check_for_ping: Whether to answer the ping messages.
+        :type check_for_ping: bool
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The received response or None if the response does not match.
+        :rtype: ServerResponse
+        """
+
+        res = await self.receive_message(timeout)
+        while check_for_ping and res.command == CMD_PING:
+            await self.pong()
+            res = await self.receive_message(timeout)
+
+        if res.command != expected_command:
+            logger.error(f"Invalid response received from the server at {self.server_address}: {res.command}. Expected: {expected_command}")
+            return None
+
+        return res
+
+
+    async def ping(self) -> bool:
+        """
+        Sends a ping message to the game server.
+
+        :return: True if the ping message was sent and responded to successfully, false otherwise.
+        :rtype: bool
+        """
+
+        await self._send_cmd([CMD_PING])
+        res = await self._receive_command_response(CMD_PONG, check_for_ping=False)
+        return res is not None
+
+
+    async def pong(self):
+        """
+        Sends a pong message to the game server.
+        """
+
+        await self._send_cmd([CMD_PONG])
+
+
+    async def login(self, username: str) -> bool:
+        """
+        Logs in to the game server with the given username (HAND/SHAKE/DEAL).
+
+        :param username: The username to log in with.
+        :type username: str
+        :return: True if the login was successful, false otherwise.
+        :rtype: bool
+        """
+
+        await self._send_cmd([CMD_TRY_VALID, username])
+        res = await self._receive_command_response(CMD_ACKW_VALID, check_for_ping=False)
+        if not res:
+            logger.error(f"Error logging in to the server at {self.server_address} - invalid server response")
+            return False
+
+        await self._send_cmd([CMD_CONFIRM_VALID])
+        return True
+
+
+    async def logout(self) -> bool:
+        """
+        Logs out from the game server.
+
+        :return: True if the logout was successful.
+        :rtype: bool
+        """
+
+        await self._send_cmd([CMD_LEAVE])
+        res = await self._receive_command_response(CMD_CONFIRM_LEAVE)
+        if not res:
+            raise ConnectionError(f"Error logging out from the server at {self.server_address} - invalid server response")
+
+        return True
+
+
+    async def get_lobbies(self) -> List[str]:
+        """
+        Requests the list of lobbies from the game server.
+
+        :return: The list of lobbies.
+        :rtype: List[str]
+        """
+
+        await self._send_cmd([CMD_LOBBIES])
+        res = await self._receive_command_response(CMD_LOBBIES_RESP)
+        if not res:
+            return []
+
+        return res.params
+
+
+    async def get_lobby(self) -> str:
+        """
+        Requests a new lobby from the game server.
+
+        :return: The lobby ID.
+        :rtype: str
+        """
+
+        await self._send_cmd([CMD_LOBBY_CREATE])
+        res = await self._receive_command_response(CMD_LOBBY_PAIRING)
+        if not res:
+            raise ConnectionError(f"Error receiving lobby from the server at {self.server_address}")
+
+        return res.params[PARAM_LOBBY_ID_INDEX]
+
+
+    async def join_lobby(self, lobby_id: str) -> str:
+        """
+        Joins a lobby with the given ID.
+
+        :param lobby_id: The ID of the lobby to join.
+        :type lobby_id: str
+        :return: The lobby ID.
+        :rtype: str
+        """
+
+        await self._send_cmd([CMD_LOBBY, lobby_id])
+        res = await self._receive_command_response(CMD_LOBBY_PAIRING)
+        if not res:
+            raise ConnectionError(f"Error receiving lobby from the server at {self.server_address}")
+
+        return res.params[PARAM_LOBBY_ID_INDEX]
+
+
+    async def check_for_players(self, timeout: float = WHOLE_MSG_TIMEOUT) -> str:
+        """
+        Waits for an opponent in the lobby.
+
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: Opponent's username.
+        :rtype: str
+        """
+
+        res = await self._receive_command_response(CMD_LOBBY_PAIRED, timeout=timeout)
+        if not res:
+            raise ConnectionError(f"Error receiving players in the lobby from the server at {self.server_address}")
+
+        return res.params[PARAM_PLAYER_ID_INDEX]
+
+
+    async def game_ready(self, timeout: float = WHOLE_MSG_TIMEOUT) -> Tuple[List[List[int]], str, bool]:
+        """
+        Sends a ready message to the game server and receives the board, the username of the player on turn
+        and the TKO flag if the player won due to the opponent's connection difficulties.
+
+        :param timeout: The timeout in seconds for each of the expected messages.
+        :type timeout: float
+        :return: The board, the username of the player whose turn it is and TKO flag.
+        :rtype: Tuple[List[List[int]], str, bool]
+        """
+
+        board = None
+        player_on_turn = None
+
+        await self._send_cmd([CMD_READY])
+        while board is None or player_on_turn is None:
+            res = await self.receive_message(timeout)
+            if res.command == CMD_PING:
+                await self.pong()
+            elif res.command == CMD_TKO:
+                return board, player_on_turn, True
+            elif res.command == CMD_BOARD:
+                board = res.params[PARAM_BOARD_INDEX]
+            elif res.command == CMD_PLAYER_TURN:
+                player_on_turn = res.params[PARAM_PLAYER_ID_INDEX]
+            else:
+                raise ConnectionError(f"Invalid response received from the server at {self.server_address}: {res.command}. Expected: {CMD_BOARD} or {CMD_PLAYER_TURN}")
+
+        return board, player_on_turn, False
+
+
+    async def send_action(self, action: Tuple[int, int]):
+        """
+        Sends an action to the game server.
+
+        :param action: The action to send (row, column).
+        :type action: Tuple[int, int]
+        """
+
+        await self._send_cmd([CMD_TURN_ACTION, f"{str(action[0])}{NUM_DELIMITER}{str(action[1])}"])
+
+
+    async def wait_ackw(self):
+        """
+        Sends an acknowledgment to the server that the player is waiting for the opponent.
+        """
+
+        await self._send_cmd([CMD_WAITING])
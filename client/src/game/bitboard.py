@@ -0,0 +1,265 @@
+"""
+This module contains the bitboard representation of the player-relative board of the game Inverse Battleships.
+The board is stored as one 81-bit integer mask per cell state (the cell (row, col) is the bit row * 9 + col),
+so the counts, the score, the equality and the differences of the boards are a few integer operations
+and int.bit_count calls instead of nested loops, and the boards are hashable (e.g. for caches).
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+from const.server_communication import *
+
+
+BOARD_CELLS_COUNT = BOARD_SIDE_SIZE * BOARD_SIDE_SIZE
+"""The number of the cells of the board."""
+
+FULL_MASK = (1 << BOARD_CELLS_COUNT) - 1
+"""The mask of all cells of the board."""
+
+_STATES = (BOARD_FREE_CELL, BOARD_PLAYER_CELL, BOARD_PLAYER_SHIP_LOST_CELL, BOARD_OPPONENT_SHIP_LOST_CELL)
+"""The cell states in the order of the masks of the bitboard."""
+
+_STATE_CODES = {state: str(i).encode() for i, state in enumerate(_STATES)}
+"""The one-character codes of the cell states (the indexes of their masks)."""
+
+_CODES = b''.join(_STATE_CODES.values())
+"""The codes of the cell states."""
+
+_NET_DELIMITERS = (SEQ_DELIMITER + NUM_DELIMITER).encode()
+"""The delimiters of the network representation of the board."""
+
+_NET_CELL = '(?:' + '|'.join(re.escape(str(state)) for state in _STATES) + ')'
+"""The pattern of a cell of the network representation of the board (one of the cell states)."""
+
+_NET_ROW = f"{_NET_CELL}(?:{re.escape(NUM_DELIMITER)}{_NET_CELL}){{{BOARD_SIDE_SIZE - 1}}}"
+"""The pattern of a row of the network representation of the board (the cells separated by NUM_DELIMITER)."""
+
+_NET_BOARD_PATTERN = re.compile(f"{_NET_ROW}(?:{re.escape(SEQ_DELIMITER)}{_NET_ROW}){{{BOARD_SIDE_SIZE - 1}}}")
+"""The pattern of the network representation of the board (the rows separated by SEQ_DELIMITER)."""
+
+_CODE_TABLES = [bytes.maketrans(_CODES, bytes(b'1'[0] if code == state_code else b'0'[0] for code in _CODES))
+                for state_code in _CODES]
+"""The translation tables of the codes to the binary digits of the mask of each state."""
+
+
+@dataclass(frozen=True)
+class Bitboard:
+    """
+    This class represents the player-relative board as the masks of the cells in each state.
+    The instances are immutable, compared and hashed by the masks.
+    """
+
+    free: int = FULL_MASK
+    """The mask of the free cells."""
+    player: int = 0
+    """The mask of the ships of the player."""
+    player_lost: int = 0
+    """The mask of the lost ships of the player."""
+    opponent_lost: int = 0
+    """The mask of the lost ships of the opponent."""
+
+
+    @staticmethod
+    def get_cell_mask(row: int, col: int) -> int:
+        """
+        Returns the mask of the cell.
+
+        :param row: The row of the cell.
+        :type row: int
+        :param col: The column of the cell.
+        :type col: int
+        :return: The mask with the bit of the cell.
+        :rtype: int
+        """
+
+        return 1 << (row * BOARD_SIDE_SIZE + col)
+
+
+    @staticmethod
+    def iter_cells(mask: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the cells of the mask (from the lowest bit).
+
+        :param mask: The mask.
+        :type mask: int
+        :return: The cells (row, column).
+        :rtype: Iterator[Tuple[int, int]]
+        """
+
+        while mask:
+            low = mask & -mask
+            yield divmod(low.bit_length() - 1, BOARD_SIDE_SIZE)
+            mask ^= low
+
+
+    @staticmethod
+    def __from_codes(codes: bytes) -> 'Bitboard':
+        """
+        Creates the bitboard from the codes of the cell states (see _STATE_CODES) in the order of the bits.
+
+        :param codes: The codes of the cells.
+        :type codes: bytes
+        :return: The bitboard.
+        :rtype: Bitboard
+        """
+
+        # the highest bit first, each mask is parsed by int() from the translated digits
+        digits = codes[::-1]
+        return Bitboard(*(int(digits.translate(table), 2) for table in _CODE_TABLES))
+
+
+    @staticmethod
+    def from_net(board_str: str) -> 'Bitboard':
+        """
+        Parses the bitboard from the network representation of the board (see util.msg_parser.board_from_net).
+
+        :param board_str: The network representation of the board.
+        :type board_str: str
+        :return: The bitboard.
+        :rtype: Bitboard
+        :raises ValueError: If the board is not valid.
+        """
+
+        # BOARD_SIDE_SIZE rows of BOARD_SIDE_SIZE valid cells with the delimiters in place
+        if not _NET_BOARD_PATTERN.fullmatch(board_str):
+            raise ValueError(f"Invalid board: '{board_str}'")
+
+        codes = board_str.encode()
+        # the two-character values are replaced by their codes (the others are their own codes)
+        for state in (BOARD_PLAYER_SHIP_LOST_CELL, BOARD_OPPONENT_SHIP_LOST_CELL):
+            codes = codes.replace(str(state).encode(), _STATE_CODES[state])
+
+        return Bitboard.__from_codes(codes.translate(None, _NET_DELIMITERS))
+
+
+    @staticmethod
+    def from_list(board: List[List[int]]) -> 'Bitboard':
+        """
+        Creates the bitboard from the board.
+
+        :param board: The board (9 rows of 9 cells).
+        :type board: List[List[int]]
+        :return: The bitboard.
+        :rtype: Bitboard
+        :raises ValueError: If the board is not valid.
+        """
+
+        cells = [cell for row in board for cell in row]
+        if len(board) != BOARD_SIDE_SIZE or len(cells) != BOARD_CELLS_COUNT:
+            raise ValueError(f"Invalid board: {len(cells)} cells instead of {BOARD_CELLS_COUNT}")
+        try:
+            return Bitboard.__from_codes(b''.join([_STATE_CODES[cell] for cell in cells]))
+        except KeyError as e:
+            raise ValueError(f"Invalid board: unknown cell value {e}")
+
+
+    def to_list(self) -> List[List[int]]:
+        """
+        Returns the board as a list of rows.
+
+        :return: The board.
+        :rtype: List[List[int]]
+        """
+
+        return [[self.get(row, col) for col in range(BOARD_SIDE_SIZE)] for row in range(BOARD_SIDE_SIZE)]
+
+
+    def to_net(self) -> str:
+        """
+        Returns the network representation of the board (see util.msg_parser.board_to_net).
+
+        :return: The network representation of the board.
+        :rtype: str
+        """
+
+        return SEQ_DELIMITER.join(NUM_DELIMITER.join(str(cell) for cell in row) for row in self.to_list())
+
+
+    def get(self, row: int, col: int) -> int:
+        """
+        Returns the state of the cell.
+
+        :param row: The row of the cell.
+        :type row: int
+        :param col: The column of the cell.
+        :type col: int
+        :return: The state of the cell (BOARD_*_CELL).
+        :rtype: int
+        """
+
+        bit = Bitboard.get_cell_mask(row, col)
+        if self.free & bit:
+            return BOARD_FREE_CELL
+        elif self.player & bit:
+            return BOARD_PLAYER_CELL
+        elif self.player_lost & bit:
+            return BOARD_PLAYER_SHIP_LOST_CELL
+
+        return BOARD_OPPONENT_SHIP_LOST_CELL
+
+
+    def is_free(self, row: int, col: int) -> bool:
+        """
+        Checks if the player can act on the cell.
+
+        :param row: The row of the cell.
+        :type row: int
+        :param col: The column of the cell.
+        :type col: int
+        :return: True if the cell is free, false otherwise.
+        :rtype: bool
+        """
+
+        return bool(self.free & Bitboard.get_cell_mask(row, col))
+
+
+    @property
+    def stats(self) -> Tuple[int, int, int, int]:
+        """
+        Getter for the numbers of the free cells, the ships of the player,
+        the lost ships of the player and the lost ships of the opponent.
+
+        :return: The statistics of the board.
+        :rtype: Tuple[int, int, int, int]
+        """
+
+        return self.free.bit_count(), self.player.bit_count(), self.player_lost.bit_count(), self.opponent_lost.bit_count()
+
+
+    @property
+    def score(self) -> int:
+        """
+        Getter for the score of the player (see game.rules.get_score).
+
+        :return: The score.
+        :rtype: int
+        """
+
+        return (self.player.bit_count() * SCORE_SHIP_GAINED + self.player_lost.bit_count() * SCORE_LOST_SHIP
+                + self.opponent_lost.bit_count() * SCORE_HIT)
+
+
+    def diff(self, other: 'Bitboard') -> int:
+        """
+        Returns the mask of the cells whose state differs on the other board.
+
+        :param other: The other board.
+        :type other: Bitboard
+        :return: The mask of the changed cells.
+        :rtype: int
+        """
+
+        return ((self.free ^ other.free) | (self.player ^ other.player)
+                | (self.player_lost ^ other.player_lost) | (self.opponent_lost ^ other.opponent_lost))
+
+
+    def __str__(self) -> str:
+        """
+        Returns the network representation of the board.
+
+        :return: The network representation of the board.
+        :rtype: str
+        """
+
+        return self.to_net()
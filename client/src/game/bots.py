@@ -0,0 +1,244 @@
+"""
+This module contains the bot players of the game Inverse Battleships.
+A bot sees only what a player sees: the player-relative board (see const.server_communication)
+and whether it is on turn. Bots are used by the headless session host and the development tools.
+"""
+
+import random
+from abc import ABC, abstractmethod
+from typing import List, Set, Tuple
+import numpy as np
+from game.rules import BOATS_COUNT
+from const.server_communication import *
+
+
+class Bot(ABC):
+    """
+    The Bot class (a strategy choosing the actions of a player).
+    """
+
+
+    def reset(self):
+        """
+        Resets the bot before a new game.
+        """
+
+        pass
+
+
+    def update(self, board: List[List[int]]):
+        """
+        Updates the bot with the board received from the server (called on every BOARD message).
+
+        :param board: The player-relative board.
+        :type board: List[List[int]]
+        """
+
+        pass
+
+
+    @abstractmethod
+    def choose_action(self, board: List[List[int]]) -> Tuple[int, int]:
+        """
+        Chooses the action of the player on turn.
+
+        :param board: The player-relative board.
+        :type board: List[List[int]]
+        :return: The chosen cell (row, column).
+        :rtype: Tuple[int, int]
+        """
+
+        raise NotImplementedError("Must be overridden by subclass.")
+
+
+class RandomBot(Bot):
+    """
+    This class represents a bot choosing a random free cell that it has not tried yet
+    (empty cells stay free on the board after an action).
+    """
+
+
+    def __init__(self, rng: random.Random = None):
+        """
+        Initializes the bot.
+
+        :param rng: The random generator (a new one if not set).
+        :type rng: random.Random
+        """
+
+        self._rng = rng if rng else random.Random()
+        self._tried: Set[Tuple[int, int]] = set()
+
+
+    def reset(self):
+        """
+        Forgets the tried cells.
+        """
+
+        self._tried.clear()
+
+
+    def choose_action(self, board: List[List[int]]) -> Tuple[int, int]:
+        """
+        Chooses a random free cell of the board that was not tried yet.
+
+        :param board: The player-relative board.
+        :type board: List[List[int]]
+        :return: The chosen cell (row, column).
+        :rtype: Tuple[int, int]
+        """
+
+        free = [(r, c) for r, row in enumerate(board) for c, cell in enumerate(row) if cell == BOARD_FREE_CELL]
+        untried = [cell for cell in free if cell not in self._tried]
+        action = self._rng.choice(untried if untried else free)
+        self._tried.add(action)
+        return action
+
+
+class ProbabilityBot(Bot):
+    """
+    This class represents a bot that keeps a probability map of the hidden objects (unclaimed boats
+    and the opponent's ships, both shown as free cells) and chooses the cell with the highest expected score.
+
+    The map is the density of the possible placements of the hidden one-cell and two-cell boats
+    on the cells that can still contain them: free cells that were not tried (a tried free cell is empty)
+    and that do not touch a known ship (the boats never touch each other and an action
+    always reveals the whole boat). The expected score of a cell weights the density with the score
+    of claiming a boat (SCORE_SHIP_GAINED) or hitting the opponent's ship (SCORE_HIT),
+    counting both cells of a two-cell boat. All updates are vectorised over the whole board.
+    """
+
+    EXPECTED_TWO_CELL_BOATS = 1
+    """The expected number of two-cell boats on the board (the server places 0 to 2 of them uniformly)."""
+
+
+    def __init__(self, rng: random.Random = None):
+        """
+        Initializes the bot.
+
+        :param rng: The random generator used to break ties (a new one if not set).
+        :type rng: random.Random
+        """
+
+        self._rng = rng if rng else random.Random()
+        self._tried = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=bool)
+        self._last_action: Tuple[int, int] = None
+        self.board = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=np.int8)
+        """The last received player-relative board."""
+        self.expected_scores = np.zeros((BOARD_SIDE_SIZE, BOARD_SIDE_SIZE))
+        """The expected score of an action on each cell (computed on every board update)."""
+
+
+    def reset(self):
+        """
+        Forgets the tried cells and the board.
+        """
+
+        self._tried[:] = False
+        self._last_action = None
+        self.board[:] = BOARD_FREE_CELL
+        self.expected_scores[:] = 0
+
+
+    def update(self, board: List[List[int]]):
+        """
+        Updates the probability map with the board received from the server.
+
+        :param board: The player-relative board.
+        :type board: List[List[int]]
+        """
+
+        self.board = np.asarray(board, dtype=np.int8)
+        if self._last_action is not None:
+            # a tried cell that stayed free is empty (or the action was not applied, it is tried again then)
+            self._tried[self._last_action] = self.board[self._last_action] == BOARD_FREE_CELL
+            self._last_action = None
+
+        self.expected_scores = ProbabilityBot.get_expected_scores(self.board, self._tried)
+
+
+    @staticmethod
+    def get_expected_scores(board: np.ndarray, tried: np.ndarray) -> np.ndarray:
+        """
+        Computes the expected score of an action on each cell of the board.
+        Works on a single board or on a batch of boards (the last two axes are the board).
+
+        :param board: The player-relative board(s).
+        :type board: np.ndarray
+        :param tried: The free cells known to be empty.
+        :type tried: np.ndarray
+        :return: The expected scores.
+        :rtype: np.ndarray
+        """
+
+        known = board != BOARD_FREE_CELL
+        near = np.zeros_like(known)
+        near[..., 1:, :] |= known[..., :-1, :]
+        near[..., :-1, :] |= known[..., 1:, :]
+        near[..., :, 1:] |= known[..., :, :-1]
+        near[..., :, :-1] |= known[..., :, 1:]
+        possible = ~known & ~near & ~tried
+
+        # the known boats are isolated groups of one or two cells
+        cells = (-2, -1)
+        known_pairs = np.count_nonzero(known[..., :, 1:] & known[..., :, :-1], axis=cells) + \
+                      np.count_nonzero(known[..., 1:, :] & known[..., :-1, :], axis=cells)
+        known_groups = np.count_nonzero(known, axis=cells) - known_pairs
+        # the boats take BOATS_COUNT cells, so each two-cell boat is one group less
+        two_count = np.maximum(ProbabilityBot.EXPECTED_TWO_CELL_BOATS, known_pairs)
+        hidden_groups = np.maximum(BOATS_COUNT - two_count - known_groups, 1)[..., None, None]
+        hidden_two = np.minimum((two_count - known_pairs)[..., None, None], hidden_groups)
+        hidden_one = hidden_groups - hidden_two
+
+        # density of the one-cell boats
+        density_one = possible.astype(float)
+        placements_one = density_one.sum(axis=cells, keepdims=True)
+        density_one *= np.divide(hidden_one, placements_one, out=np.zeros(placements_one.shape), where=placements_one > 0)
+
+        # density of the two-cell boats (each placement covers two cells)
+        horizontal = possible[..., :, 1:] & possible[..., :, :-1]
+        vertical = possible[..., 1:, :] & possible[..., :-1, :]
+        cover = np.zeros(board.shape)
+        cover[..., :, 1:] += horizontal
+        cover[..., :, :-1] += horizontal
+        cover[..., 1:, :] += vertical
+        cover[..., :-1, :] += vertical
+        placements_two = cover.sum(axis=cells, keepdims=True) / 2
+        density_two = cover * np.divide(hidden_two, placements_two, out=np.zeros(placements_two.shape), where=placements_two > 0)
+
+        # at least one of the hidden groups belongs to the opponent while the game is running
+        p_opponent = 1 / hidden_groups
+        score = p_opponent * SCORE_HIT + (1 - p_opponent) * SCORE_SHIP_GAINED
+        return score * (density_one + 2 * density_two)
+
+
+    def choose_action(self, board: List[List[int]]) -> Tuple[int, int]:
+        """
+        Chooses the cell with the highest expected score (ties are broken randomly).
+
+        :param board: The player-relative board.
+        :type board: List[List[int]]
+        :return: The chosen cell (row, column).
+        :rtype: Tuple[int, int]
+        """
+
+        if not np.array_equal(self.board, board):
+            self.update(board)
+
+        scores = self.expected_scores
+        best = scores.max()
+        if best > 0:
+            candidates = np.argwhere(scores == best)
+        else:
+            # nothing is expected anywhere, fall back to the untried free cells
+            candidates = np.argwhere((self.board == BOARD_FREE_CELL) & ~self._tried)
+            if not len(candidates):
+                candidates = np.argwhere(self.board == BOARD_FREE_CELL)
+
+        row, col = candidates[self._rng.randrange(len(candidates))]
+        self._last_action = (int(row), int(col))
+        return self._last_action
+
+
+BOTS = {'random': RandomBot, 'probability': ProbabilityBot}
+"""The available bots by name."""
@@ -0,0 +1,401 @@
+"""
+This module contains the connection lifecycle of the client: the authenticated session with the server
+is kept alive between its uses. The TCP connection is opened when the game starts, the player is logged in
+(HAND, SHAKE, DEAL) as soon as the nickname is submitted and the list of lobbies is prefetched, so the connection
+menu is shown already connected and the lobby selection with data. When the player leaves the connection menu,
+the session is handed back and reused by the next play instead of logging out and in again. While a session
+is parked, its worker thread answers the keep-alive messages of the server and holds the other received messages
+for the game. The session is torn down only when the server is changed, the game exits or it is idle for too long.
+"""
+
+import threading
+import time
+from typing import Callable, List, Tuple
+from game.connection_manager import ConnectionManager
+from game.session_log import SessionRecorder
+from util.msg_parser import ServerResponse
+from const.server_communication import CMD_PING
+from util.metrics import REGISTRY
+from util.tracing import TRACER
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+class _Session:
+    """
+    A session kept by the lifecycle (guarded by the condition of the lifecycle).
+    """
+
+    def __init__(self, server_ip: str, server_port: int, player_name: str = None, connection_manager: ConnectionManager = None):
+        """
+        Creates the session.
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The player to log in (None until the nickname is known).
+        :type player_name: str
+        :param connection_manager: The connection of the logged in player (None to open a new one).
+        :type connection_manager: ConnectionManager
+        """
+
+        self.server_ip = server_ip
+        self.server_port = server_port
+        self.player_name = player_name
+        self.connection_manager = connection_manager
+        self.logged_in = connection_manager is not None
+        """Whether the player is logged in and the connection was not lost since."""
+        self.parked = False
+        """Whether only the keep-alive messages are handled (the session is taken without waiting)."""
+        self.time_parked: float = None
+        self.released = False
+        """Whether the session was taken or closed (the worker thread stops)."""
+        self.teardown_reason: str = None
+        """The reason the session was closed (the connection is closed by the worker thread)."""
+        self.held_responses: List[ServerResponse] = []
+        """The messages received while parked (handled by the game)."""
+        self.time_start = time.perf_counter()
+        self.thread: threading.Thread = None
+
+
+    @property
+    def server_address(self) -> str:
+        """
+        Getter for server_address.
+
+        :return: The address of the server (ip:port).
+        :rtype: str
+        """
+
+        return f"{self.server_ip}:{self.server_port}"
+
+
+class ConnectionLifecycle:
+    """
+    This class keeps the authenticated session between its uses (one at a time). A session is opened ahead
+    and logged in or handed back by the game, and parked by a worker thread until the game takes it.
+    """
+
+    POLL_INTERVAL = 0.05
+    """The timeout in seconds of receiving the messages while parked (the delay of taking the session)."""
+
+    IDLE_TIMEOUT = 300.0
+    """The time in seconds a parked session is kept (the player is logged out after)."""
+
+    CLOSE_TIMEOUT = 1.0
+    """The time in seconds to wait for the logout when the game exits."""
+
+
+    def __init__(self, connection_factory: Callable[..., ConnectionManager], recorder: SessionRecorder = None,
+                 prefetch: Callable[[ConnectionManager], None] = None):
+        """
+        Creates the lifecycle without a session.
+
+        :param connection_factory: Creates the connection managers (server IP, server port, recorder).
+        :type connection_factory: Callable[..., ConnectionManager]
+        :param recorder: The recorder of the session log (None for no recording).
+        :type recorder: SessionRecorder
+        :param prefetch: Requests the data of the session logged in ahead (e.g. the list of lobbies).
+        :type prefetch: Callable[[ConnectionManager], None]
+        """
+
+        self.__connection_factory = connection_factory
+        self.__recorder = recorder
+        self.__prefetch = prefetch
+        self.__condition = threading.Condition()
+        self.__session: _Session = None
+        self.__last_thread: threading.Thread = None
+
+
+    def open(self, server_ip: str, server_port: int, player_name: str = None):
+        """
+        Starts opening the connection to the server in the background (the previous session is closed).
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The player to log in (None to wait for the login).
+        :type player_name: str
+        """
+
+        self.__start(_Session(server_ip, server_port, player_name))
+        logger.debug(f"Opening the connection to {server_ip}:{server_port} ahead")
+
+
+    def login(self, server_ip: str, server_port: int, player_name: str):
+        """
+        Logs the player in the opened session in the background
+        (the session is opened again if it is of another server or player).
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The player to log in.
+        :type player_name: str
+        """
+
+        with self.__condition:
+            session = self.__session
+            if session is not None and __class__.__matches(session, server_ip, server_port, player_name):
+                session.player_name = player_name
+                self.__condition.notify_all()
+                return
+
+        self.open(server_ip, server_port, player_name)
+
+
+    def release(self, server_ip: str, server_port: int, player_name: str, connection_manager: ConnectionManager,
+                held_responses: List[ServerResponse] = None):
+        """
+        Keeps the logged in session alive for the next play (the previous session is closed).
+        The player has to be idle on the server (not in a lobby).
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The logged in player.
+        :type player_name: str
+        :param connection_manager: The connection of the player.
+        :type connection_manager: ConnectionManager
+        :param held_responses: The received messages not handled by the game yet.
+        :type held_responses: List[ServerResponse]
+        """
+
+        session = _Session(server_ip, server_port, player_name, connection_manager)
+        if held_responses:
+            session.held_responses.extend(held_responses)
+        self.__start(session)
+        logger.debug(f"Keeping the connection to {session.server_address} for the next play")
+
+
+    def take(self, server_ip: str, server_port: int, player_name: str, wait: bool = True) -> Tuple[ConnectionManager, List[ServerResponse]]:
+        """
+        Takes the logged in session of the player (it is no longer kept by the lifecycle).
+        A session of another server or player is closed.
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The player.
+        :type player_name: str
+        :param wait: Whether to wait for the login and the prefetch (otherwise only a parked session is taken).
+        :type wait: bool
+        :return: The connection manager and the messages received while parked, or None if there is no such session.
+        :rtype: Tuple[ConnectionManager, List[ServerResponse]]
+        """
+
+        with self.__condition:
+            session = self.__session
+            # without waiting, only a ready session is taken (the rest is left to the waiting call)
+            if not wait and (session is None or not session.parked or not __class__.__matches(session, server_ip, server_port, player_name)):
+                return None
+            if session is None:
+                REGISTRY.counter('connection_reuse_total', 'Plays served by a kept session (hit) or a new connection (miss)', result='miss').inc()
+                return None
+
+            self.__session = None
+            matches = __class__.__matches(session, server_ip, server_port, player_name)
+            if matches:
+                session.player_name = player_name
+            else:
+                session.teardown_reason = 'mismatch'
+            session.released = True
+            self.__condition.notify_all()
+
+        if matches:
+            with TRACER.span('take session', 'net', server=session.server_address):
+                session.thread.join()
+        if matches and session.logged_in:
+            REGISTRY.counter('connection_reuse_total', 'Plays served by a kept session (hit) or a new connection (miss)', result='hit').inc()
+            REGISTRY.histogram('connection_parked_seconds', 'Time a session was kept before it was taken').record(
+                time.monotonic() - session.time_parked)
+            logger.info(f"Using the kept connection to {session.server_address}")
+            return session.connection_manager, session.held_responses
+
+        # the login failed or the connection was lost (closed by the worker thread), the game connects again
+        REGISTRY.counter('connection_reuse_total', 'Plays served by a kept session (hit) or a new connection (miss)', result='miss').inc()
+        return None
+
+
+    def close(self, reason: str, timeout: float = 0):
+        """
+        Closes the session (in the background).
+
+        :param reason: The reason of closing the session (e.g. server_change, quit).
+        :type reason: str
+        :param timeout: The time in seconds to wait for the connection to close.
+        :type timeout: float
+        """
+
+        with self.__condition:
+            session = self.__session
+            if session is None:
+                return
+
+            self.__session = None
+            session.released = True
+            session.teardown_reason = reason
+            self.__condition.notify_all()
+
+        if timeout:
+            session.thread.join(timeout)
+
+
+    @staticmethod
+    def __matches(session: _Session, server_ip: str, server_port: int, player_name: str) -> bool:
+        """
+        Checks if the session can be used by the player.
+
+        :param session: The session.
+        :type session: _Session
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param player_name: The player.
+        :type player_name: str
+        :return: True if the session is of the server and of the player (or not logged in yet), False otherwise.
+        :rtype: bool
+        """
+
+        return session.server_address == f"{server_ip}:{server_port}" and session.player_name in (None, player_name)
+
+
+    def __start(self, session: _Session):
+        """
+        Replaces the session and starts its worker thread.
+
+        :param session: The new session.
+        :type session: _Session
+        """
+
+        self.close('replaced')
+        # the closed session may still be logging out (e.g. the same player of the same server)
+        session.thread = threading.Thread(target=self.__run, args=(session, self.__last_thread), name='connection_lifecycle', daemon=True)
+        with self.__condition:
+            self.__session = session
+            self.__last_thread = session.thread
+        session.thread.start()
+
+
+    def __run(self, session: _Session, previous_thread: threading.Thread = None):
+        """
+        Opens the connection of the session and logs the player in when the nickname is known (unless handed back
+        logged in), prefetches the data and answers the keep-alive messages until the session is released
+        (the worker thread).
+
+        :param session: The session.
+        :type session: _Session
+        :param previous_thread: The worker thread of the previous session (the player is logged out of it first).
+        :type previous_thread: threading.Thread
+        """
+
+        try:
+            if previous_thread:
+                previous_thread.join()
+            if not session.logged_in:
+                session.connection_manager = self.__connection_factory(session.server_ip, session.server_port, self.__recorder)
+                session.connection_manager.start()
+
+                with self.__condition:
+                    self.__condition.wait_for(lambda: session.player_name is not None or session.released)
+                    player_name = session.player_name
+                if player_name is None or session.teardown_reason is not None:
+                    return
+
+                if not session.connection_manager.login(player_name):
+                    raise ConnectionError('Failed to login to the server')
+                session.logged_in = True
+                if self.__prefetch:
+                    self.__prefetch(session.connection_manager)
+                REGISTRY.histogram('connect_ahead_seconds', 'Time from opening a connection ahead to being logged in with the prefetched data').record(
+                    time.perf_counter() - session.time_start)
+
+            self.__park(session)
+
+        except Exception as e:
+            session.logged_in = False
+            logger.warning(f"The kept connection to {session.server_address} failed: {e}")
+            with self.__condition:
+                if session.teardown_reason is None:
+                    session.teardown_reason = 'failed'
+
+        finally:
+            if session.teardown_reason is not None:
+                self.__teardown(session, session.teardown_reason)
+
+
+    def __park(self, session: _Session):
+        """
+        Answers the keep-alive messages of the session until it is released or idle for IDLE_TIMEOUT.
+        The server is pinged only when it was silent for the keep-alive timeout of the connection.
+        The invalid messages are dropped (the session is kept).
+
+        :param session: The session.
+        :type session: _Session
+        """
+
+        connection_manager = session.connection_manager
+        with self.__condition:
+            session.parked = True
+            session.time_parked = time.monotonic()
+        while not session.released:
+            if time.monotonic() - session.time_parked > __class__.IDLE_TIMEOUT:
+                with self.__condition:
+                    if session.released:
+                        break
+                    if self.__session is session:
+                        self.__session = None
+                    session.released = True
+                    session.teardown_reason = 'idle'
+                break
+
+            if time.time() - connection_manager.last_time_reply > connection_manager.KEEP_ALIVE_TIMEOUT:
+                connection_manager.ping()
+
+            try:
+                res = connection_manager.receive_message(__class__.POLL_INTERVAL)
+            except TimeoutError:
+                continue
+            except ValueError as e:
+                # the invalid message is dropped, the next one starts after its terminator
+                logger.warning(f"Dropped an invalid message of the kept connection to {session.server_address}: {e}")
+                continue
+
+            if res.command == CMD_PING:
+                connection_manager.pong()
+            else:
+                session.held_responses.append(res)
+
+
+    def __teardown(self, session: _Session, reason: str):
+        """
+        Closes the connection of the session (the player is logged out if logged in).
+
+        :param session: The session.
+        :type session: _Session
+        :param reason: The reason of closing the session.
+        :type reason: str
+        """
+
+        REGISTRY.counter('connection_teardown_total', 'Sessions closed by the connection lifecycle', reason=reason).inc()
+        connection_manager = session.connection_manager
+        if connection_manager is None or not connection_manager.is_running:
+            return
+
+        try:
+            if session.logged_in:
+                connection_manager.stop()
+            else:
+                connection_manager.close()
+        except Exception as e:
+            logger.warning(f"Failed to close the kept connection to {session.server_address}: {e}")
+        logger.debug(f"Closed the kept connection to {session.server_address} ({reason})")
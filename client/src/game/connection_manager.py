@@ -2,52 +2,31 @@
 This module is responsible for managing the connection between the client and the server for the game Inverse Battleships.
 """
 
-from dataclasses import dataclass
 import socket
 import threading
 import time
 import re
 from typing import Any, List, Tuple
 from util.generic_client import GenericClient
+from game.session_log import SessionRecorder, RecordKind
+from game.bitboard import Bitboard
+from util.msg_parser import ServerResponse, to_net_message, from_net_message, escape_net_message, get_complete_message, parse_parts
 from const.server_communication import *
-from util.loggers import get_logger
-from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger, get_subsystem_logger
+from util.metrics import REGISTRY
+from util.tracing import TRACER
+from util import flight_recorder
+from util.flight_recorder import FLIGHT_RECORDER
+from const.loggers import MAIN_LOGGER_NAME, NET_SUBSYSTEM
 
 
 logger = get_logger(MAIN_LOGGER_NAME)
+net_logger = get_subsystem_logger(NET_SUBSYSTEM, MAIN_LOGGER_NAME)
 
-
-@dataclass
-class ServerResponse:
-    """
-    This class represents a response from the server.
-    """
-
-    command: str
-    """The response from the server."""
-    params: List[Any]
-    """Parameters of the response from the server."""
-
-
-    def __str__(self) -> str:
-        """
-        Returns a string representation of the server response.
-
-        :return: The string representation of the server response.
-        :rtype: str
-        """
-
-        res = ""
-        res += f"{MSG_HEADER}"
-        res += f"{MSG_DELIMITER}"
-        res += f"{self.command}"
-
-        if self.params:
-            res += f"{MSG_DELIMITER}"
-            res += f"{MSG_DELIMITER.join([str(param) for param in self.params])}"
-        res += f"{MSG_TERMINATOR}"
-
-        return res
+_FLIGHT_RECORDER_KINDS = {RecordKind.FRAME_IN: flight_recorder.FRAME_IN, RecordKind.FRAME_OUT: flight_recorder.FRAME_OUT,
+                          RecordKind.CONNECT: flight_recorder.CONNECT, RecordKind.CLOSE: flight_recorder.CLOSE,
+                          RecordKind.CONNECT_FAILED: flight_recorder.CONNECT_FAILED}
+"""The kinds of the flight recorder entries of the session log records."""
 
 
 class ConnectionManager:
@@ -64,136 +43,8 @@ class ConnectionManager:
     __WHOLE_MSG_TIMEOUT = 5
     """The timeout for receiving a whole message from the server."""
 
-    @staticmethod
-    def __to_net_message(parts: List[str]) -> str:
-        """
-        Returns a formatted message from the parts for the network communication.
-
-        :param parts: The parts of the message.
-        :type parts: List[str]
-        :return: The message.
-        :rtype: str
-        """
-
-        if not parts:
-            return f"ERR;NONE{MSG_TERMINATOR}"
-
-        for i, part in enumerate(parts):
-            if MSG_TERMINATOR in part:
-                raise ValueError(f"Message part {i}: '{part}' contains the message terminator '{MSG_TERMINATOR}'")
-            parts[i] = part.replace(MSG_DELIMITER, f"{MSG_ESCAPE}{MSG_DELIMITER}")
-            parts[i] = parts[i].replace(MSG_ESCAPE, f"{MSG_ESCAPE}{MSG_ESCAPE}")
-        
-        return f"{MSG_HEADER}{MSG_DELIMITER}{MSG_DELIMITER.join(parts)}{MSG_TERMINATOR}"
-    
-
-    @staticmethod
-    def __from_net_message(message: str) -> List[str]:
-        """
-        Returns the parts of the message from the network communication.
-
-        :param message: The message.
-        :type message: str
-        :return: The parts of the message.
-        :rtype: List[str]
-        """
-
-        if not message.startswith(MSG_HEADER):
-            raise ValueError(f"Invalid message header: '{message[:len(MSG_HEADER)]}'")
-        
-        parts = []
-        part = ""
-        do_escape = False
-        for char in message[(len(MSG_HEADER) + 1):]:    # skip the header and the first delimiter
-            # end of part encountered
-            if char == MSG_TERMINATOR:
-                parts.append(part)
-                break
-            
-            # escape character encountered
-            if char == MSG_ESCAPE and not do_escape:
-                do_escape = True
-                continue
-            
-            # escaping sequence
-            if do_escape:
-                part += char
-                do_escape = False
-                continue
-
-            # regular sequence
-            else:
-                if char == MSG_DELIMITER:
-                    parts.append(part)
-                    part = ""
-                else:
-                    part += char
-        
-        return parts
-    
-
-    @staticmethod
-    def __escape_net_message(message: str) -> str:
-        """
-        Escapes the message for network communication.
-
-        :param message: The message to escape.
-        :type message: str
-        :return: The escaped message.
-        :rtype: str
-        """
-
-        # NOTE: UTF-8 encoding maybe will be changed to ASCII
-        res = message.encode('unicode_escape').decode('utf-8')
-        return res.replace(MSG_ESCAPE+MSG_ESCAPE, MSG_ESCAPE)
-    
 
-    @staticmethod
-    def __parse_parts(parts: List[str]) -> ServerResponse:
-        """
-        Parses the parts of a message from the server.
-
-        :param parts: The parts of the message.
-        :type parts: List[str]
-        :return: The parsed message.
-        :rtype: ServerResponse
-        """
-
-        if len(parts) == 0:
-            raise ValueError("Empty message received")
-        
-        # NOTE: should always recieve valid commands (server response)
-        command = parts[PART_CMD_INDEX]
-
-        if command in [CMD_PING, CMD_PONG, CMD_ACKW_VALID, CMD_CONFIRM_LEAVE, 
-                       CMD_LOBBIES, CMD_GAME_LOSE, CMD_GAME_WIN, 
-                       CMD_WAIT, CMD_TKO, CMD_LOBBY_PAIRING, CMD_LOBBY_PAIRED,
-                       CMD_PLAYER_TURN]:
-            return ServerResponse(command, parts[PART_CMD_INDEX + 1:])
-        
-        elif command == CMD_BOARD:
-            board = []
-            rows = parts[PART_BOARD_INDEX].split(SEQ_DELIMITER)
-            for row in rows:
-                board.append([int(c) for c in row.split(NUM_DELIMITER)])
-
-            return ServerResponse(command, [board])
-        
-        elif command == CMD_CONTINUE:
-            lobby_id = parts[PART_CONTINUE_LOBBY_ID_INDEX]
-            opponent = parts[PART_CONTINUE_OPPONENT_INDEX]
-            player_on_turn = parts[PART_CONTINUE_PLAYER_ON_TURN_INDEX]
-            board = []
-            rows = parts[PART_CONTINUE_BOARD_INDEX].split(SEQ_DELIMITER)
-            for row in rows:
-                board.append([int(c) for c in row.split(NUM_DELIMITER)])
-            
-            return ServerResponse(command, [lobby_id, opponent, player_on_turn, board])
-        
-        raise ValueError(f"Invalid command received: '{command}'")
-
-
-    def __init__(self, server_ip: str, server_port: int):
+    def __init__(self, server_ip: str, server_port: int, recorder: SessionRecorder = None, client: GenericClient = None):
         """
         Initializes the connection manager.
 
@@ -201,9 +52,15 @@ class ConnectionManager:
         :type server_ip: str
         :param server_port: The game server port.
         :type server_port: int
+        :param recorder: The recorder of the session log (None for no recording).
+        :type recorder: SessionRecorder
+        :param client: The client used for the communication (e.g. replaying a recorded session);
+        a GenericClient by default.
+        :type client: GenericClient
         """
 
-        self.__client = GenericClient(server_ip, server_port)
+        self.__client = client if client else GenericClient(server_ip, server_port)
+        self.__recorder = recorder
         self.__last_time_reply = None
         self.__lock = threading.RLock()
         self.__pending_messages = ""
@@ -270,6 +127,22 @@ class ConnectionManager:
         return self.__last_time_reply
     
 
+    def __record(self, kind: int, payload: str = ""):
+        """
+        Records the event to the flight recorder and to the session log (if recording).
+
+        :param kind: The kind of the record (RecordKind).
+        :type kind: int
+        :param payload: The payload of the record.
+        :type payload: str
+        """
+
+        FLIGHT_RECORDER.add(_FLIGHT_RECORDER_KINDS[kind], payload)
+        if self.__recorder is not None:
+            self.__recorder.record(kind, payload)
+
+
+    @TRACER.traced('net')
     def start(self):
         """
         Connects to the server.
@@ -280,7 +153,10 @@ class ConnectionManager:
                 self.__client.start()
                 self.__last_time_reply = time.time()
             except Exception as e:
+                # the failed attempts are recorded too, so the replayed connections are matched to the recorded ones
+                self.__record(RecordKind.CONNECT_FAILED, self.server_address)
                 raise ConnectionError(f"Error connecting to the server at {self.server_address}: {e}")
+            self.__record(RecordKind.CONNECT, self.server_address)
     
 
     def __try_disconnect(self) -> bool:
@@ -316,6 +192,7 @@ class ConnectionManager:
         return True
             
 
+    @TRACER.traced('net')
     def stop(self):
         """
         Disconnects from the server.
@@ -330,11 +207,23 @@ class ConnectionManager:
 
             try:
                 self.__client.stop()
+                self.__record(RecordKind.CLOSE, "stop")
             except ConnectionError as e:
                 logger.error(f"Error disconnecting from the server at {self.server_address}: {e}")
                 logger.warning(f"Attempted to disconnect from the server at {self.server_address}, but no active connection")
     
 
+    def close(self):
+        """
+        Closes the connection without logging out (e.g. when the connection is known to be lost).
+        """
+
+        with self.__lock:
+            if self.is_running:
+                self.__client.stop()
+                self.__record(RecordKind.CLOSE, "close")
+
+
     def __send_cmd(self, parts: List[str]):
         """
         Sends a command to the game server.
@@ -347,16 +236,21 @@ class ConnectionManager:
             if not self.is_running:
                 raise ConnectionError(f"Cannot send message to the server at {self.server_address}: not connected")
             
-            message = __class__.__to_net_message(parts)
+            message = to_net_message(parts)
     
             try:
-                self.__client.send_message(message)
-                logger.debug(f"Sent message to the server at {self.server_address}: '{__class__.__escape_net_message(message)}'")
+                with TRACER.span('send', 'net', command=parts[0]):
+                    self.__client.send_message(message)
+                self.__record(RecordKind.FRAME_OUT, message)
+                REGISTRY.counter('net_frames_out_total', 'Frames sent to the server', command=parts[0]).inc()
+                REGISTRY.counter('net_bytes_out_total', 'Bytes sent to the server', command=parts[0]).inc(len(message.encode()))
+                net_logger.debug(lambda: f"Sent message to the server at {self.server_address}: '{escape_net_message(message)}'")
             
             except ConnectionError as e:
                 raise e
         
     
+    @TRACER.traced('net')
     def ping(self) -> bool:
         """
         Sends a ping message to the game server.
@@ -370,6 +264,7 @@ class ConnectionManager:
                 raise ConnectionError(f"Cannot send ping message to the server at {self.server_address}: not connected")
 
             try:
+                ping_start = time.perf_counter()
                 self.__send_cmd([CMD_PING])
             except Exception as e:
                 raise ConnectionError(f"Error sending ping message to the server at {self.server_address}: {e}")
@@ -379,6 +274,9 @@ class ConnectionManager:
                 if not res:
                     logger.error(f"Error receiving pong message from the server at {self.server_address}")
                     return False
+                rtt = time.perf_counter() - ping_start
+                REGISTRY.histogram('net_rtt_seconds', 'Round-trip time of the pings').record(rtt)
+                FLIGHT_RECORDER.add(flight_recorder.TIMING, 'net_rtt_seconds', rtt)
             except Exception as e:
                 raise ConnectionError(f"Error receiving pong message from the server at {self.server_address}: {e}")
                 
@@ -386,6 +284,7 @@ class ConnectionManager:
 
     
 
+    @TRACER.traced('net')
     def pong(self):
         """
         Sends a pong message to the game server.
@@ -401,6 +300,7 @@ class ConnectionManager:
                 raise ConnectionError(f"Error sending pong message to the server at {self.server_address}: {e}")
     
 
+    @TRACER.traced('net')
     def get_lobbies(self) -> List[str]:
         """
         Requests the list of lobbies from the game server.
@@ -429,6 +329,7 @@ class ConnectionManager:
         return res.params
 
 
+    @TRACER.traced('net')
     def get_lobby(self) -> str:
         """
         Requests the lobby from the game server.
@@ -455,12 +356,15 @@ class ConnectionManager:
                 raise ConnectionError(f"Error receiving lobby from the server at {self.server_address}: {e}")
             
 
-    def join_lobby(self, lobby_id: str) -> str:
+    @TRACER.traced('net')
+    def join_lobby(self, lobby_id: str, timeout: float = None) -> str:
         """
         Joins a lobby with the given ID.
 
         :param lobby_id: The ID of the lobby to join.
         :type lobby_id: str
+        :param timeout: The timeout in seconds of the response (None for the default timeouts).
+        :type timeout: float
         :return: The lobby ID.
         :rtype: str
         """
@@ -475,7 +379,7 @@ class ConnectionManager:
                 raise ConnectionError(f"Error sending lobby request to the server at {self.server_address}: {e}")
             
             try:
-                res = self.__receive_command_response(CMD_LOBBY_PAIRING)
+                res = self.__receive_command_response(CMD_LOBBY_PAIRING, timeout=timeout)
                 return res.params[PARAM_LOBBY_ID_INDEX]
             except TimeoutError:
                 raise TimeoutError(f"Timeout while waiting for lobby from the server at {self.server_address}")
@@ -483,6 +387,33 @@ class ConnectionManager:
                 raise ConnectionError(f"Error receiving lobby from the server at {self.server_address}: {e}")
             
 
+    @TRACER.traced('net')
+    def check_for_lobby(self, timeout: float) -> str:
+        """
+        Checks for a late response to joining a lobby (e.g. after join_lobby timed out),
+        so it is not received as the response to the next request.
+
+        :param timeout: The timeout in seconds of the response.
+        :type timeout: float
+        :return: The lobby ID or None if no response was received in time.
+        :rtype: str
+        """
+
+        with self.__lock:
+            if not self.is_running:
+                raise ConnectionError(f"Cannot check for lobby at the server {self.server_address}: not connected")
+
+            try:
+                res = self.__receive_command_response(CMD_LOBBY_PAIRING, timeout=timeout)
+            except TimeoutError:
+                return None
+            except Exception as e:
+                raise ConnectionError(f"Error receiving lobby from the server at {self.server_address}: {e}")
+
+        return res.params[PARAM_LOBBY_ID_INDEX] if res else None
+
+
+    @TRACER.traced('net')
     def check_for_players(self) -> str:
         """
         Checks for players in the lobby.
@@ -504,14 +435,15 @@ class ConnectionManager:
                 raise ConnectionError(f"Error receiving players in the lobby from the server at {self.server_address}: {e}")
             
 
-    def game_ready(self) -> Tuple[List[List[int]], str, bool]:
+    @TRACER.traced('net')
+    def game_ready(self) -> Tuple[Bitboard, str, bool]:
         """
         Sends a ready message to the game server and receives current player's username,
         the board and the TKO flag if the player won dur to the opponent's connection 
         difficulties.
 
         :return: The username of the player whose turn it is, the board and TKO flag.
-        :rtype: Tuple[List[List[int]], str, bool]
+        :rtype: Tuple[Bitboard, str, bool]
         """
 
         player_on_turn = None
@@ -571,6 +503,7 @@ class ConnectionManager:
 
             
 
+    @TRACER.traced('net')
     def send_action(self, action: Tuple[int, int]) -> str:
         """
         Sends an action to the game server.
@@ -591,6 +524,7 @@ class ConnectionManager:
                 raise ConnectionError(f"Error sending action to the server at {self.server_address}: {e}")
             
 
+    @TRACER.traced('net')
     def wait_ackw(self):
         """
         Sends an acknowledgment to the server that the player is waiting for the opponent.
@@ -654,31 +588,34 @@ class ConnectionManager:
         :rtype: Tuple[bool, str, str]
         """
 
-        i_end = message.find(MSG_TERMINATOR)
-        if i_end == -1:
-            return False, message, ""
-        
-        if i_end == len(message) - 1:
-            return True, message[:i_end+1], ""      # include the terminator
+        is_complete, complete_msg, tail = get_complete_message(message)
+        if tail:
+            logger.warning(f"Received message with multiple parts: {escape_net_message(message)}")
         
-        else:
-            logger.warning(f"Received message with multiple parts: {__class__.__escape_net_message(message)}")
-            return True, message[:i_end+1], message[(i_end + 1):]       # include the terminator
+        return is_complete, complete_msg, tail
         
 
-    def receive_message(self) -> ServerResponse:
+    @TRACER.traced('net')
+    def receive_message(self, timeout: float = None) -> ServerResponse:
         """
         Receives a message from the game server.
         Is blocking until a message is received or an error occurs or timeout.
 
+        :param timeout: The timeout in seconds (None for the timeout of the client and of a whole message).
+        :type timeout: float
         :return: The received message.
         :rtype: ServerResponse
+        :raises ValueError: If the received message is not valid (it is dropped).
         """
 
         message = ""
         time_start = time.time()
+        whole_msg_timeout = timeout if timeout is not None else __class__.__WHOLE_MSG_TIMEOUT
         while (True):
-            if time.time() - time_start > __class__.__WHOLE_MSG_TIMEOUT:
+            remaining = whole_msg_timeout - (time.time() - time_start)
+            if remaining <= 0:
+                # the received part is kept for the next call
+                self.__pending_messages = message + self.__pending_messages
                 raise TimeoutError("Timeout while receiving whole message from the server")
             
             # handle any pending messages
@@ -699,33 +636,45 @@ class ConnectionManager:
                     raise ConnectionError(f"Cannot receive message from the server at {self.server_address}: not connected")
             
                 try:
-                    message += self.__client.receive_message()
+                    with TRACER.span('recv', 'net'):
+                        message += self.__client.receive_message(remaining if timeout is not None else None)
                 except TimeoutError:
+                    self.__pending_messages = message + self.__pending_messages
                     raise TimeoutError()
                 except Exception as e:
+                    self.__record(RecordKind.CLOSE, "lost")
                     raise ConnectionError(f"Error receiving message from the server at {self.server_address}: {e}")
         
         with self.__lock:
             self.__last_time_reply = time.time()
+        self.__record(RecordKind.FRAME_IN, message)
         
-        logger.debug(f"Received complete message from the server: '{__class__.__escape_net_message(message)}'")
-        parts = __class__.__from_net_message(message)
+        net_logger.debug(lambda: f"Received complete message from the server: '{escape_net_message(message)}'")
+        decode_start = time.perf_counter()
         res = None
         try:
-            res = __class__.__parse_parts(parts)
-        except ValueError as e:
+            parts = from_net_message(message)
+            # the boards are bitboards (compared, counted and scored by integer operations)
+            res = parse_parts(parts, Bitboard.from_net)
+        except (ValueError, IndexError) as e:
             raise ValueError(f"Validation failed while parsing message from the server at {self.server_address}: {e}")
 
+        command = res.command if res else ''
+        REGISTRY.histogram('net_decode_seconds', 'Time to parse a received message', command=command).record(time.perf_counter() - decode_start)
+        REGISTRY.counter('net_frames_in_total', 'Frames received from the server', command=command).inc()
+        REGISTRY.counter('net_bytes_in_total', 'Bytes received from the server', command=command).inc(len(message.encode()))
         return res
     
 
-    def __receive_command_response(self, expected_command: str, check_for_ping: bool = True) -> ServerResponse:
+    def __receive_command_response(self, expected_command: str, check_for_ping: bool = True, timeout: float = None) -> ServerResponse:
         """
         Receives a response from the game server and returns it if it matches the expected command.
         It also handles the case when the server sends a ping message before the expected response.
 
         :param expected_command: The expected command.
         :type expected_command: str
+        :param timeout: The timeout in seconds of each received message (None for the default timeouts).
+        :type timeout: float
         :return: The received response.
         :rtype: ServerResponse
         """
@@ -735,11 +684,11 @@ class ConnectionManager:
                 raise ConnectionError(f"Cannot receive message from the server at {self.server_address}: not connected")
         
             try:
-                res = self.receive_message()
+                res = self.receive_message(timeout)
                 # handle edge case when the server manages to send a ping message before the expected response
                 if check_for_ping and res.command == CMD_PING:
                     self.pong()
-                    res = self.receive_message()
+                    res = self.receive_message(timeout)
 
                 if res.command != expected_command:
                     logger.error(f"Invalid response received from the server at {self.server_address}: {res.command}. Expected: {expected_command}")
@@ -753,6 +702,7 @@ class ConnectionManager:
         return res
     
 
+    @TRACER.traced('net')
     def login(self, username: str) -> bool:
         """
         Logs in to the game server with the given username.
@@ -788,6 +738,7 @@ class ConnectionManager:
         return True
         
 
+    @TRACER.traced('net')
     def logout(self) -> bool:
         """
         Logs out from the game server.
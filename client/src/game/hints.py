@@ -0,0 +1,179 @@
+"""
+This module contains the estimator of the hints of the game Inverse Battleships: the estimated value
+of an action on each free cell of the board (see game.bots.ProbabilityBot). The estimates are computed
+on a worker thread so that the render thread never waits for them, and they are cached per board
+(and tried cells), so repeated positions (e.g. after a reconnect or CONTINUE) are not recomputed.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, Tuple
+import numpy as np
+from game.bitboard import Bitboard
+from game.bots import ProbabilityBot
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+from const.server_communication import *
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+class HintEstimator:
+    """
+    This class computes the hints on a worker thread. Only the latest requested board is computed
+    (older pending requests are superseded) and the results are kept in an LRU cache.
+    """
+
+    CACHE_SIZE = 256
+    """The maximal number of cached boards."""
+
+
+    @staticmethod
+    def get_key(board: Bitboard, tried: Iterable[Tuple[int, int]]) -> Tuple[Bitboard, int]:
+        """
+        Returns the cache key of the board and the tried cells.
+
+        :param board: The player-relative board.
+        :type board: Bitboard
+        :param tried: The free cells already tried by the player.
+        :type tried: Iterable[Tuple[int, int]]
+        :return: The key (the board and the mask of the tried cells).
+        :rtype: Tuple[Bitboard, int]
+        """
+
+        tried_mask = 0
+        for r, c in tried:
+            tried_mask |= Bitboard.get_cell_mask(r, c)
+        return board, tried_mask
+
+
+    @staticmethod
+    def estimate(board: Bitboard, tried: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """
+        Estimates the value of an action on each cell, normalized to <0, 1> (1 for the best cell).
+
+        :param board: The player-relative board.
+        :type board: Bitboard
+        :param tried: The free cells already tried by the player.
+        :type tried: Iterable[Tuple[int, int]]
+        :return: The values of the cells (9, 9).
+        :rtype: np.ndarray
+        """
+
+        board = np.asarray(board.to_list(), dtype=np.int8)
+        tried_mask = np.zeros(board.shape, dtype=bool)
+        for r, c in tried:
+            tried_mask[r, c] = board[r, c] == BOARD_FREE_CELL
+
+        scores = ProbabilityBot.get_expected_scores(board, tried_mask)
+        best = scores.max()
+        return scores / best if best > 0 else scores
+
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        """
+        Initializes the estimator (the worker thread is started with the first request).
+
+        :param cache_size: The maximal number of cached boards.
+        :type cache_size: int
+        """
+
+        self.cache_size = cache_size
+        self.hits = 0
+        """The number of requests served from the cache."""
+        self.misses = 0
+        """The number of computed requests."""
+        self.__cache: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__requested = threading.Event()
+        self.__stopped = threading.Event()
+        self.__request = None
+        self.__thread: threading.Thread = None
+
+
+    def request(self, board: Bitboard, tried: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """
+        Requests the hints of the board. Returns them immediately if cached,
+        otherwise schedules the computation (see get).
+
+        :param board: The player-relative board.
+        :type board: Bitboard
+        :param tried: The free cells already tried by the player.
+        :type tried: Iterable[Tuple[int, int]]
+        :return: The cached values of the cells or None if they are being computed.
+        :rtype: np.ndarray
+        """
+
+        tried = tuple(tried)
+        key = HintEstimator.get_key(board, tried)
+        with self.__lock:
+            if key in self.__cache:
+                self.__cache.move_to_end(key)
+                self.hits += 1
+                return self.__cache[key]
+
+            self.__request = (key, board, tried)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name='HintEstimator', daemon=True)
+                self.__thread.start()
+        self.__requested.set()
+        return None
+
+
+    def get(self, board: Bitboard, tried: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """
+        Returns the hints of the board if they are already computed (does not block).
+
+        :param board: The player-relative board.
+        :type board: Bitboard
+        :param tried: The free cells already tried by the player.
+        :type tried: Iterable[Tuple[int, int]]
+        :return: The values of the cells or None.
+        :rtype: np.ndarray
+        """
+
+        key = HintEstimator.get_key(board, tried)
+        with self.__lock:
+            return self.__cache.get(key, None)
+
+
+    def stop(self):
+        """
+        Stops the worker thread.
+        """
+
+        self.__stopped.set()
+        self.__requested.set()
+
+
+    def __run(self):
+        """
+        Computes the requested hints until stopped.
+        """
+
+        while True:
+            self.__requested.wait()
+            if self.__stopped.is_set():
+                return
+
+            with self.__lock:
+                self.__requested.clear()
+                request = self.__request
+                self.__request = None
+            if request is None:
+                continue
+
+            key, board, tried = request
+            try:
+                values = HintEstimator.estimate(board, tried)
+            except Exception as e:
+                logger.error(f"Failed to estimate the hints: {e}")
+                continue
+
+            with self.__lock:
+                self.misses += 1
+                self.__cache[key] = values
+                self.__cache.move_to_end(key)
+                while len(self.__cache) > self.cache_size:
+                    self.__cache.popitem(last=False)
@@ -12,19 +12,31 @@ import time
 from graphics.game_session import GameSession
 from const.server_communication import *
 from game.connection_manager import ConnectionManager, ServerResponse
+from game.session_log import SessionRecorder, RecordKind
+from game.hints import HintEstimator
+from game.lobby_directory import LobbyDirectory
+from game.connection_lifecycle import ConnectionLifecycle
+from util.generic_client import GenericClient
+from game.state_machine import StateHandlers, StateMachine
 from const.paths import DEFAULT_USER_CONFIG_PATH
-from const.loggers import MAIN_LOGGER_NAME
+from const.loggers import MAIN_LOGGER_NAME, INPUT_SUBSYSTEM, NET_SUBSYSTEM
 from game.ib_game_state import IBGameState, ConnectionStatus
 from graphics.menus.settings_menu import SettingsMenu
 from util import input_validators, loggers
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List, Tuple
 from graphics.menus.input_menu import InputMenu
 from graphics.menus.select_menu import SelectMenu
 from graphics.menus.primitives import MenuTitle, MenuOption
 from graphics.menus.info_screen import InfoScreen
 from graphics.menus.lobby_select import LobbySelect
+from graphics.viewport import Viewport
+from graphics.viewport_pool import ViewportPool
 from util.etc import maintains_min_window_size, get_scaled_resolution
 from util.path import get_project_root, is_valid_filename
+from util.metrics import REGISTRY
+from util.tracing import TRACER
+from util import flight_recorder
+from util.flight_recorder import FLIGHT_RECORDER
 from const.typedefs import IBGameDebugInfo, IBGameUpdateResult, PyGameEvents
 from copy import deepcopy
 import pygame
@@ -32,6 +44,8 @@ from pygame.locals import *
 
 
 logger = loggers.get_logger(MAIN_LOGGER_NAME)
+input_logger = loggers.get_subsystem_logger(INPUT_SUBSYSTEM, MAIN_LOGGER_NAME)
+net_logger = loggers.get_subsystem_logger(NET_SUBSYSTEM, MAIN_LOGGER_NAME)
 tmp_logger = loggers.get_temp_logger('temp')
 tmp_logger.debug('ib_game.py uses temp logger')
 
@@ -48,6 +62,46 @@ class IBGame:
     RESIZE_DELAY = 0.2
     """The interval in seconds between window resizes."""
 
+    WARM_UP_MESSAGES = ('attempt_connection_msg', 'getting_lobbies_msg', 'no_lobbies_msg', 'getting_lobby_info_msg',
+                        'joining_lobby_msg', 'quick_match_msg', 'waiting_for_opponent_msg', 'preparing_game_msg', 'reconnecting_msg')
+    """The strings of the info screens pre-built when the game starts (see the warm_up_viewports option)."""
+
+    QUICK_MATCH_ATTEMPTS = 3
+    """The maximal number of the lobbies the quick match tries to join before it creates one."""
+
+    QUICK_MATCH_MIN_TIMEOUT = 0.25
+    """The minimal time in seconds the quick match waits for the response to joining a lobby."""
+
+    QUICK_MATCH_TIMEOUT_RTTS = 4
+    """The time the quick match waits for the response to joining a lobby in the round-trip times
+    (the server does not respond to joining a full lobby)."""
+
+    QUICK_MATCH_LATE_RESPONSE_TIMEOUT = 0.05
+    """The time in seconds the quick match waits for a late response to joining a lobby before the next attempt."""
+
+    RECORDED_EVENT_TYPES = (pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEMOTION,
+                            pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.VIDEORESIZE)
+    """The types of the PyGame events recorded to the session log."""
+
+
+    @staticmethod
+    def serialize_event(event: pygame.event.Event) -> Dict[str, Any]:
+        """
+        Returns the JSON serializable representation of the PyGame event (for the session log).
+
+        :param event: The PyGame event.
+        :type event: pygame.event.Event
+        :return: The type and the attributes of the event.
+        :rtype: Dict[str, Any]
+        """
+
+        res = {'type': event.type}
+        for key, value in event.dict.items():
+            if isinstance(value, (bool, int, float, str, tuple, list)):
+                res[key] = value
+
+        return res
+
 
     @staticmethod
     def __proccess_input(events: PyGameEvents, key_input_validator: Callable = lambda y, x: x, self = None) -> Dict[str, Any]:
@@ -55,6 +109,7 @@ class IBGame:
         Processes the input events into a dictionary.
         Can return the following keys:
         - direction: The direction key pressed.
+        - page: The page key pressed (page up, page down, home or end).
         - backspace: True if the backspace key was pressed.
         - return: True if the return key was pressed.
         - escape: True if the escape key was pressed.
@@ -77,13 +132,15 @@ class IBGame:
         if events.event_keyup:
             key_up = key_input_validator(self, events.event_keyup)
             if not key_up:
-                logger.debug('Invalid keyup event, skipping...')
+                input_logger.debug('Invalid keyup event, skipping...')
                 return res
             if key_up.key == pygame.K_UP or \
                 key_up.key == pygame.K_DOWN or \
                 key_up.key == pygame.K_LEFT or \
                 key_up.key == pygame.K_RIGHT:
                 res['direction'] = events.event_keyup.key
+            elif key_up.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN, pygame.K_HOME, pygame.K_END):
+                res['page'] = events.event_keyup.key
             elif key_up.key == pygame.K_BACKSPACE:
                 res['backspace'] = True
             elif key_up.key == pygame.K_RETURN:
@@ -93,11 +150,11 @@ class IBGame:
             elif key_up.unicode.isprintable():
                 res['new_char'] = events.event_keyup.unicode
 
-            logger.debug(f'Processed keyup event: {pygame.key.name(events.event_keyup.key)}')
+            input_logger.debug(lambda: f'Processed keyup event: {pygame.key.name(events.event_keyup.key)}')
             
         elif events.event_mousebuttonup:
             res['mouse_click'] = events.event_mousebuttonup.pos
-            logger.debug(f'Processed mousebuttonup event: {events.event_mousebuttonup.pos}')
+            input_logger.debug('Processed mousebuttonup event: %s', events.event_mousebuttonup.pos)
         
         elif events.event_mousemotion:
             res['mouse_motion'] = events.event_mousemotion.pos
@@ -165,7 +222,8 @@ class IBGame:
         return init_board
 
 
-    def __init__(self, config: Dict[str, Any], assets: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], assets: Dict[str, Any], recorder: SessionRecorder = None,
+                 connection_factory: Callable[..., ConnectionManager] = ConnectionManager):
         """
         Creates a new instance of the IBGame class.
 
@@ -173,10 +231,17 @@ class IBGame:
         :type config: Dict[Any]
         :param assets: The assets of the game.
         :type assets: Dict[Any]
+        :param recorder: The recorder of the session log (None for no recording).
+        :type recorder: SessionRecorder
+        :param connection_factory: Creates the connection managers (server IP, server port, recorder);
+        replaced by the session replayer.
+        :type connection_factory: Callable[..., ConnectionManager]
         """
 
         self.config = deepcopy(config)
         self.assets = assets
+        self.recorder = recorder
+        self.connection_factory = connection_factory
 
         self.started = False
         self.debug_mode = False
@@ -199,6 +264,10 @@ class IBGame:
         self.game_state = IBGameState()
 
         self.presentation_surface = self.window.subsurface(self.window.get_rect())
+        if self.recorder:
+            self.recorder.record(RecordKind.META, json.dumps({'window_size': self.window.get_size(),
+                                                              'speculative_connect': self.config.get('speculative_connect', False),
+                                                              'keep_connection_warm': self.config.get('keep_connection_warm', False)}))
         if self.config.get('debug_mode', False):
             logger.info('Debug mode is enabled')
             self.debug_mode = True
@@ -222,12 +291,17 @@ class IBGame:
         self.__last_resize_event = None
         self.__time_last_resize = time.time()
         self.__connection_manager = None
+        # the session is opened ahead of the connection menu and kept between the plays (if enabled)
+        self.__connection_lifecycle = ConnectionLifecycle(self.connection_factory, self.recorder, self.__refresh_lobby_directory)
+        self.__held_responses: List[ServerResponse] = []
         self.__net_handler_thread = None
         self.__end_net_handler_thread = threading.Event()
         self.__end_net_handler_thread.clear()
-        self.__lobbies = []
+        # kept across the connections, so the lobby selection is shown from the last snapshot
+        self.__lobby_directory = LobbyDirectory()
         self.__my_lobby = None
         self.__chosen_lobby = None
+        self.__quick_match_start = None
         self.__starting_player = None
         self.__starting_board = None
         self.__opponent_name = None
@@ -238,6 +312,12 @@ class IBGame:
         self.__game_session_updated.clear()
         self.__stored_state = None
         self.__stored_context = None
+        # shared by the game sessions so the cached hints survive reconnecting
+        self.hint_estimator = HintEstimator()
+        self.__state_machine = self.__create_state_machine()
+        self.__viewport_pool = ViewportPool()
+        if self.config.get('warm_up_viewports', False):
+            self.__warm_up_viewports()
 
         self.update_result = IBGameUpdateResult()
         self.started = True
@@ -253,6 +333,218 @@ class IBGame:
             self.debug_surface = self.window.subsurface(0, self.window.get_height() - self.debug_info_render.get_height(), self.window.get_width(), self.debug_info_render.get_height())
 
 
+    def __create_state_machine(self) -> StateMachine:
+        """
+        Creates the state machine of the game (the callbacks and the allowed transitions of the states).
+
+        :return: The state machine.
+        :rtype: StateMachine
+        """
+
+        # the viewport of the state is released on each transition, so a transition only has to set the state
+        release = self.__release_context
+        handlers = {
+            IBGameState.INIT: StateHandlers(self.__update_init_state, self.__enter_init_state, release,
+                                            frozenset({IBGameState.MAIN_MENU})),
+            IBGameState.MAIN_MENU: StateHandlers(self.__update_main_menu, self.__enter_main_menu, release,
+                                                 frozenset({IBGameState.SETTINGS_MENU, IBGameState.CONNECTION_MENU})),
+            IBGameState.SETTINGS_MENU: StateHandlers(self.__update_settings_menu, self.__enter_settings_menu, release,
+                                                     frozenset({IBGameState.MAIN_MENU})),
+            IBGameState.CONNECTION_MENU: StateHandlers(self.__update_connection_menu, None, release,
+                                                       frozenset({IBGameState.MAIN_MENU, IBGameState.LOBBY_SELECTION, IBGameState.LOBBY,
+                                                                  IBGameState.GAME_SESSION, IBGameState.NET_RECOVERY})),
+            IBGameState.LOBBY_SELECTION: StateHandlers(self.__update_lobby_selection, None, release,
+                                                       frozenset({IBGameState.CONNECTION_MENU, IBGameState.LOBBY, IBGameState.NET_RECOVERY})),
+            IBGameState.LOBBY: StateHandlers(self.__update_lobby, None, release,
+                                             frozenset({IBGameState.MAIN_MENU, IBGameState.LOBBY_SELECTION, IBGameState.GAME_SESSION,
+                                                        IBGameState.GAME_END, IBGameState.NET_RECOVERY})),
+            IBGameState.GAME_SESSION: StateHandlers(self.__update_game_session, None, release,
+                                                    frozenset({IBGameState.MAIN_MENU, IBGameState.GAME_END, IBGameState.NET_RECOVERY})),
+            IBGameState.GAME_END: StateHandlers(self.__update_game_end, self.__enter_game_end, release,
+                                                frozenset({IBGameState.CONNECTION_MENU, IBGameState.NET_RECOVERY})),
+            # the stored state is restored after reconnecting
+            IBGameState.NET_RECOVERY: StateHandlers(self.__update_game_net_recovery, None, release,
+                                                    frozenset({IBGameState.MAIN_MENU, IBGameState.CONNECTION_MENU, IBGameState.LOBBY_SELECTION,
+                                                               IBGameState.LOBBY, IBGameState.GAME_SESSION, IBGameState.GAME_END}))
+        }
+
+        return StateMachine(handlers, IBGameState.STATE_NAMES)
+
+
+    def __release_context(self):
+        """
+        Releases the viewport of the left state (the next state prepares its own).
+        """
+
+        with self.graphics_lock:
+            self.context = None
+
+
+    def __enter_init_state(self):
+        """
+        Enters the initial state: opens the connection to the default server ahead
+        (if enabled) and pre-builds the main menu.
+        """
+
+        if self.config.get('speculative_connect', False):
+            self.__connection_lifecycle.open(DEFAULT_SERVER_IP_ADDRESS, int(DEFAULT_SERVER_PORT))
+        self.__schedule_viewport(*self.__main_menu_viewport())
+
+
+    def __enter_main_menu(self):
+        """
+        Enters the main menu state: keeps the idle session for the next play (if enabled)
+        or cleans up the connection if carried over, and pre-builds the viewports of the options.
+        """
+
+        # only the connection menu leaves the player idle on the server (not in a lobby or a game)
+        if (self.config.get('keep_connection_warm', False) and self.game_state.connection_status == ConnectionStatus.CONNECTED_IN_PROGRESS
+                and self.__connection_manager and self.__connection_manager.is_running):
+            self.__stop_net_handler_thread()
+            self.__connection_lifecycle.release(self.server_ip, self.server_port, self.player_name, self.__connection_manager, self.__held_responses)
+            self.__connection_manager = None
+            self.__held_responses = []
+        self.connection_cleanup()
+        self.__schedule_viewport(*self.__info_screen_viewport(self.assets['strings']['attempt_connection_msg']))
+        self.__schedule_viewport(*self.__settings_menu_viewport())
+
+
+    def __enter_settings_menu(self):
+        """
+        Enters the settings menu state (the main menu is pre-built).
+        """
+
+        self.__schedule_viewport(*self.__main_menu_viewport())
+
+
+    def __enter_game_end(self):
+        """
+        Enters the game end state (the connection menu is pre-built).
+        """
+
+        self.__schedule_viewport(*self.__connection_menu_viewport())
+
+
+    def __schedule_viewport(self, key: Tuple, create: Callable[[pygame.Surface], Viewport]):
+        """
+        Schedules the pre-building of the viewport of a next state. The viewport is drawn
+        on an off-screen surface, so entering the state only copies it to the presentation surface.
+
+        :param key: The key of the viewport in the pool.
+        :type key: Tuple
+        :param create: Creates the viewport on the given surface.
+        :type create: Callable[[pygame.Surface], Viewport]
+        """
+
+        self.__state_machine.schedule_prebuild(
+            key, lambda: self.__viewport_pool.prebuild(key, self.presentation_surface.get_size(), create))
+
+
+    def __get_viewport(self, key: Tuple, create: Callable[[pygame.Surface], Viewport]) -> Viewport:
+        """
+        Returns the viewport drawn on the presentation surface: the pooled (or pre-built) one or a new one.
+
+        :param key: The key of the viewport in the pool.
+        :type key: Tuple
+        :param create: Creates the viewport on the given surface.
+        :type create: Callable[[pygame.Surface], Viewport]
+        :return: The viewport.
+        :rtype: Viewport
+        """
+
+        return self.__viewport_pool.get(key, self.presentation_surface, create)
+
+
+    def __warm_up_viewports(self):
+        """
+        Pre-builds the viewports of the menus and of the static messages (see the warm_up_viewports option).
+        """
+
+        time_start = time.perf_counter()
+        size = self.presentation_surface.get_size()
+        # the settings menu depends on the user configuration (loaded in the initial state)
+        viewports = [self.__main_menu_viewport(), self.__connection_menu_viewport()]
+        viewports.extend(self.__info_screen_viewport(self.assets['strings'][name]) for name in IBGame.WARM_UP_MESSAGES)
+        for key, create in viewports:
+            self.__viewport_pool.prebuild(key, size, create)
+        logger.debug(f"Viewports warmed up in {(time.perf_counter() - time_start) * 1000:.2f} ms")
+
+
+    def __main_menu_viewport(self) -> Tuple[Tuple, Callable[[pygame.Surface], SelectMenu]]:
+        """
+        Returns the key and the factory of the main menu.
+
+        :return: The key of the menu in the pool and the factory of the menu.
+        :rtype: Tuple[Tuple, Callable[[pygame.Surface], SelectMenu]]
+        """
+
+        def create(surface: pygame.Surface) -> SelectMenu:
+            title = MenuTitle(self.assets['strings']['main_menu_title'])
+            options = [
+                MenuOption(self.assets['strings']['main_menu_option_play']),
+                MenuOption(self.assets['strings']['main_menu_option_settings']),
+                MenuOption(self.assets['strings']['main_menu_option_exit'])
+            ]
+            return SelectMenu(surface, self.assets, title, options)
+
+        return (IBGameState.MAIN_MENU, self.assets['strings']['main_menu_title']), create
+
+
+    def __settings_menu_viewport(self) -> Tuple[Tuple, Callable[[pygame.Surface], SettingsMenu]]:
+        """
+        Returns the key and the factory of the settings menu.
+
+        :return: The key of the menu in the pool and the factory of the menu.
+        :rtype: Tuple[Tuple, Callable[[pygame.Surface], SettingsMenu]]
+        """
+
+        label_text = self.assets['strings']['settings_menu_label']
+        server_address = self.server_ip + ':' + str(self.server_port)
+        return ((IBGameState.SETTINGS_MENU, server_address),
+                lambda surface: SettingsMenu(surface, self.assets, label_text, server_address))
+
+
+    def __connection_menu_viewport(self) -> Tuple[Tuple, Callable[[pygame.Surface], SelectMenu]]:
+        """
+        Returns the key and the factory of the connection menu (selection or creation of a lobby).
+
+        :return: The key of the menu in the pool and the factory of the menu.
+        :rtype: Tuple[Tuple, Callable[[pygame.Surface], SelectMenu]]
+        """
+
+        options = [self.assets['strings']['connection_menu_lobby_select_label'],
+                   self.assets['strings']['connection_menu_lobby_create_label'],
+                   self.assets['strings']['connection_menu_quick_match_label']]
+        return ((IBGameState.CONNECTION_MENU, *options),
+                lambda surface: SelectMenu(surface, self.assets, None, [MenuOption(option) for option in options]))
+
+
+    def __info_screen_viewport(self, text: str) -> Tuple[Tuple, Callable[[pygame.Surface], InfoScreen]]:
+        """
+        Returns the key and the factory of the info screen.
+
+        :param text: The text of the info screen.
+        :type text: str
+        :return: The key of the info screen in the pool and the factory of the info screen.
+        :rtype: Tuple[Tuple, Callable[[pygame.Surface], InfoScreen]]
+        """
+
+        return ('info_screen', text), lambda surface: InfoScreen(surface, self.assets, text)
+
+
+    def __get_info_screen(self, text: str) -> InfoScreen:
+        """
+        Returns the info screen drawn on the presentation surface.
+
+        :param text: The text of the info screen.
+        :type text: str
+        :return: The info screen.
+        :rtype: InfoScreen
+        """
+
+        return self.__get_viewport(*self.__info_screen_viewport(text))
+
+
     def __get_debug_info_object(self):
         """
         Returns the debug info object. Used for debugging purposes.
@@ -289,20 +581,24 @@ class IBGame:
         """
 
         events: PyGameEvents = PyGameEvents()
+        recorded_events = []
         for event in pygame.event.get():
+            if self.recorder and event.type in IBGame.RECORDED_EVENT_TYPES:
+                recorded_events.append(IBGame.serialize_event(event))
+
             if event.type == pygame.QUIT:
                 events.event_quit = event
-                logger.debug('Quit event registered')
+                input_logger.debug('Quit event registered')
                 continue
 
             if event.type == pygame.KEYDOWN:
                 events.event_keydown = event
-                logger.debug(f'Keydown event registered: {pygame.key.name(event.key)}')
+                input_logger.debug(lambda: f'Keydown event registered: {pygame.key.name(event.key)}')
                 continue
 
             if event.type == pygame.KEYUP:
                 events.event_keyup = event
-                logger.debug(f'Keyup event registered: {pygame.key.name(event.key)}')
+                input_logger.debug(lambda: f'Keyup event registered: {pygame.key.name(event.key)}')
                 continue
 
             if event.type == pygame.MOUSEMOTION:
@@ -312,12 +608,12 @@ class IBGame:
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 events.event_mousebuttondown = event
-                logger.debug(f'Mousebuttondown event registered: {event.pos}')
+                input_logger.debug('Mousebuttondown event registered: %s', event.pos)
                 continue
 
             if event.type == pygame.MOUSEBUTTONUP:
                 events.event_mousebuttonup = event
-                logger.debug(f'Mousebuttonup event registered: {event.pos}')
+                input_logger.debug('Mousebuttonup event registered: %s', event.pos)
                 continue
 
             if event.type == pygame.VIDEORESIZE:
@@ -326,6 +622,9 @@ class IBGame:
                 logger.debug(f'Videoresize event registered: {event.dict["size"]}')
                 continue
 
+        if recorded_events:
+            self.recorder.record(RecordKind.INPUT, json.dumps(recorded_events))
+
         return events
     
 
@@ -357,6 +656,16 @@ class IBGame:
             logger.warning('Invalid player name for configuration file; will not be saved to disk. Using default server address')
             self.server_ip = DEFAULT_SERVER_IP_ADDRESS
             self.server_port = int(DEFAULT_SERVER_PORT)
+
+
+    def __connect_ahead(self):
+        """
+        Logs the player in to the server of the session ahead of the connection menu (if enabled).
+        The connection opened when the game started (or kept from the last play) is used if it is of the same server.
+        """
+
+        if self.config.get('speculative_connect', False):
+            self.__connection_lifecycle.login(self.server_ip, self.server_port, self.player_name)
     
 
     def __handle_window_resize(self, resize_event) -> bool:
@@ -398,6 +707,30 @@ class IBGame:
         self.context.redraw()
 
 
+    def __start_net_handler_thread(self, target: Callable[[], None]):
+        """
+        Starts the network handler thread.
+
+        :param target: The handler run by the thread.
+        :type target: Callable[[], None]
+        """
+
+        handler = target.__name__.lstrip('_')
+        REGISTRY.counter('net_thread_starts_total', 'Starts of the network handler thread', handler=handler).inc()
+        self.__net_handler_thread = threading.Thread(target=target, name=handler)
+        with TRACER.span('start net handler', 'thread', handler=handler):
+            self.__net_handler_thread.start()
+
+
+    def __join_net_handler_thread(self):
+        """
+        Waits for the network handler thread to finish.
+        """
+
+        with TRACER.span('join net handler', 'thread', handler=self.__net_handler_thread.name):
+            self.__net_handler_thread.join()
+
+
     def __stop_net_handler_thread(self):
         """
         Stops the network handler thread.
@@ -406,7 +739,7 @@ class IBGame:
         
         self.__end_net_handler_thread.set()
         if self.__net_handler_thread and self.__net_handler_thread.is_alive():
-            self.__net_handler_thread.join()
+            self.__join_net_handler_thread()
         self.__net_handler_thread = None
         self.__end_net_handler_thread.clear()
 
@@ -440,6 +773,22 @@ class IBGame:
             raise ConnectionError(f'Failed to connect to the server: {e}')
     
 
+    def __open_connection(self):
+        """
+        Opens a new connection to the server and logs the player in.
+
+        :raises ConnectionError: If the connection or the login fails.
+        """
+
+        self.__connection_manager = self.connection_factory(self.server_ip, self.server_port, self.recorder)
+        self.__attempt_connection()
+
+        # request the player to join the server
+        if not self.__connection_manager.login(self.player_name):
+            raise ConnectionError('Failed to login to the server')
+
+
+    @TRACER.traced('net')
     def __establish_connection(self):
         """
         Establishes the connection to the server.
@@ -449,12 +798,12 @@ class IBGame:
             self.game_state.connection_status = ConnectionStatus.CONNECTING
 
         try:
-            self.__attempt_connection()
-
-            # request the player to join the server
-            res = self.__connection_manager.login(self.player_name)
-            if not res:
-                raise ConnectionError('Failed to login to the server')
+            # the session logged in ahead is used if it is of the server and the player
+            session = self.__connection_lifecycle.take(self.server_ip, self.server_port, self.player_name)
+            if session:
+                self.__connection_manager, self.__held_responses = session
+            else:
+                self.__open_connection()
 
             # set the connection status
             with self.net_lock:
@@ -471,6 +820,7 @@ class IBGame:
                 self.context = None
 
     
+    @TRACER.traced('net')
     def __retry_connection(self):
         """
         Retries the connection to the server.
@@ -479,18 +829,17 @@ class IBGame:
         logger.debug('Retrying connection (thread)...')
         start = time.time()
         while time.time() - start < ConnectionManager.CLIENT_RECONNECT_TIMEOUT and not self.do_exit.is_set() and not self.__end_net_handler_thread.is_set():
+            REGISTRY.counter('net_reconnect_attempts_total', 'Attempts to reconnect to the server').inc()
             try:
-                self.__connection_manager = ConnectionManager(self.server_ip, self.server_port)
-                self.__attempt_connection()
-
-                if not self.__connection_manager.login(self.player_name):
-                    raise ConnectionError('Failed to login to the server')
+                self.__open_connection()
                 with self.net_lock:
                     self.game_state.connection_status = ConnectionStatus.RECONNECTED
                 with self.graphics_lock:
                     self.context = None
                 break
             except Exception as e:
+                # repeated attempts are collapsed by the rate limiting of the loggers
+                logger.error(f'Reconnect attempt failed: {e}')
                 continue
 
         if not self.game_state.connection_status == ConnectionStatus.RECONNECTED:
@@ -514,6 +863,7 @@ class IBGame:
         :type connection_status_to_revert_to: int, optional
         """
 
+        FLIGHT_RECORDER.dump('net_recovery')
         with self.net_lock:
             self.__stored_state = IBGameState()
             self.__stored_state.state = state_to_revert_to if state_to_revert_to else self.game_state.state
@@ -540,6 +890,7 @@ class IBGame:
         return True
 
 
+    @TRACER.traced('net')
     def __handle_net_connection_menu(self):
         """
         Handles basic server communication.
@@ -555,7 +906,8 @@ class IBGame:
             # listen for messages
             resp: ServerResponse = None
             try:
-                resp = self.__connection_manager.receive_message()
+                # the messages received before the session was taken (see ConnectionLifecycle) are handled first
+                resp = self.__held_responses.pop(0) if self.__held_responses else self.__connection_manager.receive_message()
 
             except ConnectionError as e:
                 logger.error(f'Error occurred while receiving message from the server: {e}')
@@ -591,6 +943,7 @@ class IBGame:
         logger.debug('Keep alive thread stopped')
 
 
+    @TRACER.traced('net')
     def __handle_net_basic_communication(self):
         """
         Handles basic server communication.
@@ -627,6 +980,70 @@ class IBGame:
         logger.debug('Keep alive thread stopped')
 
 
+    @TRACER.traced('net')
+    def __handle_net_lobby_selection(self):
+        """
+        Handles basic server communication in the lobby selection and refreshes the lobby directory
+        in the background (the changes are applied to the shown lobbies by the game ticks).
+        """
+
+        logger.debug('Lobby selection thread started')
+        while not self.__end_net_handler_thread.is_set() and not self.do_exit.is_set():
+            # refresh the lobbies
+            if self.__lobby_directory.age >= LobbyDirectory.REFRESH_INTERVAL:
+                try:
+                    self.__refresh_lobby_directory()
+                except Exception as e:
+                    logger.error(f'Failed to refresh the list of lobbies: {e}')
+                    self.__transition_to_net_recovery(IBGameState.CONNECTION_MENU, ConnectionStatus.CONNECTED)
+                    break
+
+            # keep alive
+            if not self.__is_alive():
+                self.__transition_to_net_recovery(IBGameState.CONNECTION_MENU, ConnectionStatus.CONNECTED)
+                break
+
+            # listen for messages
+            resp: ServerResponse = None
+            try:
+                resp = self.__connection_manager.receive_message()
+
+            except ConnectionError as e:
+                logger.error(f'Error occurred while receiving message from the server: {e}')
+                self.__transition_to_net_recovery(IBGameState.CONNECTION_MENU, ConnectionStatus.CONNECTED)
+                break
+
+            except TimeoutError:
+                continue
+
+            if resp.command == CMD_PING:
+                try:
+                    self.__connection_manager.pong()
+                except Exception as e:
+                    logger.error(f'Failed to send pong to the server: {e}')
+                    self.__transition_to_net_recovery(IBGameState.CONNECTION_MENU, ConnectionStatus.CONNECTED)
+                    break
+
+        logger.debug('Lobby selection thread stopped')
+
+
+    def __refresh_lobby_directory(self, connection_manager: ConnectionManager = None):
+        """
+        Requests the list of lobbies from the server and replaces the snapshot of the lobby directory.
+
+        :param connection_manager: The connection to request the lobbies on (None for the current one);
+        the session logged in ahead prefetches the lobbies.
+        :type connection_manager: ConnectionManager
+        """
+
+        if connection_manager is None:
+            connection_manager = self.__connection_manager
+        time_start = time.perf_counter()
+        lobbies = connection_manager.get_lobbies()
+        self.__lobby_directory.replace(connection_manager.server_address, lobbies, time.perf_counter() - time_start)
+
+
+    @TRACER.traced('net')
     def __handle_net_get_lobbies(self):
         """
         Gets the list of lobbies from the server.
@@ -637,10 +1054,9 @@ class IBGame:
             self.game_state.connection_status = ConnectionStatus.WAITING_FOR_LOBBIES
 
         try:
-            lobbies = self.__connection_manager.get_lobbies()
-            
+            self.__refresh_lobby_directory()
+
             with self.net_lock:
-                self.__lobbies = lobbies
                 self.game_state.connection_status = ConnectionStatus.RECEIVED_LOBBIES
 
         except Exception as e:
@@ -653,6 +1069,7 @@ class IBGame:
         logger.debug('Getting lobbies thread stopped')
 
     
+    @TRACER.traced('net')
     def __handle_net_get_lobby(self):
         """
         Gets the lobby info from the server.
@@ -686,6 +1103,7 @@ class IBGame:
         logger.debug('Getting lobby info thread stopped')
 
     
+    @TRACER.traced('net')
     def __handle_net_join_lobby(self):
         """
         Attempts to join the lobby.
@@ -708,6 +1126,92 @@ class IBGame:
         logger.debug('Joining lobby thread stopped')
 
 
+    def __quick_match_join(self, lobby_id: str, timeout: float) -> str:
+        """
+        Attempts to join the lobby for the quick match. After the timeout, a late response is checked for
+        before the next attempt (the lobby was joined), so it is not received as the response to the next request.
+
+        :param lobby_id: The ID of the lobby to join.
+        :type lobby_id: str
+        :param timeout: The timeout in seconds of the response.
+        :type timeout: float
+        :return: The lobby ID or None if the lobby was not joined in time.
+        :rtype: str
+        :raises ConnectionError: If the connection is lost (the server disconnects the clients joining a missing lobby).
+        """
+
+        try:
+            lobby = self.__connection_manager.join_lobby(lobby_id, timeout)
+            REGISTRY.counter('quick_match_attempts_total', 'Lobbies the quick match tried to join', result='joined').inc()
+            return lobby
+        except TimeoutError:
+            logger.info(f'Quick match could not join the lobby {lobby_id} in {timeout:.2f} s')
+
+        lobby = self.__connection_manager.check_for_lobby(IBGame.QUICK_MATCH_LATE_RESPONSE_TIMEOUT)
+        REGISTRY.counter('quick_match_attempts_total', 'Lobbies the quick match tried to join', result='joined_late' if lobby else 'timeout').inc()
+        return lobby
+
+
+    @TRACER.traced('net')
+    def __handle_net_quick_match(self):
+        """
+        Joins the most promising lobby of a fresh list of lobbies or creates a lobby if none can be joined.
+        The lobbies are tried one by one (the server disconnects the clients joining a missing lobby,
+        so the player is logged in again on a new connection), each with a deadline of a few round-trip times
+        (the server does not respond to joining a full lobby).
+        """
+
+        logger.debug('Quick match thread started')
+        self.__quick_match_start = time.perf_counter()
+        try:
+            self.__refresh_lobby_directory()
+            timeout = min(max(self.__lobby_directory.latency * IBGame.QUICK_MATCH_TIMEOUT_RTTS, IBGame.QUICK_MATCH_MIN_TIMEOUT),
+                          GenericClient.TIMEOUT_DURATION)
+
+            lobby = None
+            for candidate in self.__lobby_directory.get_candidates(IBGame.QUICK_MATCH_ATTEMPTS):
+                if self.__end_net_handler_thread.is_set() or self.do_exit.is_set():
+                    return
+                try:
+                    lobby = self.__quick_match_join(candidate, timeout)
+                except ConnectionError as e:
+                    # the lobby is missing, the next one is tried on a new connection
+                    logger.info(f'Quick match lost the connection while joining the lobby {candidate}: {e}')
+                    REGISTRY.counter('quick_match_attempts_total', 'Lobbies the quick match tried to join', result='disconnected').inc()
+                    self.__lobby_directory.mark_failed(candidate)
+                    self.__connection_manager.close()
+                    self.__open_connection()
+                    continue
+
+                if lobby:
+                    break
+                self.__lobby_directory.mark_failed(candidate)
+
+            # no lobby could be joined
+            if lobby is None:
+                lobby = self.__connection_manager.get_lobby()
+                if not lobby:
+                    raise ValueError('Failed to get the lobby info')
+                REGISTRY.counter('quick_match_attempts_total', 'Lobbies the quick match tried to join', result='created').inc()
+
+            logger.info(f'Quick match entered the lobby {lobby} in {time.perf_counter() - self.__quick_match_start:.2f} s')
+            with self.net_lock:
+                self.__my_lobby = lobby
+                self.game_state.connection_status = ConnectionStatus.JOINED_LOBBY
+
+        except Exception as e:
+            logger.error(f'Quick match failed: {e}')
+            self.__quick_match_start = None
+            self.__transition_to_net_recovery(IBGameState.CONNECTION_MENU, ConnectionStatus.CONNECTED)
+
+        finally:
+            with self.graphics_lock:
+                self.context = None
+
+        logger.debug('Quick match thread stopped')
+
+
+    @TRACER.traced('net')
     def __handle_net_wait_for_players(self):
         """
         Waits for the players to join the lobby.
@@ -725,6 +1229,12 @@ class IBGame:
 
             try:
                 oponent_name = self.__connection_manager.check_for_players()
+                if self.__quick_match_start is not None:
+                    time_to_paired = time.perf_counter() - self.__quick_match_start
+                    logger.info(f'Quick match paired with {oponent_name} in {time_to_paired:.2f} s')
+                    REGISTRY.histogram('quick_match_paired_seconds', 'Time from the start of a quick match to the pairing').record(time_to_paired)
+                    FLIGHT_RECORDER.add(flight_recorder.TIMING, 'quick_match_paired_seconds', time_to_paired)
+                    self.__quick_match_start = None
                 with self.net_lock:
                     self.__opponent_name = oponent_name
                     self.game_state.connection_status = ConnectionStatus.GAME_READY
@@ -747,6 +1257,7 @@ class IBGame:
         # if ended from the outside, caller handles context
 
 
+    @TRACER.traced('net')
     def __handle_net_game_ready(self):
         """
         Handles the game ready status.
@@ -758,6 +1269,7 @@ class IBGame:
                 starting_board, current_player, tko = self.__connection_manager.game_ready()
 
                 if tko:
+                    FLIGHT_RECORDER.dump('tko')
                     self.game_state.state = IBGameState.GAME_END
                     self.game_state.connection_status = ConnectionStatus.TKO
                 else:
@@ -776,6 +1288,7 @@ class IBGame:
         logger.debug('Game ready thread stopped')
 
 
+    @TRACER.traced('net')
     def __handle_net_game_session(self):
         """
         Handles the game session connection updates.
@@ -871,6 +1384,7 @@ class IBGame:
                     break
                 
                 elif resp.command == CMD_TKO:
+                    FLIGHT_RECORDER.dump('tko')
                     with self.net_lock:
                         self.game_state.state = IBGameState.GAME_END
                         self.game_state.connection_status = ConnectionStatus.TKO
@@ -901,6 +1415,7 @@ class IBGame:
         # if ended from the outside, caller handles context
 
     
+    @TRACER.traced('state')
     def __prepare_init_state(self):
         """
         Prepares the initial state of the game.
@@ -914,41 +1429,30 @@ class IBGame:
         self.update_result.update_areas.insert(0, True)
     
 
+    @TRACER.traced('state')
     def __prepare_main_menu(self):
         """
         Prepares the main menu state of the game.
         """
 
-        # clean up the connection if carried over
-        self.connection_cleanup()
-
-        title = MenuTitle(self.assets['strings']['main_menu_title'])
-        options = [
-            MenuOption(self.assets['strings']['main_menu_option_play']),
-            MenuOption(self.assets['strings']['main_menu_option_settings']),
-            MenuOption(self.assets['strings']['main_menu_option_exit'])
-        ]
-        self.context = SelectMenu(self.presentation_surface, self.assets, title, options)
-
-        # draw the menu for the first time
-        self.context.redraw()
+        # drawn for the first time (the connection is cleaned up when entering the state)
+        self.context = self.__get_viewport(*self.__main_menu_viewport())
         self.update_result.update_areas.insert(0, True)
 
 
+    @TRACER.traced('state')
     def __prepare_settings_menu(self):
         """
         Prepares the settings menu state of the game.
         """
 
-        label_text = self.assets['strings']['settings_menu_label']
-        server_address = self.server_ip + ':' + str(self.server_port)
-        self.context = SettingsMenu(self.presentation_surface, self.assets, label_text, server_address)
+        self.context = self.__get_viewport(*self.__settings_menu_viewport())
             
         self.key_input_validator = input_validators.settings_key_input_validator
-        self.context.redraw()
         self.update_result.update_areas.insert(0, True)
 
     
+    @TRACER.traced('state')
     def __prepare_connection_menu(self):
         """
         Prepares the connection menu state of the game.
@@ -956,114 +1460,144 @@ class IBGame:
 
         with self.net_lock:
             if self.game_state.connection_status == ConnectionStatus.NOT_RUNNING:
-                with self.graphics_lock:
-                    self.context = InfoScreen(self.presentation_surface, 
-                                              self.assets, 
-                                              self.assets['strings']['attempt_connection_msg'])
-                self.__connection_manager = ConnectionManager(self.server_ip, self.server_port)
-                self.__net_handler_thread = threading.Thread(target=self.__establish_connection)
-                self.__net_handler_thread.start()
+                # the session logged in ahead is shown connected immediately if it is ready
+                session = self.__connection_lifecycle.take(self.server_ip, self.server_port, self.player_name, wait=False)
+                if session:
+                    self.__connection_manager, self.__held_responses = session
+                    self.game_state.connection_status = ConnectionStatus.CONNECTED
+                else:
+                    with self.graphics_lock:
+                        self.context = self.__get_info_screen(self.assets['strings']['attempt_connection_msg'])
+                    self.__start_net_handler_thread(self.__establish_connection)
         
-            elif self.game_state.connection_status == ConnectionStatus.CONNECTED:
+            if self.game_state.connection_status == ConnectionStatus.CONNECTED:
                 logger.debug('Connection established')
                 self.__stop_net_handler_thread()
                 with self.graphics_lock:
-                    self.context = SelectMenu(self.presentation_surface,
-                                            self.assets,
-                                            None,
-                                            [MenuOption(self.assets['strings']['connection_menu_lobby_select_label']),
-                                            MenuOption(self.assets['strings']['connection_menu_lobby_create_label'])])
-                self.__net_handler_thread = threading.Thread(target=self.__handle_net_connection_menu)
-                self.__net_handler_thread.start()
+                    self.context = self.__get_viewport(*self.__connection_menu_viewport())
+                self.__start_net_handler_thread(self.__handle_net_connection_menu)
                 self.game_state.connection_status = ConnectionStatus.CONNECTED_IN_PROGRESS
         
-        # update the graphics
+        # update the graphics (the viewports are already drawn)
         with self.graphics_lock:
             if self.context:
-                self.context.redraw()
                 self.update_result.update_areas.insert(0, True)
 
 
+    @TRACER.traced('state')
     def __prepare_lobby_selection(self):
         """
         Prepares the lobby selection state of the game.
         """
 
         if self.game_state.connection_status == ConnectionStatus.REQUESTED_LOBBIES:
-            self.__lobbies = []
-            with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['getting_lobbies_msg'])
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_get_lobbies)
-            self.__net_handler_thread.start()
-
-        elif self.game_state.connection_status == ConnectionStatus.RECEIVED_LOBBIES:
-            self.__net_handler_thread.join()
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_basic_communication)
-            self.__net_handler_thread.start()
-            logger.debug('Received lobbies response')
-            if not self.__lobbies:
+            # the last snapshot is shown immediately and refreshed in the background
+            if self.__lobby_directory.is_usable(self.__connection_manager.server_address):
+                logger.debug(f'Showing the lobbies received {self.__lobby_directory.age:.1f} s ago')
+                self.game_state.connection_status = ConnectionStatus.RECEIVED_LOBBIES
+                self.__start_net_handler_thread(self.__handle_net_lobby_selection)
                 with self.graphics_lock:
-                    self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['no_lobbies_msg'])
+                    self.__show_lobby_directory()
             else:
-                options = [MenuOption(lobby) for lobby in self.__lobbies]
                 with self.graphics_lock:
-                    self.context = LobbySelect(self.presentation_surface, self.assets, options)
-            
+                    self.context = self.__get_info_screen(self.assets['strings']['getting_lobbies_msg'])
+                self.__start_net_handler_thread(self.__handle_net_get_lobbies)
 
-        # update the graphics
+        elif self.game_state.connection_status == ConnectionStatus.RECEIVED_LOBBIES:
+            self.__join_net_handler_thread()
+            self.__start_net_handler_thread(self.__handle_net_lobby_selection)
+            logger.debug('Received lobbies response')
+            with self.graphics_lock:
+                self.__show_lobby_directory()
+
+
+        # update the graphics (the info screens are already drawn)
         with self.graphics_lock:
             if self.context:
-                self.context.redraw()
                 self.update_result.update_areas.insert(0, True)
 
 
+    def __show_lobby_directory(self):
+        """
+        Shows the lobbies of the lobby directory (or the message that there are none).
+        ### Changes the context so should be called with the graphics_lock.
+        """
+
+        lobbies = self.__lobby_directory.show()
+        if not lobbies:
+            self.context = self.__get_info_screen(self.assets['strings']['no_lobbies_msg'])
+        else:
+            self.context = LobbySelect(self.presentation_surface, self.assets, lobbies)
+            self.context.redraw()
+
+
+    def __apply_lobby_directory_changes(self):
+        """
+        Applies the changes of the refreshed lobby directory to the shown lobbies.
+        ### Changes the context so should be called with the graphics_lock.
+        """
+
+        added, removed = self.__lobby_directory.take_changes()
+        if not added and not removed:
+            return
+
+        if isinstance(self.context, LobbySelect) and self.context.apply_changes(added, removed):
+            self.update_result.update_areas.extend(self.context.draw())
+        else:
+            # switched between the list and the message that there are no lobbies
+            self.__show_lobby_directory()
+            self.update_result.update_areas.insert(0, True)
+
+
+    @TRACER.traced('state')
     def __prepare_lobby(self):
         """
         Prepares the lobby state of the game.
         """
 
         if self.game_state.connection_status == ConnectionStatus.LOBBY_FAILED:
-            self.__net_handler_thread.join()
+            self.__join_net_handler_thread()
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['lobby_failed_msg'])
+                self.context = self.__get_info_screen(self.assets['strings']['lobby_failed_msg'])
 
         elif self.game_state.connection_status == ConnectionStatus.REQUESTED_LOBBY:
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['getting_lobby_info_msg'])
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_get_lobby)
-            self.__net_handler_thread.start()
+                self.context = self.__get_info_screen(self.assets['strings']['getting_lobby_info_msg'])
+            self.__start_net_handler_thread(self.__handle_net_get_lobby)
 
         elif self.game_state.connection_status == ConnectionStatus.TRYING_TO_JOIN:
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['joining_lobby_msg'])
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_join_lobby)
-            self.__net_handler_thread.start()
+                self.context = self.__get_info_screen(self.assets['strings']['joining_lobby_msg'])
+            self.__start_net_handler_thread(self.__handle_net_join_lobby)
+
+        elif self.game_state.connection_status == ConnectionStatus.QUICK_MATCH:
+            with self.graphics_lock:
+                self.context = self.__get_info_screen(self.assets['strings']['quick_match_msg'])
+            self.__start_net_handler_thread(self.__handle_net_quick_match)
 
         elif self.game_state.connection_status == ConnectionStatus.JOINED_LOBBY:
             logger.debug('Received lobby response')
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['waiting_for_opponent_msg'])
-            self.__net_handler_thread.join()
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_wait_for_players)
-            self.__net_handler_thread.start()
+                self.context = self.__get_info_screen(self.assets['strings']['waiting_for_opponent_msg'])
+            self.__join_net_handler_thread()
+            self.__start_net_handler_thread(self.__handle_net_wait_for_players)
             self.__chosen_lobby = None
 
         elif self.game_state.connection_status == ConnectionStatus.GAME_READY:
             logger.debug('Opponent joined the lobby')
-            self.__net_handler_thread.join()
+            self.__join_net_handler_thread()
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['preparing_game_msg'])
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_game_ready)
-            self.__net_handler_thread.start()
-            self.__net_handler_thread.join()
+                self.context = self.__get_info_screen(self.assets['strings']['preparing_game_msg'])
+            self.__start_net_handler_thread(self.__handle_net_game_ready)
+            self.__join_net_handler_thread()
 
-        # update the graphics
+        # update the graphics (the info screens are already drawn)
         with self.graphics_lock:
             if self.context:
-                self.context.redraw()
                 self.update_result.update_areas.insert(0, True)
     
 
+    @TRACER.traced('state')
     def __prepare_game_session(self):
         """
         Prepares the game session state of the game.
@@ -1078,7 +1612,7 @@ class IBGame:
             self.__action_input_queue = Queue()
 
             with self.graphics_lock:
-                self.context = GameSession(self.presentation_surface, self.assets)
+                self.context = GameSession(self.presentation_surface, self.assets, self.hint_estimator)
 
             with self.net_lock:
                 self.__game_session_updates['player_name'] = self.player_name
@@ -1088,16 +1622,14 @@ class IBGame:
                 self.context.update(self.__game_session_updates)
                 self.__game_session_updates = {}
 
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_game_session)
-            self.__net_handler_thread.start()
+            self.__start_net_handler_thread(self.__handle_net_game_session)
 
             self.context.redraw()
             self.update_result.update_areas.insert(0, True)
         
         elif self.game_state.connection_status == ConnectionStatus.WAITING_FOR_OPPONENT:
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['waiting_for_opponent_to_reconnect_msg'])
-            self.context.redraw()
+                self.context = self.__get_info_screen(self.assets['strings']['waiting_for_opponent_to_reconnect_msg'])
             self.update_result.update_areas.insert(0, True)
 
         elif self.game_state.connection_status == ConnectionStatus.GAME_SESSION_CONTINUED:
@@ -1114,13 +1646,12 @@ class IBGame:
             self.update_result.update_areas.insert(0, True)
 
         elif self.game_state.connection_status == ConnectionStatus.GAME_SESSION_RECONNECTED:
-            self.__net_handler_thread.join()
-            self.__net_handler_thread = threading.Thread(target=self.__handle_net_game_session)
-            self.__net_handler_thread.start()
+            self.__join_net_handler_thread()
+            self.__start_net_handler_thread(self.__handle_net_game_session)
             self.__action_input_queue = Queue()
 
             with self.graphics_lock:
-                self.context = GameSession(self.presentation_surface, self.assets) if not self.__stored_context else self.__stored_context
+                self.context = GameSession(self.presentation_surface, self.assets, self.hint_estimator) if not self.__stored_context else self.__stored_context
                 self.context.surface = self.presentation_surface
                 self.__stored_context = None
             with self.net_lock:
@@ -1132,14 +1663,14 @@ class IBGame:
             self.update_result.update_areas.insert(0, True)
 
 
+    @TRACER.traced('state')
     def __prepare_game_end_screen(self):
         """
         Prepares the game end screen state of the game.
         """
 
         self.__stop_net_handler_thread()
-        self.__net_handler_thread = threading.Thread(target=self.__handle_net_basic_communication)
-        self.__net_handler_thread.start()
+        self.__start_net_handler_thread(self.__handle_net_basic_communication)
 
         msg = ""
         if self.game_state.connection_status == ConnectionStatus.WIN:
@@ -1149,11 +1680,11 @@ class IBGame:
         else:
             msg = self.assets['strings']['game_end_tko_msg']
 
-        self.context = InfoScreen(self.presentation_surface, self.assets, msg)
-        self.context.redraw()
+        self.context = self.__get_info_screen(msg)
         self.update_result.update_areas.insert(0, True)
 
 
+    @TRACER.traced('state')
     def __prepare_net_recovery_screen(self):
         """
         Prepares the network recovery state of the game.
@@ -1162,9 +1693,8 @@ class IBGame:
         if self.game_state.connection_status == ConnectionStatus.FAILED:
             self.__stop_net_handler_thread()
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['connection_failed_msg'])
+                self.context = self.__get_info_screen(self.assets['strings']['connection_failed_msg'])
             self.game_state.connection_status = ConnectionStatus.NOT_RUNNING
-            self.context.redraw()
             self.update_result.update_areas.insert(0, True)
 
         elif self.game_state.connection_status == ConnectionStatus.RECONNECTED:
@@ -1175,11 +1705,9 @@ class IBGame:
         else:
             self.__stop_net_handler_thread()
             with self.graphics_lock:
-                self.context = InfoScreen(self.presentation_surface, self.assets, self.assets['strings']['reconnecting_msg'])
-            self.context.redraw()
+                self.context = self.__get_info_screen(self.assets['strings']['reconnecting_msg'])
             self.update_result.update_areas.insert(0, True)
-            self.__net_handler_thread = threading.Thread(target=self.__retry_connection)
-            self.__net_handler_thread.start()
+            self.__start_net_handler_thread(self.__retry_connection)
             
     
     def __handle_update_feedback_init_state(self, res: Dict[str, Any]):
@@ -1199,6 +1727,7 @@ class IBGame:
         elif res['submit']:
             logger.info(f'User submitted the input: {self.context.text_input}')
             self.__set_up_user_session()
+            self.__connect_ahead()
             self.context = None
             self.game_state.state = IBGameState.MAIN_MENU
             logger.info('Changing the state to MAIN_MENU')
@@ -1231,6 +1760,9 @@ class IBGame:
 
             elif self.context.selected_option_text == self.assets['strings']['main_menu_option_exit']:
                 logger.info('User requested to exit the game')
+                self.hint_estimator.stop()
+                self.__connection_lifecycle.close('quit', ConnectionLifecycle.CLOSE_TIMEOUT)
+                logger.info(f"State transitions: {self.__state_machine.get_transition_report()}")
                 self.update_result.exit = True
             
             else:
@@ -1263,9 +1795,13 @@ class IBGame:
                 else:
                     logger.warning('Invalid player name for the configuration file; will not be saved to disk.')
                 ip, port = self.context.text_input.split(':')
+                if (ip, int(port)) != (self.server_ip, self.server_port):
+                    # the session kept for the previous server is logged out
+                    self.__connection_lifecycle.close('server_change')
                 self.server_ip = ip
                 self.server_port = int(port)
                 logger.info(f'Server address set to: {self.server_ip}:{self.server_port}')
+                self.__connect_ahead()
                 logger.info('Changing the state to MAIN_MENU')
                 self.game_state.state = IBGameState.MAIN_MENU
                 self.context = None
@@ -1329,6 +1865,12 @@ class IBGame:
                 self.game_state.state = IBGameState.LOBBY
                 self.__stop_net_handler_thread()
 
+            elif self.context.selected_option_text == self.assets['strings']['connection_menu_quick_match_label']:
+                logger.info('Changing the state to LOBBY (quick match)')
+                self.game_state.connection_status = ConnectionStatus.QUICK_MATCH
+                self.game_state.state = IBGameState.LOBBY
+                self.__stop_net_handler_thread()
+
             else:
                 logger.error('Unknown option selected.')
                 raise ValueError('Unknown option selected.')
@@ -1358,7 +1900,7 @@ class IBGame:
             self.update_result.update_areas.extend(update_rects)
         
         # handle the user input
-        elif res['submit']:
+        elif res['submit'] and isinstance(self.context, LobbySelect):
             if self.game_state.connection_status == ConnectionStatus.RECEIVED_LOBBIES:
                 self.__stop_net_handler_thread()
                 logger.info('Changing the state to LOBBY')
@@ -1434,6 +1976,10 @@ class IBGame:
             self.context = None
         if res.get('selected_cell', None):
             self.__action_input_queue.put(res['selected_cell'])
+        if res.get('prediction_latency', None) is not None:
+            net_logger.debug("Action confirmed by the server in %.1f ms", res['prediction_latency'] * 1000)
+            REGISTRY.histogram('action_confirm_seconds', 'Time from a predicted action to its confirmation').record(res['prediction_latency'])
+            FLIGHT_RECORDER.add(flight_recorder.TIMING, 'action_confirm_seconds', res['prediction_latency'])
 
 
     def __handle_update_feedback_net_recovery(self, res: Dict[str, Any]):
@@ -1490,12 +2036,12 @@ class IBGame:
             if self.__connection_manager.is_running:
                 self.__connection_manager.stop()
             self.__connection_manager = None
-        if self.__lobbies:
-            self.__lobbies = []
         if self.__my_lobby:
             self.__my_lobby = None
         if self.__chosen_lobby:
             self.__chosen_lobby = None
+        if self.__quick_match_start:
+            self.__quick_match_start = None
         if self.__starting_player:
             self.__starting_player = None
         if self.__starting_board:
@@ -1506,6 +2052,8 @@ class IBGame:
             self.__action_input_queue = None
         if self.__game_session_updates:
             self.__game_session_updates = {}
+        if self.__held_responses:
+            self.__held_responses = []
         if self.__game_session_updated.is_set():
             self.__game_session_updated.clear()
         if self.game_state.connection_status != ConnectionStatus.NOT_RUNNING:
@@ -1634,6 +2182,9 @@ class IBGame:
 
         # update the context and get the results
         with self.graphics_lock:
+            if self.context and self.__lobby_directory.has_changes and \
+               self.game_state.connection_status == ConnectionStatus.RECEIVED_LOBBIES:
+                self.__apply_lobby_directory_changes()
             if self.context:
                 res = self.context.update(inputs)
                 self.__handle_update_feedback_lobby_selection(res)
@@ -1718,6 +2269,7 @@ class IBGame:
                     self.context = None
 
         
+    @TRACER.traced('update')
     def update(self) -> IBGameUpdateResult:
         """
         Updates the game state. This method should be called in the main loop 
@@ -1734,7 +2286,8 @@ class IBGame:
 
         # reset the control variables
         self.update_result.update_areas = []
-        events = self.__get_pygame_events()
+        with TRACER.span('update.events', 'update'):
+            events = self.__get_pygame_events()
         self.resized = False
         debug_info_updated = False
         
@@ -1742,9 +2295,12 @@ class IBGame:
         if events.event_quit:
             logger.info('User requested to exit the game')
             self.do_exit.set()
+            self.hint_estimator.stop()
+            self.__connection_lifecycle.close('quit', ConnectionLifecycle.CLOSE_TIMEOUT)
+            logger.info(f"State transitions: {self.__state_machine.get_transition_report()}")
             self.update_result.exit = True
             if self.__net_handler_thread and self.__net_handler_thread.is_alive():
-                self.__net_handler_thread.join()
+                self.__join_net_handler_thread()
             return self.update_result
             
         # user attempts to resize the window 
@@ -1757,7 +2313,8 @@ class IBGame:
             self.update_result.update_areas.insert(0, True)
             return self.update_result
         elif self.__resizing and time.time() - self.__time_last_resize > IBGame.RESIZE_DELAY:
-            self.__handle_window_resize(self.__last_resize_event)
+            with TRACER.span('update.resize', 'update'):
+                self.__handle_window_resize(self.__last_resize_event)
             debug_info_updated = True
             if self.debug_mode:
                 self.debug_info.dimensions = self.window.get_size()
@@ -1774,50 +2331,23 @@ class IBGame:
         if self.debug_mode:
             if events.event_keydown:
                 self.debug_info.last_reg_key = pygame.key.name(events.event_keydown.key)
-                logger.debug(f'Last registered key: {self.debug_info.last_reg_key}')
+                input_logger.debug('Last registered key: %s', self.debug_info.last_reg_key)
                 debug_info_updated = True
             
-        # ordered by the most prioritized states (microoptimization)
-        if self.game_state.state == IBGameState.GAME_SESSION:
-            self.__update_game_session(events)
-
-        elif self.game_state.state == IBGameState.NET_RECOVERY:
-            self.__update_game_net_recovery(events)
-
-        elif self.game_state.state == IBGameState.LOBBY:
-            self.__update_lobby(events)
-
-        elif self.game_state.state == IBGameState.LOBBY_SELECTION:
-            self.__update_lobby_selection(events)
-
-        elif self.game_state.state == IBGameState.CONNECTION_MENU:
-            self.__update_connection_menu(events)
-
-        elif self.game_state.state == IBGameState.GAME_END:
-            self.__update_game_end(events)
-
-        elif self.game_state.state == IBGameState.MAIN_MENU:
-            self.__update_main_menu(events)
-
-        elif self.game_state.state == IBGameState.SETTINGS_MENU:
-            self.__update_settings_menu(events)
-
-        elif self.game_state.state == IBGameState.INIT:
-            self.__update_init_state(events)
-        
-        else:
-            logger.critical('Unknown state.')
-            raise SystemError('Unknown state.')
+        # dispatched by the table of the states (see __create_state_machine)
+        with TRACER.span('update.state', 'update'):
+            self.__state_machine.update(self.game_state.state, events)
 
         # render the debug info if allowed
         if self.debug_mode and debug_info_updated:
-            self.debug_surface.fill(self.assets['colors']['black'])
-            self.debug_info.game_state = str(self.game_state)
-            self.debug_info_render = self.__get_debug_info_object()
-            new_rect_x = 0
-            new_rect_y = self.window.get_height() - self.debug_info_render.get_height()
-            self.debug_surface.blit(self.debug_info_render, (0, 0))
-            new_rect = pygame.Rect(new_rect_x, new_rect_y, self.window.get_width(), self.debug_info_render.get_height())
-            self.update_result.update_areas.append(new_rect)
+            with TRACER.span('update.debug_info', 'update'):
+                self.debug_surface.fill(self.assets['colors']['black'])
+                self.debug_info.game_state = str(self.game_state)
+                self.debug_info_render = self.__get_debug_info_object()
+                new_rect_x = 0
+                new_rect_y = self.window.get_height() - self.debug_info_render.get_height()
+                self.debug_surface.blit(self.debug_info_render, (0, 0))
+                new_rect = pygame.Rect(new_rect_x, new_rect_y, self.window.get_width(), self.debug_info_render.get_height())
+                self.update_result.update_areas.append(new_rect)
         
         return self.update_result
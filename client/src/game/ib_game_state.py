@@ -65,6 +65,8 @@ class ConnectionStatus:
     """The player lost the game."""
     RECONNECTED = 22
     """The player reconnected to the game."""
+    QUICK_MATCH = 23
+    """The connection is joining the first available lobby or creating one."""
 
     status: int = NOT_RUNNING
     """The status of the connection."""
@@ -106,6 +108,19 @@ class IBGameState:
     NET_RECOVERY = 7
     """The game is reconnecting."""
 
+    STATE_NAMES = {
+        INIT: 'INIT',
+        MAIN_MENU: 'MAIN_MENU',
+        SETTINGS_MENU: 'SETTINGS_MENU',
+        CONNECTION_MENU: 'CONNECTION_MENU',
+        LOBBY_SELECTION: 'LOBBY_SELECTION',
+        LOBBY: 'LOBBY',
+        GAME_SESSION: 'GAME_SESSION',
+        GAME_END: 'GAME_END',
+        NET_RECOVERY: 'NET_RECOVERY'
+    }
+    """The names of the states."""
+
 
     def __init__(self):
         """
@@ -113,17 +128,7 @@ class IBGameState:
         """
 
         self.__state = IBGameState.INIT
-        self.__state_names = {
-            IBGameState.INIT: 'INIT',
-            IBGameState.MAIN_MENU: 'MAIN_MENU',
-            IBGameState.SETTINGS_MENU: 'SETTINGS_MENU',
-            IBGameState.CONNECTION_MENU: 'CONNECTION_MENU',
-            IBGameState.LOBBY_SELECTION: 'LOBBY_SELECTION',
-            IBGameState.LOBBY: 'LOBBY',
-            IBGameState.GAME_SESSION: 'GAME_SESSION',
-            IBGameState.GAME_END: 'GAME_END',
-            IBGameState.NET_RECOVERY: 'NET_RECOVERY'
-        }
+        self.__state_names = IBGameState.STATE_NAMES
         self.__connection_status_names = {
             ConnectionStatus.NOT_RUNNING: 'NOT_RUNNING',
             ConnectionStatus.CONNECTING: 'CONNECTING',
@@ -147,7 +152,8 @@ class IBGameState:
             ConnectionStatus.WAITING_FOR_SERVER: 'WAITING_FOR_SERVER',
             ConnectionStatus.WIN: 'WIN',
             ConnectionStatus.LOSE: 'LOSE',
-            ConnectionStatus.RECONNECTED: 'RECONNECTED'
+            ConnectionStatus.RECONNECTED: 'RECONNECTED',
+            ConnectionStatus.QUICK_MATCH: 'QUICK_MATCH'
         }
         self.__connection_status = ConnectionStatus()
         logger.debug(f'IBGameState initialized with state: {str(self)}')
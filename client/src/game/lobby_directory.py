@@ -0,0 +1,202 @@
+"""
+This module contains the lobby directory of the client: the last received list of lobbies of a server
+with the time it was received. The lobby selection is shown immediately from the snapshot while it is
+refreshed in the background by the network handler thread, and the game ticks apply only the added and
+removed lobbies to the shown list (see graphics.menus.lobby_select.LobbySelect.apply_changes).
+The directory also ranks the lobbies for the quick match (see get_candidates).
+"""
+
+import threading
+import time
+from typing import Dict, List, Tuple
+from util.metrics import REGISTRY
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+class LobbyDirectory:
+    """
+    This class keeps the snapshot of the lobbies of a server. The snapshot is replaced by the network
+    handler thread and the changes since the last shown list are taken by the game ticks (thread-safe).
+    """
+
+    REFRESH_INTERVAL = 5.0
+    """The interval in seconds between the refreshes of the shown directory."""
+
+    MAX_AGE = 300.0
+    """The age in seconds after which the snapshot is not shown (the lobbies are requested again)."""
+
+    FAILED_JOIN_PENALTY = 60.0
+    """The time in seconds a lobby that could not be joined is tried after the others."""
+
+
+    def __init__(self):
+        """
+        Creates the empty directory.
+        """
+
+        self.__lock = threading.Lock()
+        self.__server_address: str = None
+        self.__lobbies: List[str] = []
+        self.__shown: List[str] = []
+        self.__time_received: float = None
+        self.__version = 0
+        self.__shown_version = 0
+        self.__first_seen: Dict[str, float] = {}
+        self.__failed_joins: Dict[str, float] = {}
+        self.latency: float = None
+        """The time in seconds the last request of the lobbies took (an estimate of the round-trip time)."""
+
+
+    @property
+    def lobbies(self) -> List[str]:
+        """
+        Getter for the lobbies of the snapshot.
+
+        :return: The lobbies (a copy).
+        :rtype: List[str]
+        """
+
+        with self.__lock:
+            return list(self.__lobbies)
+
+
+    @property
+    def age(self) -> float:
+        """
+        Getter for the age of the snapshot.
+
+        :return: The time in seconds since the snapshot was received (infinity if there is none).
+        :rtype: float
+        """
+
+        if self.__time_received is None:
+            return float('inf')
+        return time.monotonic() - self.__time_received
+
+
+    @property
+    def has_changes(self) -> bool:
+        """
+        Getter for whether the snapshot changed since the lobbies were last shown.
+
+        :return: True if there are changes to take, False otherwise.
+        :rtype: bool
+        """
+
+        return self.__version != self.__shown_version
+
+
+    def is_usable(self, server_address: str) -> bool:
+        """
+        Checks if the snapshot can be shown for the server.
+
+        :param server_address: The address of the server (ip:port).
+        :type server_address: str
+        :return: True if the snapshot is of the server and not older than MAX_AGE, False otherwise.
+        :rtype: bool
+        """
+
+        return self.__server_address == server_address and self.age <= __class__.MAX_AGE
+
+
+    def replace(self, server_address: str, lobbies: List[str], latency: float):
+        """
+        Replaces the snapshot with the received lobbies.
+
+        :param server_address: The address of the server (ip:port).
+        :type server_address: str
+        :param lobbies: The received lobbies.
+        :type lobbies: List[str]
+        :param latency: The time in seconds the request of the lobbies took.
+        :type latency: float
+        """
+
+        REGISTRY.histogram('lobby_refresh_seconds', 'Time of the requests of the lobby list').record(latency)
+        with self.__lock:
+            if self.__time_received is not None and self.__server_address == server_address:
+                REGISTRY.gauge('lobby_directory_age_seconds', 'Age of the lobby snapshot when it was shown or replaced').set(self.age)
+            if self.__server_address != server_address:
+                self.__first_seen.clear()
+                self.__failed_joins.clear()
+            self.__server_address = server_address
+            self.__time_received = time.monotonic()
+            self.latency = latency
+            if lobbies != self.__lobbies:
+                self.__lobbies = list(lobbies)
+                self.__version += 1
+                self.__first_seen = {lobby: self.__first_seen.get(lobby, self.__time_received) for lobby in self.__lobbies}
+
+
+    def show(self) -> List[str]:
+        """
+        Returns the lobbies to show (the following changes are relative to them).
+
+        :return: The lobbies of the snapshot.
+        :rtype: List[str]
+        """
+
+        with self.__lock:
+            if self.__time_received is not None:
+                REGISTRY.gauge('lobby_directory_age_seconds', 'Age of the lobby snapshot when it was shown or replaced').set(self.age)
+            self.__shown = list(self.__lobbies)
+            self.__shown_version = self.__version
+            return list(self.__shown)
+
+
+    def take_changes(self) -> Tuple[List[str], List[str]]:
+        """
+        Returns the changes of the snapshot since the lobbies were last shown (and marks them as shown).
+
+        :return: The added and the removed lobbies (in the order of the snapshot and of the shown list).
+        :rtype: Tuple[List[str], List[str]]
+        """
+
+        with self.__lock:
+            current = set(self.__lobbies)
+            shown = set(self.__shown)
+            added = [lobby for lobby in self.__lobbies if lobby not in shown]
+            removed = [lobby for lobby in self.__shown if lobby not in current]
+            self.__shown = list(self.__lobbies)
+            self.__shown_version = self.__version
+
+        if added or removed:
+            REGISTRY.counter('lobby_directory_changes_total', 'Lobbies added to or removed from the shown list', change='added').inc(len(added))
+            REGISTRY.counter('lobby_directory_changes_total', 'Lobbies added to or removed from the shown list', change='removed').inc(len(removed))
+            logger.debug(f"Lobby directory changed: {len(added)} added, {len(removed)} removed")
+        return added, removed
+
+
+    def mark_failed(self, lobby: str):
+        """
+        Marks the lobby that could not be joined (it is tried after the others for FAILED_JOIN_PENALTY seconds).
+
+        :param lobby: The name of the lobby.
+        :type lobby: str
+        """
+
+        with self.__lock:
+            self.__failed_joins[lobby] = time.monotonic()
+
+
+    def get_candidates(self, count: int) -> List[str]:
+        """
+        Returns the most promising lobbies of the snapshot to join: the lobbies waiting the longest first
+        (they were seen in the most snapshots, so they are not a brief glimpse of a lobby being paired)
+        and the lobbies that recently could not be joined last.
+
+        :param count: The maximal number of the lobbies.
+        :type count: int
+        :return: The names of the lobbies in the order to try them.
+        :rtype: List[str]
+        """
+
+        with self.__lock:
+            now = time.monotonic()
+            failed = {lobby for lobby, time_failed in self.__failed_joins.items() if now - time_failed < __class__.FAILED_JOIN_PENALTY}
+            candidates = sorted(self.__lobbies, key=lambda lobby: (lobby in failed, self.__first_seen.get(lobby, now)))
+
+        return candidates[:count]
@@ -0,0 +1,247 @@
+"""
+This module contains the authoritative rules of the game Inverse Battleships as implemented by the server
+(board generation, moves, game result and the player-relative view of the board).
+It is used by the reference server and the simulators of the development tools.
+"""
+
+import random
+from typing import List, Tuple
+from const.server_communication import *
+
+
+CELL_FREE = 0
+"""Server-side value of a free cell."""
+
+CELL_PLAYER01 = 1
+"""Server-side value of a cell with a ship of the first player."""
+
+CELL_PLAYER02 = 2
+"""Server-side value of a cell with a ship of the second player."""
+
+CELL_BOAT = 3
+"""Server-side value of a cell with an unclaimed boat."""
+
+CELL_PLAYER01_LOST = -1
+"""Server-side value of a cell with a lost ship of the first player."""
+
+CELL_PLAYER02_LOST = -2
+"""Server-side value of a cell with a lost ship of the second player."""
+
+BOATS_COUNT = 11
+"""The number of cells with a boat placed on the board (a two-cell boat takes two of them)."""
+
+__MAX_RETRIES = 1000
+"""The maximum number of failed placements while generating a board."""
+
+
+class InvalidMoveError(ValueError):
+    """
+    This class represents an error raised when a player acts on their own or a lost ship.
+    """
+
+
+def __get_neighbours_count(board: List[List[int]], row: int, col: int) -> int:
+    """
+    Returns the count of the orthogonal neighbours of the cell that contain a boat.
+
+    :param board: The server-side board.
+    :type board: List[List[int]]
+    :param row: The row of the cell.
+    :type row: int
+    :param col: The column of the cell.
+    :type col: int
+    :return: The count of the neighbouring boats.
+    :rtype: int
+    """
+
+    count = 0
+    for r, c in get_neighbours(row, col):
+        if board[r][c] == CELL_BOAT:
+            count += 1
+
+    return count
+
+
+def get_neighbours(row: int, col: int) -> List[Tuple[int, int]]:
+    """
+    Returns the orthogonal neighbours of the cell that lie on the board.
+
+    :param row: The row of the cell.
+    :type row: int
+    :param col: The column of the cell.
+    :type col: int
+    :return: The neighbouring cells (row, column).
+    :rtype: List[Tuple[int, int]]
+    """
+
+    res = []
+    if row > 0:
+        res.append((row - 1, col))
+    if row < BOARD_SIDE_SIZE - 1:
+        res.append((row + 1, col))
+    if col > 0:
+        res.append((row, col - 1))
+    if col < BOARD_SIDE_SIZE - 1:
+        res.append((row, col + 1))
+
+    return res
+
+
+def generate_board(rng: random.Random = None) -> List[List[int]]:
+    """
+    Generates a random server-side board: boats on BOATS_COUNT cells (0 to 2 of the boats two cells long,
+    the rest one cell long) that do not touch each other and one of the boats assigned to each player.
+
+    :param rng: The random generator (a new one if not set).
+    :type rng: random.Random
+    :return: The server-side board.
+    :rtype: List[List[int]]
+    """
+
+    rng = rng if rng else random.Random()
+    board = [[CELL_FREE] * BOARD_SIDE_SIZE for _ in range(BOARD_SIDE_SIZE)]
+    boats: List[List[Tuple[int, int]]] = []
+    retries = 0
+
+    two_boats_count = rng.randrange(BOATS_COUNT // 2 // 2 + 1)
+    while len(boats) < two_boats_count and retries <= __MAX_RETRIES:
+        row = rng.randrange(BOARD_SIDE_SIZE)
+        col = rng.randrange(BOARD_SIDE_SIZE)
+        if board[row][col] == CELL_BOAT or __get_neighbours_count(board, row, col) != 0:
+            retries += 1
+            continue
+
+        placements = get_neighbours(row, col)
+        rng.shuffle(placements)
+        for r, c in placements:
+            if __get_neighbours_count(board, r, c) == 0:
+                board[row][col] = CELL_BOAT
+                board[r][c] = CELL_BOAT
+                boats.append([(row, col), (r, c)])
+                break
+        else:
+            retries += 1
+
+    # the rest of the cells as one-cell boats
+    one_boats_count = BOATS_COUNT - two_boats_count * 2
+    while len(boats) < two_boats_count + one_boats_count and retries <= __MAX_RETRIES:
+        row = rng.randrange(BOARD_SIDE_SIZE)
+        col = rng.randrange(BOARD_SIDE_SIZE)
+        if board[row][col] == CELL_BOAT or __get_neighbours_count(board, row, col) != 0:
+            retries += 1
+            continue
+
+        board[row][col] = CELL_BOAT
+        boats.append([(row, col)])
+
+    for player_cell in (CELL_PLAYER01, CELL_PLAYER02):
+        boat = boats.pop(rng.randrange(len(boats)))
+        for r, c in boat:
+            board[r][c] = player_cell
+
+    return board
+
+
+def apply_move(board: List[List[int]], is_player01: bool, row: int, col: int):
+    """
+    Applies the action of the player on the server-side board (in place).
+    An action on a ship or a boat also affects its orthogonal neighbours that contain a ship or a boat:
+    unclaimed boats are claimed by the player, ships of the opponent are lost.
+
+    :param board: The server-side board.
+    :type board: List[List[int]]
+    :param is_player01: Whether the acting player is the first player.
+    :type is_player01: bool
+    :param row: The row of the cell.
+    :type row: int
+    :param col: The column of the cell.
+    :type col: int
+    :raises InvalidMoveError: If the action targets own or a lost ship.
+    """
+
+    occupied = (CELL_BOAT, CELL_PLAYER01, CELL_PLAYER02)
+    if board[row][col] not in occupied:
+        return
+
+    targets = [(row, col)] + [(r, c) for r, c in get_neighbours(row, col) if board[r][c] in occupied]
+    own_cell = CELL_PLAYER01 if is_player01 else CELL_PLAYER02
+    opponent_cell = CELL_PLAYER02 if is_player01 else CELL_PLAYER01
+    opponent_lost_cell = CELL_PLAYER02_LOST if is_player01 else CELL_PLAYER01_LOST
+    for r, c in targets:
+        cell = board[r][c]
+        if cell == CELL_BOAT:
+            board[r][c] = own_cell
+        elif cell == opponent_cell:
+            board[r][c] = opponent_lost_cell
+        elif cell == own_cell:
+            raise InvalidMoveError(f"Action on own ship at {r}:{c}")
+        else:
+            raise InvalidMoveError(f"Action on a lost ship at {r}:{c}")
+
+
+def get_game_result(board: List[List[int]]) -> Tuple[bool, bool]:
+    """
+    Returns whether the game has finished and whether the first player has won.
+
+    :param board: The server-side board.
+    :type board: List[List[int]]
+    :return: True if the game has finished, True if the first player has won.
+    :rtype: Tuple[bool, bool]
+    """
+
+    player01_ships = 0
+    player02_ships = 0
+    for row in board:
+        player01_ships += row.count(CELL_PLAYER01)
+        player02_ships += row.count(CELL_PLAYER02)
+
+    if player01_ships == 0:
+        return True, False
+    if player02_ships == 0:
+        return True, True
+
+    return False, False
+
+
+def get_player_board(board: List[List[int]], is_player01: bool) -> List[List[int]]:
+    """
+    Returns the board as seen by the player (own ships, own lost ships and opponent's lost ships;
+    everything else is free).
+
+    :param board: The server-side board.
+    :type board: List[List[int]]
+    :param is_player01: Whether the player is the first player.
+    :type is_player01: bool
+    :return: The player-relative board.
+    :rtype: List[List[int]]
+    """
+
+    if is_player01:
+        mapping = {CELL_PLAYER01: BOARD_PLAYER_CELL,
+                   CELL_PLAYER01_LOST: BOARD_PLAYER_SHIP_LOST_CELL,
+                   CELL_PLAYER02_LOST: BOARD_OPPONENT_SHIP_LOST_CELL}
+    else:
+        mapping = {CELL_PLAYER02: BOARD_PLAYER_CELL,
+                   CELL_PLAYER02_LOST: BOARD_PLAYER_SHIP_LOST_CELL,
+                   CELL_PLAYER01_LOST: BOARD_OPPONENT_SHIP_LOST_CELL}
+
+    return [[mapping.get(cell, BOARD_FREE_CELL) for cell in row] for row in board]
+
+
+def get_score(player_board: List[List[int]]) -> int:
+    """
+    Returns the score of the player on the player-relative board (as shown by the client).
+
+    :param player_board: The player-relative board.
+    :type player_board: List[List[int]]
+    :return: The score.
+    :rtype: int
+    """
+
+    score = 0
+    for row in player_board:
+        score += row.count(BOARD_PLAYER_CELL) * SCORE_SHIP_GAINED
+        score += row.count(BOARD_PLAYER_SHIP_LOST_CELL) * SCORE_LOST_SHIP
+        score += row.count(BOARD_OPPONENT_SHIP_LOST_CELL) * SCORE_HIT
+
+    return score
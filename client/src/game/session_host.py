@@ -0,0 +1,644 @@
+"""
+This module contains the session host of the game Inverse Battleships: a runtime that runs many independent
+client sessions (bot players, monitoring probes) in one process. All sessions are driven by a single
+asyncio event loop (the reactor) instead of one thread per session, each session has its own connection
+(AsyncConnectionManager) and state (IBGameState), and optionally its own virtual (off-screen) surface
+with the game session view, which the host redraws on its own tick.
+"""
+
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+import pygame
+from game.async_connection_manager import AsyncConnectionManager
+from game import rules
+from game.bots import Bot, RandomBot
+from game.ib_game_state import IBGameState, ConnectionStatus
+from graphics.game_session import GameSession
+from util.stats import summarize
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+@dataclass
+class GameResult:
+    """
+    This class represents the result of a game played by a hosted bot.
+    """
+
+    opponent: str
+    """The opponent's nickname."""
+    outcome: str
+    """The outcome of the game (WIN, LOST or TKO)."""
+    is_first: bool
+    """Whether the bot was on turn first."""
+    score: int
+    """The score of the bot on the final board (as shown by the client)."""
+    actions: int
+    """The number of actions of the bot."""
+    turns: int
+    """The number of turns of both players."""
+    duration: float
+    """The duration of the game in seconds."""
+
+
+class HostedSession(ABC):
+    """
+    The HostedSession class (a single client session run by the SessionHost).
+    """
+
+
+    def __init__(self, nickname: str, surface_size: Tuple[int, int] = None):
+        """
+        Initializes the session.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param surface_size: The size of the virtual surface (width, height) or None for no rendering.
+        :type surface_size: Tuple[int, int]
+        """
+
+        if not nickname or len(nickname) > PLAYER_NICKNAME_MAX_LENGTH:
+            raise ValueError(f"Invalid nickname '{nickname}'")
+
+        self.nickname = nickname
+        self.surface_size = surface_size
+        self.state = IBGameState()
+        """The state of the session (the same states as the client)."""
+        self.conn: AsyncConnectionManager = None
+        """The connection of the session (created by the host)."""
+        self.surface: pygame.Surface = None
+        """The virtual surface of the session (None if the session is not rendered)."""
+        self.context: GameSession = None
+        """The game session view rendered to the virtual surface."""
+        self.dirty = False
+        """Whether the virtual surface has to be redrawn."""
+        self.errors: Counter = Counter()
+        """The number of errors per exception type."""
+        self.__assets = None
+
+
+    def attach(self, server_ip: str, server_port: int, assets: Dict[str, Any] = None):
+        """
+        Creates the connection and the virtual surface of the session (called by the host).
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param assets: The assets of the game (required for rendering).
+        :type assets: Dict[str, Any]
+        """
+
+        self.conn = AsyncConnectionManager(server_ip, server_port)
+        self.__assets = assets
+        if self.surface_size:
+            self.surface = pygame.Surface(self.surface_size)
+
+
+    def update_view(self, events: Dict[str, Any]):
+        """
+        Updates the game session view with the events (the same keys as the client uses:
+        board, player_on_turn, player_name, opponent_name).
+
+        :param events: The events.
+        :type events: Dict[str, Any]
+        """
+
+        if self.surface is None:
+            return
+
+        if self.context is None:
+            self.context = GameSession(self.surface, self.__assets)
+        if self.context.update(events)['graphics_update']:
+            self.dirty = True
+
+
+    def render(self) -> bool:
+        """
+        Redraws the virtual surface if the view changed and can be drawn.
+
+        :return: True if the surface was redrawn, false otherwise.
+        :rtype: bool
+        """
+
+        if not self.dirty or self.context is None:
+            return False
+
+        try:
+            self.context.redraw()
+        except ValueError:
+            # the view is not complete yet (e.g. the player on turn is unknown)
+            return False
+
+        self.dirty = False
+        return True
+
+
+    def record_error(self, e: Exception):
+        """
+        Records an error of the session.
+
+        :param e: The error.
+        :type e: Exception
+        """
+
+        self.errors[type(e).__name__] += 1
+        self.state.connection_status = ConnectionStatus.FAILED
+
+
+    @abstractmethod
+    async def run(self, host: 'SessionHost'):
+        """
+        Runs the session until it ends or the host stops.
+
+        :param host: The host running the session.
+        :type host: SessionHost
+        """
+
+        raise NotImplementedError("Must be overridden by subclass.")
+
+
+    @abstractmethod
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the report of the session.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        raise NotImplementedError("Must be overridden by subclass.")
+
+
+class BotSession(HostedSession):
+    """
+    This class represents a session of a bot player. The bot creates a lobby (or joins the given lobby),
+    plays the configured number of games and leaves.
+    """
+
+    GAME_COOLDOWN = 0.5
+    """The pause in seconds between two games (the server deletes finished lobbies asynchronously)."""
+
+    LOBBY_POLL_INTERVAL = 0.2
+    """The interval in seconds between two lobby list requests of a joining bot."""
+
+
+    def __init__(self, nickname: str, bot: Bot = None, lobby_id: str = None, games: int = 1,
+                 timeout: float = 10, surface_size: Tuple[int, int] = None, cooldown: float = GAME_COOLDOWN):
+        """
+        Initializes the session.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param bot: The bot choosing the actions (a random bot if not set).
+        :type bot: Bot
+        :param lobby_id: The lobby to join or None to create a lobby.
+        :type lobby_id: str
+        :param games: The number of games to play.
+        :type games: int
+        :param timeout: The timeout in seconds of waiting for the opponent or the server.
+        :type timeout: float
+        :param surface_size: The size of the virtual surface (width, height) or None for no rendering.
+        :type surface_size: Tuple[int, int]
+        :param cooldown: The pause in seconds between two games.
+        :type cooldown: float
+        """
+
+        super().__init__(nickname, surface_size)
+        self.bot = bot if bot else RandomBot()
+        self.cooldown = cooldown
+        self.lobby_id = lobby_id
+        self.games = games
+        self.timeout = timeout
+        self.outcomes: Counter = Counter()
+        """The number of game outcomes (WIN, LOST, TKO)."""
+        self.actions = 0
+        """The number of sent actions."""
+        self.decision_times: List[float] = []
+        """The durations of the decisions of the bot in seconds."""
+        self.results: List[GameResult] = []
+        """The results of the played games."""
+
+
+    async def run(self, host: 'SessionHost'):
+        """
+        Runs the session: connect, log in, play the games and leave.
+
+        :param host: The host running the session.
+        :type host: SessionHost
+        """
+
+        try:
+            self.state.state = IBGameState.CONNECTION_MENU
+            self.state.connection_status = ConnectionStatus.CONNECTING
+            await self.conn.start(self.timeout)
+            if not await self.conn.login(self.nickname):
+                raise ConnectionError(f"Login of '{self.nickname}' refused")
+            self.state.connection_status = ConnectionStatus.CONNECTED
+
+            for i in range(self.games):
+                if host.is_stopping:
+                    break
+                if i > 0 and self.cooldown > 0:
+                    await asyncio.sleep(self.cooldown)
+                opponent = await self.__pair()
+                await self.__play(opponent)
+
+            self.state.state = IBGameState.MAIN_MENU
+            await self.conn.stop()
+            self.state.connection_status = ConnectionStatus.NOT_RUNNING
+
+        except Exception as e:
+            logger.warning(f"Hosted bot '{self.nickname}' failed: {e}")
+            self.record_error(e)
+
+        finally:
+            await self.conn.close()
+
+
+    async def __pair(self) -> str:
+        """
+        Creates or joins the lobby and waits for the opponent.
+
+        :return: The opponent's nickname.
+        :rtype: str
+        """
+
+        self.state.state = IBGameState.LOBBY
+        if self.lobby_id is None:
+            self.state.connection_status = ConnectionStatus.REQUESTED_LOBBY
+            await self.conn.get_lobby()
+        else:
+            self.state.connection_status = ConnectionStatus.TRYING_TO_JOIN
+            deadline = time.perf_counter() + self.timeout
+            while self.lobby_id not in await self.conn.get_lobbies():
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"Lobby '{self.lobby_id}' did not appear")
+                await asyncio.sleep(self.LOBBY_POLL_INTERVAL)
+            await self.conn.join_lobby(self.lobby_id)
+
+        self.state.connection_status = ConnectionStatus.WAITING_FOR_PLAYERS
+        return await self.conn.check_for_players(self.timeout)
+
+
+    async def __play(self, opponent: str):
+        """
+        Plays a single game until it ends.
+
+        :param opponent: The opponent's nickname.
+        :type opponent: str
+        """
+
+        self.state.connection_status = ConnectionStatus.GAME_READY
+        time_start = time.perf_counter()
+        board, player_on_turn, tko = await self.conn.game_ready(self.timeout)
+        if tko:
+            self.outcomes[CMD_TKO] += 1
+            self.results.append(GameResult(opponent, CMD_TKO, False, 0, 0, 0, time.perf_counter() - time_start))
+            self.state.connection_status = ConnectionStatus.TKO
+            return
+
+        self.state.state = IBGameState.GAME_SESSION
+        self.state.connection_status = ConnectionStatus.GAME_SESSION
+        self.bot.reset()
+        self.bot.update(board)
+        self.context = None
+        self.update_view({'player_name': self.nickname, 'opponent_name': opponent,
+                          'board': board, 'player_on_turn': player_on_turn})
+        is_first = player_on_turn == self.nickname
+        actions = 0
+        turns = 1
+        while True:
+            if player_on_turn == self.nickname:
+                decision_start = time.perf_counter()
+                action = self.bot.choose_action(board)
+                self.decision_times.append(time.perf_counter() - decision_start)
+                await self.conn.send_action(action)
+                self.actions += 1
+                actions += 1
+                player_on_turn = None
+
+            res = await self.conn.receive_message(self.timeout)
+            if res.command == CMD_PING:
+                await self.conn.pong()
+            elif res.command == CMD_BOARD:
+                board = res.params[PARAM_BOARD_INDEX]
+                self.bot.update(board)
+                self.update_view({'board': board})
+            elif res.command == CMD_PLAYER_TURN:
+                player_on_turn = res.params[PARAM_PLAYER_ON_TURN_INDEX]
+                turns += 1
+                self.update_view({'player_on_turn': player_on_turn})
+            elif res.command == CMD_WAIT:
+                self.state.connection_status = ConnectionStatus.WAITING_FOR_OPPONENT
+                await self.conn.wait_ackw()
+            elif res.command in (CMD_GAME_WIN, CMD_GAME_LOSE, CMD_TKO):
+                self.outcomes[res.command] += 1
+                self.results.append(GameResult(opponent, res.command, is_first, rules.get_score(board),
+                                               actions, turns, time.perf_counter() - time_start))
+                self.state.state = IBGameState.GAME_END
+                self.state.connection_status = {CMD_GAME_WIN: ConnectionStatus.WIN,
+                                                CMD_GAME_LOSE: ConnectionStatus.LOSE,
+                                                CMD_TKO: ConnectionStatus.TKO}[res.command]
+                return
+            else:
+                raise ConnectionError(f"Unexpected message during the game: {res.command}")
+
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the report of the session.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        return {'kind': 'bot', 'nickname': self.nickname, 'bot': type(self.bot).__name__,
+                'outcomes': dict(self.outcomes), 'actions': self.actions,
+                'decision_us': summarize(self.decision_times, scale=1e6),
+                'errors': dict(self.errors), 'state': str(self.state)}
+
+
+class ProbeSession(HostedSession):
+    """
+    This class represents a monitoring probe: a logged in session that periodically requests
+    the lobby list and measures the round-trip time. A lost connection is re-established.
+    """
+
+
+    def __init__(self, nickname: str, interval: float = 1, duration: float = 10, timeout: float = 5):
+        """
+        Initializes the probe.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param interval: The interval in seconds between two probes.
+        :type interval: float
+        :param duration: The duration of the probing in seconds.
+        :type duration: float
+        :param timeout: The timeout in seconds of a single probe.
+        :type timeout: float
+        """
+
+        super().__init__(nickname)
+        self.interval = interval
+        self.duration = duration
+        self.timeout = timeout
+        self.rtts: List[float] = []
+        """The measured round-trip times in seconds."""
+        self.probes = 0
+        """The number of attempted probes."""
+        self.lobbies = 0
+        """The number of lobbies seen by the last probe."""
+
+
+    async def run(self, host: 'SessionHost'):
+        """
+        Probes the server until the duration elapses or the host stops.
+
+        :param host: The host running the session.
+        :type host: SessionHost
+        """
+
+        deadline = time.perf_counter() + self.duration
+        while not host.is_stopping and time.perf_counter() < deadline:
+            self.probes += 1
+            try:
+                if not self.conn.is_running:
+                    self.state.connection_status = ConnectionStatus.CONNECTING
+                    await self.conn.start(self.timeout)
+                    if not await self.conn.login(self.nickname):
+                        raise ConnectionError(f"Login of '{self.nickname}' refused")
+                    self.state.state = IBGameState.LOBBY_SELECTION
+                    self.state.connection_status = ConnectionStatus.CONNECTED
+
+                time_start = time.perf_counter()
+                self.lobbies = len(await asyncio.wait_for(self.conn.get_lobbies(), self.timeout))
+                self.rtts.append(time.perf_counter() - time_start)
+                self.state.connection_status = ConnectionStatus.RECEIVED_LOBBIES
+
+            except Exception as e:
+                logger.warning(f"Probe '{self.nickname}' failed: {e}")
+                self.record_error(e)
+                await self.conn.close()
+
+            await host.sleep(self.interval)
+
+        if self.conn.is_running:
+            try:
+                await self.conn.stop()
+            except Exception as e:
+                self.record_error(e)
+        await self.conn.close()
+        self.state.connection_status = ConnectionStatus.NOT_RUNNING
+
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the report of the probe.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        return {'kind': 'probe', 'nickname': self.nickname, 'probes': self.probes,
+                'availability': len(self.rtts) / self.probes if self.probes else None,
+                'rtt_ms': summarize(self.rtts, scale=1000), 'lobbies': self.lobbies,
+                'errors': dict(self.errors), 'state': str(self.state)}
+
+
+class SessionHost:
+    """
+    This class runs many hosted sessions in one process on a single asyncio event loop.
+    The virtual surfaces of the sessions are redrawn by the host at the tick speed.
+    """
+
+
+    RENDER_BUDGET = 0.5
+    """The maximal fraction of the tick period spent redrawing the virtual surfaces."""
+
+
+    def __init__(self, server_ip: str, server_port: int, tick_speed: int = 30, assets: Dict[str, Any] = None):
+        """
+        Initializes the host.
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param tick_speed: The number of redraws of the virtual surfaces per second.
+        :type tick_speed: int
+        :param assets: The assets of the game (required if any session is rendered).
+        :type assets: Dict[str, Any]
+        """
+
+        self.server_ip = server_ip
+        self.server_port = server_port
+        self.tick_speed = tick_speed
+        self.assets = assets
+        self.sessions: List[HostedSession] = []
+        """The hosted sessions."""
+        self.render_times: List[float] = []
+        """The durations of the render ticks that redrew at least one surface in seconds."""
+        self.redraws = 0
+        """The number of redrawn virtual surfaces."""
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__stopping: asyncio.Event = None
+        self.__tasks: List[asyncio.Task] = []
+
+
+    @property
+    def is_stopping(self) -> bool:
+        """
+        Checks if the host was requested to stop.
+
+        :return: True if the sessions should end, false otherwise.
+        :rtype: bool
+        """
+
+        return self.__stopping is not None and self.__stopping.is_set()
+
+
+    def add(self, session: HostedSession):
+        """
+        Adds the session to the host. If the host is running, the session starts immediately
+        (must be called from the thread of the host).
+
+        :param session: The session.
+        :type session: HostedSession
+        """
+
+        if session.surface_size and self.assets is None:
+            raise ValueError(f"Session '{session.nickname}' is rendered but the host has no assets")
+
+        if session.surface_size:
+            SessionHost.init_virtual_display()
+        session.attach(self.server_ip, self.server_port, self.assets)
+        self.sessions.append(session)
+        if self.__loop is not None:
+            self.__tasks.append(self.__loop.create_task(session.run(self)))
+
+
+    def stop(self):
+        """
+        Requests the sessions to end (thread-safe).
+        """
+
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__stopping.set)
+
+
+    async def sleep(self, delay: float):
+        """
+        Sleeps for the delay or until the host is requested to stop.
+
+        :param delay: The delay in seconds.
+        :type delay: float
+        """
+
+        try:
+            await asyncio.wait_for(self.__stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs all sessions (including the ones added while running) until they end.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        self.__loop = asyncio.get_running_loop()
+        self.__stopping = asyncio.Event()
+        self.__tasks = [self.__loop.create_task(session.run(self)) for session in self.sessions]
+        renderer = self.__loop.create_task(self.__render())
+        time_start = time.perf_counter()
+        try:
+            # sessions can be added while waiting
+            while any(not task.done() for task in self.__tasks):
+                await asyncio.gather(*self.__tasks)
+        finally:
+            renderer.cancel()
+            self.__loop = None
+
+        # the virtual surfaces show the final state of the sessions
+        for session in self.sessions:
+            session.render()
+
+        return self.report(time.perf_counter() - time_start)
+
+
+    async def __render(self):
+        """
+        Redraws the changed virtual surfaces at the tick speed. A tick spends at most RENDER_BUDGET
+        of the tick period rendering (so the sessions are not starved), the remaining surfaces
+        are redrawn on the next ticks in a round-robin manner (their changes are coalesced).
+        """
+
+        period = 1 / self.tick_speed
+        next_index = 0
+        while True:
+            await asyncio.sleep(period)
+            time_start = time.perf_counter()
+            deadline = time_start + period * self.RENDER_BUDGET
+            redrawn = 0
+            count = len(self.sessions)
+            for i in range(count):
+                if time.perf_counter() > deadline:
+                    break
+                redrawn += self.sessions[(next_index + i) % count].render()
+            else:
+                i = count
+            next_index = (next_index + i) % count if count else 0
+
+            if redrawn:
+                self.redraws += redrawn
+                self.render_times.append(time.perf_counter() - time_start)
+
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        """
+        Returns the report of the host and its sessions.
+
+        :param duration: The wall-clock duration of the run in seconds.
+        :type duration: float
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        outcomes = Counter()
+        errors = Counter()
+        for session in self.sessions:
+            outcomes.update(getattr(session, 'outcomes', {}))
+            errors.update(session.errors)
+
+        return {'duration_s': duration, 'sessions': len(self.sessions),
+                'outcomes': dict(outcomes), 'errors': dict(errors),
+                'redraws': self.redraws, 'render_ms': summarize(self.render_times, scale=1000),
+                'session_reports': [session.report() for session in self.sessions]}
+
+
+    @staticmethod
+    def init_virtual_display():
+        """
+        Initializes PyGame for rendering to the virtual surfaces. If there is no display yet,
+        a hidden one is created (with the dummy video driver unless another driver is set).
+        """
+
+        if pygame.display.get_init() and pygame.display.get_surface():
+            return
+
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        pygame.display.set_mode((1, 1))
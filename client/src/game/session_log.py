@@ -0,0 +1,236 @@
+"""
+This module contains the recorder and the reader of the network session logs of the game Inverse Battleships.
+A session log is a compact binary file with every inbound and outbound frame, the connection events
+and the user input events, each with a monotonic timestamp. The logs can be replayed
+without a server by the replayer of the development tools (tools/replay.py).
+
+The format of the log (all integers little-endian):
+- header: the magic bytes, the format version (1 byte) and the wall-clock time of the start (8 bytes, double),
+- records: the kind (1 byte), the time since the previous record in microseconds (varint),
+  the length of the payload (varint) and the payload (UTF-8).
+"""
+
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+SESSION_LOG_MAGIC = b'IBSL'
+"""The magic bytes at the start of the session log."""
+
+SESSION_LOG_VERSION = 1
+"""The version of the session log format."""
+
+_HEADER_FORMAT = '<4sBd'
+"""The struct format of the header (magic, version, start time)."""
+
+
+@dataclass
+class RecordKind:
+    """
+    This class represents the kinds of the session log records.
+    """
+
+    FRAME_IN = 0
+    """A frame received from the server."""
+    FRAME_OUT = 1
+    """A frame sent to the server."""
+    CONNECT = 2
+    """A connection was established (payload is the server address)."""
+    CLOSE = 3
+    """A connection was closed (payload is the reason)."""
+    INPUT = 4
+    """The user input events of one game tick (payload is JSON)."""
+    META = 5
+    """The metadata of the session (payload is JSON)."""
+    CONNECT_FAILED = 6
+    """A connection attempt failed (payload is the server address)."""
+
+
+@dataclass
+class SessionRecord:
+    """
+    This class represents a record of the session log.
+    """
+
+    kind: int
+    """The kind of the record (RecordKind)."""
+    timestamp: float
+    """The time in seconds since the start of the recording."""
+    payload: str
+    """The payload of the record."""
+
+
+def _write_varint(f: BinaryIO, value: int):
+    """
+    Writes the unsigned integer in the variable-length (LEB128) encoding.
+
+    :param f: The output file.
+    :type f: BinaryIO
+    :param value: The value.
+    :type value: int
+    """
+
+    res = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            res.append(byte | 0x80)
+        else:
+            res.append(byte)
+            break
+    f.write(res)
+
+
+def _read_varint(f: BinaryIO) -> int:
+    """
+    Reads the unsigned integer in the variable-length (LEB128) encoding.
+
+    :param f: The input file.
+    :type f: BinaryIO
+    :return: The value or None at the end of the file.
+    :rtype: int
+    :raises ValueError: If the file ends in the middle of the value.
+    """
+
+    res = 0
+    shift = 0
+    while True:
+        data = f.read(1)
+        if not data:
+            if shift == 0:
+                return None
+            raise ValueError("Unexpected end of the session log")
+        res |= (data[0] & 0x7F) << shift
+        if not data[0] & 0x80:
+            return res
+        shift += 7
+
+
+class SessionRecorder:
+    """
+    This class records the session log. It is thread-safe (the network handler threads and the main thread record).
+    """
+
+
+    def __init__(self, path: str):
+        """
+        Creates the session log and writes its header.
+
+        :param path: The path to the session log.
+        :type path: str
+        """
+
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'wb')
+        self.__last = time.monotonic_ns()
+        self.__file.write(struct.pack(_HEADER_FORMAT, SESSION_LOG_MAGIC, SESSION_LOG_VERSION, time.time()))
+        logger.info(f"Recording the session to {path}")
+
+
+    @property
+    def is_recording(self) -> bool:
+        """
+        Checks if the recorder is open.
+
+        :return: True if the records are written, false otherwise.
+        :rtype: bool
+        """
+
+        return self.__file is not None
+
+
+    def record(self, kind: int, payload: str = ""):
+        """
+        Writes the record with the current timestamp.
+
+        :param kind: The kind of the record (RecordKind).
+        :type kind: int
+        :param payload: The payload of the record.
+        :type payload: str
+        """
+
+        data = payload.encode()
+        with self.__lock:
+            if self.__file is None:
+                return
+
+            now = time.monotonic_ns()
+            self.__file.write(bytes((kind,)))
+            _write_varint(self.__file, (now - self.__last) // 1000)
+            _write_varint(self.__file, len(data))
+            self.__file.write(data)
+            # keep the rounding error from accumulating
+            self.__last += (now - self.__last) // 1000 * 1000
+
+
+    def close(self):
+        """
+        Flushes and closes the session log.
+        """
+
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+                logger.info(f"Session recorded to {self.path}")
+
+
+def iter_session_log(path: str) -> Iterator[SessionRecord]:
+    """
+    Reads the records of the session log one by one.
+
+    :param path: The path to the session log.
+    :type path: str
+    :return: The records.
+    :rtype: Iterator[SessionRecord]
+    :raises ValueError: If the file is not a valid session log.
+    """
+
+    with open(path, 'rb') as f:
+        header = f.read(struct.calcsize(_HEADER_FORMAT))
+        if len(header) != struct.calcsize(_HEADER_FORMAT):
+            raise ValueError(f"Invalid session log {path}: missing header")
+        magic, version, _ = struct.unpack(_HEADER_FORMAT, header)
+        if magic != SESSION_LOG_MAGIC:
+            raise ValueError(f"Invalid session log {path}: wrong magic bytes")
+        if version != SESSION_LOG_VERSION:
+            raise ValueError(f"Unsupported session log version {version} of {path}")
+
+        timestamp_us = 0
+        while True:
+            kind = f.read(1)
+            if not kind:
+                break
+            delta = _read_varint(f)
+            length = _read_varint(f)
+            if delta is None or length is None:
+                raise ValueError(f"Invalid session log {path}: truncated record")
+            payload = f.read(length)
+            if len(payload) != length:
+                raise ValueError(f"Invalid session log {path}: truncated record")
+            timestamp_us += delta
+            yield SessionRecord(kind[0], timestamp_us / 1e6, payload.decode())
+
+
+def load_session_log(path: str) -> List[SessionRecord]:
+    """
+    Reads all records of the session log.
+
+    :param path: The path to the session log.
+    :type path: str
+    :return: The records.
+    :rtype: List[SessionRecord]
+    :raises ValueError: If the file is not a valid session log.
+    """
+
+    return list(iter_session_log(path))
@@ -0,0 +1,352 @@
+"""
+This module contains a vectorised Monte Carlo simulator of the game Inverse Battleships.
+A batch of games is stepped in lockstep as NumPy arrays of the shape (N, 9, 9) with the server-side
+cell values and the same rules as game.rules (and the server). Players are policies that choose
+an action for every running game of the batch from the player-relative boards, so the simulator
+needs neither sockets nor PyGame. It is used to evaluate the strategies of the bots offline.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from game import rules
+from game.bots import ProbabilityBot
+from util.stats import mean_confidence_interval, proportion_confidence_interval
+from const.server_communication import *
+
+
+Policy = Callable[[np.ndarray, np.ndarray, np.random.Generator], Tuple[np.ndarray, np.ndarray]]
+"""A policy: (player-relative boards (N, 9, 9), tried cells (N, 9, 9), random generator) -> (rows, columns)."""
+
+
+def random_policy(boards: np.ndarray, tried: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chooses a random free cell that was not tried yet on each board (as the RandomBot).
+
+    :param boards: The player-relative boards (N, 9, 9).
+    :type boards: np.ndarray
+    :param tried: The tried free cells (N, 9, 9).
+    :type tried: np.ndarray
+    :param rng: The random generator.
+    :type rng: np.random.Generator
+    :return: The chosen rows and columns (N,).
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+
+    free = boards == BOARD_FREE_CELL
+    candidates = free & ~tried
+    # all free cells were tried -> any free cell
+    candidates |= free & ~candidates.any(axis=(1, 2), keepdims=True)
+    return _choose_best(np.where(candidates, 1.0, 0.0), candidates, rng)
+
+
+def probability_policy(boards: np.ndarray, tried: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chooses the cell with the highest expected score on each board (as the ProbabilityBot).
+
+    :param boards: The player-relative boards (N, 9, 9).
+    :type boards: np.ndarray
+    :param tried: The tried free cells (N, 9, 9).
+    :type tried: np.ndarray
+    :param rng: The random generator.
+    :type rng: np.random.Generator
+    :return: The chosen rows and columns (N,).
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+
+    scores = ProbabilityBot.get_expected_scores(boards, tried)
+    free = boards == BOARD_FREE_CELL
+    # nothing is expected anywhere -> the untried free cells (or any free cell)
+    fallback = free & ~tried
+    fallback |= free & ~fallback.any(axis=(1, 2), keepdims=True)
+    has_score = (scores > 0).any(axis=(1, 2), keepdims=True)
+    return _choose_best(np.where(has_score, scores, fallback.astype(float)), np.where(has_score, scores > 0, fallback), rng)
+
+
+def _choose_best(values: np.ndarray, candidates: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chooses the candidate cell with the highest value on each board (ties are broken randomly).
+
+    :param values: The values of the cells (N, 9, 9).
+    :type values: np.ndarray
+    :param candidates: The cells that can be chosen (N, 9, 9).
+    :type candidates: np.ndarray
+    :param rng: The random generator.
+    :type rng: np.random.Generator
+    :return: The chosen rows and columns (N,).
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+
+    n = values.shape[0]
+    values = np.where(candidates, values, -np.inf).reshape(n, -1)
+    best = values == values.max(axis=1, keepdims=True)
+    # a random key per cell breaks the ties
+    index = np.where(best, rng.random(best.shape), -1).argmax(axis=1)
+    return index // BOARD_SIDE_SIZE, index % BOARD_SIDE_SIZE
+
+
+POLICIES: Dict[str, Policy] = {'random': random_policy, 'probability': probability_policy}
+"""The available policies by name (the vectorised counterparts of game.bots.BOTS)."""
+
+
+@dataclass
+class SimulationResult:
+    """
+    This class represents the results of a batch of simulated games.
+    """
+
+    player01_won: np.ndarray
+    """Whether the first player won each game (N,)."""
+    turns: np.ndarray
+    """The number of turns of each game (N,)."""
+    scores: np.ndarray
+    """The scores of both players on the final boards (2, N)."""
+    forfeited: np.ndarray
+    """Whether the game ended by an invalid action (the server kicks the player, the opponent wins) (N,)."""
+    finished: np.ndarray
+    """Whether the game finished within the turn limit (N,)."""
+
+
+    @staticmethod
+    def concatenate(results: List['SimulationResult']) -> 'SimulationResult':
+        """
+        Concatenates the results of several batches.
+
+        :param results: The results.
+        :type results: List[SimulationResult]
+        :return: The concatenated results.
+        :rtype: SimulationResult
+        """
+
+        return SimulationResult(np.concatenate([r.player01_won for r in results]),
+                                np.concatenate([r.turns for r in results]),
+                                np.concatenate([r.scores for r in results], axis=1),
+                                np.concatenate([r.forfeited for r in results]),
+                                np.concatenate([r.finished for r in results]))
+
+
+    def summary(self) -> Dict:
+        """
+        Returns the outcome statistics of the batch.
+
+        :return: The statistics (JSON serializable).
+        :rtype: Dict
+        """
+
+        finished = self.finished
+        return {'games': int(finished.size), 'finished': int(finished.sum()), 'forfeited': int(self.forfeited.sum()),
+                'player01_win_rate': proportion_confidence_interval(int(self.player01_won[finished].sum()), int(finished.sum())),
+                'turns': mean_confidence_interval(self.turns[finished].tolist()),
+                'player01_score': mean_confidence_interval(self.scores[0, finished].tolist()),
+                'player02_score': mean_confidence_interval(self.scores[1, finished].tolist())}
+
+
+class BatchSimulator:
+    """
+    This class represents a batch of games stepped in lockstep.
+    """
+
+    MAX_TURNS = 2 * BOARD_SIDE_SIZE * BOARD_SIDE_SIZE
+    """The default turn limit of a game."""
+
+
+    @staticmethod
+    def generate_boards(n: int, seed: int = None) -> np.ndarray:
+        """
+        Generates the server-side boards with the board generator of the server (game.rules).
+
+        :param n: The number of boards.
+        :type n: int
+        :param seed: The seed of the generator (None for random).
+        :type seed: int
+        :return: The boards (N, 9, 9).
+        :rtype: np.ndarray
+        """
+
+        rng = random.Random(seed)
+        return np.array([rules.generate_board(rng) for _ in range(n)], dtype=np.int8)
+
+
+    @staticmethod
+    def get_player_boards(boards: np.ndarray, is_player01: np.ndarray) -> np.ndarray:
+        """
+        Returns the boards as seen by the players (see rules.get_player_board).
+
+        :param boards: The server-side boards (N, 9, 9).
+        :type boards: np.ndarray
+        :param is_player01: Whether the player is the first player on each board (N,).
+        :type is_player01: np.ndarray
+        :return: The player-relative boards (N, 9, 9).
+        :rtype: np.ndarray
+        """
+
+        is_player01 = np.asarray(is_player01)[:, None, None]
+        own = np.where(is_player01, rules.CELL_PLAYER01, rules.CELL_PLAYER02)
+        own_lost = np.where(is_player01, rules.CELL_PLAYER01_LOST, rules.CELL_PLAYER02_LOST)
+        opponent_lost = np.where(is_player01, rules.CELL_PLAYER02_LOST, rules.CELL_PLAYER01_LOST)
+        res = np.full(boards.shape, BOARD_FREE_CELL, dtype=np.int8)
+        res[boards == own] = BOARD_PLAYER_CELL
+        res[boards == own_lost] = BOARD_PLAYER_SHIP_LOST_CELL
+        res[boards == opponent_lost] = BOARD_OPPONENT_SHIP_LOST_CELL
+        return res
+
+
+    @staticmethod
+    def get_scores(player_boards: np.ndarray) -> np.ndarray:
+        """
+        Returns the scores of the players on the player-relative boards (see rules.get_score).
+
+        :param player_boards: The player-relative boards (N, 9, 9).
+        :type player_boards: np.ndarray
+        :return: The scores (N,).
+        :rtype: np.ndarray
+        """
+
+        cells = (-2, -1)
+        return np.count_nonzero(player_boards == BOARD_PLAYER_CELL, axis=cells) * SCORE_SHIP_GAINED + \
+               np.count_nonzero(player_boards == BOARD_PLAYER_SHIP_LOST_CELL, axis=cells) * SCORE_LOST_SHIP + \
+               np.count_nonzero(player_boards == BOARD_OPPONENT_SHIP_LOST_CELL, axis=cells) * SCORE_HIT
+
+
+    def __init__(self, boards: np.ndarray, seed: int = None):
+        """
+        Initializes the batch (the first player is on turn first in all games, as on the server).
+
+        :param boards: The server-side boards (N, 9, 9), modified in place.
+        :type boards: np.ndarray
+        :param seed: The seed of the random generator passed to the policies.
+        :type seed: int
+        """
+
+        n = boards.shape[0]
+        self.boards = boards
+        """The server-side boards (N, 9, 9)."""
+        self.rng = np.random.default_rng(seed)
+        self.player01_on_turn = np.ones(n, dtype=bool)
+        """Whether the first player is on turn in each game (N,)."""
+        self.running = np.ones(n, dtype=bool)
+        """Whether each game is still running (N,)."""
+        self.player01_won = np.zeros(n, dtype=bool)
+        """Whether the first player won each finished game (N,)."""
+        self.forfeited = np.zeros(n, dtype=bool)
+        """Whether each game ended by an invalid action (N,)."""
+        self.turns = np.zeros(n, dtype=np.int32)
+        """The number of played turns of each game (N,)."""
+        self.tried = np.zeros((2, n, BOARD_SIDE_SIZE, BOARD_SIDE_SIZE), dtype=bool)
+        """The free cells tried by each player (2, N, 9, 9), a tried cell that stayed free is empty."""
+
+
+    def step(self, rows: np.ndarray, cols: np.ndarray):
+        """
+        Applies the actions of the players on turn in the running games (see rules.apply_move)
+        and resolves the finished games.
+
+        :param rows: The rows of the actions of the running games (the number of running games,).
+        :type rows: np.ndarray
+        :param cols: The columns of the actions of the running games.
+        :type cols: np.ndarray
+        """
+
+        games = np.flatnonzero(self.running)
+        boards = self.boards[games]
+        is_player01 = self.player01_on_turn[games][:, None, None]
+        index = np.arange(games.size)
+
+        target = np.zeros(boards.shape, dtype=bool)
+        target[index, rows, cols] = True
+        occupied = (boards == rules.CELL_BOAT) | (boards == rules.CELL_PLAYER01) | (boards == rules.CELL_PLAYER02)
+        neighbours = np.zeros_like(target)
+        neighbours[:, 1:, :] |= target[:, :-1, :]
+        neighbours[:, :-1, :] |= target[:, 1:, :]
+        neighbours[:, :, 1:] |= target[:, :, :-1]
+        neighbours[:, :, :-1] |= target[:, :, 1:]
+        hit = occupied[index, rows, cols][:, None, None]
+        affected = (target | (neighbours & occupied)) & hit
+
+        own = np.where(is_player01, rules.CELL_PLAYER01, rules.CELL_PLAYER02)
+        opponent = np.where(is_player01, rules.CELL_PLAYER02, rules.CELL_PLAYER01)
+        opponent_lost = np.where(is_player01, rules.CELL_PLAYER02_LOST, rules.CELL_PLAYER01_LOST)
+        # an action affecting own ship is invalid (the server kicks the player)
+        invalid = (affected & (boards == own)).any(axis=(1, 2))
+        boards = np.where(affected & (boards == rules.CELL_BOAT), own, boards)
+        boards = np.where(affected & (boards == opponent), opponent_lost, boards)
+        self.boards[games] = boards
+
+        player = np.where(self.player01_on_turn[games], 0, 1)
+        self.tried[player, games, rows, cols] = boards[index, rows, cols] == rules.CELL_FREE
+        self.turns[games] += 1
+
+        cells = (1, 2)
+        player01_ships = np.count_nonzero(boards == rules.CELL_PLAYER01, axis=cells)
+        player02_ships = np.count_nonzero(boards == rules.CELL_PLAYER02, axis=cells)
+        finished = invalid | (player01_ships == 0) | (player02_ships == 0)
+        # the order of the checks as in rules.get_game_result, the opponent of a kicked player wins
+        self.player01_won[games] = np.where(invalid, ~self.player01_on_turn[games], player01_ships != 0)
+        self.forfeited[games] = invalid
+        self.running[games[finished]] = False
+        self.player01_on_turn[games] = ~self.player01_on_turn[games]
+
+
+    def play(self, player01: Policy, player02: Policy, max_turns: int = MAX_TURNS) -> SimulationResult:
+        """
+        Plays all games of the batch until they finish or reach the turn limit.
+
+        :param player01: The policy of the first player.
+        :type player01: Policy
+        :param player02: The policy of the second player.
+        :type player02: Policy
+        :param max_turns: The turn limit of a game.
+        :type max_turns: int
+        :return: The results.
+        :rtype: SimulationResult
+        """
+
+        for _ in range(max_turns):
+            games = np.flatnonzero(self.running)
+            if not games.size:
+                break
+
+            rows = np.empty(games.size, dtype=np.intp)
+            cols = np.empty(games.size, dtype=np.intp)
+            on_turn = self.player01_on_turn[games]
+            for player, policy, mask in ((0, player01, on_turn), (1, player02, ~on_turn)):
+                selected = games[mask]
+                if not selected.size:
+                    continue
+                views = BatchSimulator.get_player_boards(self.boards[selected], np.full(selected.size, player == 0))
+                rows[mask], cols[mask] = policy(views, self.tried[player, selected], self.rng)
+
+            self.step(rows, cols)
+
+        scores = np.stack([BatchSimulator.get_scores(BatchSimulator.get_player_boards(self.boards, np.full(len(self.boards), is_player01)))
+                           for is_player01 in (True, False)])
+        return SimulationResult(self.player01_won.copy(), self.turns.copy(), scores, self.forfeited.copy(), ~self.running)
+
+
+def simulate(n: int, player01: str = 'random', player02: str = 'random', seed: int = None,
+             batch_size: int = 4096) -> SimulationResult:
+    """
+    Simulates the games of the two policies in batches.
+
+    :param n: The number of games.
+    :type n: int
+    :param player01: The name of the policy of the first player (see POLICIES).
+    :type player01: str
+    :param player02: The name of the policy of the second player (see POLICIES).
+    :type player02: str
+    :param seed: The seed of the boards and of the policies (None for random).
+    :type seed: int
+    :param batch_size: The maximal number of games stepped in lockstep.
+    :type batch_size: int
+    :return: The results of all games.
+    :rtype: SimulationResult
+    """
+
+    rng = random.Random(seed)
+    res = []
+    for start in range(0, n, batch_size):
+        boards = BatchSimulator.generate_boards(min(batch_size, n - start), rng.getrandbits(64))
+        res.append(BatchSimulator(boards, rng.getrandbits(64)).play(POLICIES[player01], POLICIES[player02]))
+
+    return SimulationResult.concatenate(res)
@@ -0,0 +1,236 @@
+"""
+This module contains the table-driven state machine of the game Inverse Battleships (see game.ib_game.IBGame).
+Each state has its update, enter and exit callbacks in a table, so a game tick is one dictionary lookup,
+the state changes are checked against the table of the allowed transitions, and the time of each
+transition (from the exit of the previous state to the end of the first update of the new one) is measured.
+The viewports of the likely next states can be pre-built on the ticks without a transition (see
+graphics.viewport_pool.ViewportPool), so the screen changes do not stall the tick that triggers them.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+from const.loggers import MAIN_LOGGER_NAME, STATE_SUBSYSTEM
+from util.loggers import get_logger, get_subsystem_logger
+from util.metrics import REGISTRY
+from util.tracing import TRACER
+from util import flight_recorder
+from util.flight_recorder import FLIGHT_RECORDER
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+state_logger = get_subsystem_logger(STATE_SUBSYSTEM, MAIN_LOGGER_NAME)
+
+
+@dataclass
+class StateHandlers:
+    """
+    This class represents the callbacks of a state.
+    """
+
+    update: Callable[[Any], None]
+    """Handles a game tick in the state (called with the events of the tick)."""
+    enter: Callable[[], None] = None
+    """Called when the state is entered (before its first update)."""
+    exit: Callable[[], None] = None
+    """Called when the state is left (before the enter callback of the next state)."""
+    transitions: FrozenSet[int] = field(default_factory=frozenset)
+    """The states that can follow the state."""
+
+
+@dataclass
+class TransitionStats:
+    """
+    This class represents the measured times of a transition.
+    """
+
+    count: int = 0
+    """The number of the transitions."""
+    total: float = 0
+    """The total time of the transitions in seconds."""
+    max: float = 0
+    """The longest transition in seconds."""
+
+
+    def add(self, duration: float):
+        """
+        Adds the time of a transition.
+
+        :param duration: The time of the transition in seconds.
+        :type duration: float
+        """
+
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+
+    @property
+    def mean(self) -> float:
+        """
+        Getter for the mean time of the transitions in seconds.
+
+        :return: The mean time (0 if no transition was measured).
+        :rtype: float
+        """
+
+        return self.total / self.count if self.count else 0
+
+
+class StateMachine:
+    """
+    This class dispatches the game ticks to the callbacks of the current state (see StateHandlers).
+    The state itself is owned by the caller (it can be changed by any callback or thread),
+    the machine detects its changes at the start of the next tick.
+    """
+
+    def __init__(self, handlers: Dict[int, StateHandlers], state_names: Dict[int, str] = None):
+        """
+        Creates the state machine.
+
+        :param handlers: The callbacks of the states.
+        :type handlers: Dict[int, StateHandlers]
+        :param state_names: The names of the states (for logging).
+        :type state_names: Dict[int, str]
+        """
+
+        self.__handlers = handlers
+        self.__state_names = state_names if state_names else {}
+        self.__state = None
+        self.__transition: Tuple[int, int] = None
+        self.__transition_start = None
+        self.transition_stats: Dict[Tuple[int, int], TransitionStats] = {}
+        """The measured times of the transitions (previous state, next state)."""
+        self.__prebuilds: OrderedDict = OrderedDict()
+
+
+    @property
+    def state(self) -> int:
+        """
+        Getter for the state of the last tick.
+
+        :return: The state (None before the first tick).
+        :rtype: int
+        """
+
+        return self.__state
+
+
+    def get_state_name(self, state: int) -> str:
+        """
+        Returns the name of the state.
+
+        :param state: The state.
+        :type state: int
+        :return: The name of the state.
+        :rtype: str
+        """
+
+        return self.__state_names.get(state, str(state))
+
+
+    def update(self, state: int, events: Any):
+        """
+        Handles a game tick: enters the state if it changed since the last tick and calls its update callback.
+        On the ticks without a transition, one of the scheduled viewports is pre-built.
+
+        :param state: The current state.
+        :type state: int
+        :param events: The events of the tick.
+        :type events: Any
+        :raises SystemError: If the state is not in the table.
+        """
+
+        handlers = self.__handlers.get(state, None)
+        if handlers is None:
+            logger.critical('Unknown state.')
+            raise SystemError('Unknown state.')
+
+        entered = state != self.__state
+        if entered:
+            self.__enter(state, handlers)
+
+        handlers.update(events)
+
+        if entered:
+            duration = time.perf_counter() - self.__transition_start
+            self.transition_stats.setdefault(self.__transition, TransitionStats()).add(duration)
+            previous, _ = self.__transition
+            REGISTRY.histogram('state_transition_seconds', 'Time from leaving a state to the end of the first update of the next one',
+                               from_state=self.get_state_name(previous), to_state=self.get_state_name(state)).record(duration)
+            FLIGHT_RECORDER.add(flight_recorder.TIMING, 'state_transition_seconds', duration)
+            state_logger.debug("Transition %s -> %s took %.2f ms", self.get_state_name(previous), self.get_state_name(state), duration * 1000)
+        elif self.__prebuilds:
+            self.__prebuild_next()
+
+
+    def __enter(self, state: int, handlers: StateHandlers):
+        """
+        Calls the exit callback of the previous state and the enter callback of the state.
+
+        :param state: The entered state.
+        :type state: int
+        :param handlers: The callbacks of the entered state.
+        :type handlers: StateHandlers
+        """
+
+        self.__transition_start = time.perf_counter()
+        previous = self.__state
+        self.__transition = (previous, state)
+        TRACER.instant('transition', 'state', from_state=self.get_state_name(previous), to_state=self.get_state_name(state))
+        FLIGHT_RECORDER.add(flight_recorder.TRANSITION, f"{self.get_state_name(previous)} -> {self.get_state_name(state)}")
+        if previous is not None:
+            previous_handlers = self.__handlers[previous]
+            if state not in previous_handlers.transitions:
+                logger.warning(f"Unexpected transition {self.get_state_name(previous)} -> {self.get_state_name(state)}")
+            if previous_handlers.exit:
+                with TRACER.span('exit', 'state', state=self.get_state_name(previous)):
+                    previous_handlers.exit()
+
+        self.__state = state
+        # the pre-building scheduled by the previous state is no longer needed
+        self.__prebuilds.clear()
+        if handlers.enter:
+            with TRACER.span('enter', 'state', state=self.get_state_name(state)):
+                handlers.enter()
+
+
+    def schedule_prebuild(self, key: Any, prebuild: Callable[[], None]):
+        """
+        Schedules the pre-building of a viewport of a next state. It runs on one of the next ticks
+        without a transition (one per tick) and it is cancelled by the next transition.
+
+        :param key: The key of the viewport (scheduled only once).
+        :type key: Any
+        :param prebuild: Pre-builds the viewport.
+        :type prebuild: Callable[[], None]
+        """
+
+        self.__prebuilds[key] = prebuild
+
+
+    def __prebuild_next(self):
+        """
+        Runs the oldest scheduled pre-building.
+        """
+
+        key, prebuild = self.__prebuilds.popitem(last=False)
+        try:
+            with TRACER.span('prebuild', 'state', key=key):
+                prebuild()
+        except Exception as e:
+            logger.warning(f"Failed to pre-build the viewport {key}: {e}")
+
+
+    def get_transition_report(self) -> List[Dict[str, Any]]:
+        """
+        Returns the measured times of the transitions.
+
+        :return: The transitions (names of the states, count and times in milliseconds).
+        :rtype: List[Dict[str, Any]]
+        """
+
+        return [{'from': self.get_state_name(previous), 'to': self.get_state_name(state), 'count': stats.count,
+                 'mean_ms': stats.mean * 1000, 'max_ms': stats.max * 1000}
+                for (previous, state), stats in self.transition_stats.items()]
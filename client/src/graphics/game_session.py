@@ -1,10 +1,15 @@
 import threading
+import time
+from collections import deque
 from typing import Any, Dict, List, Tuple
+import numpy as np
 import pygame
 from const.typedefs import IBAssets
 from const.server_communication import BOARD_FREE_CELL, BOARD_PLAYER_CELL, BOARD_PLAYER_SHIP_LOST_CELL, BOARD_OPPONENT_SHIP_LOST_CELL
-from const.server_communication import SCORE_SHIP_GAINED, SCORE_HIT, SCORE_LOST_SHIP
+from const.server_communication import BOARD_SIDE_SIZE
 from graphics.viewport import Viewport
+from game.bitboard import Bitboard
+from game.hints import HintEstimator
 from util.graphics import get_rendered_text_with_size
 
 
@@ -38,46 +43,22 @@ class GameSession(Viewport):
     """The symbols for the rows of the board."""
     SYMBOLS_COLUMN = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I']
     """The symbols for the columns of the board."""
-
-
-    @staticmethod
-    def __get_board_stats(board: List[List[int]]) -> Tuple[int, int, int, int]:
-        """
-        Gets the statistics of the board.
-
-        :param board: The board.
-        :type board: List[List[int]]
-        :return: The statistics of the board.
-        The statistics are as follows:
-        - The number of free cells.
-        - The number of player cells.
-        - The number of player lost cells.
-        - The number of opponent lost cells.
-        :rtype: Tuple[int, int, int, int]
-        """
-
-        stats_free = 0
-        stats_player = 0
-        stats_player_lost = 0
-        stats_opponent_lost = 0
-
-        for row in board:
-            for cell in row:
-                if cell == GameSession.BOARD_FREE:
-                    stats_free += 1
-                elif cell == GameSession.BOARD_PLAYER:
-                    stats_player += 1
-                elif cell == GameSession.BOARD_LOST:
-                    stats_player_lost += 1
-                elif cell == GameSession.BOARD_OPPONENT_LOST:
-                    stats_opponent_lost += 1
-
-        return stats_free, stats_player, stats_player_lost, stats_opponent_lost
+    HINTS_KEY = 'h'
+    """The key toggling the hint overlay."""
+    HINT_COLOR = 'dodgerblue'
+    """The color of the best cell of the hint overlay."""
+    HINT_LEVELS = 16
+    """The number of shades of the hint overlay (a cell is redrawn only when its shade changes)."""
+    PREDICTION_COLOR = 'gold'
+    """The color of the submitted cell until the server confirms the action."""
+    PREDICTION_LATENCY_SAMPLES = 100
+    """The number of the kept prediction-to-confirmation latencies."""
 
 
     def __init__(self, 
                  surface: pygame.Surface, 
-                 assets: IBAssets):
+                 assets: IBAssets,
+                 hint_estimator: HintEstimator = None):
 
         if not pygame.get_init():
             raise ValueError('The pygame module has not been initialized.')
@@ -108,6 +89,20 @@ class GameSession(Viewport):
         self.__already_submitted = False
         self.__previously_submitted_cells = set()
 
+        self.__hint_estimator = hint_estimator
+        self.__hints_enabled = False
+        self.__hints_key = None
+        self.__hint_levels = None
+        self.__full_redraw = True
+        self.__dirty_cells = set()
+        self.__dirty_panels = False
+        self.__cell_rects = None
+
+        self.__predicted_cell = None
+        self.__turn_predicted = False
+        self.__prediction_time = None
+        self.__prediction_latencies = deque(maxlen=GameSession.PREDICTION_LATENCY_SAMPLES)
+
     
     @property
     def surface(self):
@@ -145,6 +140,19 @@ class GameSession(Viewport):
         return self.__last_score
 
 
+    @property
+    def prediction_latencies(self) -> List[float]:
+        """
+        Getter for the latest prediction-to-confirmation latencies (from the submission
+        of the action to the board from the server) in seconds.
+
+        :return: The latencies (oldest first).
+        :rtype: List[float]
+        """
+
+        return list(self.__prediction_latencies)
+
+
     def __get_score(self) -> int:
         """
         Gets the score of the game session.
@@ -153,19 +161,10 @@ class GameSession(Viewport):
         :rtype: int
         """
 
-        score = 0
         if not self.__board:
-            return score
-        for row in self.__board:
-            for cell in row:
-                if cell == GameSession.BOARD_PLAYER:
-                    score += SCORE_SHIP_GAINED
-                elif cell == GameSession.BOARD_LOST:
-                    score += SCORE_LOST_SHIP
-                elif cell == GameSession.BOARD_OPPONENT_LOST:
-                    score += SCORE_HIT
+            return 0
 
-        return score
+        return self.__board.score
 
 
     def __get_panel(self, width: int, height: int) -> pygame.Surface:
@@ -188,6 +187,18 @@ class GameSession(Viewport):
         return panel
 
 
+    def __get_shown_player_on_turn(self) -> str:
+        """
+        Gets the player on turn as shown by the panels (the opponent after an action
+        of the player, before the server confirms it).
+
+        :return: The nickname of the shown player on turn.
+        :rtype: str
+        """
+
+        return self.__opponent_name if self.__turn_predicted else self.__player_on_turn
+
+
     def __get_player_turn_panel(self, info_panel_width, info_panel_height, text_border_max_width, text_border_max_height) -> pygame.Surface:
         """
         Gets the player turn panel for the game session.
@@ -203,9 +214,10 @@ class GameSession(Viewport):
         player_turn_panel = self.__get_panel(info_panel_width, info_panel_height)
 
         player_turn_panel_text = GameSession.TEXT_UNSET
-        if self.__player_on_turn == self.__player_name:
+        player_on_turn = self.__get_shown_player_on_turn()
+        if player_on_turn == self.__player_name:
             player_turn_panel_text = self.__assets['strings']['player_turn_panel_player']
-        elif self.__player_on_turn == self.__opponent_name:
+        elif player_on_turn == self.__opponent_name:
             player_turn_panel_text = self.__assets['strings']['player_turn_panel_opponent'] + f"\"{self.__opponent_name}\""
 
         player_turn_panel_text_surface = get_rendered_text_with_size(player_turn_panel_text, 
@@ -237,9 +249,10 @@ class GameSession(Viewport):
         status_panel = self.__get_panel(info_panel_width, info_panel_height)
 
         status_panel_text = GameSession.TEXT_UNSET
-        if self.__player_on_turn == self.__player_name:
+        player_on_turn = self.__get_shown_player_on_turn()
+        if player_on_turn == self.__player_name:
             status_panel_text = self.__assets['strings']['status_panel_take_turn_msg']
-        elif self.__player_on_turn == self.__opponent_name:
+        elif player_on_turn == self.__opponent_name:
             status_panel_text = self.__assets['strings']['status_panel_waiting_for_opponent_turn_msg']
 
         status_panel_text_surface = get_rendered_text_with_size(status_panel_text, 
@@ -356,6 +369,7 @@ class GameSession(Viewport):
         """
 
         self.__hit_check_cells = []
+        self.__cell_rects = []
         left_panel_width = surface_width * GameSession.RATIO_INFO_PANEL_TO_SCREEN_WIDTH
         board_width = surface_width * GameSession.RATIO_BOARD_TO_SCREEN_WIDTH
         board_height = surface_height
@@ -368,14 +382,15 @@ class GameSession(Viewport):
         if not self.__board:
             raise ValueError('The board data is not set.')
 
-        row_cells_count = len(self.__board) + 1
-        columns_cells_count = len(self.__board[0]) + 1
+        row_cells_count = BOARD_SIDE_SIZE + 1
+        columns_cells_count = BOARD_SIDE_SIZE + 1
 
         cell_width = board_width / columns_cells_count
         cell_height = board_height / row_cells_count
 
         for row in range(row_cells_count):
             hit_check_row = []
+            cell_rects_row = []
             for col in range(columns_cells_count):
                 # skip the first cell
                 if col == 0 and row == 0:
@@ -405,35 +420,133 @@ class GameSession(Viewport):
 
                 # draw the cells
                 else:
-                    cell = self.__board[row - 1][col - 1]
                     cell_rect = pygame.Rect((col * cell_width, row * cell_height), (cell_width, cell_height))
                     cell_inner_rect = pygame.Rect(cell_rect.left + (cell_width * GameSession.RATIO_OUTLINE_TO_CELL) / 2, 
                                                   cell_rect.top + (cell_height * GameSession.RATIO_OUTLINE_TO_CELL) / 2, 
                                                   cell_rect.width - (cell_width * GameSession.RATIO_OUTLINE_TO_CELL),
                                                   cell_rect.height - (cell_height * GameSession.RATIO_OUTLINE_TO_CELL))
-                    color = self.__assets['colors']['silver']
-                    if cell == GameSession.BOARD_PLAYER:
-                        color = self.__assets['colors']['green']
-                    elif cell == GameSession.BOARD_LOST:
-                        color = self.__assets['colors']['red']
-                    elif cell == GameSession.BOARD_OPPONENT_LOST:
-                        color = self.__assets['colors']['orange']
-                    elif self.__highlighted_cell and self.__highlighted_cell == (row - 1, col - 1):
-                        color = self.__assets['colors']['white']
-                    elif (row - 1, col - 1) in self.__previously_submitted_cells:
-                        color = self.__assets['colors']['gray']
+                    color = self.__get_cell_color(row - 1, col - 1)
 
                     pygame.draw.rect(board_surface, self.__assets['colors']['black'], cell_rect)
                     pygame.draw.rect(board_surface, color, cell_inner_rect)
                     hit_check_rect = pygame.Rect((left_panel_width + cell_rect.left, cell_rect.top), cell_rect.size)
                     hit_check_row.append(hit_check_rect)
+                    cell_rects_row.append((hit_check_rect, cell_inner_rect.move(left_panel_width, 0)))
             
             if row != 0:
                 self.__hit_check_cells.append(hit_check_row)
+                self.__cell_rects.append(cell_rects_row)
         
         return board_surface
 
 
+    def __get_cell_color(self, row: int, col: int) -> Tuple[int, int, int]:
+        """
+        Gets the color of the cell of the board (free cells are shaded by the hint overlay if enabled).
+
+        :param row: The row of the cell.
+        :type row: int
+        :param col: The column of the cell.
+        :type col: int
+        :return: The color of the cell.
+        :rtype: Tuple[int, int, int]
+        """
+
+        cell = self.__board.get(row, col)
+        if cell == GameSession.BOARD_PLAYER:
+            return self.__assets['colors']['green']
+        elif cell == GameSession.BOARD_LOST:
+            return self.__assets['colors']['red']
+        elif cell == GameSession.BOARD_OPPONENT_LOST:
+            return self.__assets['colors']['orange']
+        elif self.__highlighted_cell and self.__highlighted_cell == (row, col):
+            return self.__assets['colors']['white']
+        elif self.__predicted_cell == (row, col):
+            return self.__assets['colors'][GameSession.PREDICTION_COLOR]
+        elif (row, col) in self.__previously_submitted_cells:
+            return self.__assets['colors']['gray']
+
+        color = self.__assets['colors']['silver']
+        if self.__hints_enabled and self.__hint_levels is not None:
+            # blend the free cell towards the hint color by its estimated value
+            ratio = self.__hint_levels[row][col] / (GameSession.HINT_LEVELS - 1)
+            hint_color = self.__assets['colors'][GameSession.HINT_COLOR]
+            color = tuple(int(c + (h - c) * ratio) for c, h in zip(color, hint_color))
+
+        return color
+
+
+    def __draw_cells(self) -> List[pygame.Rect]:
+        """
+        Redraws only the changed cells (see __dirty_cells).
+
+        :return: The rectangles of the redrawn cells.
+        :rtype: List[pygame.Rect]
+        """
+
+        update_areas = []
+        for row, col in self.__dirty_cells:
+            cell_rect, cell_inner_rect = self.__cell_rects[row][col]
+            pygame.draw.rect(self.__surface, self.__assets['colors']['black'], cell_rect)
+            pygame.draw.rect(self.__surface, self.__get_cell_color(row, col), cell_inner_rect)
+            update_areas.append(cell_rect)
+
+        self.__dirty_cells.clear()
+        return update_areas
+
+
+    def __set_hints(self, values: np.ndarray, result: Dict[str, Any]):
+        """
+        Sets the estimated values of the cells and marks the cells whose shade changed.
+
+        :param values: The values of the cells in range <0, 1> (None to clear the overlay).
+        :type values: np.ndarray
+        :param result: The result of the update.
+        :type result: Dict[str, Any]
+        """
+
+        levels = None
+        if values is not None:
+            levels = (values * (GameSession.HINT_LEVELS - 1)).round().astype(int).tolist()
+
+        previous = self.__hint_levels
+        self.__hint_levels = levels
+        for row in range(BOARD_SIDE_SIZE):
+            for col in range(BOARD_SIDE_SIZE):
+                old = previous[row][col] if previous else 0
+                new = levels[row][col] if levels else 0
+                if old != new:
+                    self.__dirty_cells.add((row, col))
+
+        if self.__dirty_cells:
+            result['graphics_update'] = True
+
+
+    def __update_hints(self, result: Dict[str, Any]):
+        """
+        Requests the hints of the current board from the estimator (never waits for them)
+        and applies them once they are available.
+
+        :param result: The result of the update.
+        :type result: Dict[str, Any]
+        """
+
+        if not self.__board:
+            return
+
+        tried = [cell for cell in self.__previously_submitted_cells if self.__board.is_free(*cell)]
+        key = HintEstimator.get_key(self.__board, tried)
+        if key != self.__hints_key:
+            self.__hints_key = key
+            values = self.__hint_estimator.request(self.__board, tried)
+            # the previous hints are not valid for the new board
+            self.__set_hints(values, result)
+        elif self.__hint_levels is None:
+            values = self.__hint_estimator.get(self.__board, tried)
+            if values is not None:
+                self.__set_hints(values, result)
+
+
     def __draw_objects(self) -> List[pygame.Rect]:
         """
         Draws the objects in the game session.
@@ -445,6 +558,27 @@ class GameSession(Viewport):
         if not self.__player_name or not self.__opponent_name or not self.__player_on_turn or not self.__board:
             raise ValueError(f"The player name ({self.__player_name}), opponent name ({self.__opponent_name}), player on turn ({self.__player_on_turn}), or board ({self.__board}) is not set.")
 
+        update_areas = self.__draw_panels()
+
+        # draw the board
+        surface_width, surface_height = self.__surface.get_size()
+        board_surface = self.__get_board(surface_width, surface_height)
+        board_surface_x_y = surface_width * self.RATIO_INFO_PANEL_TO_SCREEN_WIDTH, 0
+        self.__surface.blit(board_surface, board_surface_x_y)
+        board_surface_rect = pygame.Rect(board_surface_x_y, board_surface.get_size())
+        update_areas.append(board_surface_rect)
+
+        return update_areas
+
+
+    def __draw_panels(self) -> List[pygame.Rect]:
+        """
+        Draws the info panels of the game session.
+
+        :return: The rectangles of the panels.
+        :rtype: List[pygame.Rect]
+        """
+
         update_areas = []
         surface_width, surface_height = self.__surface.get_size()
         info_panel_width = surface_width * self.RATIO_INFO_PANEL_TO_SCREEN_WIDTH
@@ -474,13 +608,6 @@ class GameSession(Viewport):
         score_panel_rect = pygame.Rect(score_panel_x_y, (info_panel_width, info_panel_height))
         update_areas.extend([player_turn_panel_rect, status_panel_rect, last_action_panel_rect, score_panel_rect])
 
-        # draw the board
-        board_surface = self.__get_board(surface_width, surface_height)
-        board_surface_x_y = info_panel_width, 0
-        self.__surface.blit(board_surface, board_surface_x_y)
-        board_surface_rect = pygame.Rect(board_surface_x_y, board_surface.get_size())
-        update_areas.append(board_surface_rect)
-
         return update_areas
 
 
@@ -500,7 +627,21 @@ class GameSession(Viewport):
             'board': self.__board,
             'last_action': self.__last_action
         }
-        return self.__draw_objects()
+        if self.__full_redraw or not self.__cell_rects:
+            self.__full_redraw = False
+            self.__dirty_panels = False
+            self.__dirty_cells.clear()
+            return self.__draw_objects()
+
+        # only the changed cells and panels are redrawn
+        update_areas = []
+        if self.__dirty_panels:
+            self.__dirty_panels = False
+            update_areas.extend(self.__draw_panels())
+        if self.__dirty_cells:
+            update_areas.extend(self.__draw_cells())
+
+        return update_areas
         
 
     def redraw(self):
@@ -515,9 +656,52 @@ class GameSession(Viewport):
         pygame.draw.rect(self.__surface, self.__background_color, self.__background)
 
         # draw the objects
+        self.__full_redraw = False
+        self.__dirty_panels = False
+        self.__dirty_cells.clear()
         self.__draw_objects()
 
 
+    def __predict_action(self, cell: Tuple[int, int]):
+        """
+        Shows the provisional state after the action of the player (the cell is pending
+        and the opponent is on turn) until the server confirms it (see __reconcile_board).
+
+        :param cell: The selected cell.
+        :type cell: Tuple[int, int]
+        """
+
+        self.__predicted_cell = cell
+        self.__prediction_time = time.perf_counter()
+        self.__turn_predicted = True
+        self.__dirty_cells.add(cell)
+        self.__dirty_panels = True
+
+
+    def __reconcile_board(self, result: Dict[str, Any]):
+        """
+        Reconciles the new board from the server with the shown state: only the changed cells
+        (and the predicted cell) are redrawn and the latency of the prediction is recorded.
+
+        :param result: The result of the update.
+        :type result: Dict[str, Any]
+        """
+
+        if self.__predicted_cell:
+            latency = time.perf_counter() - self.__prediction_time
+            self.__prediction_latencies.append(latency)
+            result['prediction_latency'] = latency
+            self.__dirty_cells.add(self.__predicted_cell)
+            self.__predicted_cell = None
+            self.__prediction_time = None
+
+        if self.__last_board:
+            self.__dirty_cells.update(Bitboard.iter_cells(self.__board.diff(self.__last_board)))
+        else:
+            self.__full_redraw = True
+        self.__dirty_panels = True
+
+
     def update(self, events: Dict[str, Any]) -> Dict[str, Any]:
         """
         Updates the game session.
@@ -533,16 +717,19 @@ class GameSession(Viewport):
                   'selected_cell': None}
         
         if events.get('board', None):
-            self.__board = events['board']
+            # the boards are kept as bitboards (see game.bitboard)
+            board = events['board']
+            self.__board = board if isinstance(board, Bitboard) else Bitboard.from_list(board)
+            self.__reconcile_board(result)
             if self.__last_board:
-                if str(self.__board) == str(self.__last_board):
+                if self.__board == self.__last_board:
                     if self.__prev_player_on_turn and self.__prev_player_on_turn != self.__player_name:
                         self.__last_action = self.__assets['strings']['last_action_panel_miss']
                     else:
                         self.__last_action = ""
                 else:
-                    _, stats_player, stats_player_lost, stats_opponent_lost = GameSession.__get_board_stats(self.__last_board)
-                    _, new_stats_player, new_stats_player_lost, new_stats_opponent_lost = GameSession.__get_board_stats(self.__board)
+                    _, stats_player, stats_player_lost, stats_opponent_lost = self.__last_board.stats
+                    _, new_stats_player, new_stats_player_lost, new_stats_opponent_lost = self.__board.stats
                     if new_stats_player > stats_player:
                         self.__last_action = self.__assets['strings']['last_action_panel_gain']
                     elif new_stats_opponent_lost > stats_opponent_lost:
@@ -558,17 +745,23 @@ class GameSession(Viewport):
             self.__player_on_turn = events['player_on_turn']
             if self.__player_on_turn == self.__player_name:
                 self.__already_submitted = False
+            # the authoritative turn replaces the predicted one
+            self.__turn_predicted = False
+            self.__dirty_panels = True
             result['graphics_update'] = True
         if events.get('player_name', None):
             self.__player_name = events['player_name']
+            self.__full_redraw = True
             result['graphics_update'] = True
         if events.get('opponent_name', None):
             self.__opponent_name = events['opponent_name']
+            self.__full_redraw = True
             result['graphics_update'] = True
 
         
         if events.get('escape', False):
             result['escape'] = True
+            self.__full_redraw = True
             result['graphics_update'] = True
         elif events.get('mouse_click', None) and not self.__already_submitted:
             # based on last highlighted cell (should work with usual mouse movement)
@@ -577,19 +770,32 @@ class GameSession(Viewport):
                 self.__highlighted_cell = None
                 self.__already_submitted = True
                 self.__previously_submitted_cells.add(result['selected_cell'])
+                self.__predict_action(result['selected_cell'])
                 result['graphics_update'] = True
         elif events.get('mouse_motion', None) and not self.__already_submitted:
             if self.__highlighted_cell:
+                self.__dirty_cells.add(self.__highlighted_cell)
                 self.__highlighted_cell = None
                 result['graphics_update'] = True
             if self.__player_on_turn == self.__player_name:
                 for row in range(len(self.__hit_check_cells)):
                     for col in range(len(self.__hit_check_cells[row])):
-                        if self.__board[row][col] != BOARD_FREE_CELL:
+                        if not self.__board.is_free(row, col):
                             continue
                         if self.__hit_check_cells[row][col].collidepoint(events['mouse_motion']):
                             self.__highlighted_cell = (row, col)
+                            self.__dirty_cells.add(self.__highlighted_cell)
                             result['graphics_update'] = True
                             break
 
+        if self.__hint_estimator and events.get('new_char', None) == GameSession.HINTS_KEY:
+            self.__hints_enabled = not self.__hints_enabled
+            self.__hints_key = None
+            self.__hint_levels = None
+            self.__full_redraw = True
+            result['graphics_update'] = True
+
+        if self.__hints_enabled:
+            self.__update_hints(result)
+
         return result
\ No newline at end of file
@@ -1,3 +1,4 @@
+from bisect import bisect_left, insort
 from typing import Any, Dict, List, Tuple
 import pygame
 from util.graphics import get_rendered_text_with_size
@@ -8,10 +9,17 @@ from graphics.menus.primitives import MenuOption, MenuTitle
 
 class LobbySelect(Viewport):
     """
-    Represents the lobby select screen.
+    Represents the lobby select screen: a browser of the lobbies sorted by their names.
+    Only the page with the selected lobby is drawn and the options of its rows are created
+    when they come into view, so a frame costs the same with a few or thousands of lobbies.
+    Typing jumps to the first lobby with the typed prefix, the page keys (and the arrows) jump between the pages.
     """
 
-    def __init__(self, surface: pygame.Surface, assets: IBAssets, lobbies: List[MenuOption] = None):
+    PAGE_SIZE = 5
+    """The number of the lobbies on a page."""
+
+
+    def __init__(self, surface: pygame.Surface, assets: IBAssets, lobbies: List[str] = None):
         """
         Constructor method.
 
@@ -19,8 +27,8 @@ class LobbySelect(Viewport):
         :type surface: pygame.Surface
         :param assets: The assets of the game.
         :type assets: IBAssets
-        :param lobbies: The lobbies to display.
-        :type lobbies: List[MenuOption]
+        :param lobbies: The names of the lobbies to display.
+        :type lobbies: List[str]
         """
 
 
@@ -32,7 +40,7 @@ class LobbySelect(Viewport):
             raise ValueError('The pygame.display module has not been initialized.')
         if not pygame.display.get_surface():
             raise ValueError('The pygame.display module has not have a surface to render to.')
-        
+
         self.__surface = surface
         self.__assets = assets
 
@@ -40,10 +48,14 @@ class LobbySelect(Viewport):
         self.__background = pygame.Rect(0, 0, master_display.get_width(), master_display.get_height())
 
         # if no options are present
-        if lobbies is None:
+        if not lobbies:
             raise ValueError('No lobbies were provided.')
-        self.__lobbies = lobbies
+        # the sorted index of the lobbies
+        self.__lobbies: List[str] = sorted(set(lobbies))
         self.__lobby_index = 0
+        self.__prefix = ''
+        # the options of the rows of the shown page (by the lobby names)
+        self.__options: Dict[str, MenuOption] = {}
 
         self.__left_arrow_rect = None
         self.__right_arrow_rect = None
@@ -59,7 +71,7 @@ class LobbySelect(Viewport):
         """
 
         return self.__surface
-    
+
 
     @surface.setter
     def surface(self, surface: pygame.Surface):
@@ -72,7 +84,7 @@ class LobbySelect(Viewport):
 
         self.__surface = surface
 
-    
+
     @property
     def selected_lobby_name(self) -> str:
         """
@@ -82,7 +94,64 @@ class LobbySelect(Viewport):
         :rtype: str
         """
 
-        return self.__lobbies[self.__lobby_index].text
+        return self.__lobbies[self.__lobby_index]
+
+
+    @property
+    def lobby_count(self) -> int:
+        """
+        Getter for the number of the lobbies.
+
+        :return: The number of the lobbies.
+        :rtype: int
+        """
+
+        return len(self.__lobbies)
+
+
+    @property
+    def page(self) -> int:
+        """
+        Getter for the page with the selected lobby.
+
+        :return: The page (from 0).
+        :rtype: int
+        """
+
+        return self.__lobby_index // __class__.PAGE_SIZE
+
+
+    @property
+    def page_count(self) -> int:
+        """
+        Getter for the number of the pages.
+
+        :return: The number of the pages.
+        :rtype: int
+        """
+
+        return (len(self.__lobbies) + __class__.PAGE_SIZE - 1) // __class__.PAGE_SIZE
+
+
+    def __get_page_options(self) -> List[Tuple[int, MenuOption]]:
+        """
+        Returns the options of the rows of the shown page (the options of the other pages are dropped).
+
+        :return: The indices of the lobbies and their options.
+        :rtype: List[Tuple[int, MenuOption]]
+        """
+
+        start = self.page * __class__.PAGE_SIZE
+        names = self.__lobbies[start:start + __class__.PAGE_SIZE]
+        options = {name: self.__options.get(name, None) or MenuOption(name) for name in names}
+        self.__options = options
+
+        page_options = []
+        for i, name in enumerate(names, start):
+            option = options[name]
+            option.highlighted = i == self.__lobby_index
+            page_options.append((i, option))
+        return page_options
 
 
     def __draw_objects(self):
@@ -97,63 +166,76 @@ class LobbySelect(Viewport):
 
         # define all availible positionings
         surface_width, surface_height = self.__surface.get_size()
-        
-        option_height = surface_height / 10
+
+        title_y = surface_height * 0.05
+        title_height_bounds = surface_height * 0.15
+        title_width_bounds = surface_width * 0.75
+
+        list_y = surface_height * 0.22
+        row_height = surface_height * 0.6 / __class__.PAGE_SIZE
+        option_height = row_height * 0.8
         option_width = surface_width * 0.5
         option_x = surface_width / 2        # MenuOption can center itself
-        option_y = surface_height / 2
-        
-        title_height_bounds = surface_height / 5
-        title_width_bounds = surface_width * 0.75
-        # get the real title size
-        title_surface = get_rendered_text_with_size(self.__assets['strings']['lobbies_label'], 
-                                                    title_width_bounds,
-                                                    title_height_bounds,
-                                                    color=self.__assets['colors']['white'])
-        title_width, title_height = title_surface.get_size()
 
-        title_x = (surface_width / 2) - (title_width / 2)
-        title_y = option_y - (option_height / 2) - title_height
-        
-        arrow_side = min(option_height, surface_width * 0.125)      # arrow will be sprite so it is based on upper left corner
-        left_arrow_x = option_x - (option_width / 2) - arrow_side
-        left_arrow_y = option_y - (option_height / 2)
-        right_arrow_x = option_x + (option_width / 2)
+        page_y = surface_height * 0.85
+        page_height_bounds = surface_height * 0.1
+        page_width_bounds = surface_width * 0.3
+
+        arrow_side = min(row_height, surface_width * 0.125)      # arrow will be sprite so it is based on upper left corner
+        left_arrow_x = option_x - (option_width / 2) - arrow_side * 1.5
+        left_arrow_y = list_y + (row_height * __class__.PAGE_SIZE / 2) - (arrow_side / 2)
+        right_arrow_x = option_x + (option_width / 2) + arrow_side * 0.5
         right_arrow_y = left_arrow_y
 
         # register user input bounding boxes
         self.__left_arrow_rect = pygame.Rect(left_arrow_x, left_arrow_y, arrow_side, arrow_side)
         self.__right_arrow_rect = pygame.Rect(right_arrow_x, right_arrow_y, arrow_side, arrow_side)
 
-        # get the current lobby
-        current_option = self.__lobbies[self.__lobby_index]
-        
-        # load the arrow sprite
+        # clear the changing areas (the last page can be shorter and the texts change their widths)
+        title_rect = pygame.Rect(0, title_y, surface_width, title_height_bounds)
+        list_rect = pygame.Rect(option_x - (option_width / 2), list_y, option_width, row_height * __class__.PAGE_SIZE)
+        page_rect = pygame.Rect(0, page_y, surface_width, page_height_bounds)
+        for rect in (title_rect, list_rect, page_rect):
+            pygame.draw.rect(self.__surface, self.__assets['colors']['black'], rect)
+            update_rects.append(rect)
+
+        # title (with the typed prefix)
+        title_text = self.__assets['strings']['lobbies_label']
+        if self.__prefix:
+            title_text = f"{title_text} {self.__prefix}"
+        title_surface = get_rendered_text_with_size(title_text,
+                                                    title_width_bounds,
+                                                    title_height_bounds,
+                                                    color=self.__assets['colors']['white'])
+        title_width, title_height = title_surface.get_size()
+        self.__surface.blit(title_surface, ((surface_width / 2) - (title_width / 2), title_y + title_height_bounds - title_height))
+
+        # options of the shown page
+        for i, option in self.__get_page_options():
+            row = i % __class__.PAGE_SIZE
+            option.render(self.__surface,
+                          (option_x, list_y + (row * row_height) + (row_height / 2)),
+                          option_height,
+                          option_width,
+                          centered=True,
+                          color=self.__assets['colors']['black'],
+                          background_color=self.__assets['colors']['white'],
+                          radius=option_height // 2
+                          )
+
+        # page indicator
+        page_surface = get_rendered_text_with_size(f"{self.page + 1} / {self.page_count}",
+                                                   page_width_bounds,
+                                                   page_height_bounds,
+                                                   color=self.__assets['colors']['white'])
+        page_width, page_height = page_surface.get_size()
+        self.__surface.blit(page_surface, ((surface_width / 2) - (page_width / 2), page_y + (page_height_bounds - page_height) / 2))
+
+        # arrows (to the previous and the next page)
         right_arrow_surface = pygame.transform.scale(self.__assets['sprites']['arrow'], (int(arrow_side), int(arrow_side)))
         left_arrow_surface = pygame.transform.flip(right_arrow_surface, True, False)
-
-        # draw the objects
-        # title
-        self.__surface.blit(title_surface, (title_x, title_y))
-        update_rects.append(pygame.Rect(title_x, title_y, title_width, title_height))
-        
-        # option
-        option_rect = current_option.render(self.__surface, 
-                                            (option_x, option_y), 
-                                            option_height, 
-                                            option_width, 
-                                            centered=True,
-                                            color=self.__assets['colors']['black'],
-                                            background_color=self.__assets['colors']['white'],
-                                            radius=option_height // 2
-                                            )
-        update_rects.append(option_rect)
-
-        # arrows
-        left_arrow_rect = self.__surface.blit(left_arrow_surface, (left_arrow_x, left_arrow_y))
-        update_rects.append(left_arrow_rect)
-        right_arrow_rect = self.__surface.blit(right_arrow_surface, (right_arrow_x, right_arrow_y))
-        update_rects.append(right_arrow_rect)
+        update_rects.append(self.__surface.blit(left_arrow_surface, (left_arrow_x, left_arrow_y)))
+        update_rects.append(self.__surface.blit(right_arrow_surface, (right_arrow_x, right_arrow_y)))
 
         return update_rects
 
@@ -167,11 +249,11 @@ class LobbySelect(Viewport):
         """
 
         return self.__draw_objects()
-        
+
 
     def redraw(self):
         """
-        Redraws the select menu. Expects that the entire screen is redrawn 
+        Redraws the select menu. Expects that the entire screen is redrawn
         with pygame.display.flip() after this method is called.
         """
 
@@ -183,19 +265,68 @@ class LobbySelect(Viewport):
         # draw the objects
         self.__draw_objects()
 
-    
-    def change_lobbies(self, lobbies: List[MenuOption], lobby_increment: int = 0):
+
+    def select_lobby(self, index: int):
+        """
+        Selects the lobby (wraps around the ends of the list).
+
+        :param index: The index of the lobby in the sorted list.
+        :type index: int
+        """
+
+        self.__lobby_index = index % len(self.__lobbies)
+
+
+    def jump_to_page(self, page: int):
+        """
+        Selects the first lobby of the page (wraps around the ends of the list).
+
+        :param page: The page (from 0).
+        :type page: int
+        """
+
+        self.__lobby_index = (page % self.page_count) * __class__.PAGE_SIZE
+
+
+    def search(self, prefix: str):
+        """
+        Selects the first lobby with the prefix (or the first following it in the sorted order).
+
+        :param prefix: The searched prefix of the lobby name.
+        :type prefix: str
         """
-        Changes the lobbies displayed.
 
-        :param lobbies: The new lobbies to display.
-        :type lobbies: List[MenuOption]
-        :param lobby_increment: The amount to increment the lobby index by.
-        :type lobby_increment: int
+        self.__prefix = prefix
+        self.__lobby_index = min(bisect_left(self.__lobbies, prefix), len(self.__lobbies) - 1)
+
+
+    def apply_changes(self, added: List[str], removed: List[str]) -> bool:
+        """
+        Adds and removes the lobbies in the sorted list (the selected lobby stays selected if it was not removed).
+
+        :param added: The names of the added lobbies.
+        :type added: List[str]
+        :param removed: The names of the removed lobbies.
+        :type removed: List[str]
+        :return: False if no lobby is left (the screen cannot be drawn), True otherwise.
+        :rtype: bool
         """
 
-        self.__lobbies = lobbies
-        self.__lobby_index = (self.__lobby_index + lobby_increment) % len(self.__lobbies)
+        selected = self.__lobbies[self.__lobby_index] if self.__lobbies else ''
+        for lobby in removed:
+            i = bisect_left(self.__lobbies, lobby)
+            if i < len(self.__lobbies) and self.__lobbies[i] == lobby:
+                del self.__lobbies[i]
+        for lobby in added:
+            i = bisect_left(self.__lobbies, lobby)
+            if i == len(self.__lobbies) or self.__lobbies[i] != lobby:
+                insort(self.__lobbies, lobby, lo=i)
+        if not self.__lobbies:
+            return False
+
+        # the removed selected lobby is replaced by its successor
+        self.__lobby_index = min(bisect_left(self.__lobbies, selected), len(self.__lobbies) - 1)
+        return True
 
 
     def update(self, events: Dict[str, Any]) -> Dict[str, Any]:
@@ -208,39 +339,62 @@ class LobbySelect(Viewport):
         :rtype: Dict[str, Any]
         """
 
-        result = {'graphics_update': False, 
-                  'option_selected': -1, 
+        result = {'graphics_update': False,
+                  'option_selected': -1,
                   'submit': False,
                   'escape': False}
-        
-        current_option = self.__lobbies[self.__lobby_index]
-        
+
         # handle possible option click
         if events.get('mouse_click', False):
-            if current_option.rect.collidepoint(events['mouse_click']):
-                result['submit'] = True
-                return result
-            elif self.__left_arrow_rect.collidepoint(events['mouse_click']):
-                self.change_lobbies(self.__lobbies, -1)
+            for i, option in self.__get_page_options():
+                if option.rect and option.rect.collidepoint(events['mouse_click']):
+                    self.select_lobby(i)
+                    result['submit'] = True
+                    return result
+            if self.__left_arrow_rect.collidepoint(events['mouse_click']):
+                self.jump_to_page(self.page - 1)
                 result['graphics_update'] = True
             elif self.__right_arrow_rect.collidepoint(events['mouse_click']):
-                self.change_lobbies(self.__lobbies, 1)
+                self.jump_to_page(self.page + 1)
                 result['graphics_update'] = True
 
         # handle keyboard input
         if events.get('direction', False):
-            if events['direction'] == pygame.K_LEFT:
-                self.change_lobbies(self.__lobbies, -1)
-                result['graphics_update'] = True
+            if events['direction'] == pygame.K_UP:
+                self.select_lobby(self.__lobby_index - 1)
+            elif events['direction'] == pygame.K_DOWN:
+                self.select_lobby(self.__lobby_index + 1)
+            elif events['direction'] == pygame.K_LEFT:
+                self.jump_to_page(self.page - 1)
             elif events['direction'] == pygame.K_RIGHT:
-                self.change_lobbies(self.__lobbies, 1)
-                result['graphics_update'] = True
-        
+                self.jump_to_page(self.page + 1)
+            result['graphics_update'] = True
+
+        elif events.get('page', False):
+            if events['page'] == pygame.K_PAGEUP:
+                self.jump_to_page(self.page - 1)
+            elif events['page'] == pygame.K_PAGEDOWN:
+                self.jump_to_page(self.page + 1)
+            elif events['page'] == pygame.K_HOME:
+                self.jump_to_page(0)
+            elif events['page'] == pygame.K_END:
+                self.jump_to_page(self.page_count - 1)
+            result['graphics_update'] = True
+
+        # handle the typed prefix
+        elif events.get('new_char', False):
+            self.search(self.__prefix + events['new_char'])
+            result['graphics_update'] = True
+
+        elif events.get('backspace', False) and self.__prefix:
+            self.search(self.__prefix[:-1])
+            result['graphics_update'] = True
+
         # handle enter key
         elif events.get('return', False):
             result['submit'] = True
             return result
-        
+
         elif events.get('escape', False):
             result['escape'] = True
             return result
@@ -0,0 +1,143 @@
+"""
+A module containing the ViewportPool class.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import pygame
+from graphics.viewport import Viewport
+from graphics.menus.select_menu import SelectMenu
+
+
+class ViewportPool:
+    """
+    A class that keeps the constructed viewports (keyed e.g. by the state and the strings of the viewport)
+    with the snapshots of their first drawing. A pooled viewport is reattached to the surface and
+    the snapshot is copied to it, so the text and the layout are not rendered again.
+    Only the viewports whose interaction state can be reset (select menus and info screens) are reused,
+    the others are pre-built for a single use.
+    """
+
+    MAX_SIZE = 32
+    """The maximal number of the pooled viewports (the least recently used are dropped)."""
+
+
+    def __init__(self, max_size: int = MAX_SIZE):
+        """
+        Constructor method.
+
+        :param max_size: The maximal number of the pooled viewports.
+        :type max_size: int
+        """
+
+        self.max_size = max_size
+        self.hits = 0
+        """The number of the viewports reused from the pool."""
+        self.misses = 0
+        """The number of the viewports created on demand."""
+        self.__entries: Dict[Any, Tuple[Viewport, pygame.Surface]] = OrderedDict()
+
+
+    @staticmethod
+    def __is_reusable(viewport: Viewport) -> bool:
+        """
+        Checks if the viewport can be reused after it was shown.
+
+        :param viewport: The viewport.
+        :type viewport: Viewport
+        :return: True if the viewport can be reset, False otherwise.
+        :rtype: bool
+        """
+
+        return isinstance(viewport, SelectMenu)
+
+
+    def __put(self, key: Any, viewport: Viewport, snapshot: pygame.Surface):
+        """
+        Adds the viewport to the pool.
+
+        :param key: The key of the viewport.
+        :type key: Any
+        :param viewport: The viewport.
+        :type viewport: Viewport
+        :param snapshot: The drawn viewport.
+        :type snapshot: pygame.Surface
+        """
+
+        self.__entries[key] = (viewport, snapshot)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+
+    def prebuild(self, key: Any, size: Tuple[int, int], create: Callable[[pygame.Surface], Viewport]):
+        """
+        Creates the viewport and draws it on an off-screen surface (if it is not pooled yet).
+
+        :param key: The key of the viewport.
+        :type key: Any
+        :param size: The size of the surface the viewport will be shown on.
+        :type size: Tuple[int, int]
+        :param create: Creates the viewport on the given surface.
+        :type create: Callable[[pygame.Surface], Viewport]
+        """
+
+        entry = self.__entries.get(key, None)
+        if entry and entry[1].get_size() == size:
+            return
+
+        surface = pygame.Surface(size)
+        viewport = create(surface)
+        viewport.redraw()
+        self.__put(key, viewport, surface)
+
+
+    def get(self, key: Any, surface: pygame.Surface, create: Callable[[pygame.Surface], Viewport]) -> Viewport:
+        """
+        Returns the viewport drawn on the surface: the pooled one or a new one.
+
+        :param key: The key of the viewport.
+        :type key: Any
+        :param surface: The surface to show the viewport on.
+        :type surface: pygame.Surface
+        :param create: Creates the viewport on the given surface.
+        :type create: Callable[[pygame.Surface], Viewport]
+        :return: The viewport.
+        :rtype: Viewport
+        """
+
+        entry = self.__entries.get(key, None)
+        if entry is None:
+            self.misses += 1
+            viewport = create(surface)
+            viewport.redraw()
+            if ViewportPool.__is_reusable(viewport):
+                self.__put(key, viewport, surface.copy())
+            return viewport
+
+        self.hits += 1
+        viewport, snapshot = entry
+        if ViewportPool.__is_reusable(viewport):
+            viewport.unset_highlighted_option_index()
+            self.__entries.move_to_end(key)
+        else:
+            del self.__entries[key]
+
+        viewport.surface = surface
+        # the surface was resized since the snapshot
+        if snapshot.get_size() != surface.get_size():
+            viewport.redraw()
+            if key in self.__entries:
+                self.__put(key, viewport, surface.copy())
+        else:
+            surface.blit(snapshot, (0, 0))
+
+        return viewport
+
+
+    def clear(self):
+        """
+        Drops all the pooled viewports.
+        """
+
+        self.__entries.clear()
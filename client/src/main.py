@@ -2,10 +2,12 @@
 # linux: python ./client/src/main.py -c ./client/cfg/debug_cfg.json -l ./client/cfg/debug_loggers_cfg.json
 
 import os
+import time
 from sys import exit
-from const.paths import RESOURCES_DIR_PATH
+from const.paths import PROJECT_ROOT_PATH, RESOURCES_DIR_PATH, FLIGHT_RECORDER_DIR_PATH
 from util.init_setup import loggers, LOGGER_NAME
-from util.init_setup import CFG_PATH
+from util.init_setup import CFG_PATH, RECORD_PATH, TRACE_PATH
+from const.loggers import RENDER_SUBSYSTEM, STATE_SUBSYSTEM
 from const.exit_codes import EXIT_SUCCESS, EXIT_FAILURE, EXIT_INVALID_CFG, EXIT_INVALID_ASSETS_CFG
 from typing import Dict
 from pprint import pformat
@@ -15,6 +17,11 @@ from pydantic import ValidationError
 import pygame
 from util.assets_loader import AssetsLoader
 from game.ib_game import IBGame
+from game.session_log import SessionRecorder
+from util.metrics import REGISTRY, MetricsExporter
+from util.tracing import TRACER
+from util import flight_recorder
+from util.flight_recorder import FLIGHT_RECORDER
 
 # logger = loggers.NullLogger()
 # temp_logger = loggers.NullLogger()
@@ -32,7 +39,7 @@ def load_config(path: str) -> Dict:
     logger.debug(f'Loading configuration file from: {path}')
     loaded_data = load_json(path)
     logger.info(f'Loaded configuration file: {path}')
-    logger.debug(f'Loaded configurations: \n{pformat(loaded_data, indent=4)}')
+    state_logger.debug(lambda: f'Loaded configurations: \n{pformat(loaded_data, indent=4)}')
     return loaded_data
 
 
@@ -82,8 +89,27 @@ def main():
     clock = pygame.time.Clock()
     tick_speed = config['tick_speed']
 
+    recorder = SessionRecorder(RECORD_PATH) if RECORD_PATH else None
+    if TRACE_PATH:
+        TRACER.start()
+    FLIGHT_RECORDER.dump_dir = FLIGHT_RECORDER_DIR_PATH
+    FLIGHT_RECORDER.install_crash_hooks()
+
+    metrics_config = config['metrics']
+    exporter = None
+    if metrics_config['enabled']:
+        # the relative path is in the client directory (not in the working directory)
+        metrics_path = os.path.relpath(os.path.join(PROJECT_ROOT_PATH, metrics_config['path'])) if metrics_config['path'] else None
+        exporter = MetricsExporter(REGISTRY, metrics_path, metrics_config['interval'], metrics_config['port'])
+        exporter.start()
+        logger.info('Metrics exporter started')
+    frame_time = REGISTRY.histogram('render_frame_seconds', 'Time of a frame (update and screen update, without the tick delay)')
+    dirty_area = REGISTRY.histogram('render_dirty_area_pixels', 'Area of the updated parts of the screen per frame')
+    # only the frames over the budget of a tick are kept by the flight recorder
+    frame_budget = 1 / tick_speed
+
     logger.debug('Creating the game...')
-    game = IBGame(config, assets)
+    game = IBGame(config, assets, recorder)
     logger.info('Game instance created')
 
     window: pygame.display = pygame.display.set_mode((config['window_width'], config['window_height']), pygame.RESIZABLE, config['color_bit_depth'])
@@ -101,6 +127,7 @@ def main():
 
     # MAIN LOOP
     while True:
+        frame_start = time.perf_counter()
         update_result: IBGameUpdateResult = game.update()
         if update_result.exit:
             break
@@ -108,18 +135,32 @@ def main():
         if update_result.update_areas:
             # complex update -> updates the entire screen
             if update_result.update_areas[0] == True:
-                logger.debug('Complex update detected, updating the entire screen')
+                render_logger.debug('Complex update detected, updating the entire screen')
                 pygame.display.flip()
+                width, height = pygame.display.get_window_size()
+                dirty_area.record(width * height)
 
             # updates only portions of the screen
             else:
                 # logger.debug(f'Partial update detected, updating areas: \n{pformat(update_result.update_areas, indent=4)}')
                 pygame.display.update(update_result.update_areas)
+                dirty_area.record(sum(rect.width * rect.height for rect in update_result.update_areas))
+        frame_duration = time.perf_counter() - frame_start
+        frame_time.record(frame_duration)
+        if frame_duration > frame_budget:
+            FLIGHT_RECORDER.add(flight_recorder.TIMING, 'render_frame_seconds', frame_duration)
 
         # add a delay to the game loop
         clock.tick(tick_speed)
 
     # end the game correctly
+    if recorder:
+        recorder.close()
+    if exporter:
+        exporter.stop()
+    if TRACE_PATH:
+        TRACER.stop()
+        TRACER.write(TRACE_PATH)
     if pygame.font.get_init():
         pygame.font.quit()
     if pygame.get_init():
@@ -131,6 +172,8 @@ def main():
 
 if __name__ == '__main__':
     logger = loggers.get_logger(LOGGER_NAME)
+    state_logger = loggers.get_subsystem_logger(STATE_SUBSYSTEM, LOGGER_NAME)
+    render_logger = loggers.get_subsystem_logger(RENDER_SUBSYSTEM, LOGGER_NAME)
     temp_logger = loggers.get_temp_logger('temp')
 
     # import cProfile
@@ -0,0 +1,75 @@
+"""
+This module contains the client of the connection managers receiving scripted data (used by the tests).
+"""
+
+import time
+from typing import List, Union
+
+
+class ScriptedClient:
+    """
+    This class represents a client receiving the scripted chunks of data
+    (the exceptions are raised and the numbers are the delays in seconds of the next chunks).
+    """
+
+    def __init__(self, chunks: List[Union[str, Exception, float]] = None):
+        """
+        Creates the client.
+
+        :param chunks: The received chunks of data, the exceptions to raise or the delays.
+        :type chunks: List[Union[str, Exception, float]]
+        """
+
+        self.chunks = list(chunks) if chunks else []
+        self.sent: List[str] = []
+        self.is_running = False
+        self.server_address = 'test:0'
+
+
+    def start(self):
+        """
+        Opens the connection.
+        """
+
+        self.is_running = True
+
+
+    def stop(self):
+        """
+        Closes the connection.
+        """
+
+        self.is_running = False
+
+
+    def send_message(self, message: str):
+        """
+        Keeps the sent message.
+
+        :param message: The message.
+        :type message: str
+        """
+
+        self.sent.append(message)
+
+
+    def receive_message(self, timeout: float = None) -> str:
+        """
+        Returns the next chunk (TimeoutError after the timeout if there is none).
+
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The chunk.
+        :rtype: str
+        """
+
+        while self.chunks and isinstance(self.chunks[0], float):
+            time.sleep(self.chunks.pop(0))
+        if not self.chunks:
+            time.sleep(timeout or 0)
+            raise TimeoutError()
+        chunk = self.chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+
+        return chunk
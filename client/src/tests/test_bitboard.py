@@ -0,0 +1,97 @@
+"""
+This module contains the tests of the parsing of the network representation of the board to the bitboard.
+"""
+
+import random
+import unittest
+from game.bitboard import Bitboard
+from util.msg_parser import board_to_net
+from const.server_communication import *
+
+
+class TestBitboardFromNet(unittest.TestCase):
+    """
+    This class tests Bitboard.from_net.
+    """
+
+    STATES = (BOARD_FREE_CELL, BOARD_PLAYER_CELL, BOARD_PLAYER_SHIP_LOST_CELL, BOARD_OPPONENT_SHIP_LOST_CELL)
+    """The values of the cells of the player-relative board."""
+
+
+    def setUp(self):
+        """
+        Creates the free board in the network representation.
+        """
+
+        self.free_board = board_to_net([[BOARD_FREE_CELL] * BOARD_SIDE_SIZE for _ in range(BOARD_SIDE_SIZE)])
+
+
+    def assert_invalid(self, board_str: str):
+        """
+        Asserts that the board is rejected.
+
+        :param board_str: The network representation of the board.
+        :type board_str: str
+        """
+
+        with self.assertRaises(ValueError):
+            Bitboard.from_net(board_str)
+
+
+    def test_valid_boards(self):
+        """
+        Tests that the random valid boards are parsed to the same bitboard as the list boards.
+        """
+
+        rng = random.Random(0)
+        for _ in range(100):
+            board = [[rng.choice(__class__.STATES) for _ in range(BOARD_SIDE_SIZE)] for _ in range(BOARD_SIDE_SIZE)]
+            self.assertEqual(Bitboard.from_net(board_to_net(board)), Bitboard.from_list(board))
+
+
+    def test_internal_codes(self):
+        """
+        Tests that the internal codes of the lost ships (2 and 3) are not accepted as cells.
+        """
+
+        self.assert_invalid('2' + self.free_board[1:])
+        self.assert_invalid(self.free_board[:-1] + '3')
+
+
+    def test_invalid_cells(self):
+        """
+        Tests that the cells out of the cell states are rejected.
+        """
+
+        for cell in ('', '-', '-0', '--1', '01', '10', '-3', 'x', ' 0'):
+            self.assert_invalid(cell + self.free_board[1:])
+
+
+    def test_swapped_delimiters(self):
+        """
+        Tests that the boards with the delimiters of the rows and the cells swapped are rejected.
+        """
+
+        swapped = self.free_board.translate(str.maketrans(NUM_DELIMITER + SEQ_DELIMITER, SEQ_DELIMITER + NUM_DELIMITER))
+        self.assert_invalid(swapped)
+        # the count of the delimiters is right, but a row is not BOARD_SIDE_SIZE cells long
+        first_seq = self.free_board.index(SEQ_DELIMITER)
+        first_num = self.free_board.index(NUM_DELIMITER)
+        moved = list(self.free_board)
+        moved[first_seq], moved[first_num] = NUM_DELIMITER, SEQ_DELIMITER
+        self.assert_invalid(''.join(moved))
+
+
+    def test_row_sizes(self):
+        """
+        Tests that the boards without BOARD_SIDE_SIZE rows of BOARD_SIDE_SIZE cells are rejected.
+        """
+
+        self.assert_invalid(self.free_board[:-2])
+        self.assert_invalid(self.free_board + NUM_DELIMITER + str(BOARD_FREE_CELL))
+        self.assert_invalid(self.free_board + SEQ_DELIMITER + self.free_board.split(SEQ_DELIMITER)[0])
+        self.assert_invalid(self.free_board.split(SEQ_DELIMITER, 1)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
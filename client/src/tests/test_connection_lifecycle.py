@@ -0,0 +1,82 @@
+"""
+This module contains the tests of the sessions kept by the connection lifecycle.
+"""
+
+from tools import tools_setup
+import time
+import unittest
+from typing import List, Union
+from game.connection_lifecycle import ConnectionLifecycle
+from game.connection_manager import ConnectionManager
+from util.msg_parser import to_net_message, board_to_net
+from scripted_client import ScriptedClient
+from const.server_communication import *
+
+
+class TestParkedSession(unittest.TestCase):
+    """
+    This class tests the messages received while a session is parked.
+    """
+
+    PLAYER = 'player'
+    """The logged in player."""
+
+
+    def park(self, chunks: List[Union[str, Exception, float]]) -> ScriptedClient:
+        """
+        Logs the player in a session receiving the chunks after the login and waits until all are received.
+
+        :param chunks: The received chunks of data, the exceptions to raise or the delays (see ScriptedClient).
+        :type chunks: List[Union[str, Exception, float]]
+        :return: The client of the session.
+        :rtype: ScriptedClient
+        """
+
+        client = ScriptedClient([to_net_message([CMD_ACKW_VALID])] + chunks)
+        self.lifecycle = ConnectionLifecycle(lambda server_ip, server_port, recorder=None: ConnectionManager(server_ip, server_port, recorder, client))
+        self.lifecycle.open('test', 0, __class__.PLAYER)
+
+        deadline = time.monotonic() + 5
+        while client.chunks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(client.chunks, [])
+        return client
+
+
+    def tearDown(self):
+        """
+        Closes the kept session.
+        """
+
+        self.lifecycle.close('quit', ConnectionLifecycle.CLOSE_TIMEOUT)
+
+
+    def test_split_and_invalid_frames(self):
+        """
+        Tests that a frame split across the polls is received and the invalid frames are dropped
+        without closing the session.
+        """
+
+        ping = to_net_message([CMD_PING])
+        board = [[BOARD_FREE_CELL] * BOARD_SIDE_SIZE for _ in range(BOARD_SIDE_SIZE)]
+        held = to_net_message([CMD_CONTINUE, 'lobby', 'opponent', __class__.PLAYER, board_to_net(board)])
+        client = self.park([
+            ping[:3], 0.1, ping[3:],
+            'NOT' + ping,                                       # invalid header
+            to_net_message(['UNKNOWN']),                        # invalid command
+            to_net_message([CMD_BOARD]),                        # missing board
+            to_net_message([CMD_BOARD, '2' + board_to_net(board)[1:]]),   # invalid board
+            held,
+        ])
+
+        session = self.lifecycle.take('test', 0, __class__.PLAYER)
+        self.assertIsNotNone(session)
+        connection_manager, held_responses = session
+        self.assertTrue(connection_manager.is_running)
+        self.assertIn(to_net_message([CMD_PONG]), client.sent)
+        self.assertEqual([res.command for res in held_responses], [CMD_CONTINUE])
+        connection_manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+This module contains the tests of the receiving of the messages by the connection manager.
+"""
+
+from tools import tools_setup
+import unittest
+from typing import List, Union
+from game.connection_manager import ConnectionManager
+from scripted_client import ScriptedClient
+from util.msg_parser import to_net_message
+from const.server_communication import *
+
+
+class TestReceiveMessage(unittest.TestCase):
+    """
+    This class tests ConnectionManager.receive_message.
+    """
+
+    def create_manager(self, chunks: List[Union[str, Exception, float]]) -> ConnectionManager:
+        """
+        Creates the started connection manager receiving the chunks.
+
+        :param chunks: The received chunks of data, the exceptions to raise or the delays (see ScriptedClient).
+        :type chunks: List[Union[str, Exception, float]]
+        :return: The connection manager.
+        :rtype: ConnectionManager
+        """
+
+        manager = ConnectionManager('test', 0, client=ScriptedClient(chunks))
+        manager.start()
+        return manager
+
+
+    def test_frame_split_across_timeout(self):
+        """
+        Tests that the part of a frame received before a timeout of the client is kept for the next call.
+        """
+
+        ping = to_net_message([CMD_PING])
+        manager = self.create_manager([ping[:3], TimeoutError(), ping[3:]])
+        with self.assertRaises(TimeoutError):
+            manager.receive_message(0.05)
+
+        self.assertEqual(manager.receive_message(0.05).command, CMD_PING)
+
+
+    def test_frame_split_across_deadline(self):
+        """
+        Tests that the part of a frame received before the deadline of the whole message is kept for the next call.
+        """
+
+        ping = to_net_message([CMD_PING])
+        manager = self.create_manager([0.1, ping[:3], 0.1, ping[3:]])
+        with self.assertRaises(TimeoutError):
+            manager.receive_message(0.05)
+
+        self.assertEqual(manager.receive_message(1.0).command, CMD_PING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Post-game analytics of the recorded session logs (see game/analytics.py). The logs (files or directories
+searched recursively) are streamed one by one, the per-game table is written row by row (CSV, JSON lines
+or Parquet in batches) and the aggregated statistics (outcomes, heat-maps of the actions, times to move,
+reconnections, score trajectories) are printed as a JSON report. The memory does not grow with
+the number of the analyzed games.
+
+Run from the client/src directory (Parquet requires the optional pyarrow package):
+
+    python -m tools.analyze_sessions /var/log/ib/sessions -g games.parquet -o report.json
+"""
+
+from tools import tools_setup
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+from game.analytics import GameStats, SessionAnalytics, iter_session_games, iter_session_paths
+
+
+TABLE_FORMATS = ('csv', 'json', 'parquet')
+"""The formats of the per-game table."""
+
+PARQUET_BATCH_SIZE = 10000
+"""The number of the rows of a Parquet row group (the rows are buffered until written)."""
+
+
+class _TableWriter:
+    """
+    This class writes the per-game table row by row.
+    """
+
+
+    def __init__(self, path: str):
+        """
+        Opens the table.
+
+        :param path: The path to the table.
+        :type path: str
+        """
+
+        self._path = path
+        self._file = open(path, 'w', newline='')
+
+
+    def write(self, row: Dict[str, Any]):
+        """
+        Writes the row (see GameStats.to_row).
+
+        :param row: The row.
+        :type row: Dict[str, Any]
+        """
+
+        raise NotImplementedError()
+
+
+    def close(self):
+        """
+        Writes the buffered rows and closes the table.
+        """
+
+        self._file.close()
+
+
+class _CsvTableWriter(_TableWriter):
+    """
+    This class writes the per-game table as CSV (the score trajectories are joined by spaces).
+    """
+
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._writer: csv.DictWriter = None
+
+
+    def write(self, row: Dict[str, Any]):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(row))
+            self._writer.writeheader()
+        self._writer.writerow({key: ' '.join(str(x) for x in value) if isinstance(value, list) else value
+                               for key, value in row.items()})
+
+
+class _JsonTableWriter(_TableWriter):
+    """
+    This class writes the per-game table as JSON lines (one object per game).
+    """
+
+
+    def write(self, row: Dict[str, Any]):
+        self._file.write(json.dumps(row))
+        self._file.write('\n')
+
+
+class _ParquetTableWriter(_TableWriter):
+    """
+    This class writes the per-game table as Parquet, PARQUET_BATCH_SIZE rows per row group.
+    """
+
+
+    def __init__(self, path: str):
+        # optional dependency, the ImportError is reported by the CLI
+        import pyarrow
+        import pyarrow.parquet
+        self._pyarrow = pyarrow
+        self._path = path
+        self._writer = None
+        self._rows: List[Dict[str, Any]] = []
+        # the columns of GameStats.to_row() (the types are not inferred, a column may be None in a whole batch)
+        self._schema = pyarrow.schema([
+            ('session', pyarrow.string()), ('game', pyarrow.int64()), ('player', pyarrow.string()),
+            ('opponent', pyarrow.string()), ('outcome', pyarrow.string()), ('is_first', pyarrow.bool_()),
+            ('resumed', pyarrow.bool_()), ('start_s', pyarrow.float64()), ('duration_s', pyarrow.float64()),
+            ('turns', pyarrow.int64()), ('actions', pyarrow.int64()), ('gains', pyarrow.int64()),
+            ('hits', pyarrow.int64()), ('losses', pyarrow.int64()), ('score', pyarrow.int64()),
+            ('reconnects', pyarrow.int64()), ('opponent_disconnects', pyarrow.int64()),
+            ('move_time_mean_s', pyarrow.float64()), ('move_time_median_s', pyarrow.float64()),
+            ('move_time_max_s', pyarrow.float64()), ('score_trajectory', pyarrow.list_(pyarrow.int64())),
+        ])
+
+
+    def write(self, row: Dict[str, Any]):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_SIZE:
+            self._flush()
+
+
+    def _flush(self):
+        """
+        Writes the buffered rows as a row group.
+        """
+
+        if not self._rows:
+            return
+
+        table = self._pyarrow.Table.from_pylist(self._rows, schema=self._schema)
+        if self._writer is None:
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._path, self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _get_table_writer(path: str, table_format: str) -> _TableWriter:
+    """
+    Creates the writer of the per-game table.
+
+    :param path: The path to the table.
+    :type path: str
+    :param table_format: The format (see TABLE_FORMATS, guessed from the extension if None).
+    :type table_format: str
+    :return: The writer.
+    :rtype: _TableWriter
+    :raises ValueError: If the format is not known.
+    :raises ImportError: If the format requires a package that is not installed.
+    """
+
+    if table_format is None:
+        table_format = os.path.splitext(path)[1].lstrip('.').lower()
+        table_format = 'json' if table_format == 'jsonl' else table_format
+    if table_format == 'csv':
+        return _CsvTableWriter(path)
+    elif table_format == 'json':
+        return _JsonTableWriter(path)
+    elif table_format == 'parquet':
+        return _ParquetTableWriter(path)
+
+    raise ValueError(f"Unknown format of the table '{path}', expected one of {', '.join(TABLE_FORMATS)}")
+
+
+def analyze(paths: List[str], table: _TableWriter = None, progress_interval: float = 5) -> Dict[str, Any]:
+    """
+    Analyzes the session logs.
+
+    :param paths: The paths to the session logs or to the directories.
+    :type paths: List[str]
+    :param table: The writer of the per-game table (None for no table).
+    :type table: _TableWriter
+    :param progress_interval: The interval of the progress messages on stderr in seconds.
+    :type progress_interval: float
+    :return: The report (JSON serializable).
+    :rtype: Dict[str, Any]
+    """
+
+    analytics = SessionAnalytics()
+    time_start = time.perf_counter()
+    last_progress = time_start
+    for path in iter_session_paths(paths):
+        try:
+            for stats in iter_session_games(path):
+                if isinstance(stats, GameStats):
+                    analytics.add_game(stats)
+                    if table is not None:
+                        table.write(stats.to_row())
+                else:
+                    analytics.add_session(stats)
+        except (OSError, ValueError) as e:
+            # the games read before the error are kept
+            analytics.invalid_sessions[path] = str(e)
+
+        if time.perf_counter() - last_progress > progress_interval:
+            last_progress = time.perf_counter()
+            print(f"Analyzed {analytics.sessions} sessions, {analytics.games} games", file=sys.stderr, flush=True)
+    duration = time.perf_counter() - time_start
+
+    return {'duration_s': duration, 'records_per_s': analytics.records / duration if duration else None,
+            **analytics.report()}
+
+
+def main():
+    """
+    Entry point of the analytics.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Post-game analytics of the recorded session logs of "Inverse Battleships"')
+    args_parser.add_argument('paths', type=str, nargs='+', help='Session logs or directories with them (searched recursively)')
+    args_parser.add_argument('-g', '--games', type=str, default=None, help='Path to the per-game table (.csv, .json(l) or .parquet)')
+    args_parser.add_argument('-f', '--format', type=str, default=None, choices=TABLE_FORMATS, help='Format of the per-game table (by the extension if not set)')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Path to the JSON report (stdout if not set)')
+    args = args_parser.parse_args()
+
+    table = None
+    if args.games:
+        try:
+            table = _get_table_writer(args.games, args.format)
+        except ValueError as e:
+            args_parser.error(str(e))
+        except ImportError:
+            args_parser.error("Parquet output requires the pyarrow package")
+
+    try:
+        report = analyze(args.paths, table)
+    finally:
+        if table is not None:
+            table.close()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
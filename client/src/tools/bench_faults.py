@@ -0,0 +1,321 @@
+"""
+Benchmark of the message reassembly of the client (ConnectionManager) under network faults.
+A local frame source streams server frames (BOARD and TURN) through the fault proxy to the client
+and the benchmark measures, for each fault condition, the decode throughput, the time spent
+in the receive calls, the errors and the recovery time (from an error to the next decoded frame,
+including reconnection if the connection was lost). The codec alone (without network) is measured as well.
+
+Run from the client/src directory (prints a JSON report):
+
+    python -m tools.bench_faults -f 2000 -q
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, List
+from game.connection_manager import ConnectionManager
+from game import rules
+from tools.fault_proxy import FaultProxy, FaultProfile
+from util.generic_client import GenericClient
+from util.msg_parser import to_net_message, from_net_message, get_complete_message, parse_parts, board_to_net
+from util.stats import summarize
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+CONDITIONS = {
+    'baseline': FaultProfile(),
+    'fragmented': FaultProfile(fragment=(1, 16)),
+    'byte_by_byte': FaultProfile(fragment=(1, 1), fragment_gap=0),
+    'coalesced': FaultProfile(coalesce=16),
+    'coalesced_fragmented': FaultProfile(coalesce=8, fragment=(50, 500)),
+    'latency_jitter': FaultProfile(latency=0.02, jitter=0.01),
+    'throttled': FaultProfile(bandwidth=64 * 1024),
+    'dropped': FaultProfile(drop_after_frames=250),
+    'dropped_mid_frame': FaultProfile(drop_after_frames=250, drop_mid_frame=True),
+    'stalled_fragments': FaultProfile(fragment=(60, 120), fragment_gap=GenericClient.TIMEOUT_DURATION * 1.5),
+}
+"""The benchmarked fault conditions (faults are applied to the traffic from the server to the client)."""
+
+SLOW_CONDITION_FRAMES = {'stalled_fragments': 10}
+"""The maximal number of frames of the conditions that are slow by design."""
+
+RECEIVE_TIMEOUT = 10
+"""The time in seconds after which the benchmark of a condition gives up waiting for a frame."""
+
+
+def _make_frames(count: int, seed: int = None) -> List[bytes]:
+    """
+    Creates the stream of server frames (alternating BOARD and TURN, as during the game).
+
+    :param count: The number of frames.
+    :type count: int
+    :param seed: The seed of the board generator.
+    :type seed: int
+    :return: The encoded frames.
+    :rtype: List[bytes]
+    """
+
+    rng = random.Random(seed)
+    res = []
+    for i in range(count):
+        if i % 2 == 0:
+            board = rules.get_player_board(rules.generate_board(rng), True)
+            res.append(to_net_message([CMD_BOARD, board_to_net(board)]).encode())
+        else:
+            res.append(to_net_message([CMD_PLAYER_TURN, f"player{i % 4 // 2}"]).encode())
+
+    return res
+
+
+def bench_codec(frames: List[bytes]) -> Dict[str, float]:
+    """
+    Measures the throughput of the codec alone (reassembly, unescaping and parsing of the coalesced stream).
+
+    :param frames: The encoded frames.
+    :type frames: List[bytes]
+    :return: The result of the benchmark.
+    :rtype: Dict[str, float]
+    """
+
+    stream = b"".join(frames).decode()
+    time_start = time.perf_counter()
+    decoded = 0
+    tail = stream
+    while True:
+        is_complete, message, tail = get_complete_message(tail)
+        if not is_complete:
+            break
+        parse_parts(from_net_message(message))
+        decoded += 1
+    duration = time.perf_counter() - time_start
+
+    return {'frames': decoded, 'duration_s': duration, 'frames_per_s': decoded / duration,
+            'mb_per_s': len(stream) / duration / 1e6}
+
+
+class _FrameSource:
+    """
+    This class represents a server that streams the frames to every connected client in a loop.
+    """
+
+
+    def __init__(self, frames: List[bytes]):
+        """
+        Initializes the frame source.
+
+        :param frames: The encoded frames.
+        :type frames: List[bytes]
+        """
+
+        self.frames = frames
+        self.server: asyncio.Server = None
+
+
+    async def start(self):
+        """
+        Starts listening on an ephemeral port.
+        """
+
+        self.server = await asyncio.start_server(self._stream, DEFAULT_SERVER_IP_ADDRESS, 0)
+
+
+    @property
+    def port(self) -> int:
+        """
+        Getter for port.
+
+        :return: The port the source listens on.
+        :rtype: int
+        """
+
+        return self.server.sockets[0].getsockname()[1]
+
+
+    async def _stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Streams the frames until the client disconnects.
+
+        :param reader: The stream reader of the connection.
+        :type reader: asyncio.StreamReader
+        :param writer: The stream writer of the connection.
+        :type writer: asyncio.StreamWriter
+        """
+
+        try:
+            while True:
+                for frame in self.frames:
+                    writer.write(frame)
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+class _BackgroundLoop:
+    """
+    This class runs an asyncio event loop in a daemon thread (the client under test is synchronous).
+    """
+
+
+    def __init__(self):
+        """
+        Initializes the background loop.
+        """
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='BenchLoop', daemon=True)
+
+
+    def start(self):
+        """
+        Starts the thread of the loop.
+        """
+
+        self.thread.start()
+
+
+    def run(self, coro):
+        """
+        Runs the coroutine in the loop and waits for its result.
+
+        :param coro: The coroutine.
+        :return: The result of the coroutine.
+        """
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+    def stop(self):
+        """
+        Stops the loop and joins the thread.
+        """
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def bench_condition(proxy: FaultProxy, profile: FaultProfile, frames: int) -> Dict:
+    """
+    Receives the frames with the ConnectionManager through the proxy with the fault profile applied.
+
+    :param proxy: The fault proxy.
+    :type proxy: FaultProxy
+    :param profile: The fault profile.
+    :type profile: FaultProfile
+    :param frames: The number of frames to receive.
+    :type frames: int
+    :return: The result of the benchmark.
+    :rtype: Dict
+    """
+
+    proxy.downstream = profile
+    receive_times = []
+    recovery_times = []
+    errors: Dict[str, int] = {}
+    decoded = 0
+    error_time = None
+    conn = None
+    time_start = time.perf_counter()
+    last_frame_time = time_start
+
+    while decoded < frames:
+        if time.perf_counter() - last_frame_time > RECEIVE_TIMEOUT:
+            errors['gave_up'] = errors.get('gave_up', 0) + 1
+            break
+
+        try:
+            if conn is None:
+                conn = ConnectionManager(proxy.host, proxy.port)
+                conn.start()
+
+            call_start = time.perf_counter()
+            conn.receive_message()
+            now = time.perf_counter()
+            receive_times.append(now - call_start)
+            last_frame_time = now
+            decoded += 1
+            if error_time is not None:
+                recovery_times.append(now - error_time)
+                error_time = None
+
+        except Exception as e:
+            kind = type(e).__name__
+            errors[kind] = errors.get(kind, 0) + 1
+            if error_time is None:
+                error_time = time.perf_counter()
+            # the connection is lost, the client has to reconnect
+            if isinstance(e, ConnectionError) and conn is not None:
+                conn.close()
+                conn = None
+
+    duration = time.perf_counter() - time_start
+    if conn is not None:
+        conn.close()
+
+    return {'profile': asdict(profile), 'frames': decoded, 'duration_s': duration,
+            'frames_per_s': decoded / duration if duration else None,
+            'receive_ms': summarize(receive_times, scale=1000),
+            'errors': errors,
+            'recovery_ms': summarize(recovery_times, scale=1000)}
+
+
+def main():
+    """
+    Entry point of the benchmark.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Benchmark of the client message reassembly under network faults')
+    args_parser.add_argument('-f', '--frames', type=int, default=2000, help='Number of frames received per condition')
+    args_parser.add_argument('-c', '--conditions', type=str, nargs='*', default=list(CONDITIONS), choices=list(CONDITIONS), help='Benchmarked conditions')
+    args_parser.add_argument('--seed', type=int, default=0, help='Seed of the boards and of the fault profiles')
+    args_parser.add_argument('-q', '--quiet', action='store_true', help='Log only errors (the client warns about every coalesced message)')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Output file of the JSON report (stdout by default)')
+    args = args_parser.parse_args()
+
+    if args.quiet:
+        logger.setLevel(logging.ERROR)
+
+    frames = _make_frames(200, args.seed)
+    report = {'codec': bench_codec(frames * (args.frames // len(frames) + 1)), 'conditions': {}}
+
+    background = _BackgroundLoop()
+    background.start()
+    source = _FrameSource(frames)
+    background.run(source.start())
+    proxy = FaultProxy(DEFAULT_SERVER_IP_ADDRESS, source.port)
+    background.run(proxy.start())
+    try:
+        for name in args.conditions:
+            profile = FaultProfile(**{**asdict(CONDITIONS[name]), 'seed': args.seed})
+            count = min(args.frames, SLOW_CONDITION_FRAMES.get(name, args.frames))
+            print(f"Benchmarking '{name}' ({count} frames)", file=sys.stderr, flush=True)
+            report['conditions'][name] = bench_condition(proxy, profile, count)
+    finally:
+        background.run(proxy.stop())
+        source.server.close()
+        background.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+"""
+Fault-injection TCP proxy placed between the client and the server of Inverse Battleships.
+It forwards the traffic frame by frame (frames are terminated by MSG_TERMINATOR) and can fragment frames
+at arbitrary byte offsets, coalesce several frames into one segment, add latency and jitter,
+throttle the bandwidth and drop connections, so the message reassembly of the client can be exercised
+deterministically instead of relying on the network.
+
+By default, the faults are applied to the traffic from the server to the client.
+
+Run from the client/src directory:
+
+    python -m tools.fault_proxy -a 127.0.0.1:8081 -s 127.0.0.1:8080 --fragment 1 8 --latency 0.05
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import random
+import socket
+import time
+from dataclasses import dataclass, asdict
+from typing import List, Tuple
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+@dataclass
+class FaultProfile:
+    """
+    This class represents the faults applied to one direction of the proxied traffic.
+    """
+
+    fragment: Tuple[int, int] = None
+    """The range of sizes (bytes) of the fragments a segment is split into (None for no fragmentation)."""
+    fragment_gap: float = 0.001
+    """The delay in seconds between the fragments (so that they are not merged again by the TCP stack)."""
+    coalesce: int = 1
+    """The number of frames sent as one segment."""
+    coalesce_timeout: float = 0.05
+    """The time in seconds after which an incomplete batch of coalesced frames is sent."""
+    latency: float = 0
+    """The added one-way latency in seconds."""
+    jitter: float = 0
+    """The maximal random deviation of the latency in seconds (the order of the data is kept)."""
+    bandwidth: float = None
+    """The bandwidth limit in bytes per second (None for unlimited)."""
+    drop_after_frames: int = None
+    """The number of forwarded frames after which the connection is dropped (None for never)."""
+    drop_mid_frame: bool = False
+    """Whether to forward the first half of the next frame before dropping the connection."""
+    seed: int = None
+    """The seed of the random generator (None for random)."""
+
+
+@dataclass
+class ProxyStats:
+    """
+    This class represents the statistics of the proxy.
+    """
+
+    connections: int = 0
+    """The number of accepted connections."""
+    drops: int = 0
+    """The number of dropped connections."""
+    frames: int = 0
+    """The number of forwarded frames."""
+    segments: int = 0
+    """The number of written segments (fragments)."""
+    bytes: int = 0
+    """The number of forwarded bytes."""
+
+
+class _Drop:
+    """
+    Marker put into the delivery queue to drop the connection.
+    """
+
+
+class FaultProxy:
+    """
+    This class represents the asyncio fault-injection proxy.
+    """
+
+    READ_SIZE = 4096
+    """The maximal number of bytes read from a socket at once."""
+
+    QUEUE_SIZE = 64
+    """The maximal number of fragments waiting for delivery in one direction."""
+
+
+    def __init__(self, target_host: str, target_port: int, downstream: FaultProfile = None, upstream: FaultProfile = None,
+                 host: str = DEFAULT_SERVER_IP_ADDRESS, port: int = 0):
+        """
+        Initializes the proxy.
+
+        :param target_host: The address of the proxied server.
+        :type target_host: str
+        :param target_port: The port of the proxied server.
+        :type target_port: int
+        :param downstream: The faults applied to the traffic from the server to the client.
+        :type downstream: FaultProfile
+        :param upstream: The faults applied to the traffic from the client to the server.
+        :type upstream: FaultProfile
+        :param host: The address to listen on.
+        :type host: str
+        :param port: The port to listen on (0 for an ephemeral port).
+        :type port: int
+        """
+
+        self.target_host = target_host
+        self.target_port = target_port
+        self.downstream = downstream if downstream else FaultProfile()
+        """The faults applied to the traffic from the server to the client (may be changed between connections)."""
+        self.upstream = upstream if upstream else FaultProfile()
+        """The faults applied to the traffic from the client to the server (may be changed between connections)."""
+        self.stats = ProxyStats()
+        """The statistics of the proxy."""
+        self._host = host
+        self._port = port
+        self._server: asyncio.Server = None
+        self._connections = set()
+
+
+    @property
+    def host(self) -> str:
+        """
+        Getter for host.
+
+        :return: The address the proxy listens on.
+        :rtype: str
+        """
+
+        return self._host
+
+
+    @property
+    def port(self) -> int:
+        """
+        Getter for port.
+
+        :return: The port the proxy listens on (the assigned one if an ephemeral port was requested).
+        :rtype: int
+        """
+
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+
+        return self._port
+
+
+    async def start(self):
+        """
+        Starts listening for the clients.
+        """
+
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        logger.info(f"Fault proxy listening at {self._host}:{self.port}, forwarding to {self.target_host}:{self.target_port}")
+
+
+    async def stop(self):
+        """
+        Stops the proxy and closes all connections.
+        """
+
+        if self._server is None:
+            return
+
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+
+    async def __aenter__(self) -> 'FaultProxy':
+        """
+        Called when entering the context manager.
+        """
+
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """
+        Called when exiting the context manager.
+        """
+
+        await self.stop()
+
+
+    async def _handle_connection(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        """
+        Connects to the server and forwards the traffic of the client in both directions.
+
+        :param client_reader: The stream reader of the client connection.
+        :type client_reader: asyncio.StreamReader
+        :param client_writer: The stream writer of the client connection.
+        :type client_writer: asyncio.StreamWriter
+        """
+
+        task = asyncio.current_task()
+        self._connections.add(task)
+        self.stats.connections += 1
+        server_writer = None
+        try:
+            server_reader, server_writer = await asyncio.open_connection(self.target_host, self.target_port)
+            for writer in (client_writer, server_writer):
+                writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            writers = (client_writer, server_writer)
+            pumps = [asyncio.create_task(self._pump(client_reader, server_writer, self.upstream, writers)),
+                     asyncio.create_task(self._pump(server_reader, client_writer, self.downstream, writers))]
+            try:
+                await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for pump in pumps:
+                    pump.cancel()
+                await asyncio.gather(*pumps, return_exceptions=True)
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error proxying connection to {self.target_host}:{self.target_port}: {e}")
+
+        finally:
+            for writer in (client_writer, server_writer):
+                if writer is not None:
+                    writer.close()
+            self._connections.discard(task)
+
+
+    def _drop(self, writers: Tuple[asyncio.StreamWriter, ...]):
+        """
+        Drops the connection (both sides are aborted without a proper shutdown).
+
+        :param writers: The writers of both sides of the connection.
+        :type writers: Tuple[asyncio.StreamWriter, ...]
+        """
+
+        self.stats.drops += 1
+        logger.info("Fault proxy dropped a connection")
+        for writer in writers:
+            writer.transport.abort()
+
+
+    def _fragment(self, segment: bytes, profile: FaultProfile, rng: random.Random) -> List[bytes]:
+        """
+        Splits the segment into fragments at random offsets.
+
+        :param segment: The segment.
+        :type segment: bytes
+        :param profile: The fault profile.
+        :type profile: FaultProfile
+        :param rng: The random generator.
+        :type rng: random.Random
+        :return: The fragments.
+        :rtype: List[bytes]
+        """
+
+        if not profile.fragment:
+            return [segment]
+
+        res = []
+        i = 0
+        while i < len(segment):
+            size = rng.randint(*profile.fragment)
+            res.append(segment[i:i + size])
+            i += size
+
+        return res
+
+
+    async def _pump(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, profile: FaultProfile,
+                    writers: Tuple[asyncio.StreamWriter, ...]):
+        """
+        Reads the frames from one side of the connection and schedules their delivery to the other side.
+
+        :param reader: The stream reader of the source.
+        :type reader: asyncio.StreamReader
+        :param writer: The stream writer of the destination.
+        :type writer: asyncio.StreamWriter
+        :param profile: The faults applied to the traffic.
+        :type profile: FaultProfile
+        :param writers: The writers of both sides of the connection.
+        :type writers: Tuple[asyncio.StreamWriter, ...]
+        """
+
+        rng = random.Random(profile.seed)
+        # the bounded queue propagates the backpressure of the throttled delivery to the source
+        queue = asyncio.Queue(__class__.QUEUE_SIZE)
+        delivery = asyncio.create_task(self._deliver(queue, writer, profile, writers))
+        terminator = MSG_TERMINATOR.encode()
+        buffer = b""
+        batch: List[bytes] = []
+        frames = 0
+        last_delivery = 0
+
+        async def schedule(segment: bytes):
+            nonlocal last_delivery
+            for i, chunk in enumerate(self._fragment(segment, profile, rng)):
+                delay = max(0, profile.latency + rng.uniform(-profile.jitter, profile.jitter))
+                gap = profile.fragment_gap if i > 0 else 0
+                last_delivery = max(last_delivery + gap, time.monotonic() + delay)
+                await queue.put((last_delivery, chunk))
+
+        try:
+            # the delivery ends when the destination is closed
+            while not delivery.done():
+                if batch:
+                    try:
+                        data = await asyncio.wait_for(reader.read(__class__.READ_SIZE), profile.coalesce_timeout)
+                    except asyncio.TimeoutError:
+                        await schedule(b"".join(batch))
+                        batch.clear()
+                        continue
+                else:
+                    data = await reader.read(__class__.READ_SIZE)
+
+                if not data:
+                    break
+                buffer += data
+                while terminator in buffer:
+                    frame, buffer = buffer.split(terminator, 1)
+                    frame += terminator
+                    if profile.drop_after_frames is not None and frames >= profile.drop_after_frames:
+                        if batch:
+                            await schedule(b"".join(batch))
+                        if profile.drop_mid_frame:
+                            await schedule(frame[:len(frame) // 2])
+                        await queue.put((last_delivery, _Drop))
+                        await delivery
+                        return
+
+                    batch.append(frame)
+                    frames += 1
+                    if len(batch) >= profile.coalesce:
+                        await schedule(b"".join(batch))
+                        batch.clear()
+
+            else:
+                return
+
+            # forward the rest of the data before closing the connection
+            batch.append(buffer)
+            await schedule(b"".join(batch))
+            await queue.put((last_delivery, None))
+            await delivery
+
+        finally:
+            delivery.cancel()
+
+
+    async def _deliver(self, queue: asyncio.Queue, writer: asyncio.StreamWriter, profile: FaultProfile,
+                       writers: Tuple[asyncio.StreamWriter, ...]):
+        """
+        Writes the scheduled fragments to the destination at their delivery time.
+
+        :param queue: The queue of the scheduled fragments (delivery time, data).
+        :type queue: asyncio.Queue
+        :param writer: The stream writer of the destination.
+        :type writer: asyncio.StreamWriter
+        :param profile: The faults applied to the traffic.
+        :type profile: FaultProfile
+        :param writers: The writers of both sides of the connection.
+        :type writers: Tuple[asyncio.StreamWriter, ...]
+        """
+
+        terminator = MSG_TERMINATOR.encode()
+        while True:
+            deliver_at, chunk = await queue.get()
+            delay = deliver_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if chunk is _Drop:
+                self._drop(writers)
+                return
+            if chunk is None:
+                writer.write_eof()
+                return
+            if not chunk:
+                continue
+
+            if profile.bandwidth:
+                await asyncio.sleep(len(chunk) / profile.bandwidth)
+            writer.write(chunk)
+            await writer.drain()
+            self.stats.segments += 1
+            self.stats.bytes += len(chunk)
+            self.stats.frames += chunk.count(terminator)
+
+
+def main():
+    """
+    Entry point of the standalone fault proxy.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Fault-injection proxy for the game "Inverse Battleships"')
+    args_parser.add_argument('-a', '--address', type=str, default=f"{DEFAULT_SERVER_IP_ADDRESS}:0", help='Address to listen on (ip:port)')
+    args_parser.add_argument('-s', '--server', type=str, default=f"{DEFAULT_SERVER_IP_ADDRESS}:{DEFAULT_SERVER_PORT}", help='Address of the proxied server (ip:port)')
+    args_parser.add_argument('--upstream', action='store_true', help='Apply the faults to the traffic from the client to the server instead')
+    args_parser.add_argument('--fragment', type=int, nargs=2, metavar=('MIN', 'MAX'), default=None, help='Fragment the segments into MIN-MAX bytes')
+    args_parser.add_argument('--coalesce', type=int, default=1, help='Number of frames sent as one segment')
+    args_parser.add_argument('--latency', type=float, default=0, help='Added latency in seconds')
+    args_parser.add_argument('--jitter', type=float, default=0, help='Jitter of the latency in seconds')
+    args_parser.add_argument('--bandwidth', type=float, default=None, help='Bandwidth limit in bytes per second')
+    args_parser.add_argument('--drop_after', type=int, default=None, help='Drop the connection after the number of frames')
+    args_parser.add_argument('--drop_mid_frame', action='store_true', help='Forward half of the next frame before dropping')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the random generator')
+    args = args_parser.parse_args()
+
+    profile = FaultProfile(fragment=tuple(args.fragment) if args.fragment else None, coalesce=args.coalesce,
+                           latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+                           drop_after_frames=args.drop_after, drop_mid_frame=args.drop_mid_frame, seed=args.seed)
+    host, port = args.address.rsplit(':', 1)
+    target_host, target_port = args.server.rsplit(':', 1)
+    proxy = FaultProxy(target_host, int(target_port), host=host, port=int(port),
+                       **({'upstream': profile} if args.upstream else {'downstream': profile}))
+
+    async def run():
+        await proxy.start()
+        print(f"Fault proxy listening at {proxy.host}:{proxy.port} with {asdict(profile)}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Runs many bot players and monitoring probes in one process with the session host (see game/session_host.py).
+Bots are paired with each other: every even bot creates a lobby and the following bot joins it.
+The virtual surfaces of the bots can be saved as PNG snapshots at the end of the run.
+
+Run from the client/src directory (prints a JSON report):
+
+    python -m tools.host_sessions -a 127.0.0.1:8080 -b 100 -g 3 -p 2 -s 480x270 --snapshots /tmp/snapshots
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import uuid
+from game.bots import BOTS
+from game.session_host import SessionHost, BotSession, ProbeSession
+from const.paths import RESOURCES_DIR_PATH
+from const.server_communication import *
+
+
+def parse_size(text: str):
+    """
+    Parses the size of the virtual surface (WIDTHxHEIGHT).
+
+    :param text: The size.
+    :type text: str
+    :return: The size (width, height).
+    :rtype: Tuple[int, int]
+    """
+
+    try:
+        width, height = (int(x) for x in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{text}', expected WIDTHxHEIGHT")
+
+    return width, height
+
+
+def main():
+    """
+    Entry point of the session host.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Runs many bot players and monitoring probes in one process')
+    args_parser.add_argument('-a', '--address', type=str, default=f"{DEFAULT_SERVER_IP_ADDRESS}:{DEFAULT_SERVER_PORT}", help='Address of the game server (ip:port)')
+    args_parser.add_argument('-b', '--bots', type=int, default=10, help='Number of bot players (even)')
+    args_parser.add_argument('--bot', type=str, nargs='+', default=['random'], choices=list(BOTS), help='Bots of the players (assigned to the players in turn)')
+    args_parser.add_argument('-g', '--games', type=int, default=1, help='Number of games per pair of bots')
+    args_parser.add_argument('-p', '--probes', type=int, default=0, help='Number of monitoring probes')
+    args_parser.add_argument('--probe_interval', type=float, default=1, help='Interval between two probes in seconds')
+    args_parser.add_argument('--probe_duration', type=float, default=10, help='Duration of the probing in seconds')
+    args_parser.add_argument('-s', '--surface', type=parse_size, default=None, help='Size of the virtual surfaces of the bots (WIDTHxHEIGHT, none by default)')
+    args_parser.add_argument('--snapshots', type=str, default=None, help='Directory for the PNG snapshots of the virtual surfaces')
+    args_parser.add_argument('--tick_speed', type=int, default=30, help='Redraws of the virtual surfaces per second')
+    args_parser.add_argument('--timeout', type=float, default=10, help='Timeout of waiting for the opponent or the server in seconds')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the bots')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Path to the JSON report (stdout if not set)')
+    args = args_parser.parse_args()
+
+    if args.bots % 2 != 0:
+        args_parser.error("The number of bots must be even")
+    if args.snapshots and not args.surface:
+        args_parser.error("Snapshots require the virtual surfaces (-s)")
+
+    assets = None
+    if args.surface:
+        from util.assets_loader import AssetsLoader
+        SessionHost.init_virtual_display()
+        assets = AssetsLoader(RESOURCES_DIR_PATH).load()
+
+    ip, port = args.address.rsplit(':', 1)
+    host = SessionHost(ip, int(port), args.tick_speed, assets)
+    rng = random.Random(args.seed)
+    run_id = uuid.UUID(int=rng.getrandbits(128)).hex[:6]
+    for i in range(args.bots):
+        lobby_id = None if i % 2 == 0 else f"hb{run_id}_{i - 1}"
+        bot = BOTS[args.bot[i % len(args.bot)]](random.Random(rng.getrandbits(64)))
+        host.add(BotSession(f"hb{run_id}_{i}", bot, lobby_id,
+                            args.games, args.timeout, args.surface))
+    for i in range(args.probes):
+        host.add(ProbeSession(f"hp{run_id}_{i}", args.probe_interval, args.probe_duration))
+
+    try:
+        report = asyncio.run(host.run())
+    except KeyboardInterrupt:
+        return
+
+    if args.snapshots:
+        import pygame
+        os.makedirs(args.snapshots, exist_ok=True)
+        for session in host.sessions:
+            if session.surface is not None:
+                pygame.image.save(session.surface, os.path.join(args.snapshots, f"{session.nickname}.png"))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""
+Load generator for the game server of Inverse Battleships.
+It simulates many players in a single process using the asyncio connection manager (the same
+protocol codec and command sequences as the client) and reports the latencies of the
+connect/login/pair/ready/turn phases, throughput and error rates as JSON.
+
+Players are paired deterministically: every even player creates a lobby and the following
+player polls the lobby list until the lobby appears and joins it.
+
+Run from the client/src directory:
+
+    python -m tools.loadgen -a 127.0.0.1:8080 -p 100 -r 20 -t 0.1
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Dict, List, Set, Tuple
+from game.async_connection_manager import AsyncConnectionManager
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+from util.stats import summarize
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+PHASES = ('connect', 'login', 'pair', 'ready', 'turn', 'game')
+"""The measured phases of the player's life cycle."""
+
+ROUND_COOLDOWN = 0.5
+"""The pause in seconds between two games of the same player (the server deletes finished lobbies asynchronously)."""
+
+
+@dataclass
+class LoadGenConfig:
+    """
+    This class represents the configuration of the load generator.
+    """
+
+    server_ip: str = DEFAULT_SERVER_IP_ADDRESS
+    """The game server IP address."""
+    server_port: int = int(DEFAULT_SERVER_PORT)
+    """The game server port."""
+    players: int = 10
+    """The number of simulated players (must be even)."""
+    arrival_rate: float = 0
+    """The mean arrival rate of the players in players per second (Poisson arrivals), 0 for all at once."""
+    think_time: float = 0.1
+    """The mean think time of a player before an action in seconds."""
+    think_jitter: float = 0.5
+    """The relative jitter of the think time (0.5 => think time * <0.5, 1.5>)."""
+    games: int = 1
+    """The number of games played by each pair of players."""
+    timeout: float = 10
+    """The timeout in seconds of a single phase (connecting, pairing, waiting for a turn, ...)."""
+    lobby_poll_interval: float = 0.2
+    """The interval in seconds between two lobby list requests of a joining player."""
+    seed: int = None
+    """The seed of the random generators (None for random)."""
+
+
+class LoadGenStats:
+    """
+    This class collects the measurements of all simulated players.
+    """
+
+
+    def __init__(self):
+        """
+        Initializes the statistics.
+        """
+
+        self.latencies: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+        """The measured latencies in seconds per phase."""
+        self.attempts: Counter = Counter()
+        """The number of attempts per phase."""
+        self.errors: Counter = Counter()
+        """The number of errors per phase."""
+        self.error_kinds: Counter = Counter()
+        """The number of errors per phase and exception type."""
+        self.outcomes: Counter = Counter()
+        """The number of game outcomes (WIN, LOST, TKO) as seen by the players."""
+        self.actions = 0
+        """The number of sent actions."""
+        self.frames_in = 0
+        """The number of received messages."""
+        self.frames_out = 0
+        """The number of sent messages."""
+        self.bytes_in = 0
+        """The number of received bytes."""
+        self.bytes_out = 0
+        """The number of sent bytes."""
+
+
+    async def measure(self, phase: str, awaitable: Awaitable) -> Any:
+        """
+        Awaits the awaitable and records its duration (or error) for the given phase.
+
+        :param phase: The measured phase.
+        :type phase: str
+        :param awaitable: The awaitable to measure.
+        :type awaitable: Awaitable
+        :return: The result of the awaitable.
+        :rtype: Any
+        """
+
+        self.attempts[phase] += 1
+        start = time.perf_counter()
+        try:
+            res = await awaitable
+        except Exception as e:
+            self.record_error(phase, e)
+            raise e
+
+        self.latencies[phase].append(time.perf_counter() - start)
+        return res
+
+
+    def record_error(self, phase: str, e: Exception):
+        """
+        Records an error of the given phase.
+
+        :param phase: The phase in which the error occurred.
+        :type phase: str
+        :param e: The error.
+        :type e: Exception
+        """
+
+        self.errors[phase] += 1
+        self.error_kinds[f"{phase}.{type(e).__name__}"] += 1
+
+
+    def report(self, config: LoadGenConfig, duration: float) -> Dict[str, Any]:
+        """
+        Returns the report of the measurements.
+
+        :param config: The configuration of the run.
+        :type config: LoadGenConfig
+        :param duration: The wall-clock duration of the run in seconds.
+        :type duration: float
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        games_completed = sum(self.outcomes.values()) / 2      # each game is seen by both players
+        return {
+            'config': asdict(config),
+            'duration_s': duration,
+            'latency_ms': {phase: summarize(samples, scale=1000) for phase, samples in self.latencies.items()},
+            'throughput': {
+                'games_per_s': games_completed / duration if duration else 0,
+                'actions_per_s': self.actions / duration if duration else 0,
+                'frames_per_s': (self.frames_in + self.frames_out) / duration if duration else 0,
+                'bytes_per_s': (self.bytes_in + self.bytes_out) / duration if duration else 0,
+            },
+            'totals': {
+                'games_completed': games_completed,
+                'outcomes': dict(self.outcomes),
+                'actions': self.actions,
+                'frames_in': self.frames_in,
+                'frames_out': self.frames_out,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            },
+            'errors': {
+                'by_phase': dict(self.errors),
+                'by_kind': dict(self.error_kinds),
+                'rate': {phase: self.errors[phase] / self.attempts[phase] for phase in self.attempts},
+            },
+        }
+
+
+class SimulatedPlayer:
+    """
+    This class represents a single simulated player.
+    """
+
+
+    def __init__(self, config: LoadGenConfig, stats: LoadGenStats, nickname: str, lobby_id: str, rng: random.Random):
+        """
+        Initializes the simulated player.
+
+        :param config: The configuration of the load generator.
+        :type config: LoadGenConfig
+        :param stats: The shared statistics.
+        :type stats: LoadGenStats
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param lobby_id: The lobby to join or None if the player creates the lobby.
+        :type lobby_id: str
+        :param rng: The random generator of the player.
+        :type rng: random.Random
+        """
+
+        self._config = config
+        self._stats = stats
+        self._nickname = nickname
+        self._lobby_id = lobby_id
+        self._rng = rng
+
+
+    async def run(self):
+        """
+        Runs the life cycle of the player: connect, log in, play the configured number of games and leave.
+        """
+
+        conn = AsyncConnectionManager(self._config.server_ip, self._config.server_port)
+        try:
+            await self._stats.measure('connect', conn.start(self._config.timeout))
+            await self._stats.measure('login', self._login(conn))
+            for i in range(self._config.games):
+                if i > 0:
+                    await asyncio.sleep(ROUND_COOLDOWN)
+                await self._stats.measure('pair', self._pair(conn))
+                await self._stats.measure('game', self._play(conn))
+            await conn.stop()
+
+        except Exception as e:
+            logger.warning(f"Simulated player '{self._nickname}' failed: {e}")
+
+        finally:
+            self._stats.frames_in += conn.traffic.frames_in
+            self._stats.frames_out += conn.traffic.frames_out
+            self._stats.bytes_in += conn.traffic.bytes_in
+            self._stats.bytes_out += conn.traffic.bytes_out
+            await conn.close()
+
+
+    async def _login(self, conn: AsyncConnectionManager):
+        """
+        Logs in to the server.
+
+        :param conn: The connection to the server.
+        :type conn: AsyncConnectionManager
+        """
+
+        if not await conn.login(self._nickname):
+            raise ConnectionError(f"Login of '{self._nickname}' refused")
+
+
+    async def _pair(self, conn: AsyncConnectionManager) -> str:
+        """
+        Creates or joins the lobby and waits for the opponent.
+
+        :param conn: The connection to the server.
+        :type conn: AsyncConnectionManager
+        :return: The opponent's nickname.
+        :rtype: str
+        """
+
+        if self._lobby_id is None:
+            await conn.get_lobby()
+        else:
+            deadline = time.perf_counter() + self._config.timeout
+            while self._lobby_id not in await conn.get_lobbies():
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"Lobby '{self._lobby_id}' did not appear")
+                await asyncio.sleep(self._config.lobby_poll_interval)
+            await conn.join_lobby(self._lobby_id)
+
+        return await conn.check_for_players(self._config.timeout)
+
+
+    def _choose_action(self, board: List[List[int]], tried: Set[Tuple[int, int]]) -> Tuple[int, int]:
+        """
+        Chooses a random free cell of the board that was not tried yet
+        (empty cells stay free on the board after an action).
+
+        :param board: The board.
+        :type board: List[List[int]]
+        :param tried: The cells already tried in the game.
+        :type tried: Set[Tuple[int, int]]
+        :return: The chosen cell (row, column).
+        :rtype: Tuple[int, int]
+        """
+
+        free = [(r, c) for r, row in enumerate(board) for c, cell in enumerate(row) if cell == BOARD_FREE_CELL]
+        untried = [cell for cell in free if cell not in tried]
+        action = self._rng.choice(untried if untried else free)
+        tried.add(action)
+        return action
+
+
+    async def _think(self):
+        """
+        Simulates the think time of the player.
+        """
+
+        if self._config.think_time <= 0:
+            return
+
+        jitter = self._config.think_jitter
+        await asyncio.sleep(self._config.think_time * self._rng.uniform(1 - jitter, 1 + jitter))
+
+
+    async def _play(self, conn: AsyncConnectionManager):
+        """
+        Plays a single game until it ends.
+
+        :param conn: The connection to the server.
+        :type conn: AsyncConnectionManager
+        """
+
+        board, player_on_turn, tko = await self._stats.measure('ready', conn.game_ready(self._config.timeout))
+        if tko:
+            self._stats.outcomes[CMD_TKO] += 1
+            return
+
+        tried = set()
+        action_sent_at = None
+        while True:
+            if player_on_turn == self._nickname:
+                await self._think()
+                self._stats.attempts['turn'] += 1
+                await conn.send_action(self._choose_action(board, tried))
+                self._stats.actions += 1
+                action_sent_at = time.perf_counter()
+                player_on_turn = None
+
+            try:
+                res = await conn.receive_message(self._config.timeout)
+            except Exception as e:
+                if action_sent_at is not None:
+                    self._stats.record_error('turn', e)
+                raise e
+
+            if res.command == CMD_PING:
+                await conn.pong()
+            elif res.command == CMD_BOARD:
+                board = res.params[PARAM_BOARD_INDEX]
+                if action_sent_at is not None:
+                    self._stats.latencies['turn'].append(time.perf_counter() - action_sent_at)
+                    action_sent_at = None
+            elif res.command == CMD_PLAYER_TURN:
+                player_on_turn = res.params[PARAM_PLAYER_ON_TURN_INDEX]
+            elif res.command == CMD_WAIT:
+                await conn.wait_ackw()
+            elif res.command in (CMD_GAME_WIN, CMD_GAME_LOSE, CMD_TKO):
+                self._stats.outcomes[res.command] += 1
+                return
+            else:
+                raise ConnectionError(f"Unexpected message during the game: {res.command}")
+
+
+async def run_load(config: LoadGenConfig) -> Dict[str, Any]:
+    """
+    Runs the load generator with the given configuration.
+
+    :param config: The configuration.
+    :type config: LoadGenConfig
+    :return: The report (JSON serializable).
+    :rtype: Dict[str, Any]
+    """
+
+    if config.players % 2 != 0:
+        raise ValueError("The number of players must be even")
+
+    rng = random.Random(config.seed)
+    run_id = uuid.UUID(int=rng.getrandbits(128)).hex[:6]
+    stats = LoadGenStats()
+    players = []
+    for i in range(config.players):
+        nickname = f"lg{run_id}_{i}"
+        lobby_id = None if i % 2 == 0 else f"lg{run_id}_{i - 1}"
+        players.append(SimulatedPlayer(config, stats, nickname, lobby_id, random.Random(rng.getrandbits(64))))
+
+    start = time.perf_counter()
+    tasks = []
+    for player in players:
+        tasks.append(asyncio.create_task(player.run()))
+        if config.arrival_rate > 0:
+            await asyncio.sleep(rng.expovariate(config.arrival_rate))
+    await asyncio.gather(*tasks)
+
+    return stats.report(config, time.perf_counter() - start)
+
+
+def main():
+    """
+    Entry point of the load generator.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Load generator for the game server of "Inverse Battleships"')
+    args_parser.add_argument('-a', '--address', type=str, default=f"{DEFAULT_SERVER_IP_ADDRESS}:{DEFAULT_SERVER_PORT}", help='Address of the game server (ip:port)')
+    args_parser.add_argument('-p', '--players', type=int, default=LoadGenConfig.players, help='Number of simulated players (even)')
+    args_parser.add_argument('-r', '--arrival_rate', type=float, default=LoadGenConfig.arrival_rate, help='Mean arrival rate in players per second (0 = all at once)')
+    args_parser.add_argument('-t', '--think_time', type=float, default=LoadGenConfig.think_time, help='Mean think time before an action in seconds')
+    args_parser.add_argument('-j', '--think_jitter', type=float, default=LoadGenConfig.think_jitter, help='Relative jitter of the think time')
+    args_parser.add_argument('-g', '--games', type=int, default=LoadGenConfig.games, help='Number of games per pair of players')
+    args_parser.add_argument('--timeout', type=float, default=LoadGenConfig.timeout, help='Timeout of a single phase in seconds')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the random generators')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Path to the JSON report (stdout if not set)')
+    args = args_parser.parse_args()
+
+    ip, port = args.address.rsplit(':', 1)
+    config = LoadGenConfig(server_ip=ip, server_port=int(port), players=args.players, arrival_rate=args.arrival_rate,
+                           think_time=args.think_time, think_jitter=args.think_jitter, games=args.games,
+                           timeout=args.timeout, seed=args.seed)
+    try:
+        report = asyncio.run(run_load(config))
+    except ValueError as e:
+        args_parser.error(str(e))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,913 @@
+"""
+Reference implementation of the game server of Inverse Battleships on asyncio.
+It follows the behaviour of the Go server (handshake, lobbies, pairing, BOARD/TURN broadcasting,
+WAIT/CONTINUE reconnection and TKO) but is event driven and runs in-process on an ephemeral port,
+so it can be used for offline testing and benchmarking of the client.
+
+Usage from asyncio code:
+
+    async with ReferenceServer() as server:
+        conn = AsyncConnectionManager(server.host, server.port)
+
+Usage from synchronous code (the server runs in its own thread):
+
+    with ReferenceServerThread() as server:
+        conn = ConnectionManager(server.host, server.port)
+
+Run from the client/src directory as a standalone server:
+
+    python -m tools.ref_server -a 127.0.0.1:8080
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+from game import rules
+from util.msg_parser import to_net_message, from_net_message, escape_net_message, board_to_net
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+@dataclass
+class LobbyState:
+    """
+    This class represents the states of a lobby.
+    """
+
+    WAITING = 0
+    """The lobby waits for the second player."""
+    UNREADY = 1
+    """The lobby is paired and waits for both players to be ready."""
+    PLAYING = 2
+    """The game is in progress."""
+    INTERRUPTED = 3
+    """The game is paused until the missing players reconnect."""
+    CLOSED = 4
+    """The lobby was finished or failed and was removed."""
+
+
+@dataclass
+class Lobby:
+    """
+    This class represents a lobby of the reference server.
+    """
+
+    id: str
+    """The lobby ID (nickname of the creator)."""
+    player01: str
+    """The nickname of the first player."""
+    player02: str = None
+    """The nickname of the second player."""
+    state: int = LobbyState.WAITING
+    """The state of the lobby."""
+    ready: Set[str] = field(default_factory=set)
+    """The players that are ready."""
+    board: List[List[int]] = None
+    """The server-side board."""
+    player_on_turn: str = None
+    """The nickname of the player on turn."""
+    missing: Set[str] = field(default_factory=set)
+    """The players that lost connection during the game."""
+    reconnect_timer: asyncio.TimerHandle = None
+    """The timer that fails the lobby if the missing players do not reconnect in time."""
+
+
+    @property
+    def players(self) -> List[str]:
+        """
+        Getter for players.
+
+        :return: The nicknames of the players in the lobby.
+        :rtype: List[str]
+        """
+
+        return [player for player in (self.player01, self.player02) if player]
+
+
+    def get_opponent(self, nickname: str) -> str:
+        """
+        Returns the opponent of the player.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :return: The nickname of the opponent.
+        :rtype: str
+        """
+
+        return self.player02 if nickname == self.player01 else self.player01
+
+
+class _Disconnect(Exception):
+    """
+    Raised by command handlers when the client has to be disconnected.
+    """
+
+
+class _ClientSession:
+    """
+    This class represents a connection of a single client.
+    """
+
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Initializes the client session.
+
+        :param reader: The stream reader of the connection.
+        :type reader: asyncio.StreamReader
+        :param writer: The stream writer of the connection.
+        :type writer: asyncio.StreamWriter
+        """
+
+        self.reader = reader
+        self.writer = writer
+        self.nickname: str = None
+        self.awaiting_pong = False
+        peer = writer.get_extra_info('peername')
+        self.address = f"{peer[0]}:{peer[1]}" if peer else "unknown"
+
+
+class ReferenceServer:
+    """
+    This class represents the asyncio reference server of the game Inverse Battleships.
+    """
+
+    KEEP_ALIVE_TIMEOUT = 5
+    """The idle time in seconds after which the client is pinged."""
+
+    WHOLE_MSG_TIMEOUT = 5
+    """The timeout in seconds for receiving a whole message (handshake, pong)."""
+
+    PLAYER_RECONNECT_TIMEOUT = 60
+    """The time in seconds the lobby waits for a disconnected player."""
+
+    MAX_MSG_LENGTH = 1024
+    """The maximum length of a message from the client."""
+
+
+    def __init__(self, host: str = DEFAULT_SERVER_IP_ADDRESS, port: int = 0, seed: int = None,
+                 keep_alive_timeout: float = KEEP_ALIVE_TIMEOUT, reconnect_timeout: float = PLAYER_RECONNECT_TIMEOUT):
+        """
+        Initializes the reference server.
+
+        :param host: The address to listen on.
+        :type host: str
+        :param port: The port to listen on (0 for an ephemeral port).
+        :type port: int
+        :param seed: The seed of the board generator (None for random).
+        :type seed: int
+        :param keep_alive_timeout: The idle time in seconds after which the client is pinged (None to disable).
+        :type keep_alive_timeout: float
+        :param reconnect_timeout: The time in seconds the lobby waits for a disconnected player.
+        :type reconnect_timeout: float
+        """
+
+        self._host = host
+        self._port = port
+        self._rng = random.Random(seed)
+        self._keep_alive_timeout = keep_alive_timeout
+        self._reconnect_timeout = reconnect_timeout
+        self._server: asyncio.Server = None
+        self._sessions: Dict[str, _ClientSession] = {}
+        self._lobbies: Dict[str, Lobby] = {}
+        self._player_to_lobby: Dict[str, Lobby] = {}
+        self._connections: Set[asyncio.Task] = set()
+        self.games_started = 0
+        """The number of started games."""
+        self.games_finished = 0
+        """The number of games finished by a win."""
+
+
+    @property
+    def host(self) -> str:
+        """
+        Getter for host.
+
+        :return: The address the server listens on.
+        :rtype: str
+        """
+
+        return self._host
+
+
+    @property
+    def port(self) -> int:
+        """
+        Getter for port.
+
+        :return: The port the server listens on (the assigned one if an ephemeral port was requested).
+        :rtype: int
+        """
+
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+
+        return self._port
+
+
+    @property
+    def address(self) -> str:
+        """
+        Getter for address.
+
+        :return: The address of the server (host:port).
+        :rtype: str
+        """
+
+        return f"{self.host}:{self.port}"
+
+
+    @property
+    def lobbies(self) -> Dict[str, Lobby]:
+        """
+        Getter for lobbies.
+
+        :return: The current lobbies by their IDs.
+        :rtype: Dict[str, Lobby]
+        """
+
+        return self._lobbies
+
+
+    async def start(self):
+        """
+        Starts listening for the clients.
+        """
+
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        logger.info(f"Reference server listening at {self.address}")
+
+
+    async def stop(self):
+        """
+        Stops the server and closes all connections.
+        """
+
+        if self._server is None:
+            return
+
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        for lobby in self._lobbies.values():
+            if lobby.reconnect_timer:
+                lobby.reconnect_timer.cancel()
+        self._server = None
+        logger.info("Reference server stopped")
+
+
+    async def serve_forever(self):
+        """
+        Starts the server (if not started) and serves until cancelled.
+        """
+
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+
+    async def __aenter__(self) -> 'ReferenceServer':
+        """
+        Called when entering the context manager.
+        """
+
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """
+        Called when exiting the context manager.
+        """
+
+        await self.stop()
+
+
+    def _send(self, session: _ClientSession, parts: List[str]):
+        """
+        Sends a message to the client (the data are flushed by the event loop).
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :param parts: The parts of the message.
+        :type parts: List[str]
+        """
+
+        if session.writer.is_closing():
+            return
+
+        message = to_net_message(parts)
+        session.writer.write(message.encode())
+        logger.debug(f"Sent message to {session.address}: '{escape_net_message(message)}'")
+
+
+    def _send_to(self, nickname: str, parts: List[str]):
+        """
+        Sends a message to the connected player.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param parts: The parts of the message.
+        :type parts: List[str]
+        """
+
+        session = self._sessions.get(nickname)
+        if session is not None:
+            self._send(session, parts)
+
+
+    async def _read_command(self, session: _ClientSession, timeout: float) -> List[str]:
+        """
+        Reads a whole message from the client and returns its parts (command and parameters).
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :param timeout: The timeout in seconds (None for no timeout).
+        :type timeout: float
+        :return: The parts of the message.
+        :rtype: List[str]
+        :raises TimeoutError: If no whole message was received in time.
+        :raises _Disconnect: If the connection was closed or the message is not valid.
+        """
+
+        try:
+            data = await asyncio.wait_for(session.reader.readuntil(MSG_TERMINATOR.encode()), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError) as e:
+            raise _Disconnect(f"connection lost: {e}")
+
+        message = data.decode(errors='replace')
+        logger.debug(f"Received message from {session.address}: '{escape_net_message(message)}'")
+        if len(message) > __class__.MAX_MSG_LENGTH:
+            raise _Disconnect("message too long")
+        try:
+            parts = from_net_message(message)
+        except ValueError as e:
+            raise _Disconnect(f"invalid message: {e}")
+        if not parts or not parts[PART_CMD_INDEX]:
+            raise _Disconnect("invalid message: missing command")
+
+        return parts
+
+
+    async def _handshake(self, session: _ClientSession) -> str:
+        """
+        Performs the handshake (HAND;nickname - SHAKE - DEAL) with the client.
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :return: The nickname of the client.
+        :rtype: str
+        :raises _Disconnect: If the handshake fails.
+        """
+
+        try:
+            parts = await self._read_command(session, __class__.WHOLE_MSG_TIMEOUT)
+        except TimeoutError:
+            raise _Disconnect("handshake not received in time")
+        if parts[PART_CMD_INDEX] != CMD_TRY_VALID or len(parts) < 2:
+            raise _Disconnect("invalid handshake")
+
+        nickname = parts[1]
+        if not nickname or len(nickname) > PLAYER_NICKNAME_MAX_LENGTH or not nickname.isprintable():
+            raise _Disconnect(f"invalid nickname '{nickname}'")
+        if nickname in self._sessions:
+            raise _Disconnect(f"nickname '{nickname}' is already taken")
+
+        self._send(session, [CMD_ACKW_VALID])
+        try:
+            parts = await self._read_command(session, __class__.WHOLE_MSG_TIMEOUT)
+        except TimeoutError:
+            raise _Disconnect("handshake confirmation not received in time")
+        if parts[PART_CMD_INDEX] != CMD_CONFIRM_VALID:
+            raise _Disconnect("invalid handshake confirmation")
+        if nickname in self._sessions:
+            raise _Disconnect(f"nickname '{nickname}' is already taken")
+
+        return nickname
+
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handles a connection of a client for its whole lifetime.
+
+        :param reader: The stream reader of the connection.
+        :type reader: asyncio.StreamReader
+        :param writer: The stream writer of the connection.
+        :type writer: asyncio.StreamWriter
+        """
+
+        task = asyncio.current_task()
+        self._connections.add(task)
+        session = _ClientSession(reader, writer)
+        logger.info(f"Client {session.address} connected")
+        try:
+            session.nickname = await self._handshake(session)
+            self._sessions[session.nickname] = session
+            logger.info(f"Client {session.address} authenticated as '{session.nickname}'")
+            self._try_reconnect(session.nickname)
+            await self._serve_client(session)
+
+        except _Disconnect as e:
+            logger.info(f"Disconnecting client {session.address} ('{session.nickname}'): {e}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error handling client {session.address} ('{session.nickname}'): {e}")
+
+        finally:
+            if session.nickname is not None and self._sessions.get(session.nickname) is session:
+                del self._sessions[session.nickname]
+                self._on_player_lost(session.nickname)
+            writer.close()
+            self._connections.discard(task)
+            logger.info(f"Client {session.address} disconnected")
+
+
+    async def _serve_client(self, session: _ClientSession):
+        """
+        Reads and handles the commands of an authenticated client; pings the client when idle.
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :raises _Disconnect: If the client has to be disconnected.
+        """
+
+        while True:
+            timeout = __class__.WHOLE_MSG_TIMEOUT if session.awaiting_pong else self._keep_alive_timeout
+            try:
+                parts = await self._read_command(session, timeout)
+            except TimeoutError:
+                if session.awaiting_pong:
+                    raise _Disconnect("client is not alive")
+                self._send(session, [CMD_PING])
+                session.awaiting_pong = True
+                continue
+
+            await session.writer.drain()
+            self._handle_command(session, parts[PART_CMD_INDEX], parts[PART_CMD_INDEX + 1:])
+            await session.writer.drain()
+
+
+    def _handle_command(self, session: _ClientSession, command: str, params: List[str]):
+        """
+        Handles a command of an authenticated client.
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :param command: The command.
+        :type command: str
+        :param params: The parameters of the command.
+        :type params: List[str]
+        :raises _Disconnect: If the client has to be disconnected.
+        """
+
+        nickname = session.nickname
+        lobby = self._player_to_lobby.get(nickname)
+
+        if command == CMD_PING:
+            self._send(session, [CMD_PONG])
+
+        elif command == CMD_PONG:
+            session.awaiting_pong = False
+
+        elif command == CMD_LEAVE:
+            self._send(session, [CMD_CONFIRM_LEAVE])
+            if lobby is not None:
+                self._kick_player(nickname)
+            raise _Disconnect("client left")
+
+        elif command in (CMD_LOBBIES, CMD_LOBBY_CREATE, CMD_LOBBY):
+            if lobby is not None:
+                self._kick_player(nickname)
+                raise _Disconnect(f"{command} requested while in lobby '{lobby.id}'")
+            self._handle_idle_command(session, command, params)
+
+        elif command == CMD_READY:
+            if lobby is None or lobby.state != LobbyState.UNREADY or nickname in lobby.ready:
+                raise _Disconnect("unexpected ready message")
+            lobby.ready.add(nickname)
+            if len(lobby.ready) == 2:
+                self._start_game(lobby)
+
+        elif command == CMD_TURN_ACTION:
+            if lobby is None:
+                raise _Disconnect("action outside of a lobby")
+            if lobby.state == LobbyState.INTERRUPTED:
+                logger.warning(f"Player '{nickname}' tried to make a move in an interrupted lobby")
+                return
+            if lobby.state != LobbyState.PLAYING:
+                self._kick_player(nickname)
+                raise _Disconnect("action in a lobby that is not playing")
+            if lobby.player_on_turn != nickname:
+                logger.warning(f"Player '{nickname}' tried to make a move out of turn")
+                return
+            self._handle_action(lobby, nickname, params)
+
+        elif command == CMD_WAITING:
+            if lobby is None or lobby.state != LobbyState.INTERRUPTED:
+                raise _Disconnect("unexpected waiting message")
+            logger.info(f"Player '{nickname}' acknowledged waiting in lobby '{lobby.id}'")
+
+        else:
+            raise _Disconnect(f"unknown command '{command}'")
+
+
+    def _handle_idle_command(self, session: _ClientSession, command: str, params: List[str]):
+        """
+        Handles the lobby commands of a client that is not in a lobby (LOBBIES, CREATE, BRING_IT).
+
+        :param session: The client session.
+        :type session: _ClientSession
+        :param command: The command.
+        :type command: str
+        :param params: The parameters of the command.
+        :type params: List[str]
+        :raises _Disconnect: If the client has to be disconnected.
+        """
+
+        nickname = session.nickname
+        if command == CMD_LOBBIES:
+            waiting = [lobby.id for lobby in self._lobbies.values() if lobby.state == LobbyState.WAITING]
+            self._send(session, [CMD_LOBBIES_RESP] + waiting)
+
+        elif command == CMD_LOBBY_CREATE:
+            if nickname in self._lobbies:
+                raise _Disconnect(f"lobby '{nickname}' already exists")
+            lobby = Lobby(id=nickname, player01=nickname)
+            self._lobbies[lobby.id] = lobby
+            self._player_to_lobby[nickname] = lobby
+            self._send(session, [CMD_LOBBY_PAIRING, lobby.id])
+
+        else:
+            if not params or not params[0]:
+                raise _Disconnect("invalid join lobby message")
+            lobby = self._lobbies.get(params[0])
+            if lobby is None:
+                raise _Disconnect(f"lobby '{params[0]}' not found")
+            # the Go server ignores join requests of full lobbies without a response
+            if lobby.state != LobbyState.WAITING or lobby.player02 is not None:
+                logger.warning(f"Player '{nickname}' tried to join lobby '{lobby.id}' that is not waiting")
+                return
+
+            lobby.player02 = nickname
+            lobby.state = LobbyState.UNREADY
+            self._player_to_lobby[nickname] = lobby
+            self._send(session, [CMD_LOBBY_PAIRING, lobby.id])
+            self._send_to(lobby.player01, [CMD_LOBBY_PAIRED, lobby.player02])
+            self._send_to(lobby.player02, [CMD_LOBBY_PAIRED, lobby.player01])
+
+
+    def _send_boards(self, lobby: Lobby):
+        """
+        Sends the player-relative boards to the players of the lobby.
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        """
+
+        self._send_to(lobby.player01, [CMD_BOARD, board_to_net(rules.get_player_board(lobby.board, True))])
+        self._send_to(lobby.player02, [CMD_BOARD, board_to_net(rules.get_player_board(lobby.board, False))])
+
+
+    def _start_game(self, lobby: Lobby):
+        """
+        Starts the game in the lobby (both players are ready).
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        """
+
+        lobby.board = rules.generate_board(self._rng)
+        lobby.state = LobbyState.PLAYING
+        lobby.player_on_turn = lobby.player01
+        self.games_started += 1
+        self._send_boards(lobby)
+        for player in lobby.players:
+            self._send_to(player, [CMD_PLAYER_TURN, lobby.player_on_turn])
+
+
+    def _handle_action(self, lobby: Lobby, nickname: str, params: List[str]):
+        """
+        Handles an action of the player on turn.
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        :param params: The parameters of the action.
+        :type params: List[str]
+        :raises _Disconnect: If the action is not valid.
+        """
+
+        try:
+            row, col = [int(n) for n in params[0].split(NUM_DELIMITER)]
+            if not (0 <= row < BOARD_SIDE_SIZE and 0 <= col < BOARD_SIDE_SIZE):
+                raise ValueError(f"position {row}:{col} is out of the board")
+            rules.apply_move(lobby.board, nickname == lobby.player01, row, col)
+        except (ValueError, IndexError) as e:
+            self._kick_player(nickname)
+            raise _Disconnect(f"invalid action: {e}")
+
+        self._send_boards(lobby)
+        has_finished, is_player01_winner = rules.get_game_result(lobby.board)
+        if has_finished:
+            winner = lobby.player01 if is_player01_winner else lobby.player02
+            for player in lobby.players:
+                self._send_to(player, [CMD_GAME_WIN if player == winner else CMD_GAME_LOSE])
+            self.games_finished += 1
+            self._close_lobby(lobby, send_tko=False)
+            return
+
+        lobby.player_on_turn = lobby.get_opponent(nickname)
+        for player in lobby.players:
+            self._send_to(player, [CMD_PLAYER_TURN, lobby.player_on_turn])
+
+
+    def _close_lobby(self, lobby: Lobby, send_tko: bool = True):
+        """
+        Removes the lobby and optionally informs the remaining players by TKO.
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        :param send_tko: Whether to send TKO to the connected players.
+        :type send_tko: bool
+        """
+
+        if lobby.reconnect_timer:
+            lobby.reconnect_timer.cancel()
+            lobby.reconnect_timer = None
+        lobby.state = LobbyState.CLOSED
+        for player in lobby.players:
+            if send_tko:
+                self._send_to(player, [CMD_TKO])
+            self._player_to_lobby.pop(player, None)
+        self._lobbies.pop(lobby.id, None)
+        logger.info(f"Lobby '{lobby.id}' has been closed")
+
+
+    def _kick_player(self, nickname: str):
+        """
+        Removes the player from the lobby; the lobby fails and the opponent receives TKO.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        """
+
+        lobby = self._player_to_lobby.pop(nickname, None)
+        if lobby is None:
+            return
+
+        if lobby.player01 == nickname:
+            lobby.player01 = None
+        elif lobby.player02 == nickname:
+            lobby.player02 = None
+        logger.info(f"Player '{nickname}' has been kicked from lobby '{lobby.id}'")
+        self._close_lobby(lobby)
+
+
+    def _on_player_lost(self, nickname: str):
+        """
+        Handles the loss of connection of the player: a running game is interrupted
+        (WAIT to the opponent), otherwise the lobby fails.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        """
+
+        lobby = self._player_to_lobby.get(nickname)
+        if lobby is None:
+            return
+
+        if lobby.state not in (LobbyState.PLAYING, LobbyState.INTERRUPTED):
+            logger.info(f"Player '{nickname}' disconnected from lobby '{lobby.id}'. Lobby fails.")
+            self._kick_player(nickname)
+            return
+
+        logger.info(f"Player '{nickname}' disconnected from lobby '{lobby.id}'. Lobby is interrupted.")
+        lobby.missing.add(nickname)
+        lobby.state = LobbyState.INTERRUPTED
+        self._interrupt(lobby)
+
+
+    def _interrupt(self, lobby: Lobby):
+        """
+        Sends WAIT to the connected players of the lobby and (re)starts the reconnection timer.
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        """
+
+        for player in lobby.players:
+            if player not in lobby.missing:
+                self._send_to(player, [CMD_WAIT])
+
+        if lobby.reconnect_timer:
+            lobby.reconnect_timer.cancel()
+        lobby.reconnect_timer = asyncio.get_running_loop().call_later(self._reconnect_timeout, self._on_reconnect_timeout, lobby)
+
+
+    def _on_reconnect_timeout(self, lobby: Lobby):
+        """
+        Fails the lobby whose players did not reconnect in time.
+
+        :param lobby: The lobby.
+        :type lobby: Lobby
+        """
+
+        lobby.reconnect_timer = None
+        if lobby.state != LobbyState.INTERRUPTED:
+            return
+
+        logger.info(f"Players {sorted(lobby.missing)} did not reconnect in time to lobby '{lobby.id}'")
+        for player in list(lobby.missing):
+            self._player_to_lobby.pop(player, None)
+            if lobby.player01 == player:
+                lobby.player01 = None
+            else:
+                lobby.player02 = None
+        self._close_lobby(lobby)
+
+
+    def _try_reconnect(self, nickname: str):
+        """
+        Reconnects the freshly authenticated player to the interrupted lobby if the player is missing there.
+        The reconnected player receives CONTINUE; when both players are back, both receive CONTINUE and TURN.
+
+        :param nickname: The nickname of the player.
+        :type nickname: str
+        """
+
+        lobby = self._player_to_lobby.get(nickname)
+        if lobby is None or lobby.state != LobbyState.INTERRUPTED or nickname not in lobby.missing:
+            return
+
+        logger.info(f"Player '{nickname}' reconnected to lobby '{lobby.id}'")
+        lobby.missing.discard(nickname)
+        if lobby.missing:
+            # the reconnected player is on turn until the opponent returns (as the Go server reports it)
+            is_player01 = nickname == lobby.player01
+            self._send_to(nickname, [CMD_CONTINUE, lobby.id, lobby.get_opponent(nickname), nickname,
+                                     board_to_net(rules.get_player_board(lobby.board, is_player01))])
+            self._interrupt(lobby)
+            return
+
+        if lobby.reconnect_timer:
+            lobby.reconnect_timer.cancel()
+            lobby.reconnect_timer = None
+        lobby.state = LobbyState.PLAYING
+        for player in lobby.players:
+            is_player01 = player == lobby.player01
+            self._send_to(player, [CMD_CONTINUE, lobby.id, lobby.get_opponent(player), lobby.player_on_turn,
+                                   board_to_net(rules.get_player_board(lobby.board, is_player01))])
+        for player in lobby.players:
+            self._send_to(player, [CMD_PLAYER_TURN, lobby.player_on_turn])
+
+
+class ReferenceServerThread:
+    """
+    This class runs the reference server in a dedicated thread with its own event loop,
+    so it can be used from synchronous code (e.g. together with the ConnectionManager).
+    """
+
+
+    def __init__(self, **kwargs):
+        """
+        Initializes the threaded reference server.
+
+        :param kwargs: The arguments of the ReferenceServer.
+        """
+
+        self.server = ReferenceServer(**kwargs)
+        """The wrapped reference server."""
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__thread: threading.Thread = None
+        self.__started = threading.Event()
+        self.__error: Exception = None
+
+
+    @property
+    def host(self) -> str:
+        """
+        Getter for host.
+
+        :return: The address the server listens on.
+        :rtype: str
+        """
+
+        return self.server.host
+
+
+    @property
+    def port(self) -> int:
+        """
+        Getter for port.
+
+        :return: The port the server listens on.
+        :rtype: int
+        """
+
+        return self.server.port
+
+
+    def __run(self):
+        """
+        Runs the event loop of the server thread.
+        """
+
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        try:
+            self.__loop.run_until_complete(self.server.start())
+        except Exception as e:
+            self.__error = e
+            self.__started.set()
+            return
+
+        self.__started.set()
+        self.__loop.run_forever()
+        self.__loop.run_until_complete(self.server.stop())
+        self.__loop.close()
+
+
+    def start(self):
+        """
+        Starts the server thread and waits until the server listens.
+        """
+
+        self.__thread = threading.Thread(target=self.__run, name='ReferenceServerThread', daemon=True)
+        self.__thread.start()
+        self.__started.wait()
+        if self.__error is not None:
+            raise ConnectionError(f"Error starting the reference server: {self.__error}")
+
+
+    def stop(self):
+        """
+        Stops the server and joins the server thread.
+        """
+
+        if self.__thread is None:
+            return
+
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__thread = None
+
+
+    def __enter__(self) -> 'ReferenceServerThread':
+        """
+        Called when entering the context manager.
+        """
+
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Called when exiting the context manager.
+        """
+
+        self.stop()
+
+
+def main():
+    """
+    Entry point of the standalone reference server.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Reference server for the game "Inverse Battleships"')
+    args_parser.add_argument('-a', '--address', type=str, default=f"{DEFAULT_SERVER_IP_ADDRESS}:{DEFAULT_SERVER_PORT}", help='Address to listen on (ip:port, port 0 for an ephemeral port)')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the board generator')
+    args_parser.add_argument('--reconnect_timeout', type=float, default=ReferenceServer.PLAYER_RECONNECT_TIMEOUT, help='Time in seconds the lobby waits for a disconnected player')
+    args = args_parser.parse_args()
+
+    host, port = args.address.rsplit(':', 1)
+    server = ReferenceServer(host, int(port), seed=args.seed, reconnect_timeout=args.reconnect_timeout)
+
+    async def run():
+        await server.start()
+        print(f"Reference server listening at {server.address}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
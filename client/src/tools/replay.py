@@ -0,0 +1,511 @@
+"""
+Deterministic replayer of the recorded network sessions of Inverse Battleships (see game/session_log.py).
+The recorded frames are fed back into IBGame without a server: the connection managers of the game use
+a replay client instead of the socket, and the recorded user input is posted to the PyGame event queue.
+The records are consumed strictly in the recorded order, so an input is never delivered before the frames
+that preceded it. The keep-alive traffic (PING/PONG) is answered locally, since it depends on the timing.
+
+The session can be replayed at the original speed, accelerated, or as fast as possible (speed 0),
+which is used for benchmarking the rendering and the state machine on real game traffic.
+
+Record a session with the client:
+
+    python ./client/src/main.py -r session.ibsl
+
+Replay it from the client/src directory (prints a JSON report):
+
+    python -m tools.replay session.ibsl -s 0 --headless
+"""
+
+from tools import tools_setup
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+from game.session_log import RecordKind, SessionRecord, SessionRecorder, load_session_log
+from game.connection_manager import ConnectionManager
+from util.generic_client import GenericClient
+from util.msg_parser import to_net_message, from_net_message
+from util.stats import summarize
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+from util.tracing import TRACER
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+class SessionReplayer:
+    """
+    This class holds the recorded session and the replay cursor shared by the replay clients (network
+    handler threads) and the input driver (main thread).
+    """
+
+
+    def __init__(self, records: List[SessionRecord], speed: float = 1):
+        """
+        Initializes the replayer.
+
+        :param records: The records of the session log.
+        :type records: List[SessionRecord]
+        :param speed: The replay speed relative to the recording (0 for as fast as possible).
+        :type speed: float
+        """
+
+        self.speed = speed
+        self.meta: Dict[str, Any] = {}
+        """The metadata of the recorded session."""
+        self.records: List[SessionRecord] = []
+        """The replayed records (without the metadata and the keep-alive traffic)."""
+        for record in records:
+            if record.kind == RecordKind.META:
+                self.meta.update(json.loads(record.payload))
+            elif not __class__.is_keep_alive(record):
+                self.records.append(record)
+
+        self.consumed = 0
+        """The number of consumed records."""
+        self.divergences = 0
+        """The number of outbound frames that differ from the recording."""
+        self.__cursor = 0
+        self.__time_start = None
+        self.__condition = threading.Condition()
+
+
+    @staticmethod
+    def is_keep_alive(record: SessionRecord) -> bool:
+        """
+        Checks if the record is a keep-alive frame (PING or PONG).
+
+        :param record: The record.
+        :type record: SessionRecord
+        :return: True if the record is a keep-alive frame, false otherwise.
+        :rtype: bool
+        """
+
+        if record.kind not in (RecordKind.FRAME_IN, RecordKind.FRAME_OUT):
+            return False
+
+        parts = from_net_message(record.payload)
+        return bool(parts) and parts[PART_CMD_INDEX] in (CMD_PING, CMD_PONG)
+
+
+    @property
+    def is_finished(self) -> bool:
+        """
+        Checks if all records were consumed.
+
+        :return: True if the replay is finished, false otherwise.
+        :rtype: bool
+        """
+
+        with self.__condition:
+            return self.__cursor >= len(self.records)
+
+
+    def start(self):
+        """
+        Starts the replay clock.
+        """
+
+        self.__time_start = time.monotonic()
+
+
+    def __get_delay(self, record: SessionRecord) -> float:
+        """
+        Returns the time in seconds until the record is due.
+
+        :param record: The record.
+        :type record: SessionRecord
+        :return: The delay (0 or negative if due).
+        :rtype: float
+        """
+
+        if not self.speed:
+            return 0
+
+        return self.__time_start + record.timestamp / self.speed - time.monotonic()
+
+
+    def wait_for(self, kinds: tuple, timeout: float, paced: bool = True, payload: str = None) -> SessionRecord:
+        """
+        Waits until the next record is of one of the kinds (and is due if paced) and returns it without consuming it.
+
+        :param kinds: The expected kinds of the record (RecordKind).
+        :type kinds: tuple
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :param paced: Whether to wait until the record is due.
+        :type paced: bool
+        :param payload: The expected payload of the record (None for any).
+        :type payload: str
+        :return: The record or None on timeout.
+        :rtype: SessionRecord
+        """
+
+        deadline = time.monotonic() + timeout
+        with self.__condition:
+            while True:
+                remaining = deadline - time.monotonic()
+                record = self.records[self.__cursor] if self.__cursor < len(self.records) else None
+                if record is not None and record.kind in kinds and (payload is None or record.payload == payload):
+                    delay = self.__get_delay(record) if paced else 0
+                    if delay <= 0:
+                        return record
+                    remaining = min(remaining, delay)
+
+                if deadline - time.monotonic() <= 0:
+                    return None
+                self.__condition.wait(max(remaining, 0))
+
+
+    def consume(self, record: SessionRecord):
+        """
+        Consumes the record (it has to be the next one) and wakes up the waiting threads.
+
+        :param record: The record.
+        :type record: SessionRecord
+        """
+
+        with self.__condition:
+            if self.__cursor < len(self.records) and self.records[self.__cursor] is record:
+                self.__cursor += 1
+                self.consumed += 1
+                self.__condition.notify_all()
+
+
+    def next_input(self) -> List[Dict[str, Any]]:
+        """
+        Returns the recorded input events of one game tick if they are due (called by the main loop each tick).
+
+        :return: The serialized PyGame events or None.
+        :rtype: List[Dict[str, Any]]
+        """
+
+        record = self.wait_for((RecordKind.INPUT,), 0)
+        if record is None:
+            return None
+
+        self.consume(record)
+        return json.loads(record.payload)
+
+
+    def create_connection_manager(self, server_ip: str, server_port: int, recorder: SessionRecorder = None) -> ConnectionManager:
+        """
+        Creates the connection manager that replays the session (used as the connection factory of IBGame).
+
+        :param server_ip: The game server IP address.
+        :type server_ip: str
+        :param server_port: The game server port.
+        :type server_port: int
+        :param recorder: The recorder of the session log.
+        :type recorder: SessionRecorder
+        :return: The connection manager.
+        :rtype: ConnectionManager
+        """
+
+        return ConnectionManager(server_ip, server_port, recorder, ReplayClient(self, server_ip, server_port))
+
+
+class ReplayClient:
+    """
+    This class replaces the GenericClient of the ConnectionManager and serves the recorded frames.
+    """
+
+
+    def __init__(self, replayer: SessionReplayer, host: str, port: int):
+        """
+        Initializes the replay client.
+
+        :param replayer: The session replayer.
+        :type replayer: SessionReplayer
+        :param host: The host of the server.
+        :type host: str
+        :param port: The port of the server.
+        :type port: int
+        """
+
+        self.__replayer = replayer
+        self.__host = host
+        self.__port = port
+        self.__is_running = False
+        self.__local_replies: List[str] = []
+
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Getter for is_running.
+
+        :return: True if the replayed connection is open, false otherwise.
+        :rtype: bool
+        """
+
+        return self.__is_running
+
+
+    @property
+    def host(self) -> str:
+        """
+        Getter for host.
+
+        :return: The host of the server.
+        :rtype: str
+        """
+
+        return self.__host
+
+
+    @property
+    def port(self) -> int:
+        """
+        Getter for port.
+
+        :return: The port of the server.
+        :rtype: int
+        """
+
+        return self.__port
+
+
+    @property
+    def server_address(self) -> str:
+        """
+        Getter for server_address.
+
+        :return: The address of the server.
+        :rtype: str
+        """
+
+        return f"{self.__host}:{self.__port}"
+
+
+    def start(self):
+        """
+        Opens the replayed connection when the recording has a connection to the server at this point
+        (the connections to the other servers are left for their connection managers).
+
+        :raises ConnectionError: If no connection to the server was recorded at this point or it failed.
+        """
+
+        record = self.__replayer.wait_for((RecordKind.CONNECT, RecordKind.CONNECT_FAILED), GenericClient.TIMEOUT_DURATION,
+                                          payload=self.server_address)
+        if record is None:
+            raise ConnectionError(f"Error connecting to the server at {self.server_address}: no recorded connection")
+
+        self.__replayer.consume(record)
+        if record.kind == RecordKind.CONNECT_FAILED:
+            raise ConnectionError(f"Error connecting to the server at {self.server_address}: the recorded connection failed")
+        self.__is_running = True
+
+
+    def stop(self):
+        """
+        Closes the replayed connection.
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot disconnect from the server at {self.server_address}: not connected")
+
+        self.__is_running = False
+        record = self.__replayer.wait_for((RecordKind.CLOSE,), 0, paced=False)
+        if record is not None:
+            self.__replayer.consume(record)
+
+
+    def send_message(self, message: str):
+        """
+        Checks the sent message against the recording (keep-alive messages are answered locally).
+
+        :param message: The message.
+        :type message: str
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot send message to the server at {self.server_address}: not connected")
+
+        parts = from_net_message(message)
+        if parts and parts[PART_CMD_INDEX] == CMD_PING:
+            self.__local_replies.append(to_net_message([CMD_PONG]))
+            return
+        if parts and parts[PART_CMD_INDEX] == CMD_PONG:
+            return
+
+        record = self.__replayer.wait_for((RecordKind.FRAME_OUT,), GenericClient.TIMEOUT_DURATION, paced=False)
+        if record is None:
+            self.__replayer.divergences += 1
+            logger.warning(f"Replay diverged: unexpected message sent '{message.strip()}'")
+            return
+
+        if record.payload != message:
+            self.__replayer.divergences += 1
+            logger.warning(f"Replay diverged: sent '{message.strip()}', recorded '{record.payload.strip()}'")
+        self.__replayer.consume(record)
+
+
+    def receive_message(self, timeout: float = None) -> str:
+        """
+        Returns the next recorded frame when it is due.
+
+        :param timeout: The timeout in seconds (None for GenericClient.TIMEOUT_DURATION).
+        :type timeout: float
+        :return: The message.
+        :rtype: str
+        :raises TimeoutError: If no frame is due in time.
+        :raises ConnectionError: If the connection was lost at this point of the recording.
+        """
+
+        if not self.is_running:
+            raise ConnectionError(f"Cannot receive message from the server at {self.server_address}: not connected")
+
+        if self.__local_replies:
+            return self.__local_replies.pop(0)
+
+        # the client is expected to send first if an outbound frame is next (the socket would time out)
+        record = self.__replayer.wait_for((RecordKind.FRAME_IN, RecordKind.FRAME_OUT, RecordKind.CLOSE),
+                                          timeout if timeout is not None else GenericClient.TIMEOUT_DURATION)
+        if record is None or record.kind == RecordKind.FRAME_OUT:
+            raise TimeoutError()
+
+        if record.kind == RecordKind.CLOSE:
+            if record.payload != "lost":
+                raise TimeoutError()
+            self.__replayer.consume(record)
+            self.__is_running = False
+            raise ConnectionError(f"Error receiving message from the server at {self.server_address}: connection lost (recorded)")
+
+        self.__replayer.consume(record)
+        return record.payload
+
+
+def run_replay(path: str, speed: float, config_path: str, headless: bool, timeout: float) -> Dict[str, Any]:
+    """
+    Replays the session in IBGame and returns the report.
+
+    :param path: The path to the session log.
+    :type path: str
+    :param speed: The replay speed relative to the recording (0 for as fast as possible).
+    :type speed: float
+    :param config_path: The path to the game configuration file.
+    :type config_path: str
+    :param headless: Whether to render without a window.
+    :type headless: bool
+    :param timeout: The maximal duration of the replay in seconds.
+    :type timeout: float
+    :return: The report of the replay.
+    :rtype: Dict[str, Any]
+    """
+
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    # the game (and PyGame) is imported only when replaying
+    import pygame
+    from const.paths import RESOURCES_DIR_PATH
+    from util.assets_loader import AssetsLoader
+    from util.file import load_json
+    from game.ib_game import IBGame
+
+    records = load_session_log(path)
+    replayer = SessionReplayer(records, speed)
+    config = load_json(config_path)
+    # the session is opened ahead and kept only if it was when recording (it changes the order of the frames)
+    config['speculative_connect'] = replayer.meta.get('speculative_connect', False)
+    config['keep_connection_warm'] = replayer.meta.get('keep_connection_warm', False)
+    assets = AssetsLoader(RESOURCES_DIR_PATH).load()
+
+    game = IBGame(config, assets, connection_factory=replayer.create_connection_manager)
+    window_size = replayer.meta.get('window_size', (config['window_width'], config['window_height']))
+    window = pygame.display.set_mode(window_size, pygame.RESIZABLE, config['color_bit_depth'])
+    for key, value in assets['sprites'].items():
+        assets['sprites'][key] = value.convert_alpha()
+    game.start(window)
+    pygame.display.flip()
+
+    clock = pygame.time.Clock()
+    tick_speed = config['tick_speed'] * speed
+    update_times = []
+    ticks = 0
+    quit_posted = False
+    replayer.start()
+    time_start = time.perf_counter()
+    while True:
+        events = replayer.next_input()
+        for event in events if events else []:
+            pygame.event.post(pygame.event.Event(event.pop('type'), event))
+
+        # the recording may end without the quit event
+        if replayer.is_finished and not events and not quit_posted:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            quit_posted = True
+        if time.perf_counter() - time_start > timeout:
+            logger.error(f"Replay of {path} timed out")
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+        update_start = time.perf_counter()
+        update_result = game.update()
+        if update_result.exit:
+            break
+        if update_result.update_areas:
+            if update_result.update_areas[0] == True:
+                pygame.display.flip()
+            else:
+                pygame.display.update(update_result.update_areas)
+        update_times.append(time.perf_counter() - update_start)
+        ticks += 1
+
+        if tick_speed:
+            clock.tick(tick_speed)
+
+    duration = time.perf_counter() - time_start
+    game.connection_cleanup()
+    pygame.quit()
+
+    return {'session': path, 'speed': speed, 'duration_s': duration,
+            'recorded_duration_s': records[-1].timestamp if records else 0,
+            'ticks': ticks, 'ticks_per_s': ticks / duration if duration else None,
+            'update_ms': summarize(update_times, scale=1000),
+            'records': len(replayer.records), 'consumed': replayer.consumed,
+            'finished': replayer.is_finished, 'divergences': replayer.divergences}
+
+
+def main():
+    """
+    Entry point of the session replayer.
+    """
+
+    from const.paths import DEFAULT_CONFIG_PATH
+
+    args_parser = argparse.ArgumentParser(description='Replayer of the recorded sessions of the game "Inverse Battleships"')
+    args_parser.add_argument('session', type=str, help='Path to the session log')
+    args_parser.add_argument('-s', '--speed', type=float, default=1, help='Replay speed relative to the recording (0 for as fast as possible)')
+    args_parser.add_argument('-c', '--config', type=str, default=DEFAULT_CONFIG_PATH, help='Path to the game configuration file')
+    args_parser.add_argument('--headless', action='store_true', help='Render without a window')
+    args_parser.add_argument('--timeout', type=float, default=600, help='Maximal duration of the replay in seconds')
+    args_parser.add_argument('--dump', action='store_true', help='Print the records of the session log instead of replaying it')
+    args_parser.add_argument('--trace', type=str, help='Path to write the Chrome trace of the replay to')
+    args = args_parser.parse_args()
+
+    if args.dump:
+        kinds = {value: name for name, value in vars(RecordKind).items() if not name.startswith('_')}
+        for record in load_session_log(args.session):
+            print(f"{record.timestamp:12.6f} {kinds.get(record.kind, record.kind):9} {record.payload.rstrip()}")
+        return
+
+    if args.trace:
+        TRACER.start()
+    report = run_replay(args.session, args.speed, args.config, args.headless, args.timeout)
+    if args.trace:
+        TRACER.stop()
+        TRACER.write(args.trace)
+    print(json.dumps(report, indent=2))
+    if not report['finished'] or report['divergences']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Offline evaluation of the bot strategies with the vectorised simulator of the game rules (see game/simulator.py).
+The games are played in batches stepped in lockstep, without a server or sockets.
+
+Run from the client/src directory (prints a JSON report):
+
+    python -m tools.simulate -n 100000 -1 probability -2 random
+"""
+
+from tools import tools_setup
+import argparse
+import json
+import sys
+import time
+from game.simulator import POLICIES, simulate
+
+
+def main():
+    """
+    Entry point of the simulator.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Vectorised Monte Carlo simulator of "Inverse Battleships"')
+    args_parser.add_argument('-n', '--games', type=int, default=10000, help='Number of simulated games')
+    args_parser.add_argument('-1', '--player01', type=str, default='random', choices=list(POLICIES), help='Policy of the first player (on turn first)')
+    args_parser.add_argument('-2', '--player02', type=str, default='random', choices=list(POLICIES), help='Policy of the second player')
+    args_parser.add_argument('-b', '--batch_size', type=int, default=4096, help='Number of games stepped in lockstep')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the boards and of the policies')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Path to the JSON report (stdout if not set)')
+    args = args_parser.parse_args()
+
+    time_start = time.perf_counter()
+    result = simulate(args.games, args.player01, args.player02, args.seed, args.batch_size)
+    duration = time.perf_counter() - time_start
+
+    report = {'player01': args.player01, 'player02': args.player02, 'seed': args.seed,
+              'duration_s': duration, 'games_per_s': args.games / duration if duration else None,
+              **result.summary()}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""
+Module for initial setup of the auxiliary tools (load generator, reference server, ...).
+It has to be imported before any other client module that uses loggers.
+The loggers configuration can be overridden by the IB_LOGGERS_CONFIG environment variable.
+"""
+
+import os
+
+# the banner of PyGame would break the reports written to the standard output (e.g. JSON)
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from const.paths import TOOLS_LOGGERS_CONFIG_PATH
+from util import loggers
+
+LOGGERS_CFG_PATH = os.environ.get('IB_LOGGERS_CONFIG', TOOLS_LOGGERS_CONFIG_PATH)
+"""The path to the loggers configuration file used by the tools."""
+
+# the tools may also be imported from an already configured process (e.g. the client)
+if not loggers.is_ready():
+    loggers.set_path_to_config_file(LOGGERS_CFG_PATH)
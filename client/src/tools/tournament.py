@@ -0,0 +1,303 @@
+"""
+Tournament of the bot players of Inverse Battleships. Every pair of the given bots plays the configured
+number of games. The games are split into matches that run in a pool of processes, each match
+against its own in-process reference server (no sockets are shared between the processes, so the
+tournament scales with the number of cores). The sides are alternated between the matches.
+
+The report contains, for every pair and every bot overall, the win rate, the average score
+(as shown by the client, see rules.get_score) and the game length, all with 95 % confidence intervals.
+
+Run from the client/src directory (prints a JSON report):
+
+    python -m tools.tournament -b probability random -g 2000 -w 8
+"""
+
+from tools import tools_setup
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from typing import Any, Dict, List, Tuple
+from game.bots import BOTS
+from game.session_host import SessionHost, BotSession
+from tools.ref_server import ReferenceServer
+from util.stats import mean_confidence_interval, proportion_confidence_interval
+from const.server_communication import *
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+MATCH_TIMEOUT = 10
+"""The timeout in seconds of waiting for the opponent or the server within a match."""
+
+
+async def _play_match(first: str, second: str, games: int, seed: int) -> Dict[str, Any]:
+    """
+    Plays the games of the two bots against an in-process reference server.
+
+    :param first: The name of the bot creating the lobby (on turn first).
+    :type first: str
+    :param second: The name of the bot joining the lobby.
+    :type second: str
+    :param games: The number of games.
+    :type games: int
+    :param seed: The seed of the server and of the bots.
+    :type seed: int
+    :return: The results of the games of both bots and the errors.
+    :rtype: Dict[str, Any]
+    """
+
+    rng = random.Random(seed)
+    async with ReferenceServer(seed=rng.getrandbits(64), keep_alive_timeout=None) as server:
+        host = SessionHost(server.host, server.port)
+        sessions = (BotSession('first', BOTS[first](random.Random(rng.getrandbits(64))), None,
+                               games, MATCH_TIMEOUT, cooldown=0),
+                    BotSession('second', BOTS[second](random.Random(rng.getrandbits(64))), 'first',
+                               games, MATCH_TIMEOUT, cooldown=0))
+        for session in sessions:
+            host.add(session)
+        report = await host.run()
+
+    return {'results': [[asdict(result) for result in session.results] for session in sessions],
+            'errors': report['errors']}
+
+
+def play_match(first: str, second: str, games: int, seed: int) -> Dict[str, Any]:
+    """
+    Plays a match in the worker process (see _play_match).
+
+    :param first: The name of the bot creating the lobby (on turn first).
+    :type first: str
+    :param second: The name of the bot joining the lobby.
+    :type second: str
+    :param games: The number of games.
+    :type games: int
+    :param seed: The seed of the server and of the bots.
+    :type seed: int
+    :return: The results of the games of both bots and the errors.
+    :rtype: Dict[str, Any]
+    """
+
+    return asyncio.run(_play_match(first, second, games, seed))
+
+
+class PairStats:
+    """
+    This class collects the results of the games of a pair of bots (from the point of view of the first bot).
+    """
+
+
+    def __init__(self, bot: str, opponent: str):
+        """
+        Initializes the statistics.
+
+        :param bot: The name of the bot.
+        :type bot: str
+        :param opponent: The name of the opponent.
+        :type opponent: str
+        """
+
+        self.bot = bot
+        self.opponent = opponent
+        self.games = 0
+        """The number of games (including TKOs)."""
+        self.wins = 0
+        """The number of won games."""
+        self.wins_first = 0
+        """The number of won games in which the bot was on turn first."""
+        self.games_first = 0
+        """The number of games in which the bot was on turn first."""
+        self.scores: List[float] = []
+        """The scores of the bot."""
+        self.opponent_scores: List[float] = []
+        """The scores of the opponent."""
+        self.turns: List[float] = []
+        """The lengths of the games in turns."""
+        self.errors: Dict[str, int] = {}
+        """The number of errors per exception type."""
+
+
+    def add(self, result: Dict[str, Any], opponent_result: Dict[str, Any]):
+        """
+        Adds the result of a game.
+
+        :param result: The result of the bot.
+        :type result: Dict[str, Any]
+        :param opponent_result: The result of the opponent in the same game.
+        :type opponent_result: Dict[str, Any]
+        """
+
+        self.games += 1
+        is_win = result['outcome'] in (CMD_GAME_WIN, CMD_TKO)
+        self.wins += is_win
+        if result['is_first']:
+            self.games_first += 1
+            self.wins_first += is_win
+        if result['outcome'] != CMD_TKO:
+            self.scores.append(result['score'])
+            self.opponent_scores.append(opponent_result['score'])
+            self.turns.append(result['turns'])
+
+
+    def merge(self, other: 'PairStats'):
+        """
+        Adds the results collected by the other statistics.
+
+        :param other: The other statistics.
+        :type other: PairStats
+        """
+
+        self.games += other.games
+        self.wins += other.wins
+        self.wins_first += other.wins_first
+        self.games_first += other.games_first
+        self.scores.extend(other.scores)
+        self.opponent_scores.extend(other.opponent_scores)
+        self.turns.extend(other.turns)
+        for kind, count in other.errors.items():
+            self.errors[kind] = self.errors.get(kind, 0) + count
+
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the report of the statistics.
+
+        :return: The report (JSON serializable).
+        :rtype: Dict[str, Any]
+        """
+
+        return {'games': self.games,
+                'win_rate': proportion_confidence_interval(self.wins, self.games),
+                'win_rate_first': proportion_confidence_interval(self.wins_first, self.games_first),
+                'win_rate_second': proportion_confidence_interval(self.wins - self.wins_first, self.games - self.games_first),
+                'score': mean_confidence_interval(self.scores),
+                'opponent_score': mean_confidence_interval(self.opponent_scores),
+                'turns': mean_confidence_interval(self.turns),
+                'errors': self.errors}
+
+
+def get_matches(bots: List[str], games: int, match_size: int, self_play: bool) -> List[Tuple[str, str, int]]:
+    """
+    Splits the games of all pairs of the bots into matches (the sides alternate between the matches).
+
+    :param bots: The names of the bots.
+    :type bots: List[str]
+    :param games: The number of games per pair.
+    :type games: int
+    :param match_size: The maximal number of games of a match.
+    :type match_size: int
+    :param self_play: Whether the bots also play against themselves.
+    :type self_play: bool
+    :return: The matches (first bot, second bot, games).
+    :rtype: List[Tuple[str, str, int]]
+    """
+
+    pairs = itertools.combinations_with_replacement(bots, 2) if self_play else itertools.combinations(bots, 2)
+    res = []
+    for bot, opponent in pairs:
+        for i, start in enumerate(range(0, games, match_size)):
+            count = min(match_size, games - start)
+            res.append((bot, opponent, count) if i % 2 == 0 else (opponent, bot, count))
+
+    return res
+
+
+def run_tournament(bots: List[str], games: int, match_size: int, workers: int = None, seed: int = None,
+                   self_play: bool = False) -> Dict[str, Any]:
+    """
+    Runs the tournament of the bots.
+
+    :param bots: The names of the bots (see game.bots.BOTS).
+    :type bots: List[str]
+    :param games: The number of games per pair.
+    :type games: int
+    :param match_size: The maximal number of games of a match (a unit of work of a process).
+    :type match_size: int
+    :param workers: The number of processes (the number of CPUs if not set).
+    :type workers: int
+    :param seed: The seed of the tournament (None for random).
+    :type seed: int
+    :param self_play: Whether the bots also play against themselves.
+    :type self_play: bool
+    :return: The report (JSON serializable).
+    :rtype: Dict[str, Any]
+    """
+
+    rng = random.Random(seed)
+    matches = get_matches(bots, games, match_size, self_play)
+    pairs: Dict[Tuple[str, str], PairStats] = {}
+    workers = workers if workers else os.cpu_count()
+    time_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(play_match, first, second, count, rng.getrandbits(64)): (first, second)
+                   for first, second, count in matches}
+        for done, future in enumerate(as_completed(futures), 1):
+            first, second = futures[future]
+            res = future.result()
+            first_results, second_results = res['results']
+            # the statistics are kept for both orders of the pair
+            first_stats = pairs.setdefault((first, second), PairStats(first, second))
+            second_stats = pairs.setdefault((second, first), PairStats(second, first)) if first != second else None
+            for result, opponent_result in zip(first_results, second_results):
+                first_stats.add(result, opponent_result)
+                if second_stats is not None:
+                    second_stats.add(opponent_result, result)
+            for kind, count in res['errors'].items():
+                first_stats.errors[kind] = first_stats.errors.get(kind, 0) + count
+            print(f"Finished match {done}/{len(matches)} ({first} vs {second})", file=sys.stderr, flush=True)
+    duration = time.perf_counter() - time_start
+
+    overall: Dict[str, PairStats] = {}
+    for (bot, opponent), stats in pairs.items():
+        if bot != opponent:
+            overall.setdefault(bot, PairStats(bot, None)).merge(stats)
+
+    games_played = sum(stats.games for (bot, opponent), stats in pairs.items() if bot <= opponent)
+    return {'bots': bots, 'games_per_pair': games, 'match_size': match_size, 'workers': workers, 'seed': seed,
+            'duration_s': duration, 'games': games_played,
+            'games_per_s': games_played / duration if duration else None,
+            'overall': {bot: stats.report() for bot, stats in overall.items()},
+            'pairs': {f"{bot} vs {opponent}": stats.report() for (bot, opponent), stats in pairs.items()}}
+
+
+def main():
+    """
+    Entry point of the tournament.
+    """
+
+    args_parser = argparse.ArgumentParser(description='Tournament of the bot players of "Inverse Battleships"')
+    args_parser.add_argument('-b', '--bots', type=str, nargs='+', default=list(BOTS), choices=list(BOTS), help='Bots taking part in the tournament')
+    args_parser.add_argument('-g', '--games', type=int, default=1000, help='Number of games per pair of bots')
+    args_parser.add_argument('-m', '--match_size', type=int, default=50, help='Number of games of a match (a unit of work of a process)')
+    args_parser.add_argument('-w', '--workers', type=int, default=None, help='Number of processes (number of CPUs by default)')
+    args_parser.add_argument('--self_play', action='store_true', help='Let the bots also play against themselves')
+    args_parser.add_argument('--seed', type=int, default=None, help='Seed of the tournament')
+    args_parser.add_argument('-o', '--output', type=str, default=None, help='Path to the JSON report (stdout if not set)')
+    args = args_parser.parse_args()
+
+    if len(set(args.bots)) < 2 and not args.self_play:
+        args_parser.error("At least two different bots are required (or --self_play)")
+
+    # the games are reported in the summary, the per-game logs of the server and the bots are not needed
+    logger.setLevel(logging.ERROR)
+    report = run_tournament(sorted(set(args.bots)), args.games, args.match_size, args.workers, args.seed, args.self_play)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
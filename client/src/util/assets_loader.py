@@ -6,7 +6,7 @@ import os
 from typing import Dict
 
 import pygame
-from const.loggers import MAIN_LOGGER_NAME
+from const.loggers import MAIN_LOGGER_NAME, RENDER_SUBSYSTEM
 from util import loggers
 from pprint import pformat
 from util.file import load_json
@@ -18,6 +18,7 @@ IMAGES_DIR_PATH: str = 'img'
 SPRITES_DIR_PATH: str = os.path.join(IMAGES_DIR_PATH, 'sprites')
 
 logger = loggers.get_logger(MAIN_LOGGER_NAME)
+render_logger = loggers.get_subsystem_logger(RENDER_SUBSYSTEM, MAIN_LOGGER_NAME)
 
 
 class AssetsLoader:
@@ -126,6 +127,6 @@ class AssetsLoader:
         logger.debug(f'General images loaded.')
 
         logger.info(f'Loaded assets from: {self.resources_dir_path}.')
-        logger.debug(f'Loaded assets: \n{pformat(assets, indent=4)}')
+        render_logger.debug(lambda: f'Loaded assets: \n{pformat(assets, indent=4)}')
 
         return assets
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""
+This module contains the flight recorder of the client (see FLIGHT_RECORDER): an always-on ring buffer
+of the last protocol frames, connection events, state transitions and timing samples. The buffer is preallocated
+and an entry is one tuple stored in a slot, so recording costs no more than appending to a list.
+The buffer is dumped as JSON (with a snapshot of the metrics) when the connection is lost, a game ends
+by a TKO or the process crashes, so the events before a failure are available regardless of the logging level.
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+from util.metrics import REGISTRY
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+FRAME_IN = 'frame_in'
+"""The kind of the entries of the frames received from the server."""
+
+FRAME_OUT = 'frame_out'
+"""The kind of the entries of the frames sent to the server."""
+
+CONNECT = 'connect'
+"""The kind of the entries of the established connections (the data is the server address)."""
+
+CLOSE = 'close'
+"""The kind of the entries of the closed connections (the data is the reason, e.g. lost)."""
+
+CONNECT_FAILED = 'connect_failed'
+"""The kind of the entries of the failed connection attempts (the data is the server address)."""
+
+TRANSITION = 'transition'
+"""The kind of the entries of the state transitions."""
+
+TIMING = 'timing'
+"""The kind of the entries of the timing samples (the data is the name of the metric)."""
+
+CRASH = 'crash'
+"""The kind of the entries of the uncaught exceptions."""
+
+
+class FlightRecorder:
+    """
+    This class keeps the last entries in a ring buffer of a fixed size. The entries are added
+    from any thread without a lock (the slot is taken from an atomic counter).
+    """
+
+    SIZE = 4096
+    """The default number of the kept entries."""
+
+    MAX_DUMPS = 20
+    """The number of the kept dumps (the oldest are deleted)."""
+
+
+    def __init__(self, size: int = SIZE):
+        """
+        Creates the flight recorder with the preallocated buffer.
+
+        :param size: The number of the kept entries.
+        :type size: int
+        """
+
+        self.size = size
+        self.dump_dir: str = None
+        """The directory of the dumps (None to not dump)."""
+        self.__slots: List[tuple] = [None] * size
+        self.__counter = itertools.count()
+        self.__dump_lock = threading.Lock()
+        self.__previous_excepthook = None
+        self.__previous_threading_excepthook = None
+
+
+    def add(self, kind: str, data: str, value: float = None):
+        """
+        Adds the entry to the buffer (overwrites the oldest one if the buffer is full).
+
+        :param kind: The kind of the entry (FRAME_IN, FRAME_OUT, CONNECT, CLOSE, TRANSITION, TIMING or CRASH).
+        :type kind: str
+        :param data: The data of the entry (e.g. the frame or the name of the metric).
+        :type data: str
+        :param value: The value of the entry (e.g. the sample in seconds).
+        :type value: float
+        """
+
+        self.__slots[next(self.__counter) % self.size] = (time.time(), kind, data, value)
+
+
+    def get_entries(self) -> List[Dict[str, Any]]:
+        """
+        Returns the kept entries from the oldest one.
+
+        :return: The entries (time, kind, data and value).
+        :rtype: List[Dict[str, Any]]
+        """
+
+        entries = sorted((entry for entry in self.__slots[:] if entry is not None), key=lambda entry: entry[0])
+        return [{'time': timestamp, 'kind': kind, 'data': data, 'value': value} for timestamp, kind, data, value in entries]
+
+
+    def dump(self, reason: str, background: bool = True) -> str:
+        """
+        Writes the kept entries and the snapshot of the metrics to a new file in the dump directory
+        (through a temporary file, so a partial dump is never left behind). The entries are copied
+        immediately, the file is written by a background thread unless requested otherwise
+        (so e.g. the network thread holding a lock does not wait for the disk).
+
+        :param reason: The reason of the dump (part of the file name).
+        :type reason: str
+        :param background: Whether to write the file on a background thread.
+        :type background: bool
+        :return: The path to the dump or None if the dumps are disabled.
+        :rtype: str
+        """
+
+        if self.dump_dir is None:
+            return None
+
+        now = datetime.now()
+        path = os.path.join(self.dump_dir, f"flight_{now:%Y%m%d_%H%M%S_%f}_{reason}.json")
+        data = {'reason': reason, 'time': now.timestamp(), 'pid': os.getpid(),
+                'entries': self.get_entries(), 'metrics': REGISTRY.snapshot()}
+        if background:
+            threading.Thread(target=self.__write_dump, args=(path, data), name='FlightRecorderDump', daemon=True).start()
+        else:
+            self.__write_dump(path, data)
+        return path
+
+
+    def __write_dump(self, path: str, data: Dict[str, Any]):
+        """
+        Writes the dump and deletes the oldest ones.
+
+        :param path: The path to the dump.
+        :type path: str
+        :param data: The dumped data.
+        :type data: Dict[str, Any]
+        """
+
+        with self.__dump_lock:
+            tmp_path = f"{path}.tmp"
+            try:
+                os.makedirs(self.dump_dir, exist_ok=True)
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f, indent=1, default=str)
+                os.replace(tmp_path, path)
+                self.__remove_old_dumps()
+            except OSError as e:
+                logger.error(f"Failed to dump the flight recorder to {path}: {e}")
+                return
+
+        logger.info(f"Flight recorder dumped to {path} ({data['reason']})")
+
+
+    def __remove_old_dumps(self):
+        """
+        Deletes the oldest dumps over MAX_DUMPS.
+        """
+
+        dumps = sorted(name for name in os.listdir(self.dump_dir) if name.startswith('flight_') and name.endswith('.json'))
+        for name in dumps[:-__class__.MAX_DUMPS]:
+            os.remove(os.path.join(self.dump_dir, name))
+
+
+    def install_crash_hooks(self):
+        """
+        Dumps the buffer on the uncaught exceptions of the main thread and the other threads
+        (the previous hooks are still called).
+        """
+
+        self.__previous_excepthook = sys.excepthook
+        self.__previous_threading_excepthook = threading.excepthook
+
+        def excepthook(exc_type, exc_value, traceback):
+            self.add(CRASH, f"{exc_type.__name__}: {exc_value}")
+            self.dump(CRASH, background=False)
+            self.__previous_excepthook(exc_type, exc_value, traceback)
+
+        def threading_excepthook(args):
+            if args.exc_type is not SystemExit:
+                self.add(CRASH, f"{args.exc_type.__name__} in {args.thread.name if args.thread else None}: {args.exc_value}")
+                self.dump(CRASH, background=False)
+            self.__previous_threading_excepthook(args)
+
+        sys.excepthook = excepthook
+        threading.excepthook = threading_excepthook
+
+
+FLIGHT_RECORDER = FlightRecorder()
+"""The flight recorder of the client."""
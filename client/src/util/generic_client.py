@@ -196,10 +196,12 @@ class GenericClient:
     #         return False
     
 
-    def receive_message(self) -> str:
+    def receive_message(self, timeout: float = None) -> str:
         """
         Receives a message from the server.
 
+        :param timeout: The timeout in seconds (None for TIMEOUT_DURATION).
+        :type timeout: float
         :return: The message.
         :rtype: str
         :raises ValueError: If no data is received.
@@ -213,6 +215,8 @@ class GenericClient:
         
     
         try:
+            if timeout is not None:
+                self.__server_socket.settimeout(timeout)
             data = self.__server_socket.recv(self.BUFFER_SIZE)
             if not data:
                 raise ConnectionError(f"Error receiving message from the server at {self.server_address}: no data received - connection was probably lost")
@@ -220,6 +224,9 @@ class GenericClient:
             raise TimeoutError()
         except socket.error as e:
             raise ConnectionError(f"Error receiving message from the server at {self.server_address}: {e}")    
+        finally:
+            if timeout is not None and self.__server_socket is not None:
+                self.__server_socket.settimeout(self.TIMEOUT_DURATION)
 
         message = data.decode()
         return message
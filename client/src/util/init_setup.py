@@ -10,11 +10,15 @@ args_parser = argparse.ArgumentParser(description='Client application for the ga
 args_parser.add_argument('-l', '--loggers_config', type=str, help='Path to the loggers configuration file')
 args_parser.add_argument('-c', '--config', type=str, help='Path to the configuration file')
 args_parser.add_argument('-n', '--name', type=str, help='Name of the main logger from the loggers configuration file')
+args_parser.add_argument('-r', '--record', type=str, help='Path to the session log to record the network session to (for replaying)')
+args_parser.add_argument('-t', '--trace', type=str, help='Path to write the Chrome trace of the session to (see util.tracing)')
 args = args_parser.parse_args()
 
 LOGGERS_CFG_PATH = args.loggers_config if args.loggers_config else LOGGERS_CONFIG_PATH
 CFG_PATH = args.config if args.config else DEFAULT_CONFIG_PATH
 LOGGER_NAME = args.name if args.name else MAIN_LOGGER_NAME
+RECORD_PATH = args.record
+TRACE_PATH = args.trace
 
 from util import loggers
 from time import sleep
@@ -2,9 +2,15 @@
 Module with custom logger with advanced logging
 """
 
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+from typing import Any, Callable
 from termcolor import colored
 
 class NullLogger:
@@ -89,6 +95,36 @@ __temp_loggers: dict[str, logging.Logger|NullLogger] = {}
 __ready: bool = False
 """Flag if all loggers are ready for use. """
 
+__listener = None
+"""Background writer of the records in the queue mode (None in the synchronous mode). """
+
+__subsystem_levels: dict[str, int] = {}
+"""Logging levels of the subsystems (e.g. net, render, input, state). """
+
+__subsystem_loggers: dict[tuple[str, str], 'SubsystemLogger'] = {}
+"""Facades of the loggers for the subsystems. """
+
+DEFAULT_FLUSH_INTERVAL = 0.1
+"""Default interval in seconds between the writes of the batches in the queue mode. """
+
+DEFAULT_BATCH_SIZE = 512
+"""Default maximal number of records written in one batch in the queue mode. """
+
+__rate_limit_filter = None
+"""Filter of the repeated messages (None if the rate limiting is disabled). """
+
+DEFAULT_RATE = 1.0
+"""Default number of the messages of a template let through per second in the long run. """
+
+DEFAULT_BURST = 10
+"""Default number of the messages of a template let through at once. """
+
+DEFAULT_SUMMARY_INTERVAL = 5.0
+"""Default maximal time in seconds between the summaries of the suppressed messages. """
+
+SUMMARY_CHECKS = 5
+"""Number of the checks for the due summaries of the suppressed messages per summary interval. """
+
 LOG_COLORS = {
             'DEBUG': 'light_blue',
             'INFO': 'white', 
@@ -115,6 +151,415 @@ class ColoredFormater(logging.Formatter):
         return colored(log_message, LOG_COLORS.get(record.levelname, "white"))
 
 
+class SubsystemLogger:
+    """
+    Facade of a logger for a subsystem (e.g. net, render, input, state) with its own logging level.
+    The message is built only if its level is enabled: it is either a callable returning the message
+    or a %-style format string with arguments, so disabled logging costs only the level checks
+    (of the subsystem and of the logger, which caches its effective level).
+    """
+
+
+    def __init__(self, logger: logging.Logger, subsystem: str, level: int = logging.DEBUG):
+        """
+        Creates the facade.
+
+        :param logger: The logger
+        :param subsystem: Name of the subsystem
+        :param level: Logging level of the subsystem
+        """
+
+        self.logger = logger
+        self.subsystem = subsystem
+        self.level = level
+
+
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Returns true if the messages of the level are logged, false otherwise.
+
+        :param level: The logging level
+        :return: True if the messages of the level are logged, false otherwise.
+        """
+
+        return level >= self.level and self.logger.isEnabledFor(level)
+
+
+    def __log(self, level: int, msg: str | Callable[[], str], args: tuple[Any, ...], **kwargs):
+        """
+        Builds the message and logs it (the caller is the caller of the level method).
+
+        :param level: The logging level
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if callable(msg):
+            msg = msg()
+        self.logger.log(level, msg, *args, stacklevel=3, **kwargs)
+
+
+    def debug(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message on the DEBUG level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.DEBUG):
+            self.__log(logging.DEBUG, msg, args)
+
+
+    def info(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message on the INFO level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.INFO):
+            self.__log(logging.INFO, msg, args)
+
+
+    def warning(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message on the WARNING level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.WARNING):
+            self.__log(logging.WARNING, msg, args)
+
+
+    def error(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message on the ERROR level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.ERROR):
+            self.__log(logging.ERROR, msg, args)
+
+
+    def exception(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message with the current exception on the ERROR level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.ERROR):
+            self.__log(logging.ERROR, msg, args, exc_info=True)
+
+
+    def critical(self, msg: str | Callable[[], str], *args):
+        """
+        Logs the message on the CRITICAL level.
+
+        :param msg: The message, its format string or a callable returning it
+        :param args: Arguments of the format string
+        """
+
+        if self.is_enabled_for(logging.CRITICAL):
+            self.__log(logging.CRITICAL, msg, args)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Collapses the repeated messages. Each message template (the logger and the line that logs the message)
+    has a token bucket refilled with rate tokens per second up to burst, a message without a token is suppressed.
+    The first message let through after the suppressed ones (when a token is available again, or at least every
+    summary_interval seconds) reports them, e.g. "... (repeated 412 times in 5s)". When the repetition stops,
+    the last suppressed message reports them once summary_interval elapsed (written by the thread of the filter).
+    Only the messages with the level between min_level and max_level are limited.
+    """
+
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, summary_interval: float = DEFAULT_SUMMARY_INTERVAL,
+                 min_level: int = logging.WARNING, max_level: int = logging.ERROR):
+        """
+        Creates the filter.
+
+        :param rate: Number of the messages of a template let through per second in the long run
+        :param burst: Number of the messages of a template let through at once
+        :param summary_interval: Maximal time in seconds between the summaries of the suppressed messages
+        :param min_level: Lowest limited level
+        :param max_level: Highest limited level
+        """
+
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.min_level = min_level
+        self.max_level = max_level
+        # template -> [tokens, time of the last refill, suppressed count, time of the first suppressed, last suppressed record]
+        self.__templates: dict[tuple[str, str, int], list] = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+
+    def start(self):
+        """
+        Starts the thread writing the due summaries of the suppressed messages.
+        """
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='LogSummaries', daemon=True)
+        self.__thread.start()
+
+
+    def stop(self):
+        """
+        Stops the thread writing the due summaries (the pending ones are written by flush).
+        """
+
+        if self.__thread:
+            self.__stopped.set()
+            self.__thread.join()
+            self.__thread = None
+
+
+    def __run(self):
+        """
+        Writes the due summaries SUMMARY_CHECKS times per summary interval until stopped.
+        """
+
+        while not self.__stopped.wait(self.summary_interval / SUMMARY_CHECKS):
+            self.flush_due()
+
+
+    @staticmethod
+    def __summarize(record: logging.LogRecord, count: int, duration: float):
+        """
+        Appends the number of the suppressed messages to the message of the record.
+
+        :param record: The record
+        :param count: Number of the suppressed messages
+        :param duration: Time in seconds since the first suppressed message
+        """
+
+        record.msg = f"{record.getMessage()} (repeated {count} times in {duration:.3g}s)"
+        record.args = None
+
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Returns true if the record is let through, false if it is suppressed.
+
+        :param record: The record
+        :return: True if the record is let through, false otherwise.
+        """
+
+        if not self.min_level <= record.levelno <= self.max_level:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = record.created
+        with self.__lock:
+            template = self.__templates.get(key, None)
+            if template is None:
+                template = self.__templates[key] = [self.burst, now, 0, now, None]
+            template[0] = min(self.burst, template[0] + max(now - template[1], 0) * self.rate)
+            template[1] = now
+
+            if template[0] < 1:
+                if not template[2]:
+                    template[3] = now
+                template[2] += 1
+                # the summary is due, the record reports the suppressed ones
+                if now - template[3] < self.summary_interval:
+                    template[4] = record
+                    return False
+                template[2] -= 1
+            else:
+                template[0] -= 1
+
+            count, since = template[2], template[3]
+            template[2] = 0
+            template[4] = None
+
+        if count:
+            RateLimitFilter.__summarize(record, count, now - since)
+        return True
+
+
+    def flush(self):
+        """
+        Writes the summaries of the suppressed messages (the last suppressed message of each template
+        reports the others), e.g. when the program exits.
+        """
+
+        self.__flush(lambda template: True)
+
+
+    def flush_due(self, now: float = None):
+        """
+        Writes the summaries of the templates whose first suppressed message is at least summary_interval old
+        (the repetition stopped before a message reported them).
+
+        :param now: The current time (time.time() if not set)
+        """
+
+        now = time.time() if now is None else now
+        self.__flush(lambda template: now - template[3] >= self.summary_interval)
+
+
+    def __flush(self, is_due: Callable[[list], bool]):
+        """
+        Writes the summaries of the suppressed messages of the due templates.
+
+        :param is_due: Returns true if the summary of the template is written
+        """
+
+        with self.__lock:
+            due = [template for template in self.__templates.values() if template[2] and is_due(template)]
+            pending = [(template[4], template[2] - 1, template[3]) for template in due]
+            for template in due:
+                template[2] = 0
+                template[4] = None
+
+        for record, count, since in pending:
+            if count:
+                RateLimitFilter.__summarize(record, count, record.created - since)
+            logging.getLogger(record.name).callHandlers(record)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the records to the queue of the BatchingQueueListener (the record is only merged with its arguments,
+    the formatting is left to the handlers of the listener).
+    """
+
+    __exception_formatter = logging.Formatter()
+    """Formats the exception of the record (the exception itself is not passed to the queue). """
+
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Prepares the record for the queue (without copying it).
+
+        :param record: The record
+        :return: The record with the merged message
+        """
+
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = QueueHandler.__exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class BatchingQueueListener:
+    """
+    Background writer of the records put to the queue by the QueueHandler of the loggers.
+    The records are formatted and written by a single thread in batches (one write and flush
+    per handler and batch), so the logging threads never wait for the I/O.
+    """
+
+
+    def __init__(self, records: queue.SimpleQueue, routes: dict[str, list[logging.Handler]],
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Creates the listener.
+
+        :param records: The queue of the records
+        :param routes: Handlers of each logger (by the name of the logger)
+        :param flush_interval: Maximal time in seconds a record waits for the batch to be written
+        :param batch_size: Maximal number of records in a batch
+        """
+
+        self.records = records
+        self.routes = routes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.__thread = None
+
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+
+        self.__thread = threading.Thread(target=self.__run, name='LogWriter', daemon=True)
+        self.__thread.start()
+
+
+    def stop(self):
+        """
+        Writes the remaining records and stops the writer thread.
+        """
+
+        if self.__thread:
+            self.records.put(None)
+            self.__thread.join()
+            self.__thread = None
+
+
+    def __run(self):
+        """
+        Collects the records to batches and writes them until stopped.
+        """
+
+        stopped = False
+        while not stopped:
+            record = self.records.get()
+            if record is None:
+                break
+
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self.records.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopped = True
+                    break
+                batch.append(record)
+
+            self.__write(batch)
+
+
+    def __write(self, batch: list[logging.LogRecord]):
+        """
+        Writes the batch with the handlers of the loggers of the records.
+
+        :param batch: The records
+        """
+
+        by_handler: dict[logging.Handler, list[logging.LogRecord]] = {}
+        for record in batch:
+            for handler in self.routes.get(record.name, ()):
+                if record.levelno >= handler.level:
+                    by_handler.setdefault(handler, []).append(record)
+
+        for handler, records in by_handler.items():
+            try:
+                text = ''.join(handler.format(record) + handler.terminator for record in records if handler.filter(record))
+                if text:
+                    with handler.lock:
+                        handler.stream.write(text)
+                        handler.flush()
+            except Exception:
+                handler.handleError(records[0])
+
+
 def __create_handler(handler_config: dict) -> logging.Handler:
     """
     Creates a handler for logger.
@@ -186,23 +631,80 @@ def set_path_to_config_file(json_file_path: str):
                 else:
                     __temp_loggers[logger_name] = NullLogger()
 
+    routes: dict[str, list[logging.Handler]] = {logger_name: [] for logger_name in __loggers}
     for handler_config_name, handler_config in config['logger_handler_configs'].items():
         logger_name, handler_name = handler_config_name.split('.')
-        handler = __create_handler(handler_config)
         # assignment of general handler to each logger
         if logger_name in config['loggers_general']:
-            for logger in __loggers.values():
-                logger.addHandler(handler)
+            handler = __create_handler(handler_config)
+            for handlers in routes.values():
+                handlers.append(handler)
                 
         # assignment of specified handler to specified logger
         else:
             if logger_name in __loggers:
+                routes[logger_name].append(__create_handler(handler_config))
+
+    # levels of the subsystems (the facades that already exist are updated)
+    for subsystem, level in config.get('subsystem_levels', {}).items():
+        if not subsystem.startswith('__'):     # skips the comments
+            __subsystem_levels[subsystem] = logging.getLevelName(level)
+    for (_, subsystem), subsystem_logger in __subsystem_loggers.items():
+        subsystem_logger.level = __subsystem_levels.get(subsystem, logging.DEBUG)
+
+    # repeated messages are collapsed before they reach the handlers (or the queue)
+    rate_limit_config = config.get('rate_limit', {})
+    global __rate_limit_filter
+    if rate_limit_config.get('enabled', False) and __rate_limit_filter is None:
+        __rate_limit_filter = RateLimitFilter(rate_limit_config.get('rate', DEFAULT_RATE),
+                                              rate_limit_config.get('burst', DEFAULT_BURST),
+                                              rate_limit_config.get('summary_interval', DEFAULT_SUMMARY_INTERVAL),
+                                              logging.getLevelName(rate_limit_config.get('min_level', 'WARNING')),
+                                              logging.getLevelName(rate_limit_config.get('max_level', 'ERROR')))
+        for logger_name in routes:
+            __loggers[logger_name].addFilter(__rate_limit_filter)
+        __rate_limit_filter.start()
+        atexit.register(shutdown)
+
+    # queue mode: the loggers only put the records to the queue, a single thread writes them
+    queue_config = config.get('queue', {})
+    global __listener
+    if queue_config.get('enabled', False) and __listener is None:
+        records = queue.SimpleQueue()
+        queue_handler = QueueHandler(records)
+        for logger_name, handlers in routes.items():
+            __loggers[logger_name].addHandler(queue_handler)
+        __listener = BatchingQueueListener(records, routes,
+                                           queue_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL),
+                                           queue_config.get('batch_size', DEFAULT_BATCH_SIZE))
+        __listener.start()
+        if __rate_limit_filter is None:
+            atexit.register(shutdown)
+    else:
+        for logger_name, handlers in routes.items():
+            for handler in handlers:
                 __loggers[logger_name].addHandler(handler)
                 
     global __ready
     __ready = True
 
 
+def shutdown():
+    """
+    Writes the summaries of the suppressed messages and the queued records and stops the writer thread
+    of the queue mode (called automatically when the program exits).
+    """
+
+    if __rate_limit_filter:
+        __rate_limit_filter.stop()
+        __rate_limit_filter.flush()
+
+    global __listener
+    if __listener:
+        __listener.stop()
+        __listener = None
+
+
 def get_logger(logger_name: str = '') -> logging.Logger:
     """
     Returns a logger configured from the config file.
@@ -235,6 +737,23 @@ def get_logger(logger_name: str = '') -> logging.Logger:
         raise ValueError(f"No logger configured with name '{logger_name}'.")
 
 
+def get_subsystem_logger(subsystem: str, logger_name: str) -> SubsystemLogger:
+    """
+    Returns the facade of the logger for the subsystem; its level is set by the subsystem_levels
+    of the config file (DEBUG if not set).
+
+    :param subsystem: Name of the subsystem
+    :param logger_name: Name of the logger
+    :return: Facade of the logger
+    """
+
+    key = (logger_name, subsystem)
+    if key not in __subsystem_loggers:
+        __subsystem_loggers[key] = SubsystemLogger(get_logger(logger_name), subsystem,
+                                                   __subsystem_levels.get(subsystem, logging.DEBUG))
+    return __subsystem_loggers[key]
+
+
 def get_temp_logger(name: str) -> logging.Logger|NullLogger:
     """
     Returns temp debug logger configured from the config file.
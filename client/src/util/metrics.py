@@ -0,0 +1,565 @@
+"""
+This module contains the in-process metrics of the client: thread-safe counters, gauges and histograms
+kept in a registry (see REGISTRY), and the exporter of their snapshots (a JSON file written on an interval
+and optionally a local endpoint in the Prometheus text format).
+The histograms keep the counts of log-linear buckets (as HDR histograms do), so recording a value
+is a few arithmetic operations and the percentiles have a bounded relative error in constant memory.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Sequence, Tuple
+from util.stats import DEFAULT_PERCENTILES
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+COUNTER = 'counter'
+"""The type of the counters."""
+
+GAUGE = 'gauge'
+"""The type of the gauges."""
+
+HISTOGRAM = 'histogram'
+"""The type of the histograms."""
+
+
+class Counter:
+    """
+    This class represents a monotonically increasing value (e.g. the number of the sent frames).
+    """
+
+    def __init__(self):
+        """
+        Creates the counter (starting at 0).
+        """
+
+        self.__value = 0
+        self.__lock = threading.Lock()
+
+
+    def inc(self, amount: float = 1):
+        """
+        Increases the counter.
+
+        :param amount: The increment (not negative).
+        :type amount: float
+        """
+
+        with self.__lock:
+            self.__value += amount
+
+
+    @property
+    def value(self) -> float:
+        """
+        Getter for the value of the counter.
+
+        :return: The value.
+        :rtype: float
+        """
+
+        return self.__value
+
+
+    def snapshot(self) -> float:
+        """
+        Returns the exported value of the counter.
+
+        :return: The value.
+        :rtype: float
+        """
+
+        return self.__value
+
+
+class Gauge:
+    """
+    This class represents a value that can go up and down (e.g. the number of the open connections).
+    """
+
+    def __init__(self):
+        """
+        Creates the gauge (starting at 0).
+        """
+
+        self.__value = 0
+        self.__lock = threading.Lock()
+
+
+    def set(self, value: float):
+        """
+        Sets the value of the gauge.
+
+        :param value: The value.
+        :type value: float
+        """
+
+        with self.__lock:
+            self.__value = value
+
+
+    def inc(self, amount: float = 1):
+        """
+        Increases the gauge.
+
+        :param amount: The increment.
+        :type amount: float
+        """
+
+        with self.__lock:
+            self.__value += amount
+
+
+    def dec(self, amount: float = 1):
+        """
+        Decreases the gauge.
+
+        :param amount: The decrement.
+        :type amount: float
+        """
+
+        self.inc(-amount)
+
+
+    @property
+    def value(self) -> float:
+        """
+        Getter for the value of the gauge.
+
+        :return: The value.
+        :rtype: float
+        """
+
+        return self.__value
+
+
+    def snapshot(self) -> float:
+        """
+        Returns the exported value of the gauge.
+
+        :return: The value.
+        :rtype: float
+        """
+
+        return self.__value
+
+
+class Histogram:
+    """
+    This class represents the distribution of the recorded values (e.g. the round-trip times in seconds).
+    Each power of two is split into SUB_BUCKETS linear buckets, so the reported percentiles
+    are within 1 / (2 * SUB_BUCKETS) of the recorded values.
+    """
+
+    SUB_BUCKETS = 64
+    """The number of the buckets per power of two (the relative error of the percentiles is below 0.8 %)."""
+
+
+    def __init__(self, sub_buckets: int = SUB_BUCKETS):
+        """
+        Creates the empty histogram.
+
+        :param sub_buckets: The number of the buckets per power of two.
+        :type sub_buckets: int
+        """
+
+        self.sub_buckets = sub_buckets
+        self.count = 0
+        """The number of the recorded values."""
+        self.sum = 0
+        """The sum of the recorded values."""
+        self.min = None
+        """The smallest recorded value."""
+        self.max = None
+        """The largest recorded value."""
+        self.__buckets: Dict[int, int] = {}
+        self.__lock = threading.Lock()
+
+
+    def __get_bucket(self, value: float) -> int:
+        """
+        Returns the index of the bucket of the value (None for values <= 0).
+
+        :param value: The value.
+        :type value: float
+        :return: The index of the bucket.
+        :rtype: int
+        """
+
+        if value <= 0:
+            return None
+
+        # value = mantissa * 2 ** exponent, mantissa in <0.5, 1)
+        mantissa, exponent = math.frexp(value)
+        return exponent * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+
+
+    def __get_bucket_value(self, bucket: int) -> float:
+        """
+        Returns the value representing the bucket (its middle).
+
+        :param bucket: The index of the bucket (None for values <= 0).
+        :type bucket: int
+        :return: The value.
+        :rtype: float
+        """
+
+        if bucket is None:
+            return 0
+
+        exponent, sub_bucket = divmod(bucket, self.sub_buckets)
+        return math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * self.sub_buckets), exponent)
+
+
+    def record(self, value: float):
+        """
+        Records the value.
+
+        :param value: The value.
+        :type value: float
+        """
+
+        bucket = self.__get_bucket(value)
+        with self.__lock:
+            self.__buckets[bucket] = self.__buckets.get(bucket, 0) + 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+
+    def get_percentiles(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """
+        Returns the percentiles of the recorded values (clamped to the recorded minimum and maximum).
+
+        :param percentiles: The percentiles in range <0, 100>.
+        :type percentiles: Sequence[float]
+        :return: The percentiles (p50, p90, ...), empty if no value was recorded.
+        :rtype: Dict[str, float]
+        """
+
+        with self.__lock:
+            if not self.count:
+                return {}
+            # the bucket of the values <= 0 is the first one
+            buckets = sorted(self.__buckets.items(), key=lambda item: -math.inf if item[0] is None else item[0])
+            count, low, high = self.count, self.min, self.max
+
+        res = {}
+        for p in percentiles:
+            rank = max(math.ceil(count * p / 100), 1)
+            seen = 0
+            for bucket, bucket_count in buckets:
+                seen += bucket_count
+                if seen >= rank:
+                    break
+            res[f"p{p:g}"] = min(max(self.__get_bucket_value(bucket), low), high)
+
+        return res
+
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the exported summary of the histogram.
+
+        :return: The count, sum, mean, min, percentiles and max of the recorded values.
+        :rtype: Dict[str, float]
+        """
+
+        with self.__lock:
+            count, total, low, high = self.count, self.sum, self.min, self.max
+
+        res = {'count': count, 'sum': total}
+        if count:
+            res['mean'] = total / count
+            res['min'] = low
+            res.update(self.get_percentiles())
+            res['max'] = high
+
+        return res
+
+
+_METRIC_CLASSES = {COUNTER: Counter, GAUGE: Gauge, HISTOGRAM: Histogram}
+"""The classes of the metrics by their type."""
+
+
+class MetricsRegistry:
+    """
+    This class keeps the metrics by their names and labels. A metric is created by its first request,
+    the following requests (with the same name and labels) return the same instance.
+    """
+
+    def __init__(self):
+        """
+        Creates the empty registry.
+        """
+
+        # name -> (type, help, {sorted labels: metric})
+        self.__families: Dict[str, Tuple[str, str, Dict[Tuple[Tuple[str, str], ...], Any]]] = {}
+        self.__lock = threading.Lock()
+
+
+    def __get(self, metric_type: str, name: str, help: str, labels: Dict[str, Any]) -> Any:
+        """
+        Returns the metric (creates it if it does not exist).
+
+        :param metric_type: The type of the metric (COUNTER, GAUGE or HISTOGRAM).
+        :type metric_type: str
+        :param name: The name of the metric.
+        :type name: str
+        :param help: The description of the metric.
+        :type help: str
+        :param labels: The labels of the metric.
+        :type labels: Dict[str, Any]
+        :return: The metric.
+        :rtype: Any
+        :raises ValueError: If the metric was registered with another type.
+        """
+
+        key = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        family = self.__families.get(name, None)
+        if family is None or key not in family[2]:
+            with self.__lock:
+                family = self.__families.setdefault(name, (metric_type, help, {}))
+                if family[0] != metric_type:
+                    raise ValueError(f"Metric '{name}' is a {family[0]}, not a {metric_type}")
+                family[2].setdefault(key, _METRIC_CLASSES[metric_type]())
+        elif family[0] != metric_type:
+            raise ValueError(f"Metric '{name}' is a {family[0]}, not a {metric_type}")
+
+        return family[2][key]
+
+
+    def counter(self, name: str, help: str = '', **labels) -> Counter:
+        """
+        Returns the counter.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param help: The description of the counter.
+        :type help: str
+        :return: The counter.
+        :rtype: Counter
+        """
+
+        return self.__get(COUNTER, name, help, labels)
+
+
+    def gauge(self, name: str, help: str = '', **labels) -> Gauge:
+        """
+        Returns the gauge.
+
+        :param name: The name of the gauge.
+        :type name: str
+        :param help: The description of the gauge.
+        :type help: str
+        :return: The gauge.
+        :rtype: Gauge
+        """
+
+        return self.__get(GAUGE, name, help, labels)
+
+
+    def histogram(self, name: str, help: str = '', **labels) -> Histogram:
+        """
+        Returns the histogram.
+
+        :param name: The name of the histogram.
+        :type name: str
+        :param help: The description of the histogram.
+        :type help: str
+        :return: The histogram.
+        :rtype: Histogram
+        """
+
+        return self.__get(HISTOGRAM, name, help, labels)
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the current values of all metrics.
+
+        :return: The time of the snapshot and the metrics (type, help and values with their labels).
+        :rtype: Dict[str, Any]
+        """
+
+        with self.__lock:
+            families = [(name, metric_type, help, list(metrics.items()))
+                        for name, (metric_type, help, metrics) in self.__families.items()]
+
+        res = {}
+        for name, metric_type, help, metrics in families:
+            res[name] = {'type': metric_type, 'help': help,
+                         'values': [{'labels': dict(key), 'value': metric.snapshot()} for key, metric in metrics]}
+
+        return {'time': time.time(), 'metrics': res}
+
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the current values of all metrics in the Prometheus text format
+        (the histograms are exported as summaries with the quantiles).
+
+        :return: The metrics.
+        :rtype: str
+        """
+
+        lines: List[str] = []
+        for name, family in self.snapshot()['metrics'].items():
+            metric_type = 'summary' if family['type'] == HISTOGRAM else family['type']
+            if family['help']:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for entry in family['values']:
+                labels, value = entry['labels'], entry['value']
+                if family['type'] != HISTOGRAM:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+
+                for p in DEFAULT_PERCENTILES:
+                    if f"p{p:g}" in value:
+                        lines.append(f"{name}{_format_labels({**labels, 'quantile': f'{p / 100:g}'})} {value[f'p{p:g}']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """
+    Returns the labels in the Prometheus text format.
+
+    :param labels: The labels.
+    :type labels: Dict[str, str]
+    :return: The formatted labels (empty if there are none).
+    :rtype: str
+    """
+
+    if not labels:
+        return ''
+
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{label}="{value}"' for label, value in zip(labels, escaped)) + '}'
+
+
+REGISTRY = MetricsRegistry()
+"""The registry of the metrics of the client."""
+
+
+class MetricsExporter:
+    """
+    This class exports the snapshots of the registry: writes them as JSON to a file
+    on an interval (replaced atomically) and optionally serves them in the Prometheus text format
+    on a local HTTP endpoint (/metrics).
+    """
+
+    DEFAULT_INTERVAL = 10
+    """The default interval in seconds between the writes of the snapshots."""
+
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, path: str = None, interval: float = DEFAULT_INTERVAL, port: int = 0):
+        """
+        Creates the exporter.
+
+        :param registry: The exported registry.
+        :type registry: MetricsRegistry
+        :param path: The path to the file of the snapshots (None to not write them).
+        :type path: str
+        :param interval: The interval in seconds between the writes of the snapshots.
+        :type interval: float
+        :param port: The port of the local endpoint (0 to not serve it).
+        :type port: int
+        """
+
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.port = port
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread = None
+        self.__server: ThreadingHTTPServer = None
+
+
+    def start(self):
+        """
+        Starts writing the snapshots and serving the endpoint.
+        """
+
+        if self.path:
+            self.__thread = threading.Thread(target=self.__run, name='MetricsExporter', daemon=True)
+            self.__thread.start()
+
+        if self.port:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = registry.to_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self.__server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+                self.__server.daemon_threads = True
+                threading.Thread(target=self.__server.serve_forever, name='MetricsEndpoint', daemon=True).start()
+                logger.info(f"Serving the metrics at http://127.0.0.1:{self.port}/metrics")
+            except OSError as e:
+                logger.error(f"Failed to serve the metrics on the port {self.port}: {e}")
+                self.__server = None
+
+
+    def stop(self):
+        """
+        Stops the exporter (the last snapshot is written).
+        """
+
+        self.__stopped.set()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+        if self.__server:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+
+    def write_snapshot(self):
+        """
+        Writes the current snapshot to the file (through a temporary file, so readers never see a partial one).
+        """
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.registry.snapshot(), f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to write the metrics to {self.path}: {e}")
+
+
+    def __run(self):
+        """
+        Writes the snapshots until stopped.
+        """
+
+        while not self.__stopped.wait(self.interval):
+            self.write_snapshot()
+        self.write_snapshot()
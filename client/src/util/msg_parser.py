@@ -0,0 +1,211 @@
+"""
+This module contains the codec of the network protocol of the game Inverse Battleships.
+The functions are pure (no I/O) so they can be shared by the synchronous and asynchronous
+connection managers and by the development tools.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, List, Tuple
+from const.server_communication import *
+
+
+@dataclass
+class ServerResponse:
+    """
+    This class represents a response from the server.
+    """
+
+    command: str
+    """The response from the server."""
+    params: List[Any]
+    """Parameters of the response from the server."""
+
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the server response.
+
+        :return: The string representation of the server response.
+        :rtype: str
+        """
+
+        res = ""
+        res += f"{MSG_HEADER}"
+        res += f"{MSG_DELIMITER}"
+        res += f"{self.command}"
+
+        if self.params:
+            res += f"{MSG_DELIMITER}"
+            res += f"{MSG_DELIMITER.join([str(param) for param in self.params])}"
+        res += f"{MSG_TERMINATOR}"
+
+        return res
+
+
+def to_net_message(parts: List[str]) -> str:
+    """
+    Returns a formatted message from the parts for the network communication.
+
+    :param parts: The parts of the message.
+    :type parts: List[str]
+    :return: The message.
+    :rtype: str
+    :raises ValueError: If any part contains the message terminator.
+    """
+
+    if not parts:
+        return f"ERR;NONE{MSG_TERMINATOR}"
+
+    escaped = []
+    for i, part in enumerate(parts):
+        if MSG_TERMINATOR in part:
+            raise ValueError(f"Message part {i}: '{part}' contains the message terminator '{MSG_TERMINATOR}'")
+        # the escape character has to be escaped first, otherwise the escaped delimiters would be doubled
+        part = part.replace(MSG_ESCAPE, f"{MSG_ESCAPE}{MSG_ESCAPE}")
+        escaped.append(part.replace(MSG_DELIMITER, f"{MSG_ESCAPE}{MSG_DELIMITER}"))
+
+    return f"{MSG_HEADER}{MSG_DELIMITER}{MSG_DELIMITER.join(escaped)}{MSG_TERMINATOR}"
+
+
+def from_net_message(message: str) -> List[str]:
+    """
+    Returns the parts of the message from the network communication.
+
+    :param message: The message.
+    :type message: str
+    :return: The parts of the message.
+    :rtype: List[str]
+    :raises ValueError: If the message does not start with the header.
+    """
+
+    if not message.startswith(MSG_HEADER):
+        raise ValueError(f"Invalid message header: '{message[:len(MSG_HEADER)]}'")
+
+    parts = []
+    part = ""
+    do_escape = False
+    for char in message[(len(MSG_HEADER) + 1):]:    # skip the header and the first delimiter
+        # end of part encountered
+        if char == MSG_TERMINATOR:
+            parts.append(part)
+            break
+
+        # escape character encountered
+        if char == MSG_ESCAPE and not do_escape:
+            do_escape = True
+            continue
+
+        # escaping sequence
+        if do_escape:
+            part += char
+            do_escape = False
+            continue
+
+        # regular sequence
+        else:
+            if char == MSG_DELIMITER:
+                parts.append(part)
+                part = ""
+            else:
+                part += char
+
+    return parts
+
+
+def escape_net_message(message: str) -> str:
+    """
+    Escapes the message for logging purposes (makes the control characters visible).
+
+    :param message: The message to escape.
+    :type message: str
+    :return: The escaped message.
+    :rtype: str
+    """
+
+    # NOTE: UTF-8 encoding maybe will be changed to ASCII
+    res = message.encode('unicode_escape').decode('utf-8')
+    return res.replace(MSG_ESCAPE+MSG_ESCAPE, MSG_ESCAPE)
+
+
+def get_complete_message(message: str) -> Tuple[bool, str, str]:
+    """
+    Checks if the message is complete and returns the complete message and the tail of the message.
+
+    :param message: The message.
+    :type message: str
+    :return: True if the message is complete, the complete message and the tail of the message.
+    :rtype: Tuple[bool, str, str]
+    """
+
+    i_end = message.find(MSG_TERMINATOR)
+    if i_end == -1:
+        return False, message, ""
+
+    return True, message[:i_end+1], message[(i_end + 1):]       # include the terminator
+
+
+def board_from_net(board_str: str) -> List[List[int]]:
+    """
+    Parses the board from its network representation (rows separated by SEQ_DELIMITER,
+    cells separated by NUM_DELIMITER).
+
+    :param board_str: The network representation of the board.
+    :type board_str: str
+    :return: The board.
+    :rtype: List[List[int]]
+    """
+
+    return [[int(c) for c in row.split(NUM_DELIMITER)] for row in board_str.split(SEQ_DELIMITER)]
+
+
+def board_to_net(board: List[List[int]]) -> str:
+    """
+    Returns the network representation of the board.
+
+    :param board: The board.
+    :type board: List[List[int]]
+    :return: The network representation of the board.
+    :rtype: str
+    """
+
+    return SEQ_DELIMITER.join(NUM_DELIMITER.join(str(c) for c in row) for row in board)
+
+
+def parse_parts(parts: List[str], board_parser: Callable[[str], Any] = board_from_net) -> ServerResponse:
+    """
+    Parses the parts of a message from the server.
+
+    :param parts: The parts of the message.
+    :type parts: List[str]
+    :param board_parser: Parses the boards from their network representation (board_from_net by default,
+    e.g. game.bitboard.Bitboard.from_net for bitboards).
+    :type board_parser: Callable[[str], Any]
+    :return: The parsed message.
+    :rtype: ServerResponse
+    :raises ValueError: If the message is empty or the command is not valid.
+    """
+
+    if len(parts) == 0:
+        raise ValueError("Empty message received")
+
+    # NOTE: should always recieve valid commands (server response)
+    command = parts[PART_CMD_INDEX]
+
+    if command in [CMD_PING, CMD_PONG, CMD_ACKW_VALID, CMD_CONFIRM_LEAVE,
+                   CMD_LOBBIES, CMD_GAME_LOSE, CMD_GAME_WIN,
+                   CMD_WAIT, CMD_TKO, CMD_LOBBY_PAIRING, CMD_LOBBY_PAIRED,
+                   CMD_PLAYER_TURN]:
+        return ServerResponse(command, parts[PART_CMD_INDEX + 1:])
+
+    elif command == CMD_BOARD:
+        return ServerResponse(command, [board_parser(parts[PART_BOARD_INDEX])])
+
+    elif command == CMD_CONTINUE:
+        lobby_id = parts[PART_CONTINUE_LOBBY_ID_INDEX]
+        opponent = parts[PART_CONTINUE_OPPONENT_INDEX]
+        player_on_turn = parts[PART_CONTINUE_PLAYER_ON_TURN_INDEX]
+        board = board_parser(parts[PART_CONTINUE_BOARD_INDEX])
+
+        return ServerResponse(command, [lobby_id, opponent, player_on_turn, board])
+
+    raise ValueError(f"Invalid command received: '{command}'")
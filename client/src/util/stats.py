@@ -0,0 +1,141 @@
+"""
+This module contains helper functions for summarizing measured samples (latencies, scores, ...).
+"""
+
+import math
+from typing import Dict, List, Sequence
+
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+"""The percentiles reported by default."""
+
+
+def percentile(sorted_samples: Sequence[float], p: float) -> float:
+    """
+    Returns the p-th percentile of the sorted samples (linear interpolation between closest ranks).
+
+    :param sorted_samples: The samples sorted in ascending order.
+    :type sorted_samples: Sequence[float]
+    :param p: The percentile in range <0, 100>.
+    :type p: float
+    :return: The percentile or None if there are no samples.
+    :rtype: float
+    """
+
+    if not sorted_samples:
+        return None
+
+    rank = (len(sorted_samples) - 1) * p / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_samples[low]
+
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def summarize(samples: List[float], percentiles: Sequence[float] = DEFAULT_PERCENTILES, scale: float = 1) -> Dict[str, float]:
+    """
+    Returns a summary (count, mean, min, max and percentiles) of the samples.
+
+    :param samples: The samples.
+    :type samples: List[float]
+    :param percentiles: The percentiles to report.
+    :type percentiles: Sequence[float]
+    :param scale: The factor applied to the reported values (e.g. 1000 for seconds to milliseconds).
+    :type scale: float
+    :return: The summary.
+    :rtype: Dict[str, float]
+    """
+
+    res = {'count': len(samples)}
+    if not samples:
+        return res
+
+    sorted_samples = sorted(samples)
+    res['mean'] = sum(sorted_samples) / len(sorted_samples) * scale
+    res['min'] = sorted_samples[0] * scale
+    for p in percentiles:
+        res[f"p{p:g}"] = percentile(sorted_samples, p) * scale
+    res['max'] = sorted_samples[-1] * scale
+
+    return res
+
+
+def mean_confidence_interval(samples: List[float], z: float = 1.96) -> Dict[str, float]:
+    """
+    Returns the mean of the samples with the normal approximation of its confidence interval
+    (95 % by default).
+
+    :param samples: The samples.
+    :type samples: List[float]
+    :param z: The z-score of the confidence level.
+    :type z: float
+    :return: The mean and the lower and upper bound of the interval.
+    :rtype: Dict[str, float]
+    """
+
+    n = len(samples)
+    if n == 0:
+        return {'mean': None, 'low': None, 'high': None}
+
+    mean = sum(samples) / n
+    if n == 1:
+        return {'mean': mean, 'low': mean, 'high': mean}
+
+    variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+    half_width = z * math.sqrt(variance / n)
+    return {'mean': mean, 'low': mean - half_width, 'high': mean + half_width}
+
+
+def moments_confidence_interval(n: int, total: float, total_squares: float, z: float = 1.96) -> Dict[str, float]:
+    """
+    Returns the same as mean_confidence_interval from the count, the sum and the sum of squares
+    of the samples (so the samples of long streams do not have to be kept).
+
+    :param n: The number of samples.
+    :type n: int
+    :param total: The sum of the samples.
+    :type total: float
+    :param total_squares: The sum of the squares of the samples.
+    :type total_squares: float
+    :param z: The z-score of the confidence level.
+    :type z: float
+    :return: The mean and the lower and upper bound of the interval.
+    :rtype: Dict[str, float]
+    """
+
+    if n == 0:
+        return {'mean': None, 'low': None, 'high': None}
+
+    mean = total / n
+    if n == 1:
+        return {'mean': mean, 'low': mean, 'high': mean}
+
+    variance = max(total_squares - n * mean ** 2, 0) / (n - 1)
+    half_width = z * math.sqrt(variance / n)
+    return {'mean': mean, 'low': mean - half_width, 'high': mean + half_width}
+
+
+def proportion_confidence_interval(successes: int, n: int, z: float = 1.96) -> Dict[str, float]:
+    """
+    Returns the proportion of successes with its Wilson score confidence interval (95 % by default).
+
+    :param successes: The number of successes.
+    :type successes: int
+    :param n: The number of trials.
+    :type n: int
+    :param z: The z-score of the confidence level.
+    :type z: float
+    :return: The proportion and the lower and upper bound of the interval.
+    :rtype: Dict[str, float]
+    """
+
+    if n == 0:
+        return {'mean': None, 'low': None, 'high': None}
+
+    p = successes / n
+    denominator = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return {'mean': p, 'low': center - half_width, 'high': center + half_width}
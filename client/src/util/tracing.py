@@ -0,0 +1,289 @@
+"""
+This module contains the tracer of the client (see TRACER): it records the spans (e.g. the phases of a game tick,
+the network requests, the joins of the threads) with the ids of their threads, and writes them in the Chrome
+Trace Event format (opened by chrome://tracing or https://ui.perfetto.dev) as a timeline of the threads.
+When the tracing is not started, a span is a shared no-op context manager, so the traced code costs
+one attribute check.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+from const.loggers import MAIN_LOGGER_NAME
+from util.loggers import get_logger
+
+
+logger = get_logger(MAIN_LOGGER_NAME)
+
+
+class _NullSpan:
+    """
+    The span returned when the tracing is not started (does nothing).
+    """
+
+    def __enter__(self) -> '_NullSpan':
+        """
+        Enters the span.
+
+        :return: The span.
+        :rtype: _NullSpan
+        """
+
+        return self
+
+
+    def __exit__(self, *exc_info) -> bool:
+        """
+        Exits the span.
+
+        :return: False (the exceptions are propagated).
+        :rtype: bool
+        """
+
+        return False
+
+
+    def set(self, **args):
+        """
+        Adds the arguments to the span.
+        """
+
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+"""The shared no-op span."""
+
+
+class _Span:
+    """
+    A recorded span (a complete event of the trace).
+    """
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict[str, Any]):
+        """
+        Creates the span.
+
+        :param tracer: The tracer recording the span.
+        :type tracer: Tracer
+        :param name: The name of the span.
+        :type name: str
+        :param category: The category of the span (e.g. net, state, thread).
+        :type category: str
+        :param args: The arguments shown with the span.
+        :type args: Dict[str, Any]
+        """
+
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+
+    def __enter__(self) -> '_Span':
+        """
+        Starts the span.
+
+        :return: The span.
+        :rtype: _Span
+        """
+
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        """
+        Ends the span and records it.
+
+        :return: False (the exceptions are propagated).
+        :rtype: bool
+        """
+
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = f"{exc_type.__name__}: {exc_value}"
+        self.tracer.add_event({'ph': 'X', 'name': self.name, 'cat': self.category,
+                               'ts': self.tracer.get_timestamp(self.start),
+                               'dur': (end - self.start) * 1e6, 'args': self.args})
+        return False
+
+
+    def set(self, **args):
+        """
+        Adds the arguments to the span (e.g. known only at its end).
+        """
+
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    This class records the events of the trace of all threads. The events are kept in a bounded buffer
+    (the oldest are dropped), so a long session can be traced and only its end is written.
+    """
+
+    MAX_EVENTS = 200_000
+    """The maximal number of the kept events."""
+
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        """
+        Creates the tracer (not started).
+
+        :param max_events: The maximal number of the kept events.
+        :type max_events: int
+        """
+
+        self.enabled = False
+        """Whether the events are recorded."""
+        self.__events = deque(maxlen=max_events)
+        self.__thread_names: Dict[int, str] = {}
+        self.__start = time.perf_counter()
+        self.__pid = os.getpid()
+
+
+    def start(self):
+        """
+        Starts recording the events (the previous events are dropped).
+        """
+
+        self.__events.clear()
+        self.__thread_names.clear()
+        self.__start = time.perf_counter()
+        self.enabled = True
+        logger.info('Tracing started')
+
+
+    def stop(self):
+        """
+        Stops recording the events.
+        """
+
+        self.enabled = False
+
+
+    def get_timestamp(self, counter: float) -> float:
+        """
+        Returns the timestamp of the trace.
+
+        :param counter: The value of time.perf_counter.
+        :type counter: float
+        :return: The timestamp in microseconds since the start of the tracing.
+        :rtype: float
+        """
+
+        return (counter - self.__start) * 1e6
+
+
+    def add_event(self, event: Dict[str, Any]):
+        """
+        Adds the event of the current thread.
+
+        :param event: The event (without the ids of the process and the thread).
+        :type event: Dict[str, Any]
+        """
+
+        tid = threading.get_native_id()
+        if tid not in self.__thread_names:
+            self.__thread_names[tid] = threading.current_thread().name
+        event['pid'] = self.__pid
+        event['tid'] = tid
+        self.__events.append(event)
+
+
+    def span(self, name: str, category: str = '', **args) -> _Span | _NullSpan:
+        """
+        Returns the span to trace a block of code (a context manager).
+
+        :param name: The name of the span.
+        :type name: str
+        :param category: The category of the span (e.g. net, state, thread).
+        :type category: str
+        :return: The span (a no-op one if the tracing is not started).
+        :rtype: _Span | _NullSpan
+        """
+
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return _Span(self, name, category, args)
+
+
+    def instant(self, name: str, category: str = '', **args):
+        """
+        Records an instant event (e.g. a state transition).
+
+        :param name: The name of the event.
+        :type name: str
+        :param category: The category of the event.
+        :type category: str
+        """
+
+        if self.enabled:
+            self.add_event({'ph': 'i', 's': 't', 'name': name, 'cat': category,
+                            'ts': self.get_timestamp(time.perf_counter()), 'args': args})
+
+
+    def traced(self, category: str = '') -> Callable[[Callable], Callable]:
+        """
+        Returns the decorator tracing each call of the function as a span (named by the qualified name of the function).
+
+        :param category: The category of the spans.
+        :type category: str
+        :return: The decorator.
+        :rtype: Callable[[Callable], Callable]
+        """
+
+        def decorator(func: Callable) -> Callable:
+            name = func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, category, {}):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+    def get_trace(self) -> Dict[str, Any]:
+        """
+        Returns the recorded trace in the Chrome Trace Event format.
+
+        :return: The trace (the names of the threads and the events).
+        :rtype: Dict[str, Any]
+        """
+
+        events: List[Dict[str, Any]] = [{'ph': 'M', 'name': 'thread_name', 'pid': self.__pid, 'tid': tid, 'args': {'name': name}}
+                                        for tid, name in list(self.__thread_names.items())]
+        events.extend(list(self.__events))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+    def write(self, path: str):
+        """
+        Writes the recorded trace to the file.
+
+        :param path: The path to the file.
+        :type path: str
+        """
+
+        try:
+            with open(path, 'w') as f:
+                json.dump(self.get_trace(), f, default=str)
+            logger.info(f"Trace written to {path}")
+        except OSError as e:
+            logger.error(f"Failed to write the trace to {path}: {e}")
+
+
+TRACER = Tracer()
+"""The tracer of the client."""